@@ -41,37 +41,72 @@ from datetime import timedelta
 import logging
 
 from .models import Alumno, Log, Configuracion, Tarea
+from .utils.log_buffer import registrar_log
 from .services import ingerir_desde_sial  # función en services.py (archivo)
 from .services.teams_service import TeamsService  # clase en services/ (directorio)
 from .services.email_service import EmailService  # clase en services/ (directorio)
 
 logger = logging.getLogger(__name__)
 
+# Exportación de alumnos (Excel/CSV): filas por round-trip a la base
+EXPORTACION_CHUNK_SIZE = 2000
+
+# Columnas exportadas: campo del modelo, encabezado y ancho en Excel
+EXPORTACION_COLUMNAS = [
+    ('apellido', 'Apellido', 20),
+    ('nombre', 'Nombre', 20),
+    ('tipo_documento', 'Tipo Documento', 10),
+    ('dni', 'DNI', 12),
+    ('email_personal', 'Email Personal', 35),
+    ('email_institucional', 'Email Institucional', 35),
+    ('estado_actual', 'Estado Actual', 14),
+    ('fecha_ingreso', 'Fecha Ingreso', 12),
+    ('cohorte', 'Cohorte', 10),
+    ('localidad', 'Localidad', 20),
+    ('telefono', 'Teléfono', 16),
+    ('modalidad_actual', 'Modalidad', 12),
+    ('carreras_data', 'Carreras', 50),
+    ('teams_procesado', 'Teams Procesado', 10),
+    ('moodle_procesado', 'Moodle Procesado', 10),
+    ('email_procesado', 'Email Procesado', 10),
+    ('created_at', 'Fecha Creación', 17),
+    ('updated_at', 'Última Modificación', 17),
+]
+EXPORTACION_CAMPOS = [campo for campo, _, _ in EXPORTACION_COLUMNAS]
+EXPORTACION_ENCABEZADOS = [encabezado for _, encabezado, _ in EXPORTACION_COLUMNAS]
+EXPORTACION_ANCHOS = [ancho for _, _, ancho in EXPORTACION_COLUMNAS]
+
+
+def _formatear_texto(valor):
+    return valor if valor is not None else ''
+
+
+def _formatear_fecha(valor):
+    return valor.strftime('%Y-%m-%d') if valor else ''
 
-def extraer_codigo_error(excepcion_msg, codigo_default='G-001'):
-    """
-    Extrae el código de error si viene en el formato "T-XXX: mensaje".
-    Retorna tupla (codigo_error, mensaje_limpio)
-    """
-    error_msg = str(excepcion_msg)
-
-    # Lista de códigos válidos
-    codigos_validos = [
-        'T-001', 'T-002', 'T-003', 'T-004', 'T-005', 'T-006', 'T-007', 'T-008', 'T-009', 'T-999',
-        'M-001', 'M-002', 'M-003', 'M-004', 'M-005', 'M-006', 'M-007', 'M-008', 'M-009', 'M-010', 'M-011',
-        'E-001', 'E-002', 'E-003', 'E-004', 'E-005', 'E-006', 'E-007',
-        'U-001', 'U-002', 'U-003', 'U-004', 'U-005', 'U-006',
-        'G-001', 'G-002', 'G-003', 'G-004', 'G-005', 'G-006'
-    ]
 
-    # Verificar si el mensaje comienza con un código válido
-    if ':' in error_msg:
-        posible_codigo = error_msg.split(':')[0].strip()
-        if posible_codigo in codigos_validos:
-            mensaje_limpio = error_msg.split(':', 1)[1].strip()
-            return (posible_codigo, mensaje_limpio)
+def _formatear_fecha_hora(valor):
+    return valor.strftime('%Y-%m-%d %H:%M') if valor else ''
 
-    return (codigo_default, error_msg)
+
+def _formatear_booleano(valor):
+    return 'Sí' if valor else 'No'
+
+
+def _formatear_carreras(valor):
+    return ", ".join(c.get('nombre_carrera', 'N/A') for c in valor) if valor else ''
+
+
+# Formato de cada campo exportado; los que no figuran se exportan como texto
+EXPORTACION_FORMATOS = {
+    'fecha_ingreso': _formatear_fecha,
+    'carreras_data': _formatear_carreras,
+    'teams_procesado': _formatear_booleano,
+    'moodle_procesado': _formatear_booleano,
+    'email_procesado': _formatear_booleano,
+    'created_at': _formatear_fecha_hora,
+    'updated_at': _formatear_fecha_hora,
+}
 
 
 def encolar_o_ejecutar_tarea(alumno, tipo_tarea, task_func=None, task_args=None, usuario=None, detalles=None):
@@ -149,7 +184,7 @@ class AlumnoAdmin(admin.ModelAdmin):
     )
     ordering = ("apellido", "nombre")
     actions = [
-        # ===== ACCIONES ATÓMICAS (SÍNCRONAS) =====
+        # ===== ACCIONES ATÓMICAS (las *_sync corren en background) =====
         'enviar_email_bienvenida_masivo',
         'activar_teams_con_email_sync',
         'activar_teams_sin_email_sync',
@@ -165,6 +200,7 @@ class AlumnoAdmin(admin.ModelAdmin):
         'activar_teams_y_moodle_sin_email_sync',
         # ===== EXPORTACIÓN/IMPORTACIÓN =====
         'exportar_alumnos_excel',
+        'exportar_alumnos_csv',
     ]
 
     def get_urls(self):
@@ -175,6 +211,21 @@ class AlumnoAdmin(admin.ModelAdmin):
                 self.admin_site.admin_view(self.ingesta_view),
                 name="alumnos_alumno_ingesta",
             ),
+            path(
+                "accion-masiva/<int:tarea_id>/",
+                self.admin_site.admin_view(self.accion_masiva_view),
+                name="alumnos_alumno_accion_masiva",
+            ),
+            path(
+                "accion-masiva/<int:tarea_id>/estado/",
+                self.admin_site.admin_view(self.accion_masiva_estado_view),
+                name="alumnos_alumno_accion_masiva_estado",
+            ),
+            path(
+                "accion-masiva/<int:tarea_id>/cancelar/",
+                self.admin_site.admin_view(self.accion_masiva_cancelar_view),
+                name="alumnos_alumno_accion_masiva_cancelar",
+            ),
         ]
         return custom + urls
 
@@ -254,1935 +305,401 @@ class AlumnoAdmin(admin.ModelAdmin):
         return redirect("..")
 
     # =====================================================
-    # ACCIONES ATÓMICAS (SÍNCRONAS)
+    # ACCIONES MASIVAS EN BACKGROUND (con progreso)
     # =====================================================
 
-    @admin.action(description="⚡ Teams con email (ATÓMICO)")
-    def activar_teams_con_email_sync(self, request, queryset):
+    def _lanzar_accion_masiva(self, request, queryset, accion):
         """
-        Crea usuario en Teams y envía email con credenciales.
-        Ejecución SÍNCRONA (sin cola).
+        Encola una acción masiva sobre el queryset y vuelve enseguida.
+
+        El trabajo lo hace ejecutar_accion_masiva en Celery, de a chunks; acá
+        solo se crea la Tarea agregada y se deja el link a la página de progreso.
         """
-        from django.conf import settings
-        from .services.teams_service import TeamsService
-        from .services.email_service import EmailService
-        from .models import Log, Tarea
-        from django.utils import timezone
-        import time
+        from django.db import transaction
+        from django.urls import reverse
+        from .tasks.acciones_admin import crear_accion_masiva, ejecutar_accion_masiva
 
-        teams_svc = TeamsService()
-        email_svc = EmailService()
+        alumno_ids = list(queryset.values_list('id', flat=True))
+        if not alumno_ids:
+            self.message_user(request, "No hay alumnos seleccionados.", level=messages.WARNING)
+            return
 
-        exitos = 0
-        errores = 0
+        usuario = request.user.username if request.user.is_authenticated else None
+        tarea = crear_accion_masiva(accion, alumno_ids, usuario)
+        transaction.on_commit(lambda: ejecutar_accion_masiva.delay(tarea.id))
 
-        for alumno in queryset:
-            inicio = timezone.now()
-            inicio_time = time.time()
-            codigo_error = None
-            mensaje_error = None
+        url = reverse('admin:alumnos_alumno_accion_masiva', args=[tarea.id])
+        self.message_user(
+            request,
+            format_html(
+                '⏳ {}: {} alumnos en proceso en segundo plano. <a href="{}">Ver progreso</a>',
+                tarea.detalles['descripcion'], len(alumno_ids), url
+            ),
+            level=messages.INFO
+        )
 
-            # Log inicio
-            Log.objects.create(
-                tipo='INFO',
-                modulo='admin_action_sync',
-                mensaje=f'Iniciando: Teams con email',
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None
-            )
+    def _get_accion_masiva(self, tarea_id):
+        from django.shortcuts import get_object_or_404
+        return get_object_or_404(Tarea, id=tarea_id, tipo=Tarea.TipoTarea.ACCION_MASIVA)
 
-            # Crear tarea
-            tarea = Tarea.objects.create(
-                tipo=Tarea.TipoTarea.CREAR_USUARIO_TEAMS,
-                estado=Tarea.EstadoTarea.RUNNING,
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None,
-                hora_inicio=inicio,
-                detalles={
-                    'modulo': 'admin_action_sync',
-                    'accion': 'activar_teams_con_email',
-                    'enviar_email': True
-                }
-            )
+    def accion_masiva_view(self, request, tarea_id):
+        """Página de progreso de una acción masiva (se actualiza con el endpoint de estado)."""
+        from django.shortcuts import render
+        from .tasks.acciones_admin import progreso_accion_masiva
 
-            try:
-                # Validar email
-                if not alumno.email:
-                    codigo_error = 'T-001'
-                    raise ValueError("No tiene email configurado")
+        tarea = self._get_accion_masiva(tarea_id)
+        context = {
+            **self.admin_site.each_context(request),
+            'title': f"Progreso: {tarea.detalles.get('descripcion', 'Acción masiva')}",
+            'opts': self.model._meta,
+            'tarea': tarea,
+            'progreso': progreso_accion_masiva(tarea),
+        }
+        return render(request, 'admin/alumnos/alumno/accion_masiva.html', context)
 
-                # Crear usuario en Teams
-                logger.info(f"Llamando teams_svc.create_user para alumno {alumno.id}")
-                result = teams_svc.create_user(alumno)
-                logger.info(f"Resultado de Teams: type={type(result)}, value={result}")
+    def accion_masiva_estado_view(self, request, tarea_id):
+        """Contadores en vivo de una acción masiva (JSON para el polling de la página)."""
+        from django.http import JsonResponse
+        from .tasks.acciones_admin import progreso_accion_masiva
 
-                if not result:
-                    codigo_error = 'T-003'
-                    raise Exception("Error al crear usuario en Teams")
-
-                # Validar que el resultado tenga los campos necesarios
-                if not isinstance(result, dict):
-                    codigo_error = 'T-003'
-                    raise Exception(f"Respuesta inválida de Teams - no es dict: {type(result).__name__}, valor: {str(result)[:100]}")
-
-                if 'upn' not in result:
-                    codigo_error = 'T-003'
-                    raise Exception(f"Respuesta de Teams sin 'upn': {list(result.keys())}")
-
-                # Actualizar alumno
-                alumno.email_institucional = result.get('upn')
-                alumno.teams_password = result.get('password')
-                alumno.teams_procesado = True
-                # alumno.teams_payload = result
-                alumno.save(update_fields=[
-                    'email_institucional', 'teams_password',
-                    'teams_procesado'
-                ])
-
-                # Enviar email solo si tenemos password
-                email_enviado = False
-                if result.get('password'):
-                    teams_data = {
-                        'upn': result.get('upn'),
-                        'password': result.get('password')
-                    }
-                    email_enviado = email_svc.send_credentials_email(alumno, teams_data)
-                    if email_enviado:
-                        alumno.email_procesado = True
-                        alumno.save(update_fields=['email_procesado'])
-                else:
-                    logger.warning(f"No se pudo enviar email a {alumno}: sin password en resultado de Teams")
+        return JsonResponse(progreso_accion_masiva(self._get_accion_masiva(tarea_id)))
 
-                # Actualizar tarea
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-                tarea.estado = Tarea.EstadoTarea.COMPLETED
-                tarea.hora_fin = fin
-                tarea.cantidad_entidades = 1
-                tarea.detalles['resultado'] = 'Éxito'
-                tarea.detalles['upn'] = result['upn']
-                tarea.detalles['email_enviado'] = email_enviado
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
+    def accion_masiva_cancelar_view(self, request, tarea_id):
+        """Pide cancelar una acción masiva; se corta al terminar el chunk en curso."""
+        from .tasks.acciones_admin import cancelar_accion_masiva
 
-                # Log fin
-                Log.objects.create(
-                    tipo='SUCCESS',
-                    modulo='admin_action_sync',
-                    mensaje=f'Completado: Teams con email',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'duracion_segundos': round(duracion, 2),
-                        'upn': result['upn']
-                    }
-                )
+        if request.method != "POST":
+            return redirect("..")
 
-                exitos += 1
+        self._get_accion_masiva(tarea_id)
+        usuario = request.user.username if request.user.is_authenticated else None
+        if cancelar_accion_masiva(tarea_id, usuario):
+            messages.warning(request, "🛑 Cancelación solicitada: se detiene al terminar el chunk en curso.")
+        else:
+            messages.info(request, "La acción ya había terminado.")
+        return redirect("..")
 
-            except Exception as e:
-                # Actualizar tarea como fallida
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
+    @admin.action(description="⚡ Teams con email (ATÓMICO)")
+    def activar_teams_con_email_sync(self, request, queryset):
+        """
+        Crea usuario en Teams y envía email con credenciales.
+        Se ejecuta en background por chunks; el progreso se ve en la tarea.
+        """
+        self._lanzar_accion_masiva(request, queryset, 'activar_teams_con_email')
 
-                # Extraer código de error del mensaje si viene en formato "T-XXX: mensaje"
-                codigo_final, mensaje_limpio = extraer_codigo_error(e, codigo_error)
+    @admin.action(description="⚡ Teams sin email (ATÓMICO)")
+    def activar_teams_sin_email_sync(self, request, queryset):
+        """
+        Crea usuario en Teams SIN enviar email.
+        Se ejecuta en background por chunks; el progreso se ve en la tarea.
+        """
+        self._lanzar_accion_masiva(request, queryset, 'activar_teams_sin_email')
 
-                tarea.estado = Tarea.EstadoTarea.FAILED
-                tarea.hora_fin = fin
-                tarea.mensaje_error = mensaje_limpio
-                tarea.detalles['codigo_error'] = codigo_final
-                tarea.detalles['error'] = mensaje_limpio
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
+    @admin.action(description="⚡ Moodle con email (ATÓMICO)")
+    def enrollar_moodle_con_email_sync(self, request, queryset):
+        """
+        Enrolla en Moodle y envía email de enrollamiento.
+        Se ejecuta en background por chunks; el progreso se ve en la tarea.
+        """
+        self._lanzar_accion_masiva(request, queryset, 'enrollar_moodle_con_email')
 
-                # Log error
-                Log.objects.create(
-                    tipo='ERROR',
-                    modulo='admin_action_sync',
-                    mensaje=f'Error: Teams con email',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'codigo_error': codigo_final,
-                        'error': mensaje_limpio,
-                        'duracion_segundos': round(duracion, 2)
-                    }
-                )
+    @admin.action(description="⚡ Moodle sin email (ATÓMICO)")
+    def enrollar_moodle_sin_email_sync(self, request, queryset):
+        """
+        Enrolla en Moodle SIN enviar email.
+        Se ejecuta en background por chunks; el progreso se ve en la tarea.
+        """
+        self._lanzar_accion_masiva(request, queryset, 'enrollar_moodle_sin_email')
 
-                errores += 1
+    @admin.action(description="⚡⚡ Teams + Moodle con email (ATÓMICO)")
+    def activar_teams_y_moodle_con_email_sync(self, request, queryset):
+        """
+        Crea usuario en Teams, enrolla en Moodle y envía emails.
+        Operación ATÓMICA.
+        Se ejecuta en background por chunks; el progreso se ve en la tarea.
+        """
+        self._lanzar_accion_masiva(request, queryset, 'activar_teams_y_moodle_con_email')
 
-        self.message_user(
-            request,
-            f"✅ Teams: {exitos} éxitos, {errores} errores. Ver Tareas Asíncronas para detalles.",
-            level=messages.SUCCESS if exitos > 0 else messages.ERROR
-        )
+    @admin.action(description="⚡⚡ Teams + Moodle sin email (ATÓMICO)")
+    def activar_teams_y_moodle_sin_email_sync(self, request, queryset):
+        """
+        Crea usuario en Teams y enrolla en Moodle SIN enviar emails.
+        Operación ATÓMICA.
+        Se ejecuta en background por chunks; el progreso se ve en la tarea.
+        """
+        self._lanzar_accion_masiva(request, queryset, 'activar_teams_y_moodle_sin_email')
 
-    @admin.action(description="⚡ Teams sin email (ATÓMICO)")
-    def activar_teams_sin_email_sync(self, request, queryset):
+    # =====================================================
+    # ACCIONES ASÍNCRONAS (CON COLA CELERY)
+    # =====================================================
+
+    @admin.action(description="🚀 Activar Teams + Enviar Email con credenciales")
+    def activar_teams_email(self, request, queryset):
         """
-        Crea usuario en Teams SIN enviar email.
-        Ejecución SÍNCRONA (sin cola).
+        Crea usuario en Teams y envía email con credenciales (modo asíncrono).
+
+        **Comportamiento según USE_QUEUE_SYSTEM**:
+        - False: Ejecuta inmediatamente con .delay()
+        - True: Encola para procesamiento cada 5 min con rate limiting
         """
         from django.conf import settings
-        from .services.teams_service import TeamsService
-        from .models import Log, Tarea
-        from django.utils import timezone
-        import time
-
-        teams_svc = TeamsService()
+        from .tasks import activar_servicios_alumno
 
-        exitos = 0
-        errores = 0
+        tareas_programadas = 0
+        skipped_count = 0
+        use_queue = getattr(settings, 'USE_QUEUE_SYSTEM', False)
+        usuario = request.user.username if request.user.is_authenticated else None
 
         for alumno in queryset:
-            inicio = timezone.now()
-            inicio_time = time.time()
-            codigo_error = None
+            # Validar que tenga email
+            if not alumno.email:
+                self.message_user(
+                    request,
+                    f"⚠️ {alumno.apellido}, {alumno.nombre} no tiene email configurado",
+                    level=messages.WARNING
+                )
+                skipped_count += 1
+                continue
 
-            # Log inicio
-            Log.objects.create(
-                tipo='INFO',
-                modulo='admin_action_sync',
-                mensaje=f'Iniciando: Teams sin email',
+            encolar_o_ejecutar_tarea(
                 alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None
+                tipo_tarea=Tarea.TipoTarea.ACTIVAR_SERVICIOS,
+                task_func=activar_servicios_alumno,
+                task_args=(alumno.id,),
+                usuario=usuario
             )
+            tareas_programadas += 1
 
-            # Crear tarea
-            tarea = Tarea.objects.create(
-                tipo=Tarea.TipoTarea.CREAR_USUARIO_TEAMS,
-                estado=Tarea.EstadoTarea.RUNNING,
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None,
-                hora_inicio=inicio,
-                detalles={
-                    'modulo': 'admin_action_sync',
-                    'accion': 'activar_teams_sin_email',
-                    'enviar_email': False
-                }
-            )
+        # Mensaje según modo
+        if use_queue:
+            mensaje = f"✅ {tareas_programadas} tareas encoladas. Serán procesadas en máx 5 minutos."
+        else:
+            mensaje = f"📋 {tareas_programadas} tareas ejecutándose en background."
 
-            try:
-                # Crear usuario en Teams
-                result = teams_svc.create_user(alumno)
+        self.message_user(request, mensaje + " Ver Tareas Asíncronas.", level=messages.SUCCESS)
 
-                if not result:
-                    codigo_error = 'T-003'
-                    raise Exception("Error al crear usuario en Teams")
-
-                # Validar que el resultado tenga los campos necesarios
-                if not isinstance(result, dict) or 'upn' not in result:
-                    codigo_error = 'T-003'
-                    raise Exception(f"Respuesta inválida de Teams: {type(result)}")
-
-                # Actualizar alumno
-                alumno.email_institucional = result.get('upn')
-                alumno.teams_password = result.get('password')
-                alumno.teams_procesado = True
-                # alumno.teams_payload = result
-                alumno.save(update_fields=[
-                    'email_institucional', 'teams_password',
-                    'teams_procesado'
-                ])
+        if skipped_count > 0:
+            self.message_user(
+                request,
+                f"⚠️ {skipped_count} alumnos omitidos por falta de email",
+                level=messages.WARNING
+            )
 
-                # Actualizar tarea
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-                tarea.estado = Tarea.EstadoTarea.COMPLETED
-                tarea.hora_fin = fin
-                tarea.cantidad_entidades = 1
-                tarea.detalles['resultado'] = 'Éxito'
-                tarea.detalles['upn'] = result['upn']
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
+    @admin.action(description="🎓 Enrollar en Moodle + Email de Enrollamiento")
+    def enrollar_moodle_con_email(self, request, queryset):
+        """
+        Enrolla alumnos en Moodle y envía email de enrollamiento (Ecosistema Virtual).
+        """
+        from django.conf import settings
+        from .tasks import enrollar_moodle_task
+        from .models import Tarea
 
-                # Log fin
-                Log.objects.create(
-                    tipo='SUCCESS',
-                    modulo='admin_action_sync',
-                    mensaje=f'Completado: Teams sin email',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'duracion_segundos': round(duracion, 2),
-                        'upn': result['upn']
-                    }
-                )
+        use_queue = getattr(settings, 'USE_QUEUE_SYSTEM', False)
+        usuario = request.user.username if request.user.is_authenticated else None
 
-                exitos += 1
-
-            except Exception as e:
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-                tarea.estado = Tarea.EstadoTarea.FAILED
-                tarea.hora_fin = fin
-                tarea.mensaje_error = str(e)
-                tarea.detalles['codigo_error'] = codigo_error or 'G-001'
-                tarea.detalles['error'] = str(e)
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
-
-                Log.objects.create(
-                    tipo='ERROR',
-                    modulo='admin_action_sync',
-                    mensaje=f'Error: Teams sin email',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'codigo_error': codigo_error or 'G-001',
-                        'error': str(e),
-                        'duracion_segundos': round(duracion, 2)
-                    }
-                )
-
-                errores += 1
-
-        self.message_user(
-            request,
-            f"✅ Teams: {exitos} éxitos, {errores} errores. Ver Tareas Asíncronas para detalles.",
-            level=messages.SUCCESS if exitos > 0 else messages.ERROR
-        )
-
-    @admin.action(description="⚡ Moodle con email (ATÓMICO)")
-    def enrollar_moodle_con_email_sync(self, request, queryset):
-        """
-        Enrolla en Moodle y envía email de enrollamiento.
-        Ejecución SÍNCRONA (sin cola).
-        """
-        from .services.moodle_service import MoodleService
-        from .services.email_service import EmailService
-        from .models import Log, Tarea
-        from django.utils import timezone
-        import time
-
-        moodle_svc = MoodleService()
-        email_svc = EmailService()
-
-        exitos = 0
-        errores = 0
-
-        for alumno in queryset:
-            inicio = timezone.now()
-            inicio_time = time.time()
-            codigo_error = None
-
-            Log.objects.create(
-                tipo='INFO',
-                modulo='admin_action_sync',
-                mensaje=f'Iniciando: Moodle con email',
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None
-            )
-
-            tarea = Tarea.objects.create(
-                tipo=Tarea.TipoTarea.MOODLE_ENROLL,
-                estado=Tarea.EstadoTarea.RUNNING,
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None,
-                hora_inicio=inicio,
-                detalles={
-                    'modulo': 'admin_action_sync',
-                    'accion': 'enrollar_moodle_con_email',
-                    'enviar_email': True
-                }
-            )
-
-            try:
-                if not alumno.email_institucional:
-                    codigo_error = 'M-001'
-                    raise ValueError("No tiene email institucional")
-
-                # Crear/buscar usuario en Moodle
-                result = moodle_svc.create_user(alumno)
-                if not result:
-                    codigo_error = 'M-004'
-                    raise Exception('Error al crear usuario en Moodle - Sin respuesta')
-
-                if isinstance(result, dict) and 'error' in result:
-                    codigo_error = 'M-004'
-                    error_msg = result.get('error') if isinstance(result, dict) else str(result)
-                    raise Exception(f'Error al crear usuario en Moodle: {error_msg}')
-
-                # Enrollar en cursos
-                enroll_result = moodle_svc.enroll_user_in_courses(alumno)
-                if not enroll_result:
-                    codigo_error = 'M-006'
-                    raise Exception('Error al enrollar en cursos - Sin respuesta')
-
-                if isinstance(enroll_result, dict) and 'error' in enroll_result:
-                    codigo_error = 'M-006'
-                    error_msg = enroll_result.get('error') if isinstance(enroll_result, dict) else str(enroll_result)
-                    raise Exception(f'Error al enrollar en cursos: {error_msg}')
-
-                # Actualizar alumno
-                alumno.moodle_procesado = True
-                # alumno.moodle_payload = {'user': result, 'enrollments': enroll_result}
-                alumno.save(update_fields=['moodle_procesado'])
-
-                # Enviar email
-                email_enviado = email_svc.send_enrollment_email(alumno)
-                if email_enviado:
-                    alumno.email_procesado = True
-                    alumno.save(update_fields=['email_procesado'])
-
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-                tarea.estado = Tarea.EstadoTarea.COMPLETED
-                tarea.hora_fin = fin
-                tarea.cantidad_entidades = 1
-                tarea.detalles['resultado'] = 'Éxito'
-                tarea.detalles['email_enviado'] = email_enviado
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
-
-                Log.objects.create(
-                    tipo='SUCCESS',
-                    modulo='admin_action_sync',
-                    mensaje=f'Completado: Moodle con email',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={'duracion_segundos': round(duracion, 2)}
-                )
-
-                exitos += 1
-
-            except Exception as e:
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-                tarea.estado = Tarea.EstadoTarea.FAILED
-                tarea.hora_fin = fin
-                tarea.mensaje_error = str(e)
-                tarea.detalles['codigo_error'] = codigo_error or 'G-001'
-                tarea.detalles['error'] = str(e)
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
-
-                Log.objects.create(
-                    tipo='ERROR',
-                    modulo='admin_action_sync',
-                    mensaje=f'Error: Moodle con email',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'codigo_error': codigo_error or 'G-001',
-                        'error': str(e),
-                        'duracion_segundos': round(duracion, 2)
-                    }
-                )
-
-                errores += 1
-
-        self.message_user(
-            request,
-            f"✅ Moodle: {exitos} éxitos, {errores} errores. Ver Tareas Asíncronas para detalles.",
-            level=messages.SUCCESS if exitos > 0 else messages.ERROR
-        )
-
-    @admin.action(description="⚡ Moodle sin email (ATÓMICO)")
-    def enrollar_moodle_sin_email_sync(self, request, queryset):
-        """
-        Enrolla en Moodle SIN enviar email.
-        Ejecución SÍNCRONA (sin cola).
-        """
-        from .services.moodle_service import MoodleService
-        from .models import Log, Tarea
-        from django.utils import timezone
-        import time
-
-        moodle_svc = MoodleService()
-
-        exitos = 0
-        errores = 0
-
-        for alumno in queryset:
-            inicio = timezone.now()
-            inicio_time = time.time()
-            codigo_error = None
-
-            Log.objects.create(
-                tipo='INFO',
-                modulo='admin_action_sync',
-                mensaje=f'Iniciando: Moodle sin email',
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None
-            )
-
-            tarea = Tarea.objects.create(
-                tipo=Tarea.TipoTarea.MOODLE_ENROLL,
-                estado=Tarea.EstadoTarea.RUNNING,
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None,
-                hora_inicio=inicio,
-                detalles={
-                    'modulo': 'admin_action_sync',
-                    'accion': 'enrollar_moodle_sin_email',
-                    'enviar_email': False
-                }
-            )
-
-            try:
-                if not alumno.email_institucional:
-                    codigo_error = 'M-001'
-                    raise ValueError("No tiene email institucional")
-
-                # Crear/buscar usuario en Moodle
-                result = moodle_svc.create_user(alumno)
-                if not result:
-                    codigo_error = 'M-004'
-                    raise Exception('Error al crear usuario en Moodle - Sin respuesta')
-
-                if isinstance(result, dict) and 'error' in result:
-                    codigo_error = 'M-004'
-                    error_msg = result.get('error') if isinstance(result, dict) else str(result)
-                    raise Exception(f'Error al crear usuario en Moodle: {error_msg}')
-
-                # Enrollar en cursos
-                enroll_result = moodle_svc.enroll_user_in_courses(alumno)
-                if not enroll_result:
-                    codigo_error = 'M-006'
-                    raise Exception('Error al enrollar en cursos - Sin respuesta')
-
-                if isinstance(enroll_result, dict) and 'error' in enroll_result:
-                    codigo_error = 'M-006'
-                    error_msg = enroll_result.get('error') if isinstance(enroll_result, dict) else str(enroll_result)
-                    raise Exception(f'Error al enrollar en cursos: {error_msg}')
-
-                # Actualizar alumno
-                alumno.moodle_procesado = True
-                # alumno.moodle_payload = {'user': result, 'enrollments': enroll_result}
-                alumno.save(update_fields=['moodle_procesado'])
-
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-                tarea.estado = Tarea.EstadoTarea.COMPLETED
-                tarea.hora_fin = fin
-                tarea.cantidad_entidades = 1
-                tarea.detalles['resultado'] = 'Éxito'
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
-
-                Log.objects.create(
-                    tipo='SUCCESS',
-                    modulo='admin_action_sync',
-                    mensaje=f'Completado: Moodle sin email',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={'duracion_segundos': round(duracion, 2)}
-                )
-
-                exitos += 1
-
-            except Exception as e:
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-                tarea.estado = Tarea.EstadoTarea.FAILED
-                tarea.hora_fin = fin
-                tarea.mensaje_error = str(e)
-                tarea.detalles['codigo_error'] = codigo_error or 'G-001'
-                tarea.detalles['error'] = str(e)
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
-
-                Log.objects.create(
-                    tipo='ERROR',
-                    modulo='admin_action_sync',
-                    mensaje=f'Error: Moodle sin email',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'codigo_error': codigo_error or 'G-001',
-                        'error': str(e),
-                        'duracion_segundos': round(duracion, 2)
-                    }
-                )
-
-                errores += 1
-
-        self.message_user(
-            request,
-            f"✅ Moodle: {exitos} éxitos, {errores} errores. Ver Tareas Asíncronas para detalles.",
-            level=messages.SUCCESS if exitos > 0 else messages.ERROR
-        )
-
-    @admin.action(description="⚡⚡ Teams + Moodle con email (ATÓMICO)")
-    def activar_teams_y_moodle_con_email_sync(self, request, queryset):
-        """
-        Crea usuario en Teams, enrolla en Moodle y envía emails.
-        Operación ATÓMICA.
-        """
-        from django.conf import settings
-        from .services.teams_service import TeamsService
-        from .services.moodle_service import MoodleService
-        from .services.email_service import EmailService
-        from .models import Log, Tarea
-        from django.utils import timezone
-        import time
-
-        teams_svc = TeamsService()
-        moodle_svc = MoodleService()
-        email_svc = EmailService()
-
-        exitos = 0
-        errores = 0
-
-        for alumno in queryset:
-            inicio = timezone.now()
-            inicio_time = time.time()
-            codigo_error = None
-            paso = ""
-
-            Log.objects.create(
-                tipo='INFO',
-                modulo='admin_action_sync',
-                mensaje=f'Iniciando: Teams + Moodle con email',
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None
-            )
-
-            tarea = Tarea.objects.create(
-                tipo=Tarea.TipoTarea.ACTIVAR_SERVICIOS,
-                estado=Tarea.EstadoTarea.RUNNING,
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None,
-                hora_inicio=inicio,
-                detalles={
-                    'modulo': 'admin_action_sync',
-                    'accion': 'activar_teams_y_moodle_con_email',
-                    'enviar_email': True
-                }
-            )
-
-            try:
-                if not alumno.email:
-                    codigo_error = 'T-001'
-                    raise ValueError("No tiene email configurado")
-
-                # PASO 1: Crear usuario en Teams
-                paso = "Teams"
-                teams_result = teams_svc.create_user(alumno)
-
-                if not teams_result:
-                    codigo_error = 'T-003'
-                    raise Exception("Error al crear usuario en Teams")
-
-                # Validar que el resultado tenga los campos necesarios
-                if not isinstance(teams_result, dict) or 'upn' not in teams_result:
-                    codigo_error = 'T-003'
-                    raise Exception(f"Respuesta inválida de Teams: {type(teams_result)}")
-
-                alumno.email_institucional = teams_result.get('upn')
-                alumno.teams_password = teams_result.get('password')
-                alumno.teams_procesado = True
-                # alumno.teams_payload = teams_result
-                alumno.save(update_fields=[
-                    'email_institucional', 'teams_password',
-                    'teams_procesado'
-                ])
-
-                # PASO 2: Enviar email con credenciales Teams (solo si tenemos password)
-                if teams_result.get('password'):
-                    teams_data = {
-                        'upn': teams_result.get('upn'),
-                        'password': teams_result.get('password')
-                    }
-                    email_svc.send_credentials_email(alumno, teams_data)
-
-                # PASO 3: Enrollar en Moodle
-                paso = "Moodle"
-                moodle_result = moodle_svc.create_user(alumno)
-                if not moodle_result or 'error' in moodle_result:
-                    codigo_error = 'M-004'
-                    raise Exception(moodle_result.get('error', 'Error al crear usuario en Moodle'))
-
-                enroll_result = moodle_svc.enroll_user_in_courses(alumno)
-                if not enroll_result or 'error' in enroll_result:
-                    codigo_error = 'M-006'
-                    raise Exception(enroll_result.get('error', 'Error al enrollar en cursos'))
-
-                alumno.moodle_procesado = True
-                # alumno.moodle_payload = {'user': moodle_result, 'enrollments': enroll_result}
-                alumno.save(update_fields=['moodle_procesado'])
-
-                # PASO 4: Enviar email de enrollamiento
-                email_svc.send_enrollment_email(alumno)
-                alumno.email_procesado = True
-                alumno.save(update_fields=['email_procesado'])
-
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-                tarea.estado = Tarea.EstadoTarea.COMPLETED
-                tarea.hora_fin = fin
-                tarea.cantidad_entidades = 1
-                tarea.detalles['resultado'] = 'Éxito completo'
-                tarea.detalles['upn'] = teams_result['upn']
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
-
-                Log.objects.create(
-                    tipo='SUCCESS',
-                    modulo='admin_action_sync',
-                    mensaje=f'Completado: Teams + Moodle con email',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'duracion_segundos': round(duracion, 2),
-                        'upn': teams_result['upn']
-                    }
-                )
-
-                exitos += 1
-
-            except Exception as e:
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-                tarea.estado = Tarea.EstadoTarea.FAILED
-                tarea.hora_fin = fin
-                tarea.mensaje_error = f"Error en {paso}: {str(e)}"
-                tarea.detalles['codigo_error'] = codigo_error or 'G-001'
-                tarea.detalles['paso_fallido'] = paso
-                tarea.detalles['error'] = str(e)
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
-
-                Log.objects.create(
-                    tipo='ERROR',
-                    modulo='admin_action_sync',
-                    mensaje=f'Error: Teams + Moodle (paso: {paso})',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'codigo_error': codigo_error or 'G-001',
-                        'paso_fallido': paso,
-                        'error': str(e),
-                        'duracion_segundos': round(duracion, 2)
-                    }
-                )
-
-                errores += 1
-
-        self.message_user(
-            request,
-            f"✅ Teams + Moodle: {exitos} éxitos, {errores} errores. Ver Tareas Asíncronas para detalles.",
-            level=messages.SUCCESS if exitos > 0 else messages.ERROR
-        )
-
-    @admin.action(description="⚡⚡ Teams + Moodle sin email (ATÓMICO)")
-    def activar_teams_y_moodle_sin_email_sync(self, request, queryset):
-        """
-        Crea usuario en Teams y enrolla en Moodle SIN enviar emails.
-        Operación ATÓMICA.
-        """
-        from django.conf import settings
-        from .services.teams_service import TeamsService
-        from .services.moodle_service import MoodleService
-        from .models import Log, Tarea
-        from django.utils import timezone
-        import time
-
-        teams_svc = TeamsService()
-        moodle_svc = MoodleService()
-
-        exitos = 0
-        errores = 0
-
-        for alumno in queryset:
-            inicio = timezone.now()
-            inicio_time = time.time()
-            codigo_error = None
-            paso = ""
-
-            Log.objects.create(
-                tipo='INFO',
-                modulo='admin_action_sync',
-                mensaje=f'Iniciando: Teams + Moodle sin email',
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None
-            )
-
-            tarea = Tarea.objects.create(
-                tipo=Tarea.TipoTarea.ACTIVAR_SERVICIOS,
-                estado=Tarea.EstadoTarea.RUNNING,
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None,
-                hora_inicio=inicio,
-                detalles={
-                    'modulo': 'admin_action_sync',
-                    'accion': 'activar_teams_y_moodle_sin_email',
-                    'enviar_email': False
-                }
-            )
-
-            try:
-                # PASO 1: Crear usuario en Teams
-                paso = "Teams"
-                teams_result = teams_svc.create_user(alumno)
-
-                if not teams_result:
-                    codigo_error = 'T-003'
-                    raise Exception("Error al crear usuario en Teams")
-
-                # Validar que el resultado tenga los campos necesarios
-                if not isinstance(teams_result, dict) or 'upn' not in teams_result:
-                    codigo_error = 'T-003'
-                    raise Exception(f"Respuesta inválida de Teams: {type(teams_result)}")
-
-                alumno.email_institucional = teams_result.get('upn')
-                alumno.teams_password = teams_result.get('password')
-                alumno.teams_procesado = True
-                # alumno.teams_payload = teams_result
-                alumno.save(update_fields=[
-                    'email_institucional', 'teams_password',
-                    'teams_procesado'
-                ])
-
-                # PASO 2: Enrollar en Moodle
-                paso = "Moodle"
-                moodle_result = moodle_svc.create_user(alumno)
-                if not moodle_result or 'error' in moodle_result:
-                    codigo_error = 'M-004'
-                    raise Exception(moodle_result.get('error', 'Error al crear usuario en Moodle'))
-
-                enroll_result = moodle_svc.enroll_user_in_courses(alumno)
-                if not enroll_result or 'error' in enroll_result:
-                    codigo_error = 'M-006'
-                    raise Exception(enroll_result.get('error', 'Error al enrollar en cursos'))
-
-                alumno.moodle_procesado = True
-                # alumno.moodle_payload = {'user': moodle_result, 'enrollments': enroll_result}
-                alumno.save(update_fields=['moodle_procesado'])
-
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-                tarea.estado = Tarea.EstadoTarea.COMPLETED
-                tarea.hora_fin = fin
-                tarea.cantidad_entidades = 1
-                tarea.detalles['resultado'] = 'Éxito completo'
-                tarea.detalles['upn'] = teams_result['upn']
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
-
-                Log.objects.create(
-                    tipo='SUCCESS',
-                    modulo='admin_action_sync',
-                    mensaje=f'Completado: Teams + Moodle sin email',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'duracion_segundos': round(duracion, 2),
-                        'upn': teams_result['upn']
-                    }
-                )
-
-                exitos += 1
-
-            except Exception as e:
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-                tarea.estado = Tarea.EstadoTarea.FAILED
-                tarea.hora_fin = fin
-                tarea.mensaje_error = f"Error en {paso}: {str(e)}"
-                tarea.detalles['codigo_error'] = codigo_error or 'G-001'
-                tarea.detalles['paso_fallido'] = paso
-                tarea.detalles['error'] = str(e)
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
-
-                Log.objects.create(
-                    tipo='ERROR',
-                    modulo='admin_action_sync',
-                    mensaje=f'Error: Teams + Moodle (paso: {paso})',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'codigo_error': codigo_error or 'G-001',
-                        'paso_fallido': paso,
-                        'error': str(e),
-                        'duracion_segundos': round(duracion, 2)
-                    }
-                )
-
-                errores += 1
-
-        self.message_user(
-            request,
-            f"✅ Teams + Moodle: {exitos} éxitos, {errores} errores. Ver Tareas Asíncronas para detalles.",
-            level=messages.SUCCESS if exitos > 0 else messages.ERROR
-        )
-
-    # =====================================================
-    # ACCIONES ASÍNCRONAS (CON COLA CELERY)
-    # =====================================================
-
-    @admin.action(description="🚀 Activar Teams + Enviar Email con credenciales")
-    def activar_teams_email(self, request, queryset):
-        """
-        Crea usuario en Teams y envía email con credenciales (modo asíncrono).
-
-        **Comportamiento según USE_QUEUE_SYSTEM**:
-        - False: Ejecuta inmediatamente con .delay()
-        - True: Encola para procesamiento cada 5 min con rate limiting
-        """
-        from django.conf import settings
-        from .tasks import activar_servicios_alumno
-
-        tareas_programadas = 0
-        skipped_count = 0
-        use_queue = getattr(settings, 'USE_QUEUE_SYSTEM', False)
-        usuario = request.user.username if request.user.is_authenticated else None
-
-        for alumno in queryset:
-            # Validar que tenga email
-            if not alumno.email:
-                self.message_user(
-                    request,
-                    f"⚠️ {alumno.apellido}, {alumno.nombre} no tiene email configurado",
-                    level=messages.WARNING
-                )
-                skipped_count += 1
-                continue
-
-            encolar_o_ejecutar_tarea(
-                alumno=alumno,
-                tipo_tarea=Tarea.TipoTarea.ACTIVAR_SERVICIOS,
-                task_func=activar_servicios_alumno,
-                task_args=(alumno.id,),
-                usuario=usuario
-            )
-            tareas_programadas += 1
-
-        # Mensaje según modo
-        if use_queue:
-            mensaje = f"✅ {tareas_programadas} tareas encoladas. Serán procesadas en máx 5 minutos."
-        else:
-            mensaje = f"📋 {tareas_programadas} tareas ejecutándose en background."
-
-        self.message_user(request, mensaje + " Ver Tareas Asíncronas.", level=messages.SUCCESS)
-
-        if skipped_count > 0:
-            self.message_user(
-                request,
-                f"⚠️ {skipped_count} alumnos omitidos por falta de email",
-                level=messages.WARNING
-            )
-
-    @admin.action(description="🎓 Enrollar en Moodle + Email de Enrollamiento")
-    def enrollar_moodle_con_email(self, request, queryset):
-        """
-        Enrolla alumnos en Moodle y envía email de enrollamiento (Ecosistema Virtual).
-        """
-        from django.conf import settings
-        from .tasks import enrollar_moodle_task
-        from .models import Tarea
-
-        use_queue = getattr(settings, 'USE_QUEUE_SYSTEM', False)
-        usuario = request.user.username if request.user.is_authenticated else None
-
-        tareas_programadas = 0
-        already_processed = 0
-        skipped_count = 0
-
-        for alumno in queryset:
-            # Validar que tenga email
-            if not alumno.email:
-                self.message_user(
-                    request,
-                    f"⚠️ {alumno.apellido}, {alumno.nombre} no tiene email configurado",
-                    level=messages.WARNING
-                )
-                skipped_count += 1
-                continue
-
-            # Verificar si ya está procesado en Moodle
-            if alumno.moodle_procesado:
-                already_processed += 1
-                continue
-
-            # Encolar o ejecutar tarea con envío de email
-            encolar_o_ejecutar_tarea(
-                alumno=alumno,
-                tipo_tarea=Tarea.TipoTarea.MOODLE_ENROLL,
-                task_func=enrollar_moodle_task,
-                task_args=(alumno.id, True),  # enviar_email=True
-                usuario=usuario,
-                detalles={'enviar_email': True}
-            )
-
-            tareas_programadas += 1
-
-        # Resumen final
-        if tareas_programadas > 0:
-            modo = "encoladas" if use_queue else "programadas"
-            self.message_user(
-                request,
-                f"📋 {tareas_programadas} tareas {modo} para enrollamiento en Moodle (con email de enrollamiento).",
-                level=messages.SUCCESS
-            )
-
-        if already_processed > 0:
-            self.message_user(
-                request,
-                f"✅ {already_processed} alumnos ya enrollados en Moodle (omitidos)",
-                level=messages.INFO
-            )
-
-        if skipped_count > 0:
-            self.message_user(
-                request,
-                f"⚠️ {skipped_count} alumnos omitidos por falta de email",
-                level=messages.WARNING
-            )
-
-    @admin.action(description="🎓 Enrollar en Moodle (sin email)")
-    def enrollar_moodle_sin_email(self, request, queryset):
-        """
-        Enrolla alumnos en Moodle SIN enviar email de bienvenida.
-        """
-        from django.conf import settings
-        from .tasks import enrollar_moodle_task
-        from .models import Tarea
-
-        use_queue = getattr(settings, 'USE_QUEUE_SYSTEM', False)
-        usuario = request.user.username if request.user.is_authenticated else None
-
-        tareas_programadas = 0
-        already_processed = 0
-        skipped_count = 0
-
-        for alumno in queryset:
-            # Validar que tenga email institucional
-            if not alumno.email_institucional:
-                self.message_user(
-                    request,
-                    f"⚠️ {alumno.apellido}, {alumno.nombre} no tiene email institucional",
-                    level=messages.WARNING
-                )
-                skipped_count += 1
-                continue
-
-            # Verificar si ya está procesado en Moodle
-            if alumno.moodle_procesado:
-                already_processed += 1
-                continue
-
-            # Encolar o ejecutar tarea SIN envío de email
-            encolar_o_ejecutar_tarea(
-                alumno=alumno,
-                tipo_tarea=Tarea.TipoTarea.MOODLE_ENROLL,
-                task_func=enrollar_moodle_task,
-                task_args=(alumno.id, False),  # enviar_email=False
-                usuario=usuario,
-                detalles={'enviar_email': False}
-            )
-
-            tareas_programadas += 1
-
-        # Resumen final
-        if tareas_programadas > 0:
-            modo = "encoladas" if use_queue else "programadas"
-            self.message_user(
-                request,
-                f"📋 {tareas_programadas} tareas {modo} para enrollamiento en Moodle (sin email).",
-                level=messages.SUCCESS
-            )
-
-        if already_processed > 0:
-            self.message_user(
-                request,
-                f"✅ {already_processed} alumnos ya enrollados en Moodle (omitidos)",
-                level=messages.INFO
-            )
-
-        if skipped_count > 0:
-            self.message_user(
-                request,
-                f"⚠️ {skipped_count} alumnos omitidos por falta de email institucional",
-                level=messages.WARNING
-            )
-
-    @admin.action(description="📧 Enviar email de bienvenida (ATÓMICO)")
-    def enviar_email_bienvenida_masivo(self, request, queryset):
-        """
-        Envía email de bienvenida a los alumnos seleccionados.
-        Ejecución SÍNCRONA con registro en Tareas Asíncronas.
-        """
-        from .services.email_service import EmailService
-        from .models import Log, Tarea
-        from django.utils import timezone
-        import time
-
-        email_svc = EmailService()
-        exitos = 0
-        errores = 0
-
-        for alumno in queryset:
-            inicio = timezone.now()
-            inicio_time = time.time()
-            codigo_error = None
-
-            # Log inicio
-            Log.objects.create(
-                tipo='INFO',
-                modulo='admin_action_sync',
-                mensaje=f'Iniciando: Enviar email bienvenida',
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None
-            )
-
-            # Crear tarea
-            tarea = Tarea.objects.create(
-                tipo=Tarea.TipoTarea.ENVIAR_EMAIL,
-                estado=Tarea.EstadoTarea.RUNNING,
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None,
-                hora_inicio=inicio,
-                detalles={
-                    'modulo': 'admin_action_sync',
-                    'accion': 'enviar_email_bienvenida',
-                    'tipo_email': 'bienvenida'
-                }
-            )
-
-            try:
-                # Validar que tenga email
-                if not alumno.email:
-                    codigo_error = 'E-001'
-                    raise ValueError("No tiene email personal configurado")
-
-                # Enviar email
-                result = email_svc.send_welcome_email(alumno)
-
-                if not result:
-                    codigo_error = 'E-002'
-                    raise Exception("Error al enviar email de bienvenida")
-
-                # Actualizar alumno - MARCAR COMO PROCESADO
-                alumno.email_procesado = True
-                alumno.save(update_fields=['email_procesado'])
-
-                # Actualizar tarea
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-                tarea.estado = Tarea.EstadoTarea.COMPLETED
-                tarea.hora_fin = fin
-                tarea.cantidad_entidades = 1
-                tarea.detalles['resultado'] = 'Éxito'
-                tarea.detalles['email_enviado_a'] = alumno.email
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
-
-                # Log fin
-                Log.objects.create(
-                    tipo='SUCCESS',
-                    modulo='admin_action_sync',
-                    mensaje=f'Completado: Enviar email bienvenida',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'duracion_segundos': round(duracion, 2),
-                        'email': alumno.email
-                    }
-                )
-
-                exitos += 1
-
-            except Exception as e:
-                # Actualizar tarea como fallida
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-                tarea.estado = Tarea.EstadoTarea.FAILED
-                tarea.hora_fin = fin
-                tarea.mensaje_error = str(e)
-                tarea.detalles['codigo_error'] = codigo_error or 'G-001'
-                tarea.detalles['error'] = str(e)
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
-
-                # Log error
-                Log.objects.create(
-                    tipo='ERROR',
-                    modulo='admin_action_sync',
-                    mensaje=f'Error: Enviar email bienvenida',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'codigo_error': codigo_error or 'G-001',
-                        'error': str(e),
-                        'duracion_segundos': round(duracion, 2)
-                    }
-                )
-
-                errores += 1
-
-        self.message_user(
-            request,
-            f"✅ Emails: {exitos} enviados, {errores} errores. Ver Tareas Asíncronas para detalles.",
-            level=messages.SUCCESS if exitos > 0 else messages.ERROR
-        )
-
-    @admin.action(description="🗑️ Borrar de Teams (ATÓMICO)")
-    def borrar_teams_sync(self, request, queryset):
-        """
-        Elimina usuarios de Teams de forma SÍNCRONA.
-        PRECAUCIÓN: Solo funciona con cuentas test-*
-        """
-        from .services.teams_service import TeamsService
-        from .models import Log, Tarea
-        from django.utils import timezone
-        import time
-
-        teams_svc = TeamsService()
-        exitos = 0
-        errores = 0
-        omitidos = 0
-
-        for alumno in queryset:
-            # Validar que tenga email institucional
-            if not alumno.email_institucional:
-                omitidos += 1
-                continue
-
-            # Validar que esté procesado en Teams
-            if not alumno.teams_procesado:
-                omitidos += 1
-                continue
-
-            inicio = timezone.now()
-            inicio_time = time.time()
-            codigo_error = None
-
-            # Log inicio
-            Log.objects.create(
-                tipo='INFO',
-                modulo='admin_action_sync',
-                mensaje=f'Iniciando: Borrar de Teams',
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None
-            )
-
-            # Crear tarea
-            tarea = Tarea.objects.create(
-                tipo=Tarea.TipoTarea.ELIMINAR_CUENTA,
-                estado=Tarea.EstadoTarea.RUNNING,
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None,
-                hora_inicio=inicio,
-                detalles={
-                    'modulo': 'admin_action_sync',
-                    'accion': 'borrar_teams',
-                    'servicio': 'Teams',
-                    'upn': alumno.email_institucional
-                }
-            )
-
-            try:
-                upn = alumno.email_institucional
-
-                # Eliminar usuario de Teams
-                teams_svc.delete_user(upn, alumno)
-
-                # Limpiar campos del alumno
-                alumno.email_institucional = None
-                alumno.teams_password = None
-                alumno.teams_procesado = False
-                # alumno.teams_payload = None
-                alumno.save(update_fields=[
-                    'email_institucional', 'teams_password',
-                    'teams_procesado'
-                ])
-
-                # Actualizar tarea
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-                tarea.estado = Tarea.EstadoTarea.COMPLETED
-                tarea.hora_fin = fin
-                tarea.cantidad_entidades = 1
-                tarea.detalles['resultado'] = 'Éxito'
-                tarea.detalles['upn_eliminado'] = upn
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
-
-                # Log fin
-                Log.objects.create(
-                    tipo='SUCCESS',
-                    modulo='admin_action_sync',
-                    mensaje=f'Completado: Borrar de Teams',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'duracion_segundos': round(duracion, 2),
-                        'upn': upn
-                    }
-                )
-
-                exitos += 1
-
-            except Exception as e:
-                # Actualizar tarea como fallida
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-
-                # Extraer código de error del mensaje si viene en formato "T-XXX: mensaje"
-                codigo_final, mensaje_limpio = extraer_codigo_error(e, codigo_error)
-
-                tarea.estado = Tarea.EstadoTarea.FAILED
-                tarea.hora_fin = fin
-                tarea.mensaje_error = mensaje_limpio
-                tarea.detalles['codigo_error'] = codigo_final
-                tarea.detalles['error'] = mensaje_limpio
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
-
-                # Log error
-                Log.objects.create(
-                    tipo='ERROR',
-                    modulo='admin_action_sync',
-                    mensaje=f'Error: Borrar de Teams',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'codigo_error': codigo_final,
-                        'error': mensaje_limpio,
-                        'duracion_segundos': round(duracion, 2)
-                    }
-                )
-
-                errores += 1
-
-        mensaje = f"🗑️ Teams: {exitos} eliminados, {errores} errores"
-        if omitidos > 0:
-            mensaje += f", {omitidos} omitidos"
-
-        self.message_user(
-            request,
-            mensaje + ". Ver Tareas Asíncronas para detalles.",
-            level=messages.SUCCESS if exitos > 0 else messages.ERROR
-        )
-
-    @admin.action(description="🔄 Resetear password Teams con email (ATÓMICO)")
-    def resetear_password_teams_con_email_sync(self, request, queryset):
-        """
-        Resetea contraseña de Teams y envía email con credenciales.
-        Ejecución SÍNCRONA con registro en Tareas Asíncronas.
-        """
-        from .services.teams_service import TeamsService
-        from .services.email_service import EmailService
-        from .models import Log, Tarea
-        from django.utils import timezone
-        import time
-
-        teams_svc = TeamsService()
-        email_svc = EmailService()
-        exitos = 0
-        errores = 0
-        omitidos = 0
+        tareas_programadas = 0
+        already_processed = 0
+        skipped_count = 0
 
         for alumno in queryset:
-            # Validar que tenga email institucional
-            if not alumno.email_institucional:
-                omitidos += 1
-                continue
-
-            # Validar que tenga email personal
+            # Validar que tenga email
             if not alumno.email:
-                omitidos += 1
-                continue
-
-            inicio = timezone.now()
-            inicio_time = time.time()
-            codigo_error = None
-
-            # Log inicio
-            Log.objects.create(
-                tipo='INFO',
-                modulo='admin_action_sync',
-                mensaje=f'Iniciando: Resetear password Teams con email',
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None
-            )
-
-            # Crear tarea
-            tarea = Tarea.objects.create(
-                tipo=Tarea.TipoTarea.RESETEAR_PASSWORD,
-                estado=Tarea.EstadoTarea.RUNNING,
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None,
-                hora_inicio=inicio,
-                detalles={
-                    'modulo': 'admin_action_sync',
-                    'accion': 'resetear_password_teams_con_email',
-                    'upn': alumno.email_institucional,
-                    'enviar_email': True
-                }
-            )
-
-            try:
-                upn = alumno.email_institucional
-
-                # Resetear contraseña
-                new_password = teams_svc.reset_password(upn, alumno=alumno)
-
-                # Actualizar alumno
-                alumno.teams_password = new_password
-                alumno.save(update_fields=['teams_password'])
-
-                # Enviar email con nueva contraseña
-                teams_data = {
-                    'upn': upn,
-                    'password': new_password
-                }
-                email_enviado = email_svc.send_credentials_email(alumno, teams_data)
-
-                # Actualizar tarea
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-                tarea.estado = Tarea.EstadoTarea.COMPLETED
-                tarea.hora_fin = fin
-                tarea.cantidad_entidades = 1
-                tarea.detalles['resultado'] = 'Éxito'
-                tarea.detalles['upn'] = upn
-                tarea.detalles['email_enviado'] = email_enviado
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
-
-                # Log fin
-                Log.objects.create(
-                    tipo='SUCCESS',
-                    modulo='admin_action_sync',
-                    mensaje=f'Completado: Resetear password Teams con email',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'duracion_segundos': round(duracion, 2),
-                        'upn': upn
-                    }
-                )
-
-                exitos += 1
-
-            except Exception as e:
-                # Actualizar tarea como fallida
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-
-                # Extraer código de error del mensaje si viene en formato "T-XXX: mensaje"
-                codigo_final, mensaje_limpio = extraer_codigo_error(e, codigo_error)
-
-                tarea.estado = Tarea.EstadoTarea.FAILED
-                tarea.hora_fin = fin
-                tarea.mensaje_error = mensaje_limpio
-                tarea.detalles['codigo_error'] = codigo_final
-                tarea.detalles['error'] = mensaje_limpio
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
-
-                # Log error
-                Log.objects.create(
-                    tipo='ERROR',
-                    modulo='admin_action_sync',
-                    mensaje=f'Error: Resetear password Teams con email',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'codigo_error': codigo_final,
-                        'error': mensaje_limpio,
-                        'duracion_segundos': round(duracion, 2)
-                    }
-                )
-
-                errores += 1
-
-        mensaje = f"🔄 Password Teams: {exitos} reseteados, {errores} errores"
-        if omitidos > 0:
-            mensaje += f", {omitidos} omitidos"
-
-        self.message_user(
-            request,
-            mensaje + ". Ver Tareas Asíncronas para detalles.",
-            level=messages.SUCCESS if exitos > 0 else messages.ERROR
-        )
-
-    @admin.action(description="🔄 Resetear password Teams sin email (ATÓMICO)")
-    def resetear_password_teams_sin_email_sync(self, request, queryset):
-        """
-        Resetea contraseña de Teams SIN enviar email.
-        Ejecución SÍNCRONA con registro en Tareas Asíncronas.
-        """
-        from .services.teams_service import TeamsService
-        from .models import Log, Tarea
-        from django.utils import timezone
-        import time
-
-        teams_svc = TeamsService()
-        exitos = 0
-        errores = 0
-        omitidos = 0
-
-        for alumno in queryset:
-            # Validar que tenga email institucional
-            if not alumno.email_institucional:
-                omitidos += 1
-                continue
-
-            inicio = timezone.now()
-            inicio_time = time.time()
-            codigo_error = None
-
-            # Log inicio
-            Log.objects.create(
-                tipo='INFO',
-                modulo='admin_action_sync',
-                mensaje=f'Iniciando: Resetear password Teams sin email',
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None
-            )
-
-            # Crear tarea
-            tarea = Tarea.objects.create(
-                tipo=Tarea.TipoTarea.RESETEAR_PASSWORD,
-                estado=Tarea.EstadoTarea.RUNNING,
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None,
-                hora_inicio=inicio,
-                detalles={
-                    'modulo': 'admin_action_sync',
-                    'accion': 'resetear_password_teams_sin_email',
-                    'upn': alumno.email_institucional,
-                    'enviar_email': False
-                }
-            )
-
-            try:
-                upn = alumno.email_institucional
-
-                # Resetear contraseña
-                new_password = teams_svc.reset_password(upn, alumno=alumno)
-
-                # Actualizar alumno
-                alumno.teams_password = new_password
-                alumno.save(update_fields=['teams_password'])
-
-                # Actualizar tarea
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-                tarea.estado = Tarea.EstadoTarea.COMPLETED
-                tarea.hora_fin = fin
-                tarea.cantidad_entidades = 1
-                tarea.detalles['resultado'] = 'Éxito'
-                tarea.detalles['upn'] = upn
-                tarea.detalles['new_password'] = new_password
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
-
-                # Log fin
-                Log.objects.create(
-                    tipo='SUCCESS',
-                    modulo='admin_action_sync',
-                    mensaje=f'Completado: Resetear password Teams sin email',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'duracion_segundos': round(duracion, 2),
-                        'upn': upn
-                    }
-                )
-
-                exitos += 1
-
-            except Exception as e:
-                # Actualizar tarea como fallida
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-
-                # Extraer código de error del mensaje si viene en formato "T-XXX: mensaje"
-                codigo_final, mensaje_limpio = extraer_codigo_error(e, codigo_error)
-
-                tarea.estado = Tarea.EstadoTarea.FAILED
-                tarea.hora_fin = fin
-                tarea.mensaje_error = mensaje_limpio
-                tarea.detalles['codigo_error'] = codigo_final
-                tarea.detalles['error'] = mensaje_limpio
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
-
-                # Log error
-                Log.objects.create(
-                    tipo='ERROR',
-                    modulo='admin_action_sync',
-                    mensaje=f'Error: Resetear password Teams sin email',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'codigo_error': codigo_final,
-                        'error': mensaje_limpio,
-                        'duracion_segundos': round(duracion, 2)
-                    }
+                self.message_user(
+                    request,
+                    f"⚠️ {alumno.apellido}, {alumno.nombre} no tiene email configurado",
+                    level=messages.WARNING
                 )
-
-                errores += 1
-
-        mensaje = f"🔄 Password Teams: {exitos} reseteados, {errores} errores"
-        if omitidos > 0:
-            mensaje += f", {omitidos} omitidos"
-
-        self.message_user(
-            request,
-            mensaje + ". Ver Tareas Asíncronas para detalles.",
-            level=messages.SUCCESS if exitos > 0 else messages.ERROR
-        )
-
-    @admin.action(description="🔻 Desenrollar de Moodle con email (ATÓMICO)")
-    def desenrollar_moodle_con_email_sync(self, request, queryset):
-        """
-        Des-enrolla de cursos de Moodle y envía email de notificación.
-        Ejecución SÍNCRONA con registro en Tareas Asíncronas.
-        """
-        from .services.moodle_service import MoodleService
-        from .services.email_service import EmailService
-        from .models import Log, Tarea, Configuracion
-        from django.utils import timezone
-        import time
-
-        from cursos.services import resolver_curso
-        from cursos.constants import CARRERAS_DICT
-
-        config = Configuracion.load()
-        moodle_svc = MoodleService()
-        email_svc = EmailService()
-        exitos = 0
-        errores = 0
-        omitidos = 0
-
-        for alumno in queryset:
-            # Validar email institucional con manejo de fallback
-            username = alumno.email_institucional
-            if not username:
-                if config.deshabilitar_fallback_email_personal:
-                    # Fallback deshabilitado, omitir alumno
-                    Log.objects.create(
-                        tipo='WARNING',
-                        modulo='admin_action_sync',
-                        mensaje=f'⚠️ FALTA EMAIL INSTITUCIONAL - Alumno {alumno.id} omitido (fallback deshabilitado)',
-                        alumno=alumno,
-                        usuario=request.user.username if request.user.is_authenticated else None,
-                        detalles={'dni': alumno.dni, 'nombre': f'{alumno.nombre} {alumno.apellido}'}
-                    )
-                    omitidos += 1
-                    continue
-                else:
-                    # Usar fallback a email personal
-                    username = alumno.email_personal
-
-            if not username:
-                omitidos += 1
-                continue
-
-            # Validar que tenga email personal para notificación
-            if not alumno.email:
-                omitidos += 1
+                skipped_count += 1
                 continue
 
-            # Obtener cursos dinámicamente basado en carreras_data
-            courses_to_unenrol = []
-            if alumno.carreras_data and isinstance(alumno.carreras_data, list):
-                for carrera_data in alumno.carreras_data:
-                    id_carrera = carrera_data.get('id_carrera')
-                    modalidad = carrera_data.get('modalidad', '').strip()
-                    comisiones = carrera_data.get('comisiones', [])
-                    comision = comisiones[0].get('nombre_comision', '') if comisiones else ''
-
-                    # Mapear id_carrera a código
-                    codigo_carrera = CARRERAS_DICT.get(str(id_carrera)) or CARRERAS_DICT.get(id_carrera)
-                    if not codigo_carrera:
-                        continue
-
-                    try:
-                        cursos = resolver_curso(codigo_carrera, modalidad, comision)
-                        courses_to_unenrol.extend(cursos)
-                    except Exception:
-                        continue
-
-            # Eliminar duplicados
-            courses_to_unenrol = list(set(courses_to_unenrol))
-
-            if not courses_to_unenrol:
-                omitidos += 1
+            # Verificar si ya está procesado en Moodle
+            if alumno.moodle_procesado:
+                already_processed += 1
                 continue
 
-            inicio = timezone.now()
-            inicio_time = time.time()
-            codigo_error = None
-
-            # Log inicio
-            Log.objects.create(
-                tipo='INFO',
-                modulo='admin_action_sync',
-                mensaje=f'Iniciando: Desenrollar de Moodle con email',
-                alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None
-            )
-
-            # Crear tarea
-            tarea = Tarea.objects.create(
-                tipo=Tarea.TipoTarea.MOODLE_ENROLL,
-                estado=Tarea.EstadoTarea.RUNNING,
+            # Encolar o ejecutar tarea con envío de email
+            encolar_o_ejecutar_tarea(
                 alumno=alumno,
-                usuario=request.user.username if request.user.is_authenticated else None,
-                hora_inicio=inicio,
-                detalles={
-                    'modulo': 'admin_action_sync',
-                    'accion': 'desenrollar_moodle_con_email',
-                    'username': username,
-                    'cursos': courses_to_unenrol,
-                    'enviar_email': True
-                }
+                tipo_tarea=Tarea.TipoTarea.MOODLE_ENROLL,
+                task_func=enrollar_moodle_task,
+                task_args=(alumno.id, True),  # enviar_email=True
+                usuario=usuario,
+                detalles={'enviar_email': True}
             )
 
-            try:
-                # Buscar usuario en Moodle
-                user = moodle_svc.get_user_by_username(username)
-                if not user:
-                    codigo_error = 'M-001'
-                    raise ValueError(f"Usuario no encontrado en Moodle: {username}")
+            tareas_programadas += 1
 
-                user_id = user['id']
+        # Resumen final
+        if tareas_programadas > 0:
+            modo = "encoladas" if use_queue else "programadas"
+            self.message_user(
+                request,
+                f"📋 {tareas_programadas} tareas {modo} para enrollamiento en Moodle (con email de enrollamiento).",
+                level=messages.SUCCESS
+            )
 
-                # Des-enrollar de cada curso
-                desenrollados = []
-                for course_shortname in courses_to_unenrol:
-                    try:
-                        if moodle_svc.unenrol_user_from_course(user_id, course_shortname, alumno):
-                            desenrollados.append(course_shortname)
-                    except Exception as e:
-                        logger.warning(f"Error des-enrollando de {course_shortname}: {e}")
+        if already_processed > 0:
+            self.message_user(
+                request,
+                f"✅ {already_processed} alumnos ya enrollados en Moodle (omitidos)",
+                level=messages.INFO
+            )
 
-                if not desenrollados:
-                    codigo_error = 'M-006'
-                    raise Exception("No se pudo des-enrollar de ningún curso")
+        if skipped_count > 0:
+            self.message_user(
+                request,
+                f"⚠️ {skipped_count} alumnos omitidos por falta de email",
+                level=messages.WARNING
+            )
 
-                # Enviar email de notificación
-                # TODO: Implementar plantilla de email para des-enrollamiento
-                email_enviado = False  # Por ahora no enviamos email
+    @admin.action(description="🎓 Enrollar en Moodle (sin email)")
+    def enrollar_moodle_sin_email(self, request, queryset):
+        """
+        Enrolla alumnos en Moodle SIN enviar email de bienvenida.
+        """
+        from django.conf import settings
+        from .tasks import enrollar_moodle_task
+        from .models import Tarea
 
-                # Actualizar alumno
-                alumno.moodle_procesado = False
-                alumno.save(update_fields=['moodle_procesado'])
+        use_queue = getattr(settings, 'USE_QUEUE_SYSTEM', False)
+        usuario = request.user.username if request.user.is_authenticated else None
 
-                # Actualizar tarea
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-                tarea.estado = Tarea.EstadoTarea.COMPLETED
-                tarea.hora_fin = fin
-                tarea.cantidad_entidades = len(desenrollados)
-                tarea.detalles['resultado'] = 'Éxito'
-                tarea.detalles['cursos_desenrollados'] = desenrollados
-                tarea.detalles['email_enviado'] = email_enviado
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
+        tareas_programadas = 0
+        already_processed = 0
+        skipped_count = 0
 
-                # Log fin
-                Log.objects.create(
-                    tipo='SUCCESS',
-                    modulo='admin_action_sync',
-                    mensaje=f'Completado: Desenrollar de Moodle con email',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'duracion_segundos': round(duracion, 2),
-                        'cursos': desenrollados
-                    }
+        for alumno in queryset:
+            # Validar que tenga email institucional
+            if not alumno.email_institucional:
+                self.message_user(
+                    request,
+                    f"⚠️ {alumno.apellido}, {alumno.nombre} no tiene email institucional",
+                    level=messages.WARNING
                 )
+                skipped_count += 1
+                continue
 
-                exitos += 1
-
-            except Exception as e:
-                # Actualizar tarea como fallida
-                fin = timezone.now()
-                duracion = time.time() - inicio_time
-
-                # Extraer código de error del mensaje si viene en formato "M-XXX: mensaje"
-                codigo_final, mensaje_limpio = extraer_codigo_error(e, codigo_error)
+            # Verificar si ya está procesado en Moodle
+            if alumno.moodle_procesado:
+                already_processed += 1
+                continue
 
-                tarea.estado = Tarea.EstadoTarea.FAILED
-                tarea.hora_fin = fin
-                tarea.mensaje_error = mensaje_limpio
-                tarea.detalles['codigo_error'] = codigo_final
-                tarea.detalles['error'] = mensaje_limpio
-                tarea.detalles['duracion_segundos'] = round(duracion, 2)
-                tarea.save()
+            # Encolar o ejecutar tarea SIN envío de email
+            encolar_o_ejecutar_tarea(
+                alumno=alumno,
+                tipo_tarea=Tarea.TipoTarea.MOODLE_ENROLL,
+                task_func=enrollar_moodle_task,
+                task_args=(alumno.id, False),  # enviar_email=False
+                usuario=usuario,
+                detalles={'enviar_email': False}
+            )
 
-                # Log error
-                Log.objects.create(
-                    tipo='ERROR',
-                    modulo='admin_action_sync',
-                    mensaje=f'Error: Desenrollar de Moodle con email',
-                    alumno=alumno,
-                    usuario=request.user.username if request.user.is_authenticated else None,
-                    detalles={
-                        'codigo_error': codigo_final,
-                        'error': mensaje_limpio,
-                        'duracion_segundos': round(duracion, 2)
-                    }
-                )
+            tareas_programadas += 1
 
-                errores += 1
+        # Resumen final
+        if tareas_programadas > 0:
+            modo = "encoladas" if use_queue else "programadas"
+            self.message_user(
+                request,
+                f"📋 {tareas_programadas} tareas {modo} para enrollamiento en Moodle (sin email).",
+                level=messages.SUCCESS
+            )
 
-        mensaje = f"🔻 Moodle: {exitos} des-enrollados, {errores} errores"
-        if omitidos > 0:
-            mensaje += f", {omitidos} omitidos"
+        if already_processed > 0:
+            self.message_user(
+                request,
+                f"✅ {already_processed} alumnos ya enrollados en Moodle (omitidos)",
+                level=messages.INFO
+            )
 
-        self.message_user(
-            request,
-            mensaje + ". Ver Tareas Asíncronas para detalles.",
-            level=messages.SUCCESS if exitos > 0 else messages.ERROR
-        )
+        if skipped_count > 0:
+            self.message_user(
+                request,
+                f"⚠️ {skipped_count} alumnos omitidos por falta de email institucional",
+                level=messages.WARNING
+            )
 
-    @admin.action(description="🔻 Desenrollar de Moodle sin email (ATÓMICO)")
-    def desenrollar_moodle_sin_email_sync(self, request, queryset):
+    @admin.action(description="📧 Enviar email de bienvenida (ATÓMICO)")
+    def enviar_email_bienvenida_masivo(self, request, queryset):
         """
-        Des-enrolla de cursos de Moodle SIN enviar email.
+        Envía email de bienvenida a los alumnos seleccionados.
         Ejecución SÍNCRONA con registro en Tareas Asíncronas.
         """
-        from .services.moodle_service import MoodleService
-        from .models import Log, Tarea, Configuracion
+        from .services.email_service import EmailService
+        from .models import Tarea
         from django.utils import timezone
         import time
-        from cursos.services import resolver_curso
-        from cursos.constants import CARRERAS_DICT
 
-        config = Configuracion.load()
-        moodle_svc = MoodleService()
+        email_svc = EmailService()
         exitos = 0
         errores = 0
-        omitidos = 0
 
         for alumno in queryset:
-            # Validar email institucional con manejo de fallback
-            username = alumno.email_institucional
-            if not username:
-                if config.deshabilitar_fallback_email_personal:
-                    # Fallback deshabilitado, omitir alumno
-                    Log.objects.create(
-                        tipo='WARNING',
-                        modulo='admin_action_sync',
-                        mensaje=f'⚠️ FALTA EMAIL INSTITUCIONAL - Alumno {alumno.id} omitido (fallback deshabilitado)',
-                        alumno=alumno,
-                        usuario=request.user.username if request.user.is_authenticated else None,
-                        detalles={'dni': alumno.dni, 'nombre': f'{alumno.nombre} {alumno.apellido}'}
-                    )
-                    omitidos += 1
-                    continue
-                else:
-                    # Usar fallback a email personal
-                    username = alumno.email_personal
-
-            if not username:
-                omitidos += 1
-                continue
-
-            # Obtener cursos dinámicamente basado en carreras_data
-            courses_to_unenrol = []
-            if alumno.carreras_data and isinstance(alumno.carreras_data, list):
-                for carrera_data in alumno.carreras_data:
-                    id_carrera = carrera_data.get('id_carrera')
-                    modalidad = carrera_data.get('modalidad', '').strip()
-                    comisiones = carrera_data.get('comisiones', [])
-                    comision = comisiones[0].get('nombre_comision', '') if comisiones else ''
-
-                    # Mapear id_carrera a código
-                    codigo_carrera = CARRERAS_DICT.get(str(id_carrera)) or CARRERAS_DICT.get(id_carrera)
-                    if not codigo_carrera:
-                        continue
-
-                    try:
-                        cursos = resolver_curso(codigo_carrera, modalidad, comision)
-                        courses_to_unenrol.extend(cursos)
-                    except Exception:
-                        continue
-
-            # Eliminar duplicados
-            courses_to_unenrol = list(set(courses_to_unenrol))
-
-            if not courses_to_unenrol:
-                omitidos += 1
-                continue
-
             inicio = timezone.now()
             inicio_time = time.time()
             codigo_error = None
 
             # Log inicio
-            Log.objects.create(
+            registrar_log(
                 tipo='INFO',
                 modulo='admin_action_sync',
-                mensaje=f'Iniciando: Desenrollar de Moodle sin email',
+                mensaje=f'Iniciando: Enviar email bienvenida',
                 alumno=alumno,
                 usuario=request.user.username if request.user.is_authenticated else None
             )
 
             # Crear tarea
             tarea = Tarea.objects.create(
-                tipo=Tarea.TipoTarea.MOODLE_ENROLL,
+                tipo=Tarea.TipoTarea.ENVIAR_EMAIL,
                 estado=Tarea.EstadoTarea.RUNNING,
                 alumno=alumno,
                 usuario=request.user.username if request.user.is_authenticated else None,
                 hora_inicio=inicio,
                 detalles={
                     'modulo': 'admin_action_sync',
-                    'accion': 'desenrollar_moodle_sin_email',
-                    'username': username,
-                    'cursos': courses_to_unenrol,
-                    'enviar_email': False
+                    'accion': 'enviar_email_bienvenida',
+                    'tipo_email': 'bienvenida'
                 }
             )
 
             try:
-                # Buscar usuario en Moodle
-                user = moodle_svc.get_user_by_username(username)
-                if not user:
-                    codigo_error = 'M-001'
-                    raise ValueError(f"Usuario no encontrado en Moodle: {username}")
-
-                user_id = user['id']
+                # Validar que tenga email
+                if not alumno.email:
+                    codigo_error = 'E-001'
+                    raise ValueError("No tiene email personal configurado")
 
-                # Des-enrollar de cada curso
-                desenrollados = []
-                for course_shortname in courses_to_unenrol:
-                    try:
-                        if moodle_svc.unenrol_user_from_course(user_id, course_shortname, alumno):
-                            desenrollados.append(course_shortname)
-                    except Exception as e:
-                        logger.warning(f"Error des-enrollando de {course_shortname}: {e}")
+                # Enviar email
+                result = email_svc.send_welcome_email(alumno)
 
-                if not desenrollados:
-                    codigo_error = 'M-006'
-                    raise Exception("No se pudo des-enrollar de ningún curso")
+                if not result:
+                    codigo_error = 'E-002'
+                    raise Exception("Error al enviar email de bienvenida")
 
-                # Actualizar alumno
-                alumno.moodle_procesado = False
-                alumno.save(update_fields=['moodle_procesado'])
+                # Actualizar alumno - MARCAR COMO PROCESADO
+                alumno.email_procesado = True
+                alumno.save(update_fields=['email_procesado'])
 
                 # Actualizar tarea
                 fin = timezone.now()
                 duracion = time.time() - inicio_time
                 tarea.estado = Tarea.EstadoTarea.COMPLETED
                 tarea.hora_fin = fin
-                tarea.cantidad_entidades = len(desenrollados)
+                tarea.cantidad_entidades = 1
                 tarea.detalles['resultado'] = 'Éxito'
-                tarea.detalles['cursos_desenrollados'] = desenrollados
+                tarea.detalles['email_enviado_a'] = alumno.email
                 tarea.detalles['duracion_segundos'] = round(duracion, 2)
                 tarea.save()
 
                 # Log fin
-                Log.objects.create(
+                registrar_log(
                     tipo='SUCCESS',
                     modulo='admin_action_sync',
-                    mensaje=f'Completado: Desenrollar de Moodle sin email',
+                    mensaje=f'Completado: Enviar email bienvenida',
                     alumno=alumno,
                     usuario=request.user.username if request.user.is_authenticated else None,
                     detalles={
                         'duracion_segundos': round(duracion, 2),
-                        'cursos': desenrollados
+                        'email': alumno.email
                     }
                 )
 
@@ -2192,44 +709,76 @@ class AlumnoAdmin(admin.ModelAdmin):
                 # Actualizar tarea como fallida
                 fin = timezone.now()
                 duracion = time.time() - inicio_time
-
-                # Extraer código de error del mensaje si viene en formato "M-XXX: mensaje"
-                codigo_final, mensaje_limpio = extraer_codigo_error(e, codigo_error)
-
                 tarea.estado = Tarea.EstadoTarea.FAILED
                 tarea.hora_fin = fin
-                tarea.mensaje_error = mensaje_limpio
-                tarea.detalles['codigo_error'] = codigo_final
-                tarea.detalles['error'] = mensaje_limpio
+                tarea.mensaje_error = str(e)
+                tarea.detalles['codigo_error'] = codigo_error or 'G-001'
+                tarea.detalles['error'] = str(e)
                 tarea.detalles['duracion_segundos'] = round(duracion, 2)
                 tarea.save()
 
                 # Log error
-                Log.objects.create(
+                registrar_log(
                     tipo='ERROR',
                     modulo='admin_action_sync',
-                    mensaje=f'Error: Desenrollar de Moodle sin email',
+                    mensaje=f'Error: Enviar email bienvenida',
                     alumno=alumno,
                     usuario=request.user.username if request.user.is_authenticated else None,
                     detalles={
-                        'codigo_error': codigo_final,
-                        'error': mensaje_limpio,
+                        'codigo_error': codigo_error or 'G-001',
+                        'error': str(e),
                         'duracion_segundos': round(duracion, 2)
                     }
                 )
 
                 errores += 1
 
-        mensaje = f"🔻 Moodle: {exitos} des-enrollados, {errores} errores"
-        if omitidos > 0:
-            mensaje += f", {omitidos} omitidos"
-
         self.message_user(
             request,
-            mensaje + ". Ver Tareas Asíncronas para detalles.",
+            f"✅ Emails: {exitos} enviados, {errores} errores. Ver Tareas Asíncronas para detalles.",
             level=messages.SUCCESS if exitos > 0 else messages.ERROR
         )
 
+    @admin.action(description="🗑️ Borrar de Teams (ATÓMICO)")
+    def borrar_teams_sync(self, request, queryset):
+        """
+        PRECAUCIÓN: Solo funciona con cuentas test-*
+        Se ejecuta en background por chunks; el progreso se ve en la tarea.
+        """
+        self._lanzar_accion_masiva(request, queryset, 'borrar_teams')
+
+    @admin.action(description="🔄 Resetear password Teams con email (ATÓMICO)")
+    def resetear_password_teams_con_email_sync(self, request, queryset):
+        """
+        Resetea contraseña de Teams y envía email con credenciales.
+        Se ejecuta en background por chunks; el progreso se ve en la tarea.
+        """
+        self._lanzar_accion_masiva(request, queryset, 'resetear_password_teams_con_email')
+
+    @admin.action(description="🔄 Resetear password Teams sin email (ATÓMICO)")
+    def resetear_password_teams_sin_email_sync(self, request, queryset):
+        """
+        Resetea contraseña de Teams SIN enviar email.
+        Se ejecuta en background por chunks; el progreso se ve en la tarea.
+        """
+        self._lanzar_accion_masiva(request, queryset, 'resetear_password_teams_sin_email')
+
+    @admin.action(description="🔻 Desenrollar de Moodle con email (ATÓMICO)")
+    def desenrollar_moodle_con_email_sync(self, request, queryset):
+        """
+        Des-enrolla de cursos de Moodle y envía email de notificación.
+        Se ejecuta en background por chunks; el progreso se ve en la tarea.
+        """
+        self._lanzar_accion_masiva(request, queryset, 'desenrollar_moodle_con_email')
+
+    @admin.action(description="🔻 Desenrollar de Moodle sin email (ATÓMICO)")
+    def desenrollar_moodle_sin_email_sync(self, request, queryset):
+        """
+        Des-enrolla de cursos de Moodle SIN enviar email.
+        Se ejecuta en background por chunks; el progreso se ve en la tarea.
+        """
+        self._lanzar_accion_masiva(request, queryset, 'desenrollar_moodle_sin_email')
+
     @admin.action(description="🗑️ Borrar solo de Teams")
     def borrar_solo_de_teams(self, request, queryset):
         """
@@ -2660,28 +1209,45 @@ class AlumnoAdmin(admin.ModelAdmin):
 
     email_status.short_description = "Email"
 
+    def _filas_exportacion(self, queryset):
+        """
+        Genera las filas de la exportación de alumnos sin instanciar modelos.
+
+        Lee solo las columnas exportadas con values_list().iterator(), así que
+        la memoria queda acotada a EXPORTACION_CHUNK_SIZE filas aunque se
+        exporte una cohorte entera.
+        """
+        for valores in queryset.values_list(*EXPORTACION_CAMPOS).iterator(chunk_size=EXPORTACION_CHUNK_SIZE):
+            alumno = dict(zip(EXPORTACION_CAMPOS, valores))
+            yield [
+                EXPORTACION_FORMATOS.get(campo, _formatear_texto)(alumno[campo])
+                for campo in EXPORTACION_CAMPOS
+            ]
+
     @admin.action(description="📥 Exportar alumnos seleccionados a Excel")
     def exportar_alumnos_excel(self, request, queryset):
         """
         Exporta los alumnos seleccionados o filtrados a un archivo Excel.
+
+        Usa el modo write-only de openpyxl (las filas se vuelcan a disco a medida
+        que se escriben) y devuelve el archivo temporal con FileResponse, así que
+        la memoria no crece con la cantidad de alumnos.
         """
-        from django.http import HttpResponse
+        import tempfile
+        from django.http import FileResponse
         from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
         from openpyxl.styles import Font, PatternFill, Alignment
+        from openpyxl.utils import get_column_letter
         from datetime import datetime
 
-        # Crear workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Alumnos"
-
-        # Encabezados
-        headers = [
-            'Apellido', 'Nombre', 'Tipo Documento', 'DNI', 'Email Personal',
-            'Email Institucional', 'Estado Actual', 'Fecha Ingreso', 'Cohorte',
-            'Localidad', 'Teléfono', 'Modalidad', 'Carreras', 'Teams Procesado',
-            'Moodle Procesado', 'Email Procesado', 'Fecha Creación', 'Última Modificación'
-        ]
+        # Crear workbook en modo write-only
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(title="Alumnos")
+
+        # Ancho de columnas: en write-only se fija antes de escribir filas
+        for col_num, ancho in enumerate(EXPORTACION_ANCHOS, 1):
+            ws.column_dimensions[get_column_letter(col_num)].width = ancho
 
         # Estilo de encabezados
         header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
@@ -2689,83 +1255,72 @@ class AlumnoAdmin(admin.ModelAdmin):
         header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
 
         # Escribir encabezados
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num, value=header)
+        encabezados = []
+        for header in EXPORTACION_ENCABEZADOS:
+            cell = WriteOnlyCell(ws, value=header)
             cell.fill = header_fill
             cell.font = header_font
             cell.alignment = header_alignment
+            encabezados.append(cell)
+        ws.append(encabezados)
 
         # Escribir datos
-        for row_num, alumno in enumerate(queryset, 2):
-            # Formatear carreras
-            carreras_texto = ""
-            if alumno.carreras_data:
-                carreras_nombres = [c.get('nombre_carrera', 'N/A') for c in alumno.carreras_data]
-                carreras_texto = ", ".join(carreras_nombres)
-
-            # Fecha de ingreso
-            fecha_ingreso = alumno.fecha_ingreso.strftime('%Y-%m-%d') if alumno.fecha_ingreso else ''
-
-            # Fecha de creación y modificación
-            fecha_creacion = alumno.created_at.strftime('%Y-%m-%d %H:%M') if alumno.created_at else ''
-            fecha_modificacion = alumno.updated_at.strftime('%Y-%m-%d %H:%M') if alumno.updated_at else ''
-
-            row_data = [
-                alumno.apellido,
-                alumno.nombre,
-                alumno.tipo_documento,
-                alumno.dni,
-                alumno.email_personal,
-                alumno.email_institucional or '',
-                alumno.estado_actual,
-                fecha_ingreso,
-                alumno.cohorte or '',
-                alumno.localidad or '',
-                alumno.telefono or '',
-                alumno.modalidad_actual or '',
-                carreras_texto,
-                'Sí' if alumno.teams_procesado else 'No',
-                'Sí' if alumno.moodle_procesado else 'No',
-                'Sí' if alumno.email_procesado else 'No',
-                fecha_creacion,
-                fecha_modificacion
-            ]
+        exportados = 0
+        for fila in self._filas_exportacion(queryset):
+            ws.append(fila)
+            exportados += 1
 
-            for col_num, value in enumerate(row_data, 1):
-                ws.cell(row=row_num, column=col_num, value=value)
-
-        # Ajustar ancho de columnas
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-
-        # Crear respuesta HTTP
-        response = HttpResponse(
+        # Guardar en un archivo temporal y devolverlo por bloques
+        archivo = tempfile.TemporaryFile()
+        wb.save(archivo)
+        archivo.seek(0)
+
+        filename = f"alumnos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        response = FileResponse(
+            archivo,
+            as_attachment=True,
+            filename=filename,
             content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
-        filename = f"alumnos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-        # Guardar workbook en respuesta
-        wb.save(response)
 
         self.message_user(
             request,
-            f"✅ Exportados {queryset.count()} alumnos a Excel",
+            f"✅ Exportados {exportados} alumnos a Excel",
             level=messages.SUCCESS
         )
 
         return response
 
-    exportar_alumnos_excel.short_description = "📥 Exportar alumnos a Excel"
+    @admin.action(description="📥 Exportar alumnos seleccionados a CSV")
+    def exportar_alumnos_csv(self, request, queryset):
+        """
+        Exporta los alumnos seleccionados o filtrados a CSV con StreamingHttpResponse.
+
+        Las filas se generan y envían a medida que se leen de la base, sin armar
+        el archivo completo en memoria.
+        """
+        import csv
+        from django.http import StreamingHttpResponse
+        from datetime import datetime
+
+        class Echo:
+            """Pseudo-buffer para csv.writer: devuelve la línea en vez de guardarla."""
+            def write(self, value):
+                return value
+
+        writer = csv.writer(Echo())
+
+        def generar():
+            # BOM para que Excel abra el CSV como UTF-8
+            yield '\ufeff'
+            yield writer.writerow(EXPORTACION_ENCABEZADOS)
+            for fila in self._filas_exportacion(queryset):
+                yield writer.writerow(fila)
+
+        filename = f"alumnos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        response = StreamingHttpResponse(generar(), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
     def carreras_formatted(self, obj):
         """Muestra la carrera del alumno (primera carrera de la lista)."""
@@ -3226,6 +1781,7 @@ class TareaAdmin(admin.ModelAdmin):
             'activar_servicios': '#1abc9c',
             'crear_usuario_teams': '#34495e',
             'resetear_password': '#e67e22',
+            'accion_masiva': '#0078d4',
         }
         color = color_map.get(obj.tipo, '#95a5a6')
         return format_html(
@@ -3260,12 +1816,15 @@ class TareaAdmin(admin.ModelAdmin):
     estado_colored.admin_order_field = 'estado'
 
     def alumno_link(self, obj):
-        """Link al alumno relacionado."""
+        """Link al alumno relacionado (o al progreso si es una acción masiva)."""
         from django.urls import reverse
         from django.utils.html import format_html
         if obj.alumno:
             url = reverse('admin:alumnos_alumno_change', args=[obj.alumno.id])
             return format_html('<a href="{}">{}</a>', url, obj.alumno)
+        if obj.tipo == Tarea.TipoTarea.ACCION_MASIVA:
+            url = reverse('admin:alumnos_alumno_accion_masiva', args=[obj.id])
+            return format_html('<a href="{}">📊 Ver progreso</a>', url)
         return '-'
     alumno_link.short_description = 'Alumno'
 
@@ -3304,8 +1863,10 @@ class ConfiguracionAdmin(admin.ModelAdmin):
                 'rate_limit_teams',
                 'rate_limit_moodle',
                 'rate_limit_uti',
+                'cache_personal_ttl_segundos',
+                'cache_personal_max_entradas',
             ),
-            'description': '🔧 Configuración de workflows automáticos. BATCH_SIZE: alumnos por lote. RATE_LIMIT: tareas/llamadas máximas por minuto para cada servicio (Teams, Moodle, UTI).'
+            'description': '🔧 Configuración de workflows automáticos. BATCH_SIZE: alumnos por lote. RATE_LIMIT: tareas/llamadas máximas por minuto para cada servicio (Teams, Moodle, UTI). CACHE: reutiliza datos personales de UTI entre ingestas.'
         }),
         ('📥 Ingesta Automática - Preinscriptos', {
             'fields': (
@@ -3543,6 +2104,8 @@ class ConfiguracionAdmin(admin.ModelAdmin):
             'rate_limit_teams': config.rate_limit_teams,
             'rate_limit_moodle': config.rate_limit_moodle,
             'rate_limit_uti': config.rate_limit_uti,
+            'cache_personal_ttl_segundos': config.cache_personal_ttl_segundos,
+            'cache_personal_max_entradas': config.cache_personal_max_entradas,
             'preinscriptos_dia_inicio': time_to_str(config.preinscriptos_dia_inicio),
             'preinscriptos_dia_fin': time_to_str(config.preinscriptos_dia_fin),
             'preinscriptos_frecuencia_segundos': config.preinscriptos_frecuencia_segundos,
@@ -3841,7 +2404,7 @@ Sistema PyLucy"""
 
                 logger.info(f"Enviando email vía Graph API desde {email_from} a {destinatario}")
 
-                response = requests.post(
+                response = teams_svc.session.post(
                     url,
                     json=message_payload,
                     headers={
@@ -44,3 +44,7 @@ class AlumnosConfig(AppConfig):
         import alumnos.signals  # noqa
         import alumnos.tasks  # noqa - registrar tareas de Celery
         import alumnos.tasks_delete  # noqa - registrar tareas de borrado
+
+        # Logs en lote: volcar el buffer al terminar cada tarea/request
+        from alumnos.utils.log_buffer import conectar_senales
+        conectar_senales()
@@ -21,29 +21,23 @@ Permisos requeridos en Azure AD (Application permissions):
 """
 import requests
 import logging
-from typing import List, Optional
+from typing import Dict, List
 from django.core.mail.backends.base import BaseEmailBackend
 from django.conf import settings
 
+from ..services.graph_token import get_graph_token
+from ..utils.http_client import get_session
+from ..utils.log_buffer import registrar_log
+from ..utils.rate_limit import (
+    STATUS_LIMITACION, RETRY_AFTER_DEFECTO_SEGUNDOS, detectar_limitacion, registrar_limitacion,
+)
+
 logger = logging.getLogger(__name__)
 
 
 def log_to_db(tipo, modulo, mensaje, detalles=None, alumno=None):
-    """
-    Registra un log en la base de datos.
-    Se importa aquí para evitar problemas de importación circular.
-    """
-    try:
-        from ..models import Log
-        Log.objects.create(
-            tipo=tipo,
-            modulo=modulo,
-            mensaje=mensaje,
-            detalles=detalles,
-            alumno=alumno
-        )
-    except Exception as e:
-        logger.error(f"Error guardando log en BD: {e}")
+    """Registra un log en la base de datos (en lote, ver utils.log_buffer)."""
+    registrar_log(tipo, modulo, mensaje, detalles=detalles, alumno=alumno)
 
 
 class MicrosoftGraphEmailBackend(BaseEmailBackend):
@@ -55,7 +49,9 @@ class MicrosoftGraphEmailBackend(BaseEmailBackend):
     """
 
     BASE_URL = "https://graph.microsoft.com/v1.0"
-    TOKEN_URL = "https://login.microsoftonline.com/{tenant}/oauth2/v2.0/token"
+
+    # Límite de Graph para sub-requests en un POST /$batch
+    BATCH_MAX_REQUESTS = 20
 
     def __init__(self, fail_silently=False, **kwargs):
         """
@@ -76,8 +72,8 @@ class MicrosoftGraphEmailBackend(BaseEmailBackend):
         self.client_secret = config.teams_client_secret or getattr(settings, 'TEAMS_CLIENT_SECRET', None)
         self.from_email = config.email_from or getattr(settings, 'DEFAULT_FROM_EMAIL', None)
 
-        # Cache del token OAuth2
-        self._token = None
+        # Headers con token mientras la conexión está abierta (open/close)
+        self._headers = None
 
         # Validar configuración requerida
         if not all([self.tenant, self.client_id, self.client_secret, self.from_email]):
@@ -90,7 +86,8 @@ class MicrosoftGraphEmailBackend(BaseEmailBackend):
     def _get_token(self) -> str:
         """
         Obtiene token OAuth2 usando Client Credentials Flow.
-        El token se cachea en memoria durante la instancia del backend.
+        El token se comparte con TeamsService y entre workers (memoria + Redis)
+        y se renueva antes de expirar, ver services.graph_token.
 
         Returns:
             str: Access token para Microsoft Graph API
@@ -98,25 +95,8 @@ class MicrosoftGraphEmailBackend(BaseEmailBackend):
         Raises:
             ValueError: Si las credenciales son inválidas o hay error de conexión
         """
-        if self._token:
-            return self._token
-
-        url = self.TOKEN_URL.format(tenant=self.tenant)
-        data = {
-            'client_id': self.client_id,
-            'client_secret': self.client_secret,
-            'scope': 'https://graph.microsoft.com/.default',
-            'grant_type': 'client_credentials'
-        }
-
         try:
-            response = requests.post(url, data=data, timeout=10)
-            response.raise_for_status()
-            result = response.json()
-            self._token = result['access_token']
-            logger.info("MicrosoftGraphEmailBackend: Token OAuth2 obtenido exitosamente")
-            log_to_db('SUCCESS', 'msgraph_backend', 'Token OAuth2 obtenido exitosamente')
-            return self._token
+            return get_graph_token(self.tenant, self.client_id, self.client_secret)
         except requests.exceptions.HTTPError as e:
             error_detail = str(e)
             if e.response.status_code == 400:
@@ -224,50 +204,139 @@ class MicrosoftGraphEmailBackend(BaseEmailBackend):
 
         return graph_message
 
+    def open(self) -> bool:
+        """
+        Obtiene el token una sola vez para todos los envíos hasta close().
+
+        Returns:
+            bool: True si se abrió una conexión nueva
+        """
+        if self._headers:
+            return False
+        self._headers = self._get_headers()
+        return bool(self._headers)
+
+    def close(self):
+        self._headers = None
+
     def send_messages(self, email_messages) -> int:
         """
         Envía uno o más EmailMessage usando Microsoft Graph API.
 
         Este método es llamado por Django cuando se usa send_mail() o send_mass_mail().
+        Los mensajes viajan en grupos de hasta BATCH_MAX_REQUESTS por POST /$batch.
 
         Args:
             email_messages: Lista de instancias de django.core.mail.EmailMessage
 
         Returns:
             int: Número de emails enviados exitosamente
+
+        Raises:
+            ValueError: MSGraph-003 si algún envío falló y fail_silently es False
         """
-        if not email_messages:
-            return 0
+        resultados = self.send_messages_detallado(email_messages)
+        errores = [r['error'] for r in resultados if not r['success']]
+        if errores and not self.fail_silently:
+            raise ValueError(f"MSGraph-003: {len(errores)} de {len(resultados)} emails no se enviaron - {errores[0]}")
+        return len(resultados) - len(errores)
 
-        # Obtener headers con token
-        headers = self._get_headers()
-        if not headers:
-            logger.error("MicrosoftGraphEmailBackend: No se pudo obtener token de autenticación")
-            return 0
+    def send_messages_detallado(self, email_messages) -> List[Dict]:
+        """
+        Igual que send_messages pero con el resultado de cada mensaje, en el mismo orden.
 
-        num_sent = 0
+        Returns:
+            Lista de dicts {'success': bool, 'error': str o None}; los limitados por
+            Graph (429/503) traen además 'throttled': True y 'retry_after'
+        """
+        if not email_messages:
+            return []
 
-        for message in email_messages:
+        conexion_nueva = self.open()
+        try:
+            if not self._headers:
+                logger.error("MicrosoftGraphEmailBackend: No se pudo obtener token de autenticación")
+                return [
+                    {'success': False, 'error': 'MSGraph-001: Sin token de autenticación'}
+                    for _ in email_messages
+                ]
+
+            resultados = []
+            for inicio in range(0, len(email_messages), self.BATCH_MAX_REQUESTS):
+                if inicio:
+                    # Mismo token (cacheado en graph_token) salvo que esté por vencer en envíos largos
+                    self._headers = self._get_headers() or self._headers
+                resultados.extend(self._enviar_batch(email_messages[inicio:inicio + self.BATCH_MAX_REQUESTS]))
+            return resultados
+        finally:
+            if conexion_nueva:
+                self.close()
+
+    def _enviar_batch(self, mensajes) -> List[Dict]:
+        """Envía hasta BATCH_MAX_REQUESTS mensajes en un único POST /$batch."""
+        sub_requests = []
+        no_convertidos = {}
+        for idx, message in enumerate(mensajes):
+            # Un mensaje que no se puede convertir (adjunto inválido, sin sender, etc.)
+            # falla solo; el resto del lote se envía igual
             try:
-                # Convertir mensaje de Django a formato Graph API
-                graph_payload = self._convert_email_message(message)
-
-                # Endpoint de envío de email
                 # Usamos el email configurado en from_email como sender
                 sender_email = message.from_email or self.from_email
-                url = f"{self.BASE_URL}/users/{sender_email}/sendMail"
-
-                # Enviar email vía Graph API
-                response = requests.post(
-                    url,
-                    headers=headers,
-                    json=graph_payload,
-                    timeout=30
-                )
-                response.raise_for_status()
+                if not sender_email:
+                    raise ValueError("Mensaje sin remitente")
+                cuerpo = self._convert_email_message(message)
+            except Exception as e:
+                error_msg = f"Error preparando email: {e}"
+                logger.error(f"MicrosoftGraphEmailBackend: {error_msg} (destinatarios: {message.to})")
+                log_to_db('ERROR', 'msgraph_backend', f'Error preparando email a {", ".join(message.to or [])}',
+                          detalles=error_msg)
+                no_convertidos[idx] = {'success': False, 'error': error_msg}
+                continue
+            sub_requests.append({
+                'id': str(idx),
+                'method': 'POST',
+                'url': f"/users/{sender_email}/sendMail",
+                'headers': {'Content-Type': 'application/json'},
+                'body': cuerpo,
+            })
+
+        if not sub_requests:
+            return [no_convertidos[idx] for idx in range(len(mensajes))]
 
-                # Graph API retorna 202 Accepted en éxito (sin cuerpo)
-                num_sent += 1
+        try:
+            response = get_session('graph').post(
+                f"{self.BASE_URL}/$batch",
+                headers=self._headers,
+                json={'requests': sub_requests},
+                timeout=30
+            )
+            response.raise_for_status()
+            respuestas = {item['id']: item for item in response.json().get('responses', [])}
+        except requests.exceptions.RequestException as e:
+            # Falló el $batch completo: mismo resultado para todos sus mensajes
+            response = getattr(e, 'response', None)
+            retry_after = detectar_limitacion('teams', response)
+            error_msg = f"Error HTTP {response.status_code}: {e}" if response is not None else f"Error de conexión: {e}"
+            logger.error(f"MicrosoftGraphEmailBackend: Error enviando lote de {len(sub_requests)} emails: {error_msg}")
+            log_to_db('ERROR', 'msgraph_backend', f'Error enviando lote de {len(sub_requests)} emails', detalles=error_msg)
+            resultado = {'success': False, 'error': error_msg}
+            if retry_after is not None:
+                resultado.update(throttled=True, retry_after=retry_after)
+            return [no_convertidos.get(idx) or dict(resultado) for idx in range(len(mensajes))]
+
+        resultados = []
+        retry_after_lote = None
+        for idx, message in enumerate(mensajes):
+            if idx in no_convertidos:
+                resultados.append(no_convertidos[idx])
+                continue
+
+            respuesta = respuestas.get(str(idx)) or {}
+            status = respuesta.get('status', 0)
+
+            # Graph API retorna 202 Accepted en éxito (sin cuerpo)
+            if 200 <= status < 300:
+                resultados.append({'success': True, 'error': None})
                 logger.info(
                     f"MicrosoftGraphEmailBackend: Email enviado exitosamente a {message.to} "
                     f"(asunto: {message.subject})"
@@ -278,56 +347,35 @@ class MicrosoftGraphEmailBackend(BaseEmailBackend):
                     f'Email enviado a {", ".join(message.to)}',
                     detalles=f'Asunto: {message.subject}'
                 )
+                continue
 
-            except requests.exceptions.HTTPError as e:
-                error_msg = f"Error HTTP {e.response.status_code}"
-                try:
-                    error_detail = e.response.json()
-                    error_msg = f"{error_msg}: {error_detail.get('error', {}).get('message', str(e))}"
-                except:
-                    error_msg = f"{error_msg}: {str(e)}"
-
-                logger.error(
-                    f"MicrosoftGraphEmailBackend: Error enviando email a {message.to}: {error_msg}"
-                )
-                log_to_db(
-                    'ERROR',
-                    'msgraph_backend',
-                    f'Error enviando email a {", ".join(message.to)}',
-                    detalles=error_msg
-                )
-
-                if not self.fail_silently:
-                    raise
-
-            except requests.exceptions.RequestException as e:
-                error_msg = f"Error de conexión: {str(e)}"
-                logger.error(
-                    f"MicrosoftGraphEmailBackend: {error_msg} al enviar a {message.to}"
-                )
-                log_to_db(
-                    'ERROR',
-                    'msgraph_backend',
-                    f'Error de conexión enviando email a {", ".join(message.to)}',
-                    detalles=error_msg
-                )
-
-                if not self.fail_silently:
-                    raise
+            cuerpo = respuesta.get('body') or {}
+            detalle = cuerpo.get('error', {}).get('message', '') if isinstance(cuerpo, dict) else ''
+            error_msg = f"Error HTTP {status}: {detalle}" if detalle else f"Error HTTP {status}"
+            resultado = {'success': False, 'error': error_msg}
 
-            except Exception as e:
-                error_msg = f"Error inesperado: {str(e)}"
-                logger.error(
-                    f"MicrosoftGraphEmailBackend: {error_msg} al enviar a {message.to}"
-                )
-                log_to_db(
-                    'ERROR',
-                    'msgraph_backend',
-                    f'Error inesperado enviando email a {", ".join(message.to)}',
-                    detalles=error_msg
-                )
+            if status in STATUS_LIMITACION:
+                headers = {k.lower(): v for k, v in (respuesta.get('headers') or {}).items()}
+                try:
+                    retry_after = float(headers.get('retry-after'))
+                except (TypeError, ValueError):
+                    retry_after = float(RETRY_AFTER_DEFECTO_SEGUNDOS)
+                retry_after_lote = max(retry_after_lote or 0, retry_after)
+                resultado.update(throttled=True, retry_after=retry_after)
+
+            logger.error(
+                f"MicrosoftGraphEmailBackend: Error enviando email a {message.to}: {error_msg}"
+            )
+            log_to_db(
+                'ERROR',
+                'msgraph_backend',
+                f'Error enviando email a {", ".join(message.to)}',
+                detalles=error_msg
+            )
+            resultados.append(resultado)
 
-                if not self.fail_silently:
-                    raise
+        # 429/503 en sub-requests: frena el ritmo de Graph para todos los workers
+        if retry_after_lote is not None:
+            registrar_limitacion('teams', retry_after_lote)
 
-        return num_sent
+        return resultados
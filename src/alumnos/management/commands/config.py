@@ -73,6 +73,8 @@ class Command(BaseCommand):
             'rate_limit_teams': config.rate_limit_teams,
             'rate_limit_moodle': config.rate_limit_moodle,
             'rate_limit_uti': config.rate_limit_uti,
+            'cache_personal_ttl_segundos': config.cache_personal_ttl_segundos,
+            'cache_personal_max_entradas': config.cache_personal_max_entradas,
 
             # Ingesta automática
             'preinscriptos_dia_inicio': config.preinscriptos_dia_inicio.isoformat() if config.preinscriptos_dia_inicio else None,
@@ -145,6 +147,8 @@ class Command(BaseCommand):
         config.rate_limit_teams = data.get('rate_limit_teams', config.rate_limit_teams)
         config.rate_limit_moodle = data.get('rate_limit_moodle', config.rate_limit_moodle)
         config.rate_limit_uti = data.get('rate_limit_uti', config.rate_limit_uti)
+        config.cache_personal_ttl_segundos = data.get('cache_personal_ttl_segundos', config.cache_personal_ttl_segundos)
+        config.cache_personal_max_entradas = data.get('cache_personal_max_entradas', config.cache_personal_max_entradas)
 
         # Ingesta automática
         if data.get('preinscriptos_dia_inicio'):
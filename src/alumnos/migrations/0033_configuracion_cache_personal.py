@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alumnos', '0032_remove_alumno_email_payload_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configuracion',
+            name='cache_personal_ttl_segundos',
+            field=models.PositiveIntegerField(default=86400, help_text='🗃️ Segundos que se reutilizan los datos personales descargados de UTI entre ingestas (0 = sin cache)'),
+        ),
+        migrations.AddField(
+            model_name='configuracion',
+            name='cache_personal_max_entradas',
+            field=models.PositiveIntegerField(default=100000, help_text='🗃️ Máximo de documentos en el cache de datos personales (se desalojan los más antiguos)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alumnos', '0033_configuracion_cache_personal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarea',
+            name='lease_hasta',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Hasta cuándo la tarea está reservada por un consumidor de la cola (vencido = vuelve a pendiente)', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alumnos', '0034_tarea_lease_hasta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarea',
+            name='no_antes_de',
+            field=models.DateTimeField(blank=True, help_text='No ejecutar antes de esta hora (backoff tras un 429/503 de la API)', null=True),
+        ),
+    ]
@@ -169,6 +169,7 @@ class Tarea(models.Model):
         CREAR_USUARIO_TEAMS = "crear_usuario_teams", "Crear Usuario en Teams"
         RESETEAR_PASSWORD = "resetear_password", "Resetear Contraseña"
         MOODLE_ENROLL = "moodle_enroll", "Enrollar en Moodle"
+        ACCION_MASIVA = "accion_masiva", "Acción Masiva del Admin"
 
     class EstadoTarea(models.TextChoices):
         PENDING = "pending", "Pendiente"
@@ -239,6 +240,17 @@ class Tarea(models.Model):
         blank=True,
         help_text="Mensaje de error si la tarea falló"
     )
+    lease_hasta = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="Hasta cuándo la tarea está reservada por un consumidor de la cola (vencido = vuelve a pendiente)"
+    )
+    no_antes_de = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="No ejecutar antes de esta hora (backoff tras un 429/503 de la API)"
+    )
 
     class Meta:
         ordering = ("-hora_programada",)
@@ -398,6 +410,14 @@ class Configuracion(models.Model):
         default=60,
         help_text="🔧 Máximo de llamadas a API UTI/SIAL por minuto (recomendado: 30-100)"
     )
+    cache_personal_ttl_segundos = models.PositiveIntegerField(
+        default=86400,
+        help_text="🗃️ Segundos que se reutilizan los datos personales descargados de UTI entre ingestas (0 = sin cache)"
+    )
+    cache_personal_max_entradas = models.PositiveIntegerField(
+        default=100000,
+        help_text="🗃️ Máximo de documentos en el cache de datos personales (se desalojan los más antiguos)"
+    )
 
     # Tokens y credenciales (pueden anular variables de entorno)
     teams_tenant_id = models.CharField(
@@ -568,9 +588,16 @@ class Configuracion(models.Model):
 
     @classmethod
     def load(cls):
-        """Obtiene la configuración (crea una si no existe)."""
-        obj, created = cls.objects.get_or_create(pk=1)
-        return obj
+        """
+        Obtiene la configuración (crea una si no existe).
+
+        Lee del cache del proceso (utils.config.get_configuracion) y devuelve
+        una copia, así el llamador puede modificarla y guardarla sin afectar
+        a la instancia compartida.
+        """
+        import copy
+        from .utils.config import get_configuracion
+        return copy.copy(get_configuracion())
 
 
 class TareaPersonalizada(models.Model):
@@ -0,0 +1,188 @@
+"""
+Nombre del Módulo: cache_personal.py
+
+Descripción:
+Cache persistente (con TTL) de datospersonales de UTI/SIAL, compartido entre ingestas.
+
+Autor: Carlos Dagorret
+Fecha de Creación: 2025-12-29
+Última Modificación: 2025-12-29
+
+Licencia: MIT
+Copyright (c) 2025 Carlos Dagorret
+
+Permisos:
+Se concede permiso, de forma gratuita, a cualquier persona que obtenga una copia
+de este software y la documentación asociada (el "Software"), para tratar
+en el Software sin restricciones, incluyendo, sin limitación, los derechos
+de usar, copiar, modificar, fusionar, publicar, distribuir, sublicenciar
+y/o vender copias del Software, y para permitir a las personas a las que
+se les proporciona el Software hacerlo, sujeto a las siguientes condiciones:
+
+El aviso de copyright anterior y este aviso de permiso se incluirán en todas
+las copias o partes sustanciales del Software.
+
+EL SOFTWARE SE PROPORCIONA "TAL CUAL", SIN GARANTÍA DE NINGÚN TIPO, EXPRESA O
+IMPLÍCITA, INCLUYENDO PERO NO LIMITADO A LAS GARANTÍAS DE COMERCIABILIDAD,
+IDONEIDAD PARA UN PROPÓSITO PARTICULAR Y NO INFRACCIÓN. EN NINGÚN CASO LOS
+AUTORES O TITULARES DE LOS DERECHOS DE AUTOR SERÁN RESPONSABLES DE CUALQUIER
+RECLAMO, DAÑO U OTRA RESPONSABILIDAD, YA SEA EN UNA ACCIÓN DE CONTRATO,
+AGRAVIO O DE OTRO MODO, QUE SURJA DE, FUERA DE O EN CONEXIÓN CON EL SOFTWARE
+O EL USO U OTROS TRATOS EN EL SOFTWARE.
+"""
+
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# Fallback en memoria del proceso (worker Celery) cuando Redis no está disponible:
+# nrodoc -> (expira_en, datos), en orden LRU
+_cache_local: "OrderedDict[str, tuple]" = OrderedDict()
+_cache_local_lock = threading.Lock()
+
+
+class DatosPersonalesCache:
+    """
+    Cache de /datospersonales indexado por nrodoc.
+
+    Se guarda en el Redis que ya usa Celery para que lo compartan todas las
+    ejecuciones (preinscriptos, aspirantes, ingresantes) y todos los workers.
+    Cada entrada expira a los `ttl` segundos y el índice se recorta a
+    `max_entradas` desalojando las más antiguas. Si Redis no está disponible
+    se usa un LRU en memoria del proceso con las mismas reglas.
+
+    Los contadores de hits/misses de la instancia se exponen con
+    `estadisticas()` para guardarlos en Tarea.detalles.
+    """
+
+    PREFIJO = "lucy:sial:dp:"
+    INDICE = "lucy:sial:dp:__indice__"
+
+    def __init__(self, ttl: Optional[int] = None, max_entradas: Optional[int] = None):
+        from alumnos.utils.config import get_cache_personal_ttl, get_cache_personal_max_entradas
+        from alumnos.utils.redis_client import get_redis
+
+        self.ttl = get_cache_personal_ttl() if ttl is None else ttl
+        self.max_entradas = get_cache_personal_max_entradas() if max_entradas is None else max_entradas
+        self.redis = get_redis() if self.habilitado else None
+        self.hits = 0
+        self.misses = 0
+        self.escrituras = 0
+        self.desalojos = 0
+
+    @property
+    def habilitado(self) -> bool:
+        return self.ttl > 0 and self.max_entradas > 0
+
+    @property
+    def backend(self) -> str:
+        if not self.habilitado:
+            return "deshabilitado"
+        return "redis" if self.redis is not None else "local"
+
+    def get_many(self, nrodocs: Iterable[str]) -> Dict[str, dict]:
+        """
+        Busca varios documentos en el cache.
+
+        Returns:
+            Dict nrodoc -> datos personales, solo con los encontrados (hits)
+        """
+        nrodocs = list(dict.fromkeys(nrodocs))
+        if not nrodocs or not self.habilitado:
+            return {}
+
+        encontrados: Dict[str, dict] = {}
+        if self.redis is not None:
+            try:
+                valores = self.redis.mget([self.PREFIJO + nrodoc for nrodoc in nrodocs])
+                for nrodoc, valor in zip(nrodocs, valores):
+                    if valor is not None:
+                        encontrados[nrodoc] = json.loads(valor)
+            except Exception as e:
+                logger.warning(f"[Cache datospersonales] Error leyendo Redis ({e}), usando cache local")
+                self.redis = None
+
+        if self.redis is None:
+            ahora = time.time()
+            with _cache_local_lock:
+                for nrodoc in nrodocs:
+                    entrada = _cache_local.get(nrodoc)
+                    if entrada is None:
+                        continue
+                    expira_en, datos = entrada
+                    if expira_en <= ahora:
+                        del _cache_local[nrodoc]
+                        continue
+                    _cache_local.move_to_end(nrodoc)
+                    encontrados[nrodoc] = datos
+
+        self.hits += len(encontrados)
+        self.misses += len(nrodocs) - len(encontrados)
+        return encontrados
+
+    def set_many(self, datos: Dict[str, dict]) -> None:
+        """
+        Guarda datos personales recién descargados. Las respuestas vacías no
+        se cachean para volver a consultarlas en la próxima ejecución.
+        """
+        datos = {nrodoc: valor for nrodoc, valor in datos.items() if valor}
+        if not datos or not self.habilitado:
+            return
+
+        if self.redis is not None:
+            try:
+                self._set_many_redis(datos)
+                self.escrituras += len(datos)
+                return
+            except Exception as e:
+                logger.warning(f"[Cache datospersonales] Error escribiendo Redis ({e}), usando cache local")
+                self.redis = None
+
+        expira_en = time.time() + self.ttl
+        with _cache_local_lock:
+            for nrodoc, valor in datos.items():
+                _cache_local[nrodoc] = (expira_en, valor)
+                _cache_local.move_to_end(nrodoc)
+            while len(_cache_local) > self.max_entradas:
+                _cache_local.popitem(last=False)
+                self.desalojos += 1
+        self.escrituras += len(datos)
+
+    def _set_many_redis(self, datos: Dict[str, dict]) -> None:
+        """SETEX por documento + índice ordenado por antigüedad para acotar el tamaño."""
+        ahora = time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        for nrodoc, valor in datos.items():
+            pipe.setex(self.PREFIJO + nrodoc, self.ttl, json.dumps(valor))
+        pipe.zadd(self.INDICE, {nrodoc: ahora for nrodoc in datos})
+        # Las claves vencidas ya las borró Redis; limpiar también el índice
+        pipe.zremrangebyscore(self.INDICE, "-inf", ahora - self.ttl)
+        pipe.zcard(self.INDICE)
+        total = pipe.execute()[-1]
+
+        exceso = total - self.max_entradas
+        if exceso > 0:
+            desalojados = self.redis.zpopmin(self.INDICE, exceso)
+            if desalojados:
+                self.redis.delete(*[self.PREFIJO + miembro.decode() for miembro, _ in desalojados])
+                self.desalojos += len(desalojados)
+
+    def estadisticas(self) -> dict:
+        """Resumen de uso de la instancia para guardar en Tarea.detalles."""
+        consultas = self.hits + self.misses
+        return {
+            'backend': self.backend,
+            'ttl_segundos': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / consultas, 3) if consultas else None,
+            'escrituras': self.escrituras,
+            'desalojos': self.desalojos,
+        }
@@ -32,27 +32,67 @@ O EL USO U OTROS TRATOS EN EL SOFTWARE.
 """
 
 import logging
-from typing import Optional
+from string import Formatter
+from typing import Dict, FrozenSet, List, Optional, Tuple
 from django.core.mail import send_mail
 from django.conf import settings
 from django.template.loader import render_to_string
 
+from ..utils.config import get_configuracion
+from ..utils.log_buffer import registrar_log
+
 logger = logging.getLogger(__name__)
 
+# Alumnos por conexión del backend en los envíos en lote
+EMAIL_BULK_CHUNK_SIZE = 200
+
 
 def log_to_db(tipo, modulo, mensaje, detalles=None, alumno=None):
-    """Registra un log en la base de datos."""
-    try:
-        from ..models import Log
-        Log.objects.create(
-            tipo=tipo,
-            modulo=modulo,
-            mensaje=mensaje,
-            detalles=detalles,
-            alumno=alumno
+    """Registra un log en la base de datos (en lote, ver utils.log_buffer)."""
+    registrar_log(tipo, modulo, mensaje, detalles=detalles, alumno=alumno)
+
+
+class PlantillaCompilada:
+    """
+    Plantilla de email (sintaxis str.format: {nombre}, {upn}, ...) analizada
+    una sola vez: valida las llaves, lista los campos y detecta si es HTML.
+    render() usa str.format_map, sin volver a recorrer el texto en Python.
+    """
+
+    __slots__ = ('texto', 'campos', 'es_html')
+
+    def __init__(self, texto: str):
+        self.texto = texto
+        # parse() lanza ValueError si hay llaves sin cerrar
+        self.campos: FrozenSet[str] = frozenset(
+            campo.split('.')[0].split('[')[0]
+            for _, campo, _, _ in Formatter().parse(texto) if campo
         )
-    except Exception as e:
-        logger.error(f"Error guardando log en BD: {e}")
+        self.es_html = '<html' in texto.lower()
+
+    def render(self, **contexto) -> str:
+        """Lanza KeyError si la plantilla usa una variable que no está en el contexto."""
+        return self.texto.format_map(contexto)
+
+
+# Plantillas de Configuracion compiladas, por campo. Si el texto cambió
+# (Configuracion editada) se recompila; la comparación suele ser por identidad
+# porque get_configuracion() comparte la instancia entre llamadas.
+_plantillas: Dict[str, PlantillaCompilada] = {}
+
+
+def plantilla_compilada(campo: str, texto: str) -> PlantillaCompilada:
+    """
+    Devuelve la plantilla compilada para `campo` (ej: 'email_plantilla_bienvenida').
+
+    Raises:
+        ValueError: Si la plantilla tiene llaves mal formadas
+    """
+    compilada = _plantillas.get(campo)
+    if compilada is None or (compilada.texto is not texto and compilada.texto != texto):
+        compilada = PlantillaCompilada(texto)
+        _plantillas[campo] = compilada
+    return compilada
 
 
 class EmailService:
@@ -63,70 +103,594 @@ class EmailService:
         from ..models import Configuracion
         config = Configuracion.load()
 
-        self.from_email = config.email_from or settings.DEFAULT_FROM_EMAIL
-        self.email_host = config.email_host or settings.EMAIL_HOST
-        self.email_port = config.email_port if config.email_port is not None else settings.EMAIL_PORT
-        self.email_use_tls = config.email_use_tls if config.email_use_tls is not None else settings.EMAIL_USE_TLS
+        self.from_email = config.email_from or settings.DEFAULT_FROM_EMAIL
+        self.email_host = config.email_host or settings.EMAIL_HOST
+        self.email_port = config.email_port if config.email_port is not None else settings.EMAIL_PORT
+        self.email_use_tls = config.email_use_tls if config.email_use_tls is not None else settings.EMAIL_USE_TLS
+
+    def contenido_credenciales(self, alumno, upn: str, password: str) -> Tuple[str, str, Optional[str]]:
+        """
+        Arma asunto, texto y HTML del email de credenciales (plantilla de BD o fallback).
+
+        Returns:
+            Tupla (subject, message, html_message)
+        """
+        config = get_configuracion()
+
+        # 🔧 ASUNTO DINÁMICO DESDE BD
+        subject = config.email_asunto_credenciales or "Credenciales de acceso - UNRC"
+        try:
+            subject = plantilla_compilada('email_asunto_credenciales', subject).render(
+                nombre=alumno.nombre,
+                apellido=alumno.apellido,
+                upn=upn
+            )
+        except (KeyError, ValueError):
+            pass  # Si hay error en el formato, usar el subject sin formatear
+
+        # 🔧 USAR PLANTILLA DESDE BD O FALLBACK A TEXTO DEFAULT
+        plantilla = config.email_plantilla_credenciales
+        html_message = None  # Inicializar siempre
+        if plantilla:
+            # Reemplazar variables en la plantilla
+            try:
+                compilada = plantilla_compilada('email_plantilla_credenciales', plantilla)
+                message = compilada.render(
+                    nombre=alumno.nombre,
+                    apellido=alumno.apellido,
+                    dni=alumno.dni,
+                    email=alumno.email_personal or alumno.email_institucional or '',
+                    upn=upn,
+                    password=password,
+                )
+                # Si la plantilla es HTML, usarla como html_message
+                html_message = message if compilada.es_html else None
+            except (KeyError, ValueError) as e:
+                logger.error(f"Error en variables de plantilla: {e}")
+                plantilla = None
+                html_message = None  # Resetear si hubo error
+
+        if not plantilla:
+            # Fallback: Plantilla FCE - UNRC (Credenciales)
+            message = f"Hola {alumno.nombre} {alumno.apellido}, tus credenciales de acceso V.ECO están disponibles."
+            html_message = _FALLBACK_CREDENCIALES.render(
+                nombre=alumno.nombre,
+                apellido=alumno.apellido,
+                upn=upn,
+                password=password,
+            )
+
+        return subject, message, html_message
+
+    def contenido_bienvenida(self, alumno) -> Tuple[str, str, Optional[str]]:
+        """
+        Arma asunto, texto y HTML del email de bienvenida (plantilla de BD o fallback).
+
+        Returns:
+            Tupla (subject, message, html_message)
+        """
+        config = get_configuracion()
+
+        # 🔧 ASUNTO DINÁMICO DESDE BD
+        subject = config.email_asunto_bienvenida or "Bienvenido/a a la UNRC"
+        try:
+            subject = plantilla_compilada('email_asunto_bienvenida', subject).render(
+                nombre=alumno.nombre,
+                apellido=alumno.apellido,
+                dni=alumno.dni
+            )
+        except (KeyError, ValueError):
+            pass
+
+        # 🔧 USAR PLANTILLA DESDE BD O FALLBACK A TEXTO DEFAULT
+        plantilla = config.email_plantilla_bienvenida
+        html_message = None
+        if plantilla:
+            # Reemplazar variables en la plantilla
+            try:
+                compilada = plantilla_compilada('email_plantilla_bienvenida', plantilla)
+                message = compilada.render(
+                    nombre=alumno.nombre,
+                    apellido=alumno.apellido,
+                    dni=alumno.dni,
+                    email=alumno.email_personal or alumno.email_institucional or '',
+                )
+                # Si la plantilla es HTML, usarla como html_message
+                html_message = message if compilada.es_html else None
+            except (KeyError, ValueError) as e:
+                logger.error(f"Error en variables de plantilla: {e}")
+                plantilla = None
+                html_message = None  # Resetear si hubo error
+
+        if not plantilla:
+            # Fallback: Plantilla FCE - UNRC
+            message = f"Hola {alumno.apellido}, {alumno.nombre}, bienvenido/a a la FCE-UNRC."
+            html_message = _FALLBACK_BIENVENIDA.render(
+                nombre=alumno.nombre,
+                apellido=alumno.apellido,
+                dni=alumno.dni,
+            )
+
+        return subject, message, html_message
+
+    def send_credentials_email(self, alumno, teams_data: dict) -> bool:
+        """
+        Envía email con credenciales de acceso a Teams.
+
+        🔧 REPARACIÓN: Usa plantilla desde Configuracion.email_plantilla_credenciales (BD > .env)
+
+        Args:
+            alumno: Instancia del modelo Alumno
+            teams_data: Dict con datos de Teams (upn, password)
+
+        Returns:
+            True si se envió exitosamente, False en caso contrario
+        """
+        upn = teams_data.get('upn')
+        password = teams_data.get('password')
+
+        if not upn or not password:
+            logger.error(f"Datos incompletos para enviar credenciales a {alumno.email}")
+            return False
+
+        subject, message, html_message = self.contenido_credenciales(alumno, upn, password)
+
+        try:
+            # IMPORTANTE: Siempre enviar al email_personal
+            email_destino = alumno.email_personal or alumno.email_institucional
+            if not email_destino:
+                logger.error(f"Alumno {alumno.id} no tiene email personal ni institucional")
+                return False
+
+            logger.info(f"Enviando credenciales a {email_destino} (email personal) (UPN: {upn})")
+
+            result = send_mail(
+                subject=subject,
+                message=message,
+                from_email=self.from_email,
+                recipient_list=[email_destino],
+                html_message=html_message,
+                fail_silently=False
+            )
+
+            if result == 1:
+                logger.info(f"Email de credenciales enviado exitosamente a {email_destino}")
+                log_to_db('SUCCESS', 'email_service', f'Email de credenciales enviado a email personal: {email_destino}',
+                         detalles={'email_personal': email_destino, 'upn': upn}, alumno=alumno)
+                return True
+            else:
+                logger.warning(f"send_mail retornó {result} para {email_destino}")
+                log_to_db('WARNING', 'email_service', f'send_mail retornó {result} para {email_destino}',
+                         alumno=alumno)
+                return False
+
+        except Exception as e:
+            logger.error(f"Error enviando email a {email_destino}: {e}")
+            log_to_db('ERROR', 'email_service', f'Error enviando email a {alumno.email}',
+                     detalles={'error': str(e)}, alumno=alumno)
+            return False
+
+    def send_welcome_email(self, alumno) -> bool:
+        """
+        Envía email de bienvenida a aspirantes (sin credenciales aún).
+
+        🔧 REPARACIÓN: Usa plantilla desde Configuracion.email_plantilla_bienvenida (BD > .env)
+
+        Args:
+            alumno: Instancia del modelo Alumno
+
+        Returns:
+            True si se envió exitosamente, False en caso contrario
+        """
+        subject, message, html_message = self.contenido_bienvenida(alumno)
+
+        try:
+            # IMPORTANTE: Siempre enviar al email_personal
+            email_destino = alumno.email_personal or alumno.email_institucional
+            if not email_destino:
+                logger.error(f"Alumno {alumno.id} no tiene email personal ni institucional")
+                return False
+
+            logger.info(f"Enviando email de bienvenida a {email_destino} (email personal)")
+
+            result = send_mail(
+                subject=subject,
+                message=message,
+                from_email=self.from_email,
+                recipient_list=[email_destino],
+                html_message=html_message,  # Agregar HTML
+                fail_silently=False
+            )
+
+            if result == 1:
+                logger.info(f"Email de bienvenida enviado a {email_destino}")
+                return True
+            else:
+                return False
+
+        except Exception as e:
+            logger.error(f"Error enviando email de bienvenida a {alumno.email}: {e}")
+            return False
+
+    def send_enrollment_email(self, alumno, courses_enrolled: list = None) -> bool:
+        """
+        Envía email de enrollamiento en Moodle (Ecosistema Virtual).
+
+        Explica:
+        - Acceso a v.eco.unrc.edu.ar
+        - Login con credenciales de Teams (UPN + contraseña Teams)
+        - Cursos en los que fue enrollado
+
+        Args:
+            alumno: Instancia del modelo Alumno
+            courses_enrolled: Lista de shortnames de cursos enrollados
+
+        Returns:
+            True si se envió exitosamente, False en caso contrario
+        """
+        config = get_configuracion()
+
+        moodle_url = config.moodle_base_url or "https://v.eco.unrc.edu.ar"
+        upn = alumno.email_institucional or f"{alumno.dni}@eco.unrc.edu.ar"
+
+        # Lista de cursos
+        if courses_enrolled and len(courses_enrolled) > 0:
+            cursos_html = "<ul>" + "".join([f"<li>{curso}</li>" for curso in courses_enrolled]) + "</ul>"
+            cursos_texto = "\n".join([f"- {curso}" for curso in courses_enrolled])
+        else:
+            cursos_html = "<p><em>Serás notificado cuando los cursos estén disponibles.</em></p>"
+            cursos_texto = "Serás notificado cuando los cursos estén disponibles."
+
+        # 🔧 ASUNTO DINÁMICO DESDE BD
+        subject = config.email_asunto_enrollamiento or "Acceso al Ecosistema Virtual - UNRC"
+        try:
+            subject = plantilla_compilada('email_asunto_enrollamiento', subject).render(
+                nombre=alumno.nombre,
+                apellido=alumno.apellido
+            )
+        except (KeyError, ValueError):
+            pass
+
+        # 🔧 USAR PLANTILLA DESDE BD O FALLBACK A TEXTO DEFAULT
+        plantilla = config.email_plantilla_enrollamiento
+        html_message = None
+        password = alumno.teams_password or "[Contactar soporte]"
+
+        if plantilla:
+            try:
+                compilada = plantilla_compilada('email_plantilla_enrollamiento', plantilla)
+                message = compilada.render(
+                    nombre=alumno.nombre,
+                    apellido=alumno.apellido,
+                    upn=upn,
+                    password=password,
+                    moodle_url=moodle_url,
+                    cursos_html=cursos_html,
+                    cursos_texto=cursos_texto
+                )
+                # Si la plantilla es HTML, usarla como html_message
+                html_message = message if compilada.es_html else None
+            except (KeyError, ValueError) as e:
+                logger.error(f"Error en variables de plantilla de enrollamiento: {e}")
+                plantilla = None
+
+        if not plantilla:
+            # Fallback: Plantilla FCE - UNRC (Enrollamiento)
+            message = f"Hola {alumno.nombre} {alumno.apellido}, ya tienes acceso al Campus Virtual Moodle."
+            html_message = _FALLBACK_ENROLLAMIENTO.render(
+                nombre=alumno.nombre,
+                apellido=alumno.apellido,
+                cursos_html=cursos_html,
+                moodle_url=moodle_url,
+            )
+        else:
+            # Si hay plantilla personalizada pero no es HTML, no enviar html
+            if not html_message:
+                html_message = None
+
+        try:
+            email_to = alumno.email_personal or alumno.email_institucional
+            if not email_to:
+                logger.error(f"Alumno {alumno.id} no tiene email configurado")
+                return False
+
+            logger.info(f"Enviando email de enrollamiento Moodle a {email_to}")
+
+            result = send_mail(
+                subject=subject,
+                message=message,
+                from_email=self.from_email,
+                recipient_list=[email_to],
+                html_message=html_message,
+                fail_silently=False
+            )
+
+            if result == 1:
+                logger.info(f"Email de enrollamiento Moodle enviado a {email_to}")
+                log_to_db('SUCCESS', 'email_service', f'Email de enrollamiento Moodle enviado a {email_to}',
+                         detalles={'email': email_to, 'courses': courses_enrolled}, alumno=alumno)
+                return True
+            else:
+                logger.warning(f"send_mail retornó {result} para {email_to}")
+                return False
+
+        except Exception as e:
+            logger.error(f"Error enviando email de enrollamiento a {alumno.email}: {e}")
+            log_to_db('ERROR', 'email_service', f'Error enviando email de enrollamiento',
+                     detalles={'error': str(e)}, alumno=alumno)
+            return False
+
+    def send_enrollment_confirmation(self, alumno, curso: str) -> bool:
+        """
+        Envía confirmación de enrolamiento en un curso.
+
+        Args:
+            alumno: Instancia del modelo Alumno
+            curso: Nombre del curso
+
+        Returns:
+            True si se envió exitosamente, False en caso contrario
+        """
+        subject = f"Confirmación de enrolamiento - {curso}"
+
+        message = f"""
+Hola {alumno.nombre} {alumno.apellido},
+
+Te confirmamos tu enrolamiento en el curso:
+
+{curso}
+
+Ya puedes acceder al curso en Moodle con tus credenciales institucionales.
+
+Saludos,
+Sistema Lucy AMS
+Universidad Nacional de Río Cuarto
+"""
+
+        try:
+            # IMPORTANTE: Siempre enviar al email_personal
+            email_destino = alumno.email_personal or alumno.email_institucional
+            if not email_destino:
+                logger.error(f"Alumno {alumno.id} no tiene email personal ni institucional")
+                return False
+
+            logger.info(f"Enviando confirmación de enrolamiento a {email_destino} (email personal)")
+
+            result = send_mail(
+                subject=subject,
+                message=message,
+                from_email=self.from_email,
+                recipient_list=[email_destino],
+                fail_silently=False
+            )
+
+            if result == 1:
+                logger.info(f"Confirmación de enrolamiento enviada a {email_destino}")
+                return True
+            else:
+                return False
+
+        except Exception as e:
+            logger.error(f"Error enviando confirmación a {email_destino}: {e}")
+            return False
+
+    def enviar_email_password_reset(self, alumno, password: str) -> bool:
+        """
+        Envía email con nueva contraseña temporal después de un reset.
+
+        Args:
+            alumno: Instancia del modelo Alumno
+            password: Nueva contraseña temporal
+
+        Returns:
+            True si se envió exitosamente, False en caso contrario
+        """
+        upn = alumno.email_institucional or f"{alumno.dni}@eco.unrc.edu.ar"
+        subject = "Nueva contraseña temporal - FCE UNRC"
+
+        message = f"Hola {alumno.nombre} {alumno.apellido}, se ha generado una nueva contraseña temporal."
+        html_message = _FALLBACK_PASSWORD_RESET.render(
+            nombre=alumno.nombre,
+            apellido=alumno.apellido,
+            upn=upn,
+            password=password,
+        )
+
+        try:
+            email_destino = alumno.email_personal or alumno.email_institucional
+            if not email_destino:
+                logger.error(f"Alumno {alumno.id} no tiene email configurado")
+                return False
+
+            logger.info(f"Enviando email de password reset a {email_destino}")
+
+            result = send_mail(
+                subject=subject,
+                message=message,
+                from_email=self.from_email,
+                recipient_list=[email_destino],
+                html_message=html_message,
+                fail_silently=False
+            )
+
+            if result == 1:
+                logger.info(f"Email de password reset enviado a {email_destino}")
+                return True
+            else:
+                return False
+
+        except Exception as e:
+            logger.error(f"Error enviando email de password reset a {email_destino}: {e}")
+            return False
 
-    def send_credentials_email(self, alumno, teams_data: dict) -> bool:
+    def send_status_change_email(self, alumno, old_status: str, new_status: str) -> bool:
         """
-        Envía email con credenciales de acceso a Teams.
-
-        🔧 REPARACIÓN: Usa plantilla desde Configuracion.email_plantilla_credenciales (BD > .env)
+        Envía notificación de cambio de estado del alumno.
 
         Args:
             alumno: Instancia del modelo Alumno
-            teams_data: Dict con datos de Teams (upn, password)
+            old_status: Estado anterior
+            new_status: Nuevo estado
 
         Returns:
             True si se envió exitosamente, False en caso contrario
         """
-        from ..models import Configuracion
-        config = Configuracion.load()
+        subject = "Actualización de estado - UNRC"
 
-        upn = teams_data.get('upn')
-        password = teams_data.get('password')
+        message = f"""
+Hola {alumno.nombre} {alumno.apellido},
 
-        if not upn or not password:
-            logger.error(f"Datos incompletos para enviar credenciales a {alumno.email}")
-            return False
+Te informamos que tu estado ha sido actualizado:
+
+Estado anterior: {old_status}
+Nuevo estado: {new_status}
+
+Si tienes consultas, contacta con la administración académica.
+
+Saludos,
+Sistema Lucy AMS
+Universidad Nacional de Río Cuarto
+"""
 
-        # 🔧 ASUNTO DINÁMICO DESDE BD
-        subject = config.email_asunto_credenciales or "Credenciales de acceso - UNRC"
         try:
-            subject = subject.format(
-                nombre=alumno.nombre,
-                apellido=alumno.apellido,
-                upn=upn
+            logger.info(f"Enviando notificación de cambio de estado a {alumno.email}")
+
+            result = send_mail(
+                subject=subject,
+                message=message,
+                from_email=self.from_email,
+                recipient_list=[alumno.email],
+                fail_silently=False
             )
-        except KeyError:
-            pass  # Si hay error en el formato, usar el subject sin formatear
 
-        # 🔧 USAR PLANTILLA DESDE BD O FALLBACK A TEXTO DEFAULT
-        plantilla = config.email_plantilla_credenciales
-        html_message = None  # Inicializar siempre
-        if plantilla:
-            # Reemplazar variables en la plantilla
-            try:
-                message = plantilla.format(
-                    nombre=alumno.nombre,
-                    apellido=alumno.apellido,
-                    dni=alumno.dni,
-                    email=alumno.email_personal or alumno.email_institucional or '',
-                    upn=upn,
-                    password=password,
-                )
-                # Si la plantilla es HTML, usarla como html_message
-                html_message = message if '<html' in plantilla.lower() else None
-            except KeyError as e:
-                logger.error(f"Error en variables de plantilla: {e}")
-                plantilla = None
-                html_message = None  # Resetear si hubo error
+            if result == 1:
+                logger.info(f"Notificación enviada a {alumno.email}")
+                return True
+            else:
+                return False
 
-        if not plantilla:
-            # Fallback: Plantilla FCE - UNRC (Credenciales)
-            message = f"Hola {alumno.nombre} {alumno.apellido}, tus credenciales de acceso V.ECO están disponibles."
-            html_message = f"""<!DOCTYPE html>
+        except Exception as e:
+            logger.error(f"Error enviando notificación a {alumno.email}: {e}")
+            return False
+
+
+    # ------------------------------------------------------------------
+    # Envío en lote
+    # ------------------------------------------------------------------
+
+    def _contenido_para(self, alumno, tipo: str) -> Tuple[str, str, Optional[str]]:
+        if tipo == 'bienvenida':
+            return self.contenido_bienvenida(alumno)
+        if tipo == 'credenciales':
+            upn = alumno.email_institucional or f"{alumno.dni}@eco.unrc.edu.ar"
+            if not alumno.teams_password:
+                raise ValueError("Alumno sin contraseña de Teams guardada")
+            return self.contenido_credenciales(alumno, upn, alumno.teams_password)
+        raise ValueError(f"Tipo de email no soportado en lote: {tipo}")
+
+    def enviar_emails_bulk(self, alumnos, tipo: str = 'bienvenida', chunk_size: int = EMAIL_BULK_CHUNK_SIZE) -> Dict[int, Dict]:
+        """
+        Envía el email `tipo` ('bienvenida' o 'credenciales') a muchos alumnos
+        con una sola conexión del backend de email por chunk (un token de Graph,
+        mensajes agrupados en /$batch) y registra el resultado en
+        Alumno.email_procesado.
+
+        Args:
+            alumnos: QuerySet o iterable de Alumno (los QuerySet se recorren con iterator())
+            tipo: 'bienvenida' o 'credenciales' (usa alumno.teams_password)
+            chunk_size: Alumnos por conexión/chunk
+
+        Returns:
+            Dict {alumno_id: {'success': bool, 'error': str o None}}; los limitados
+            por Graph (429/503) traen además 'throttled' y 'retry_after'
+        """
+        from itertools import islice
+        from django.core.mail import EmailMultiAlternatives, get_connection
+        from ..models import Alumno
+
+        if hasattr(alumnos, 'iterator'):
+            alumnos = alumnos.iterator(chunk_size=chunk_size)
+        alumnos = iter(alumnos)
+
+        resultados: Dict[int, Dict] = {}
+        while True:
+            chunk = list(islice(alumnos, chunk_size))
+            if not chunk:
+                break
+
+            # 1. Renderizar todos los mensajes del chunk
+            mensajes = []
+            destinatarios = []
+            for alumno in chunk:
+                email_destino = alumno.email_personal or alumno.email_institucional
+                if not email_destino:
+                    resultados[alumno.id] = {'success': False, 'error': 'Sin email personal ni institucional'}
+                    continue
+                try:
+                    subject, message, html_message = self._contenido_para(alumno, tipo)
+                except Exception as e:
+                    resultados[alumno.id] = {'success': False, 'error': str(e)}
+                    continue
+                mensaje = EmailMultiAlternatives(subject, message, self.from_email, [email_destino])
+                if html_message:
+                    mensaje.attach_alternative(html_message, 'text/html')
+                mensajes.append(mensaje)
+                destinatarios.append(alumno)
+
+            # 2. Una conexión para todo el chunk
+            if mensajes:
+                try:
+                    with get_connection(fail_silently=True) as conexion:
+                        envios = self._enviar_por_conexion(conexion, mensajes)
+                except Exception as e:
+                    logger.error(f"Error enviando lote de {len(mensajes)} emails de {tipo}: {e}")
+                    envios = [{'success': False, 'error': str(e)} for _ in mensajes]
+                for alumno, envio in zip(destinatarios, envios):
+                    resultados[alumno.id] = envio
+
+            # 3. Resultado por destinatario en Alumno.email_procesado
+            enviados = [alumno.id for alumno in destinatarios if resultados[alumno.id]['success']]
+            if enviados:
+                Alumno.objects.filter(id__in=enviados).update(email_procesado=True)
+
+        exitosos = sum(1 for r in resultados.values() if r['success'])
+        logger.info(f"Emails de {tipo} en lote: {exitosos} enviados, {len(resultados) - exitosos} fallidos")
+        log_to_db(
+            'SUCCESS' if exitosos == len(resultados) else 'WARNING',
+            'email_service',
+            f'Emails de {tipo} en lote: {exitosos}/{len(resultados)} enviados',
+            detalles={
+                'fallidos': {
+                    alumno_id: r['error'] for alumno_id, r in resultados.items() if not r['success']
+                }
+            }
+        )
+        return resultados
+
+    @staticmethod
+    def _enviar_por_conexion(conexion, mensajes) -> List[Dict]:
+        """
+        Resultado por mensaje: el backend de Graph lo informa directamente
+        (send_messages_detallado); con otros backends (SMTP) se envía de a uno
+        reutilizando la misma conexión abierta.
+        """
+        if hasattr(conexion, 'send_messages_detallado'):
+            return conexion.send_messages_detallado(mensajes)
+        envios = []
+        for mensaje in mensajes:
+            try:
+                ok = conexion.send_messages([mensaje]) == 1
+                envios.append({'success': ok, 'error': None if ok else 'El backend no envió el mensaje'})
+            except Exception as e:
+                envios.append({'success': False, 'error': str(e)})
+        return envios
+
+# ========================================
+# Plantillas por defecto (compiladas al importar el módulo)
+# ========================================
+
+# Plantilla FCE - UNRC (Credenciales)
+_FALLBACK_CREDENCIALES = PlantillaCompilada("""<!DOCTYPE html>
 <html lang="es">
 <head>
   <meta charset="UTF-8" />
@@ -172,7 +736,7 @@ class EmailService:
       <div class="content">
         <span class="pill">Bienvenida/o al ecosistema virtual</span>
 
-        <h2 class="title">Hola {alumno.nombre} {alumno.apellido},</h2>
+        <h2 class="title">Hola {nombre} {apellido},</h2>
         <p class="muted">
           Te compartimos tu cuenta institucional para ingresar al <b>Ecosistema Virtual de la FCE (V.ECO)</b>.
         </p>
@@ -230,96 +794,10 @@ class EmailService:
     </div>
   </div>
 </body>
-</html>"""
-        else:
-            # Si hay plantilla personalizada pero no es HTML, crear versión texto simple
-            if not html_message:
-                html_message = None
-
-        try:
-            # IMPORTANTE: Siempre enviar al email_personal
-            email_destino = alumno.email_personal or alumno.email_institucional
-            if not email_destino:
-                logger.error(f"Alumno {alumno.id} no tiene email personal ni institucional")
-                return False
-
-            logger.info(f"Enviando credenciales a {email_destino} (email personal) (UPN: {upn})")
-
-            result = send_mail(
-                subject=subject,
-                message=message,
-                from_email=self.from_email,
-                recipient_list=[email_destino],
-                html_message=html_message,
-                fail_silently=False
-            )
-
-            if result == 1:
-                logger.info(f"Email de credenciales enviado exitosamente a {email_destino}")
-                log_to_db('SUCCESS', 'email_service', f'Email de credenciales enviado a email personal: {email_destino}',
-                         detalles={'email_personal': email_destino, 'upn': upn}, alumno=alumno)
-                return True
-            else:
-                logger.warning(f"send_mail retornó {result} para {email_destino}")
-                log_to_db('WARNING', 'email_service', f'send_mail retornó {result} para {email_destino}',
-                         alumno=alumno)
-                return False
-
-        except Exception as e:
-            logger.error(f"Error enviando email a {email_destino}: {e}")
-            log_to_db('ERROR', 'email_service', f'Error enviando email a {alumno.email}',
-                     detalles={'error': str(e)}, alumno=alumno)
-            return False
-
-    def send_welcome_email(self, alumno) -> bool:
-        """
-        Envía email de bienvenida a aspirantes (sin credenciales aún).
-
-        🔧 REPARACIÓN: Usa plantilla desde Configuracion.email_plantilla_bienvenida (BD > .env)
-
-        Args:
-            alumno: Instancia del modelo Alumno
-
-        Returns:
-            True si se envió exitosamente, False en caso contrario
-        """
-        from ..models import Configuracion
-        config = Configuracion.load()
-
-        # 🔧 ASUNTO DINÁMICO DESDE BD
-        subject = config.email_asunto_bienvenida or "Bienvenido/a a la UNRC"
-        try:
-            subject = subject.format(
-                nombre=alumno.nombre,
-                apellido=alumno.apellido,
-                dni=alumno.dni
-            )
-        except KeyError:
-            pass
-
-        # 🔧 USAR PLANTILLA DESDE BD O FALLBACK A TEXTO DEFAULT
-        plantilla = config.email_plantilla_bienvenida
-        html_message = None
-        if plantilla:
-            # Reemplazar variables en la plantilla
-            try:
-                message = plantilla.format(
-                    nombre=alumno.nombre,
-                    apellido=alumno.apellido,
-                    dni=alumno.dni,
-                    email=alumno.email_personal or alumno.email_institucional or '',
-                )
-                # Si la plantilla es HTML, usarla como html_message
-                html_message = message if '<html' in plantilla.lower() else None
-            except KeyError as e:
-                logger.error(f"Error en variables de plantilla: {e}")
-                plantilla = None
-                html_message = None  # Resetear si hubo error
+</html>""")
 
-        if not plantilla:
-            # Fallback: Plantilla FCE - UNRC
-            message = f"Hola {alumno.apellido}, {alumno.nombre}, bienvenido/a a la FCE-UNRC."
-            html_message = f"""<!DOCTYPE html>
+# Plantilla FCE - UNRC (Bienvenida)
+_FALLBACK_BIENVENIDA = PlantillaCompilada("""<!DOCTYPE html>
 <html lang="es">
 <head>
   <meta charset="UTF-8" />
@@ -358,7 +836,7 @@ class EmailService:
       <div class="content">
         <span class="pill">Inscripción recibida</span>
 
-        <h2 class="title">Estimado/a {alumno.apellido}, {alumno.nombre} <span style="font-weight: normal; color:#6b7280;">(DNI: {alumno.dni})</span></h2>
+        <h2 class="title">Estimado/a {apellido}, {nombre} <span style="font-weight: normal; color:#6b7280;">(DNI: {dni})</span></h2>
 
         <p class="muted">
           Es un placer darte la bienvenida a la <b>Facultad de Ciencias Económicas de la UNRC</b>.
@@ -366,142 +844,46 @@ class EmailService:
         </p>
 
         <div class="card">
-          <p class="label">En los próximos días vas a recibir información sobre</p>
-          <ul class="list">
-            <li><b>Credenciales de acceso a V.ECO</b></li>
-          </ul>
-
-          <div class="divider" style="margin: 14px 0;"></div>
-
-          <p class="muted" style="margin:0;">
-            Para ver información y materiales del cursillo de ingreso, ingresá desde el siguiente enlace:
-          </p>
-
-          <div class="btn-wrap" style="margin-top:12px;">
-            <a class="button" href="https://www.eco.unrc.edu.ar/ingresantes/" target="_blank" rel="noopener">
-              Ir a Ingresantes
-            </a>
-          </div>
-
-          <p class="muted" style="margin:10px 0 0;">
-            Si el botón no funciona, copiá y pegá este enlace en tu navegador:<br />
-            <a href="https://www.eco.unrc.edu.ar/ingresantes/" target="_blank" rel="noopener">https://www.eco.unrc.edu.ar/ingresantes/</a>
-          </p>
-        </div>
-
-        <p style="margin: 0;">
-          ¡Bienvenido/a y éxitos en esta nueva etapa!
-        </p>
-      </div>
-
-      <div class="footer">
-        <b>Secretaría de Virtualización Estratégica - Facultad de Ciencias Económicas – UNRC</b><br />
-        Ruta Nacional 36 Km 601 – Río Cuarto, Córdoba<br />
-        <a href="https://www.eco.unrc.edu.ar" target="_blank" rel="noopener">www.eco.unrc.edu.ar</a>
-      </div>
-    </div>
-  </div>
-</body>
-</html>"""
-        else:
-            # Si hay plantilla personalizada pero no es HTML, no enviar html
-            if not html_message:
-                html_message = None
-
-        try:
-            # IMPORTANTE: Siempre enviar al email_personal
-            email_destino = alumno.email_personal or alumno.email_institucional
-            if not email_destino:
-                logger.error(f"Alumno {alumno.id} no tiene email personal ni institucional")
-                return False
-
-            logger.info(f"Enviando email de bienvenida a {email_destino} (email personal)")
-
-            result = send_mail(
-                subject=subject,
-                message=message,
-                from_email=self.from_email,
-                recipient_list=[email_destino],
-                html_message=html_message,  # Agregar HTML
-                fail_silently=False
-            )
-
-            if result == 1:
-                logger.info(f"Email de bienvenida enviado a {email_destino}")
-                return True
-            else:
-                return False
-
-        except Exception as e:
-            logger.error(f"Error enviando email de bienvenida a {alumno.email}: {e}")
-            return False
-
-    def send_enrollment_email(self, alumno, courses_enrolled: list = None) -> bool:
-        """
-        Envía email de enrollamiento en Moodle (Ecosistema Virtual).
-
-        Explica:
-        - Acceso a v.eco.unrc.edu.ar
-        - Login con credenciales de Teams (UPN + contraseña Teams)
-        - Cursos en los que fue enrollado
-
-        Args:
-            alumno: Instancia del modelo Alumno
-            courses_enrolled: Lista de shortnames de cursos enrollados
+          <p class="label">En los próximos días vas a recibir información sobre</p>
+          <ul class="list">
+            <li><b>Credenciales de acceso a V.ECO</b></li>
+          </ul>
 
-        Returns:
-            True si se envió exitosamente, False en caso contrario
-        """
-        from ..models import Configuracion
-        config = Configuracion.load()
+          <div class="divider" style="margin: 14px 0;"></div>
 
-        moodle_url = config.moodle_base_url or "https://v.eco.unrc.edu.ar"
-        upn = alumno.email_institucional or f"{alumno.dni}@eco.unrc.edu.ar"
+          <p class="muted" style="margin:0;">
+            Para ver información y materiales del cursillo de ingreso, ingresá desde el siguiente enlace:
+          </p>
 
-        # Lista de cursos
-        if courses_enrolled and len(courses_enrolled) > 0:
-            cursos_html = "<ul>" + "".join([f"<li>{curso}</li>" for curso in courses_enrolled]) + "</ul>"
-            cursos_texto = "\n".join([f"- {curso}" for curso in courses_enrolled])
-        else:
-            cursos_html = "<p><em>Serás notificado cuando los cursos estén disponibles.</em></p>"
-            cursos_texto = "Serás notificado cuando los cursos estén disponibles."
+          <div class="btn-wrap" style="margin-top:12px;">
+            <a class="button" href="https://www.eco.unrc.edu.ar/ingresantes/" target="_blank" rel="noopener">
+              Ir a Ingresantes
+            </a>
+          </div>
 
-        # 🔧 ASUNTO DINÁMICO DESDE BD
-        subject = config.email_asunto_enrollamiento or "Acceso al Ecosistema Virtual - UNRC"
-        try:
-            subject = subject.format(
-                nombre=alumno.nombre,
-                apellido=alumno.apellido
-            )
-        except KeyError:
-            pass
+          <p class="muted" style="margin:10px 0 0;">
+            Si el botón no funciona, copiá y pegá este enlace en tu navegador:<br />
+            <a href="https://www.eco.unrc.edu.ar/ingresantes/" target="_blank" rel="noopener">https://www.eco.unrc.edu.ar/ingresantes/</a>
+          </p>
+        </div>
 
-        # 🔧 USAR PLANTILLA DESDE BD O FALLBACK A TEXTO DEFAULT
-        plantilla = config.email_plantilla_enrollamiento
-        html_message = None
-        password = alumno.teams_password or "[Contactar soporte]"
+        <p style="margin: 0;">
+          ¡Bienvenido/a y éxitos en esta nueva etapa!
+        </p>
+      </div>
 
-        if plantilla:
-            try:
-                message = plantilla.format(
-                    nombre=alumno.nombre,
-                    apellido=alumno.apellido,
-                    upn=upn,
-                    password=password,
-                    moodle_url=moodle_url,
-                    cursos_html=cursos_html,
-                    cursos_texto=cursos_texto
-                )
-                # Si la plantilla es HTML, usarla como html_message
-                html_message = message if '<html' in plantilla.lower() else None
-            except KeyError as e:
-                logger.error(f"Error en variables de plantilla de enrollamiento: {e}")
-                plantilla = None
+      <div class="footer">
+        <b>Secretaría de Virtualización Estratégica - Facultad de Ciencias Económicas – UNRC</b><br />
+        Ruta Nacional 36 Km 601 – Río Cuarto, Córdoba<br />
+        <a href="https://www.eco.unrc.edu.ar" target="_blank" rel="noopener">www.eco.unrc.edu.ar</a>
+      </div>
+    </div>
+  </div>
+</body>
+</html>""")
 
-        if not plantilla:
-            # Fallback: Plantilla FCE - UNRC (Enrollamiento)
-            message = f"Hola {alumno.nombre} {alumno.apellido}, ya tienes acceso al Campus Virtual Moodle."
-            html_message = f"""<!DOCTYPE html>
+# Plantilla FCE - UNRC (Enrollamiento)
+_FALLBACK_ENROLLAMIENTO = PlantillaCompilada("""<!DOCTYPE html>
 <html lang="es">
 <head>
   <meta charset="UTF-8" />
@@ -541,7 +923,7 @@ class EmailService:
       <div class="content">
         <span class="pill">Cursillo de ingreso</span>
 
-        <h2 class="title">Hola {alumno.nombre} {alumno.apellido},</h2>
+        <h2 class="title">Hola {nombre} {apellido},</h2>
 
         <p class="muted">
           ¡Bienvenido/a al <b>Ecosistema Virtual</b> de la Facultad de Ciencias Económicas (<b>V.ECO</b>)!
@@ -592,117 +974,10 @@ class EmailService:
     </div>
   </div>
 </body>
-</html>"""
-        else:
-            # Si hay plantilla personalizada pero no es HTML, no enviar html
-            if not html_message:
-                html_message = None
-
-        try:
-            email_to = alumno.email_personal or alumno.email_institucional
-            if not email_to:
-                logger.error(f"Alumno {alumno.id} no tiene email configurado")
-                return False
-
-            logger.info(f"Enviando email de enrollamiento Moodle a {email_to}")
-
-            result = send_mail(
-                subject=subject,
-                message=message,
-                from_email=self.from_email,
-                recipient_list=[email_to],
-                html_message=html_message,
-                fail_silently=False
-            )
-
-            if result == 1:
-                logger.info(f"Email de enrollamiento Moodle enviado a {email_to}")
-                log_to_db('SUCCESS', 'email_service', f'Email de enrollamiento Moodle enviado a {email_to}',
-                         detalles={'email': email_to, 'courses': courses_enrolled}, alumno=alumno)
-                return True
-            else:
-                logger.warning(f"send_mail retornó {result} para {email_to}")
-                return False
-
-        except Exception as e:
-            logger.error(f"Error enviando email de enrollamiento a {alumno.email}: {e}")
-            log_to_db('ERROR', 'email_service', f'Error enviando email de enrollamiento',
-                     detalles={'error': str(e)}, alumno=alumno)
-            return False
-
-    def send_enrollment_confirmation(self, alumno, curso: str) -> bool:
-        """
-        Envía confirmación de enrolamiento en un curso.
-
-        Args:
-            alumno: Instancia del modelo Alumno
-            curso: Nombre del curso
-
-        Returns:
-            True si se envió exitosamente, False en caso contrario
-        """
-        subject = f"Confirmación de enrolamiento - {curso}"
-
-        message = f"""
-Hola {alumno.nombre} {alumno.apellido},
-
-Te confirmamos tu enrolamiento en el curso:
-
-{curso}
-
-Ya puedes acceder al curso en Moodle con tus credenciales institucionales.
-
-Saludos,
-Sistema Lucy AMS
-Universidad Nacional de Río Cuarto
-"""
-
-        try:
-            # IMPORTANTE: Siempre enviar al email_personal
-            email_destino = alumno.email_personal or alumno.email_institucional
-            if not email_destino:
-                logger.error(f"Alumno {alumno.id} no tiene email personal ni institucional")
-                return False
-
-            logger.info(f"Enviando confirmación de enrolamiento a {email_destino} (email personal)")
-
-            result = send_mail(
-                subject=subject,
-                message=message,
-                from_email=self.from_email,
-                recipient_list=[email_destino],
-                fail_silently=False
-            )
-
-            if result == 1:
-                logger.info(f"Confirmación de enrolamiento enviada a {email_destino}")
-                return True
-            else:
-                return False
-
-        except Exception as e:
-            logger.error(f"Error enviando confirmación a {email_destino}: {e}")
-            return False
-
-    def enviar_email_password_reset(self, alumno, password: str) -> bool:
-        """
-        Envía email con nueva contraseña temporal después de un reset.
-
-        Args:
-            alumno: Instancia del modelo Alumno
-            password: Nueva contraseña temporal
-
-        Returns:
-            True si se envió exitosamente, False en caso contrario
-        """
-        from ..models import Configuracion
-        config = Configuracion.load()
-
-        upn = alumno.email_institucional or f"{alumno.dni}@eco.unrc.edu.ar"
-        subject = "Nueva contraseña temporal - FCE UNRC"
+</html>""")
 
-        message = f"Hola {alumno.nombre} {alumno.apellido}, se ha generado una nueva contraseña temporal."
-        html_message = f"""<!DOCTYPE html>
+# Plantilla FCE - UNRC (Reset de contraseña)
+_FALLBACK_PASSWORD_RESET = PlantillaCompilada("""<!DOCTYPE html>
 <html lang="es">
 <head>
   <meta charset="UTF-8" />
@@ -744,7 +1019,7 @@ Universidad Nacional de Río Cuarto
       <div class="content">
         <span class="pill">Recuperación de acceso</span>
 
-        <h2 class="title">Hola {alumno.nombre} {alumno.apellido},</h2>
+        <h2 class="title">Hola {nombre} {apellido},</h2>
 
         <p class="muted">
           Se ha generado una <b>nueva contraseña temporal</b> para tu cuenta institucional.
@@ -788,81 +1063,4 @@ Universidad Nacional de Río Cuarto
     </div>
   </div>
 </body>
-</html>"""
-
-        try:
-            email_destino = alumno.email_personal or alumno.email_institucional
-            if not email_destino:
-                logger.error(f"Alumno {alumno.id} no tiene email configurado")
-                return False
-
-            logger.info(f"Enviando email de password reset a {email_destino}")
-
-            result = send_mail(
-                subject=subject,
-                message=message,
-                from_email=self.from_email,
-                recipient_list=[email_destino],
-                html_message=html_message,
-                fail_silently=False
-            )
-
-            if result == 1:
-                logger.info(f"Email de password reset enviado a {email_destino}")
-                return True
-            else:
-                return False
-
-        except Exception as e:
-            logger.error(f"Error enviando email de password reset a {email_destino}: {e}")
-            return False
-
-    def send_status_change_email(self, alumno, old_status: str, new_status: str) -> bool:
-        """
-        Envía notificación de cambio de estado del alumno.
-
-        Args:
-            alumno: Instancia del modelo Alumno
-            old_status: Estado anterior
-            new_status: Nuevo estado
-
-        Returns:
-            True si se envió exitosamente, False en caso contrario
-        """
-        subject = "Actualización de estado - UNRC"
-
-        message = f"""
-Hola {alumno.nombre} {alumno.apellido},
-
-Te informamos que tu estado ha sido actualizado:
-
-Estado anterior: {old_status}
-Nuevo estado: {new_status}
-
-Si tienes consultas, contacta con la administración académica.
-
-Saludos,
-Sistema Lucy AMS
-Universidad Nacional de Río Cuarto
-"""
-
-        try:
-            logger.info(f"Enviando notificación de cambio de estado a {alumno.email}")
-
-            result = send_mail(
-                subject=subject,
-                message=message,
-                from_email=self.from_email,
-                recipient_list=[alumno.email],
-                fail_silently=False
-            )
-
-            if result == 1:
-                logger.info(f"Notificación enviada a {alumno.email}")
-                return True
-            else:
-                return False
-
-        except Exception as e:
-            logger.error(f"Error enviando notificación a {alumno.email}: {e}")
-            return False
+</html>""")
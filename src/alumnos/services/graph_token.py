@@ -0,0 +1,197 @@
+"""
+Nombre del Módulo: graph_token.py
+
+Descripción:
+Proveedor compartido de tokens OAuth2 para Microsoft Graph.
+
+Autor: Carlos Dagorret
+Fecha de Creación: 2025-12-29
+Última Modificación: 2025-12-29
+
+Licencia: MIT
+Copyright (c) 2025 Carlos Dagorret
+
+Permisos:
+Se concede permiso, de forma gratuita, a cualquier persona que obtenga una copia
+de este software y la documentación asociada (el "Software"), para tratar
+en el Software sin restricciones, incluyendo, sin limitación, los derechos
+de usar, copiar, modificar, fusionar, publicar, distribuir, sublicenciar
+y/o vender copias del Software, y para permitir a las personas a las que
+se les proporciona el Software hacerlo, sujeto a las siguientes condiciones:
+
+El aviso de copyright anterior y este aviso de permiso se incluirán en todas
+las copias o partes sustanciales del Software.
+
+EL SOFTWARE SE PROPORCIONA "TAL CUAL", SIN GARANTÍA DE NINGÚN TIPO, EXPRESA O
+IMPLÍCITA, INCLUYENDO PERO NO LIMITADO A LAS GARANTÍAS DE COMERCIABILIDAD,
+IDONEIDAD PARA UN PROPÓSITO PARTICULAR Y NO INFRACCIÓN. EN NINGÚN CASO LOS
+AUTORES O TITULARES DE LOS DERECHOS DE AUTOR SERÁN RESPONSABLES DE CUALQUIER
+RECLAMO, DAÑO U OTRA RESPONSABILIDAD, YA SEA EN UNA ACCIÓN DE CONTRATO,
+AGRAVIO O DE OTRO MODO, QUE SURJA DE, FUERA DE O EN CONEXIÓN CON EL SOFTWARE
+O EL USO U OTROS TRATOS EN EL SOFTWARE.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from ..utils.http_client import get_session
+from ..utils.log_buffer import registrar_log
+from ..utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+TOKEN_URL = "https://login.microsoftonline.com/{tenant}/oauth2/v2.0/token"
+GRAPH_SCOPE = "https://graph.microsoft.com/.default"
+
+# Se pide un token nuevo cuando al vigente le quedan menos de estos segundos
+MARGEN_REFRESCO_SEGUNDOS = 300
+
+# Tiempo máximo que un worker retiene (o espera) el lock de refresco en Redis
+LOCK_TIMEOUT_SEGUNDOS = 30
+
+_lock = threading.Lock()
+_tokens: Dict[str, Tuple[str, float]] = {}
+
+
+def log_to_db(tipo, modulo, mensaje, detalles=None, alumno=None):
+    """Registra un log en la base de datos (en lote, ver utils.log_buffer)."""
+    registrar_log(tipo, modulo, mensaje, detalles=detalles, alumno=alumno)
+
+
+def _clave(tenant: str, client_id: str, scope: str) -> str:
+    """Clave de cache por (tenant, client_id, scope), sin exponer los IDs en Redis."""
+    digest = hashlib.sha1(f"{tenant}|{client_id}|{scope}".encode()).hexdigest()
+    return f"lucy:graph:token:{digest}"
+
+
+def _vigente(entrada: Optional[Tuple[str, float]], margen: float = MARGEN_REFRESCO_SEGUNDOS) -> Optional[str]:
+    """Retorna el token si le quedan más de `margen` segundos de validez."""
+    if entrada and entrada[1] - time.time() > margen:
+        return entrada[0]
+    return None
+
+
+def _leer_redis(cliente, clave: str) -> Optional[Tuple[str, float]]:
+    try:
+        valor = cliente.get(clave)
+        if valor:
+            datos = json.loads(valor)
+            return datos['token'], float(datos['expira'])
+    except Exception as e:
+        logger.warning(f"Error leyendo token Graph desde Redis: {e}")
+    return None
+
+
+def _guardar_redis(cliente, clave: str, token: str, expira: float):
+    ttl = int(expira - time.time())
+    if ttl <= 0:
+        return
+    try:
+        cliente.set(clave, json.dumps({'token': token, 'expira': expira}), ex=ttl)
+    except Exception as e:
+        logger.warning(f"Error guardando token Graph en Redis: {e}")
+
+
+def _solicitar_token(tenant: str, client_id: str, client_secret: str, scope: str) -> Tuple[str, float]:
+    """
+    Pide un token a login.microsoftonline.com (Client Credentials Flow).
+
+    Raises:
+        requests.exceptions.RequestException: Errores HTTP o de conexión
+    """
+    response = get_session('graph').post(
+        TOKEN_URL.format(tenant=tenant),
+        data={
+            'client_id': client_id,
+            'client_secret': client_secret,
+            'scope': scope,
+            'grant_type': 'client_credentials'
+        },
+        timeout=10
+    )
+    response.raise_for_status()
+    result = response.json()
+    expira = time.time() + int(result.get('expires_in', 3599))
+    logger.info("Token OAuth2 obtenido exitosamente")
+    log_to_db('SUCCESS', 'graph_token', 'Token OAuth2 obtenido exitosamente',
+              detalles={'expires_in': result.get('expires_in')})
+    return result['access_token'], expira
+
+
+def get_graph_token(tenant: str, client_id: str, client_secret: str, scope: str = GRAPH_SCOPE) -> str:
+    """
+    Obtiene un access token de Microsoft Graph compartido entre instancias y workers.
+
+    El token se cachea por (tenant, client_id, scope) en memoria del proceso y en
+    Redis, respetando expires_in. Se renueva MARGEN_REFRESCO_SEGUNDOS antes de
+    expirar, y un lock en Redis evita que varios workers pidan token a la vez.
+    Si el refresco falla pero el token anterior aún no expiró, se sigue usando.
+
+    Raises:
+        requests.exceptions.RequestException: Si no hay token válido y falla la solicitud
+    """
+    clave = _clave(tenant, client_id, scope)
+
+    token = _vigente(_tokens.get(clave))
+    if token:
+        return token
+
+    with _lock:
+        token = _vigente(_tokens.get(clave))
+        if token:
+            return token
+
+        cliente = get_redis()
+        if cliente is None:
+            return _renovar(clave, tenant, client_id, client_secret, scope)
+
+        entrada = _leer_redis(cliente, clave)
+        if _vigente(entrada):
+            _tokens[clave] = entrada
+            return entrada[0]
+
+        try:
+            lock = cliente.lock(f"{clave}:lock", timeout=LOCK_TIMEOUT_SEGUNDOS,
+                                blocking_timeout=LOCK_TIMEOUT_SEGUNDOS)
+            adquirido = lock.acquire()
+        except Exception as e:
+            logger.warning(f"No se pudo tomar el lock de token Graph en Redis: {e}")
+            lock, adquirido = None, False
+
+        try:
+            # Otro worker pudo haberlo renovado mientras esperábamos el lock
+            entrada = _leer_redis(cliente, clave)
+            if _vigente(entrada):
+                _tokens[clave] = entrada
+                return entrada[0]
+            return _renovar(clave, tenant, client_id, client_secret, scope, cliente)
+        finally:
+            if adquirido:
+                try:
+                    lock.release()
+                except Exception:
+                    pass
+
+
+def _renovar(clave, tenant, client_id, client_secret, scope, cliente=None) -> str:
+    """Solicita un token nuevo y lo publica en memoria y en Redis (llamar con _lock tomado)."""
+    try:
+        token, expira = _solicitar_token(tenant, client_id, client_secret, scope)
+    except requests.exceptions.RequestException:
+        anterior = _vigente(_tokens.get(clave), margen=0)
+        if anterior:
+            logger.warning("Error renovando token OAuth2, se usa el token vigente hasta su expiración")
+            return anterior
+        raise
+
+    _tokens[clave] = (token, expira)
+    if cliente is not None:
+        _guardar_redis(cliente, clave, token, expira)
+    return token
+
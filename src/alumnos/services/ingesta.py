@@ -31,15 +31,50 @@ AGRAVIO O DE OTRO MODO, QUE SURJA DE, FUERA DE O EN CONEXIÓN CON EL SOFTWARE
 O EL USO U OTROS TRATOS EN EL SOFTWARE.
 """
 import datetime
+import json
+import logging
 import secrets
 import string
-from typing import Dict, List, Optional, Tuple
+import tempfile
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-import requests
 from django.conf import settings
 
 from cursos.services import resolver_curso
 from ..models import Alumno  # .. porque ahora estamos en alumnos/services/
+from ..utils.http_client import get_session
+from .cache_personal import DatosPersonalesCache
+
+logger = logging.getLogger(__name__)
+
+
+# Máximo de requests simultáneas a UTI (no superar el pool de conexiones de la sesión)
+SIAL_MAX_CONCURRENCY = 8
+
+# Bytes del body de /listas que se mantienen en memoria antes de volcar a disco
+LISTAS_SPOOL_MAX_MEMORIA = 8 * 1024 * 1024
+LISTAS_STREAM_BLOQUE = 64 * 1024
+
+
+class _Espaciador:
+    """Garantiza un intervalo mínimo entre inicios de requests, compartido entre hilos."""
+
+    def __init__(self, intervalo: float):
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._proximo = 0.0
+
+    def esperar(self) -> None:
+        if self.intervalo <= 0:
+            return
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self._proximo)
+            self._proximo = turno + self.intervalo
+        if turno > ahora:
+            time.sleep(turno - ahora)
 
 
 class SIALClient:
@@ -49,8 +84,9 @@ class SIALClient:
         from ..utils.config import get_sial_base_url, get_sial_basic_user, get_sial_basic_pass
         self.base_url = (base_url or get_sial_base_url()).rstrip("/")
         self.auth = (user or get_sial_basic_user(), password or get_sial_basic_pass())
-        self.session = requests.Session()
-        self.session.auth = self.auth
+        # Sesión compartida del worker (pool dimensionado para fetch_datospersonales_many);
+        # las credenciales viajan en cada request porque la sesión no las guarda
+        self.session = get_session("sial", pool_maxsize=SIAL_MAX_CONCURRENCY)
 
     def fetch_listas(
         self,
@@ -64,6 +100,58 @@ class SIALClient:
         """
         Llama a /listas/ (completa), /listas/{fecha} o /listas/{desde}/{hasta} según parámetros.
         """
+        url, params = self._listas_request(tipo, n=n, fecha=fecha, desde=desde, hasta=hasta, seed=seed)
+        resp = self.session.get(url, params=params, auth=self.auth, timeout=30)
+        resp.raise_for_status()
+        return resp.json()
+
+    def iter_listas(
+        self,
+        tipo: str,
+        n: Optional[int] = None,
+        fecha: Optional[str] = None,
+        desde: Optional[str] = None,
+        hasta: Optional[str] = None,
+        seed: Optional[int] = None,
+    ) -> Iterator[dict]:
+        """
+        Igual que fetch_listas pero sin materializar la lista completa.
+
+        El body se descarga por bloques (iter_content) a un archivo temporal
+        que solo pasa a disco si supera LISTAS_SPOOL_MAX_MEMORIA, y después se
+        parsea incrementalmente con ijson, devolviendo un registro a la vez.
+        Descargar antes de parsear evita mantener la conexión con UTI abierta
+        mientras se procesa cada chunk. Si ijson no está instalado, se parsea
+        con json (mismo resultado, sin el ahorro de memoria).
+        """
+        url, params = self._listas_request(tipo, n=n, fecha=fecha, desde=desde, hasta=hasta, seed=seed)
+
+        with tempfile.SpooledTemporaryFile(max_size=LISTAS_SPOOL_MAX_MEMORIA) as body:
+            with self.session.get(url, params=params, auth=self.auth, timeout=30, stream=True) as resp:
+                resp.raise_for_status()
+                for bloque in resp.iter_content(chunk_size=LISTAS_STREAM_BLOQUE):
+                    body.write(bloque)
+            body.seek(0)
+
+            try:
+                import ijson
+            except ImportError:
+                logger.warning("ijson no está instalado, /listas se parsea completo en memoria")
+                yield from json.load(body)
+                return
+
+            yield from ijson.items(body, "item", use_float=True)
+
+    def _listas_request(
+        self,
+        tipo: str,
+        n: Optional[int] = None,
+        fecha: Optional[str] = None,
+        desde: Optional[str] = None,
+        hasta: Optional[str] = None,
+        seed: Optional[int] = None,
+    ) -> Tuple[str, dict]:
+        """Arma URL y query params de /listas según el tipo de consulta."""
         path = f"/webservice/sial/V2/04/{tipo}/listas"
         if fecha:
             path += f"/{fecha}"
@@ -78,10 +166,7 @@ class SIALClient:
         if seed is not None:
             params["seed"] = seed
 
-        url = self.base_url + path
-        resp = self.session.get(url, params=params, timeout=30)
-        resp.raise_for_status()
-        return resp.json()
+        return self.base_url + path, params
 
     def fetch_datospersonales(self, nrodoc: str) -> dict:
         """
@@ -89,11 +174,56 @@ class SIALClient:
         """
         path = f"/webservice/sial/V2/04/alumnos/datospersonales/{nrodoc}"
         url = self.base_url + path
-        resp = self.session.get(url, timeout=30)
+        resp = self.session.get(url, auth=self.auth, timeout=30)
         resp.raise_for_status()
         data = resp.json()
         return data[0] if data else {}
 
+    def fetch_datospersonales_many(
+        self,
+        nrodocs: Iterable[str],
+        max_concurrency: int = SIAL_MAX_CONCURRENCY,
+        rate_limit: Optional[int] = None,
+    ) -> Tuple[Dict[str, dict], Dict[str, Exception]]:
+        """
+        Descarga datospersonales de varios documentos en paralelo.
+
+        Usa un pool de hilos acotado a `max_concurrency` y espacia el inicio de
+        cada request según `rate_limit` (llamadas por minuto; por defecto
+        Configuracion.rate_limit_uti), así el paralelismo no supera la cuota de UTI.
+
+        Returns:
+            (datos por nrodoc, excepciones por nrodoc)
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        pendientes = list(dict.fromkeys(str(n) for n in nrodocs if n))
+        resultados: Dict[str, dict] = {}
+        errores: Dict[str, Exception] = {}
+        if not pendientes:
+            return resultados, errores
+
+        if rate_limit is None:
+            from ..utils.config import get_rate_limit_uti
+            rate_limit = get_rate_limit_uti()
+        pacer = _Espaciador(60.0 / rate_limit if rate_limit and rate_limit > 0 else 0)
+
+        def _fetch(nrodoc: str) -> dict:
+            pacer.esperar()
+            return self.fetch_datospersonales(nrodoc)
+
+        workers = max(1, min(max_concurrency, len(pendientes)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sial") as pool:
+            futures = {pool.submit(_fetch, nrodoc): nrodoc for nrodoc in pendientes}
+            for future in as_completed(futures):
+                nrodoc = futures[future]
+                try:
+                    resultados[nrodoc] = future.result()
+                except Exception as exc:
+                    errores[nrodoc] = exc
+
+        return resultados, errores
+
 
 def _parse_fecha_natal(fecha_natal: Optional[str]) -> Optional[datetime.date]:
     if not fecha_natal:
@@ -276,6 +406,196 @@ def _build_defaults(
     }
 
 
+# Tamaño de chunk para la escritura en lote (bulk_create / bulk_update)
+INGESTA_CHUNK_SIZE = 500
+
+# Campos que _build_defaults puede modificar + timestamps auto_now
+# (bulk_update no ejecuta pre_save, hay que setearlos a mano)
+_CAMPOS_BULK_UPDATE = [
+    "nombre",
+    "apellido",
+    "email_personal",
+    "fecha_nacimiento",
+    "cohorte",
+    "localidad",
+    "telefono",
+    "email_institucional",
+    "estado_actual",
+    "fecha_ingreso",
+    "estado_ingreso",
+    "modalidad_actual",
+    "carreras_data",
+    "teams_password",
+    "fecha_ultima_modificacion",
+    "updated_at",
+]
+
+
+def _iter_chunks(items: Iterable, size: int) -> Iterator[List]:
+    """Agrupa un iterable en listas de a lo sumo `size` elementos."""
+    chunk: List = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _encolar_emails_bienvenida(alumno_ids: List[int], tipo: str) -> int:
+    """
+    Registra el email de bienvenida pendiente de cada alumno como una Tarea
+    ENVIAR_EMAIL (bulk_create); la envía después el carril 'email' de la cola.
+    """
+    if not alumno_ids:
+        return 0
+    from ..models import Tarea
+    from ..tasks.helpers import encolar_tareas_alumnos
+    return encolar_tareas_alumnos(
+        Tarea.TipoTarea.ENVIAR_EMAIL,
+        alumno_ids,
+        detalles={'tipo_email': 'bienvenida', 'origen': f'ingesta_{tipo}'}
+    )
+
+
+def _despertar_carril_email():
+    """Pide al carril 'email' que procese ya (tras el commit), sin esperar al dispatcher."""
+    from django.db import transaction
+    try:
+        from ..tasks.procesamiento import despertar_carril
+        transaction.on_commit(lambda: despertar_carril('email'))
+    except Exception as e:
+        logger.warning(f"No se pudo despertar el carril de email: {e}")
+
+
+def _guardar_chunk_por_fila(
+    filas: List[Tuple[str, str, Dict]],
+    errors: List[str],
+) -> Tuple[int, int, List[Alumno]]:
+    """
+    Fallback fila por fila (update_or_create) cuando falla la escritura en lote.
+    Permite aislar el registro problemático sin perder el resto del chunk.
+    """
+    created = 0
+    updated = 0
+    creados: List[Alumno] = []
+    for tipodoc, nrodoc, defaults in filas:
+        try:
+            obj, is_created = Alumno.objects.update_or_create(
+                tipo_documento=tipodoc, dni=nrodoc, defaults=defaults
+            )
+            if is_created:
+                created += 1
+                creados.append(obj)
+            else:
+                updated += 1
+        except Exception as exc:
+            errors.append(f"{tipodoc} {nrodoc}: error al guardar ({exc})")
+    return created, updated, creados
+
+
+def _procesar_chunk(
+    tipo: str,
+    chunk: List[dict],
+    client: "SIALClient",
+    cache_personal: Dict[str, dict],
+    errors: List[str],
+    cache_persistente: Optional[DatosPersonalesCache] = None,
+) -> Tuple[int, int, List[Alumno]]:
+    """
+    Procesa un chunk de items de /listas con escritura en lote.
+
+    1. Precarga en una sola query los Alumno existentes del chunk.
+    2. Descarga en paralelo los datospersonales que falten (primero se
+       buscan en el cache persistente, si se pasa uno).
+    3. Arma los defaults en memoria (sin tocar la BD por fila).
+    4. Persiste con bulk_create + bulk_update dentro de una transacción.
+
+    Returns:
+        (creados, actualizados, [instancias creadas])
+    """
+    from django.db import transaction
+    from django.utils import timezone
+
+    # Normalizar claves y descartar registros inválidos
+    items: List[Tuple[str, str, dict]] = []
+    for item in chunk:
+        tipodoc = item.get("tipodoc") or "DNI"
+        nrodoc = str(item.get("nrodoc") or "").strip()
+        if not nrodoc:
+            errors.append("Registro sin nrodoc")
+            continue
+        items.append((tipodoc, nrodoc, item))
+
+    if not items:
+        return 0, 0, []
+
+    # 1. Precargar existentes: una query por chunk en lugar de una por alumno
+    dnis = {nrodoc for _, nrodoc, _ in items}
+    existentes: Dict[Tuple[str, str], Alumno] = {
+        (a.tipo_documento, a.dni): a
+        for a in Alumno.objects.filter(dni__in=dnis)
+    }
+
+    # 2. Prefetch concurrente de datos personales (cache por ejecución → cache persistente → UTI)
+    faltantes = {nrodoc: tipodoc for tipodoc, nrodoc, _ in items if nrodoc not in cache_personal}
+    if faltantes and cache_persistente is not None:
+        for nrodoc, datos in cache_persistente.get_many(faltantes.keys()).items():
+            cache_personal[nrodoc] = datos
+            del faltantes[nrodoc]
+    if faltantes:
+        datos, fallidos = client.fetch_datospersonales_many(faltantes.keys())
+        cache_personal.update(datos)
+        if cache_persistente is not None:
+            cache_persistente.set_many(datos)
+        for nrodoc, exc in fallidos.items():
+            errors.append(f"{faltantes[nrodoc]} {nrodoc}: error datospersonales ({exc})")
+            cache_personal[nrodoc] = {}
+
+    # 3. Armar instancias en memoria
+    ahora = timezone.now()
+    a_crear: Dict[Tuple[str, str], Alumno] = {}
+    a_actualizar: Dict[Tuple[str, str], Alumno] = {}
+    filas: List[Tuple[str, str, Dict]] = []
+    created = 0
+    updated = 0
+
+    for tipodoc, nrodoc, item in items:
+        key = (tipodoc, nrodoc)
+        # Si el documento se repite dentro del chunk, evoluciona sobre la instancia en memoria
+        existing = a_crear.get(key) or a_actualizar.get(key) or existentes.get(key)
+        defaults = _build_defaults(tipo, item, cache_personal.get(nrodoc, {}), existing)
+        filas.append((tipodoc, nrodoc, defaults))
+
+        if existing is None:
+            a_crear[key] = Alumno(tipo_documento=tipodoc, dni=nrodoc, **defaults)
+            created += 1
+            continue
+
+        for campo, valor in defaults.items():
+            setattr(existing, campo, valor)
+        if key not in a_crear:
+            existing.fecha_ultima_modificacion = ahora
+            existing.updated_at = ahora
+            a_actualizar[key] = existing
+        updated += 1
+
+    # 4. Persistir en lote; si falla, reintentar fila por fila para aislar errores
+    try:
+        with transaction.atomic():
+            creados = Alumno.objects.bulk_create(list(a_crear.values()))
+            if a_actualizar:
+                Alumno.objects.bulk_update(list(a_actualizar.values()), _CAMPOS_BULK_UPDATE)
+    except Exception as exc:
+        logger.warning(
+            f"[Ingesta {tipo}] Error en escritura en lote ({exc}), reintentando fila por fila"
+        )
+        return _guardar_chunk_por_fila(filas, errors)
+
+    return created, updated, creados
+
+
 def ingerir_desde_sial(
     tipo: str,
     n: Optional[int] = None,
@@ -286,14 +606,27 @@ def ingerir_desde_sial(
     client: Optional[SIALClient] = None,
     retornar_nuevos: bool = False,
     enviar_email: bool = False,
+    chunk_size: int = INGESTA_CHUNK_SIZE,
+    estadisticas: Optional[dict] = None,
 ) -> Tuple[int, int, List[str], Optional[List[int]]]:
     """
     Consume listas SIAL y persiste en Alumno.
 
+    Los registros se leen en streaming desde /listas (SIALClient.iter_listas)
+    y se procesan en chunks de `chunk_size`: los existentes se precargan con
+    una query por chunk y la escritura se hace con bulk_create/bulk_update,
+    en lugar de ~3 queries por alumno. La memoria pico queda acotada al
+    tamaño del chunk, sin importar el largo de la lista.
+
     Args:
         tipo: Tipo de ingesta (preinscriptos, aspirantes, ingresantes)
         retornar_nuevos: Si es True, retorna lista de IDs de alumnos creados
-        enviar_email: Si es True, envía email de bienvenida a alumnos nuevos
+        enviar_email: Si es True, encola el email de bienvenida de los alumnos
+            nuevos (tareas ENVIAR_EMAIL que el carril 'email' envía en lote)
+        chunk_size: Cantidad de registros por escritura en lote
+        estadisticas: Dict opcional que se completa con métricas de la ejecución
+            ('cache_datospersonales': hits/misses del cache persistente) para
+            guardarlas en Tarea.detalles
 
     Returns:
         (creados, actualizados, errores, [nuevos_ids] si retornar_nuevos=True)
@@ -311,64 +644,72 @@ def ingerir_desde_sial(
     errors: List[str] = []
     nuevos_ids: List[int] = [] if retornar_nuevos else None
     cache_personal: Dict[str, dict] = {}
+    cache_persistente = DatosPersonalesCache()
 
-    try:
-        listas = client.fetch_listas(tipo, n=n, fecha=fecha, desde=desde, hasta=hasta, seed=seed)
-        logger.info(f"[Ingesta {tipo}] Se obtuvieron {len(listas)} registros de la API")
-    except Exception as exc:
-        error_msg = f"Error al consultar listas: {exc}"
-        errors.append(error_msg)
-        logger.error(f"[Ingesta {tipo}] ❌ {error_msg}")
+    listas = client.iter_listas(tipo, n=n, fecha=fecha, desde=desde, hasta=hasta, seed=seed)
+    chunks = _iter_chunks(listas, max(1, chunk_size))
+    leidos = 0
+    emails_pendientes = 0
 
-        # LOG FINAL CON ERROR
-        logger.error(f"[Ingesta {tipo}] ❌ Finalizada con error. Creados: 0, Actualizados: 0, Errores: 1")
+    while True:
+        # Los errores de red/parseo aparecen al pedir el próximo chunk del stream
+        try:
+            chunk = next(chunks, None)
+        except Exception as exc:
+            error_msg = f"Error al consultar listas: {exc}"
+            errors.append(error_msg)
+            logger.error(f"[Ingesta {tipo}] ❌ {error_msg}")
 
-        if retornar_nuevos:
-            return created, updated, errors, nuevos_ids
-        return created, updated, errors
+            if leidos == 0:
+                # LOG FINAL CON ERROR
+                logger.error(f"[Ingesta {tipo}] ❌ Finalizada con error. Creados: 0, Actualizados: 0, Errores: 1")
 
-    for item in listas:
-        tipodoc = item.get("tipodoc") or "DNI"
-        nrodoc = str(item.get("nrodoc") or "").strip()
-        if not nrodoc:
-            errors.append("Registro sin nrodoc")
-            continue
-        existing = Alumno.objects.filter(tipo_documento=tipodoc, dni=nrodoc).first()
-        if nrodoc not in cache_personal:
-            try:
-                cache_personal[nrodoc] = client.fetch_datospersonales(nrodoc)
-            except Exception as exc:
-                errors.append(f"{tipodoc} {nrodoc}: error datospersonales ({exc})")
-                cache_personal[nrodoc] = {}
+                if retornar_nuevos:
+                    return created, updated, errors, nuevos_ids
+                return created, updated, errors
+            break
 
-        defaults = _build_defaults(tipo, item, cache_personal.get(nrodoc, {}), existing)
-        try:
-            obj, is_created = Alumno.objects.update_or_create(
-                tipo_documento=tipodoc, dni=nrodoc, defaults=defaults
-            )
-            created += 1 if is_created else 0
-            updated += 0 if is_created else 1
+        if chunk is None:
+            break
+        leidos += len(chunk)
+
+        chunk_created, chunk_updated, creados = _procesar_chunk(
+            tipo, chunk, client, cache_personal, errors, cache_persistente
+        )
+        created += chunk_created
+        updated += chunk_updated
 
-            # Si es nuevo y se solicitan IDs, agregarlo a la lista
-            if is_created and retornar_nuevos:
-                nuevos_ids.append(obj.id)
+        # Si son nuevos y se solicitan IDs, agregarlos a la lista
+        if retornar_nuevos:
+            nuevos_ids.extend(obj.id for obj in creados if obj.id)
 
-            # Si es nuevo y se solicita envío de email, enviar
-            if is_created and enviar_email:
+        # Si son nuevos y se solicita envío de email, dejarlo pendiente: el
+        # chunk ya está commiteado y el envío no demora la ingesta
+        if enviar_email and creados:
+            con_email = []
+            for obj in creados:
                 if obj.email_personal or obj.email_institucional:
-                    try:
-                        from .email_service import EmailService
-                        email_svc = EmailService()
-                        email_result = email_svc.send_welcome_email(obj)
-                        if not email_result:
-                            errors.append(f"{tipodoc} {nrodoc}: error enviando email de bienvenida")
-                    except Exception as email_exc:
-                        errors.append(f"{tipodoc} {nrodoc}: error enviando email ({email_exc})")
+                    con_email.append(obj.id)
                 else:
-                    errors.append(f"{tipodoc} {nrodoc}: sin email, no se pudo enviar bienvenida")
+                    errors.append(f"{obj.tipo_documento} {obj.dni}: sin email, no se pudo enviar bienvenida")
+            emails_pendientes += _encolar_emails_bienvenida(con_email, tipo)
 
-        except Exception as exc:
-            errors.append(f"{tipodoc} {nrodoc}: error al guardar ({exc})")
+        logger.info(f"[Ingesta {tipo}] Chunk procesado: {chunk_created} creados, {chunk_updated} actualizados")
+
+    logger.info(f"[Ingesta {tipo}] Se obtuvieron {leidos} registros de la API")
+
+    stats_cache = cache_persistente.estadisticas()
+    logger.info(
+        f"[Ingesta {tipo}] Cache datospersonales ({stats_cache['backend']}): "
+        f"{stats_cache['hits']} hits, {stats_cache['misses']} misses"
+    )
+    if estadisticas is not None:
+        estadisticas['cache_datospersonales'] = stats_cache
+        estadisticas['emails_bienvenida_encolados'] = emails_pendientes
+
+    if emails_pendientes:
+        logger.info(f"[Ingesta {tipo}] {emails_pendientes} emails de bienvenida encolados")
+        _despertar_carril_email()
 
     # LOG FINAL
     if errors:
@@ -32,26 +32,35 @@ O EL USO U OTROS TRATOS EN EL SOFTWARE.
 """
 
 import logging
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 import requests
 from django.conf import settings
 
+from ..utils.cache_ttl import CacheTTL
+from ..utils.http_client import get_session
+from ..utils.log_buffer import registrar_log
+from ..utils.rate_limit import ServicioLimitado, detectar_limitacion
+
 logger = logging.getLogger(__name__)
 
+# Cache de IDs de cursos (shortname → id) y grupos ((curso, nombre) → id), compartido vía Redis
+MOODLE_CACHE_TTL = getattr(settings, 'MOODLE_CACHE_TTL', 3600)
+_cache_cursos = CacheTTL('lucy:moodle:curso', MOODLE_CACHE_TTL)
+_cache_grupos = CacheTTL('lucy:moodle:grupo', MOODLE_CACHE_TTL)
+
+# Filas por llamada en los web services multi-fila (enrolments[N], members[N], users[N])
+MOODLE_BULK_CHUNK = 100
+
+
+def limpiar_cache_moodle():
+    """Borra el cache de IDs de cursos y grupos de Moodle (todos los workers)."""
+    _cache_cursos.clear()
+    _cache_grupos.clear()
+
 
 def log_to_db(tipo, modulo, mensaje, detalles=None, alumno=None):
-    """Registra un log en la base de datos."""
-    try:
-        from ..models import Log
-        Log.objects.create(
-            tipo=tipo,
-            modulo=modulo,
-            mensaje=mensaje,
-            detalles=detalles,
-            alumno=alumno
-        )
-    except Exception as e:
-        logger.error(f"Error guardando log en BD: {e}")
+    """Registra un log en la base de datos (en lote, ver utils.log_buffer)."""
+    registrar_log(tipo, modulo, mensaje, detalles=detalles, alumno=alumno)
 
 
 class MoodleService:
@@ -64,6 +73,40 @@ class MoodleService:
 
         self.base_url = (config.moodle_base_url or settings.MOODLE_BASE_URL).rstrip('/')
         self.wstoken = config.moodle_wstoken or settings.MOODLE_WSTOKEN
+        self.session = get_session('moodle')
+
+        # Hits/misses del cache de IDs durante la vida de esta instancia
+        self._cache_stats = {'cursos': [0, 0], 'grupos': [0, 0]}
+
+        # Retry-After del último 429/503 recibido (None si Moodle no limitó)
+        self._limitado_retry_after = None
+
+    def _clave_cache(self, *partes) -> str:
+        """Clave de cache por instancia de Moodle (no mezclar IDs de testing y producción)."""
+        return '|'.join([self.base_url, *(str(p) for p in partes)])
+
+    def _contar_cache(self, tipo: str, hit: bool):
+        self._cache_stats[tipo][0 if hit else 1] += 1
+
+    def estadisticas_cache(self) -> Dict:
+        """Hit rate del cache de cursos/grupos en esta instancia."""
+        resultado = {}
+        for tipo, (hits, misses) in self._cache_stats.items():
+            total = hits + misses
+            resultado[tipo] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / total, 3) if total else None,
+            }
+        return resultado
+
+    def invalidar_curso(self, shortname: str):
+        """Descarta el ID cacheado de un curso (ej: fue recreado en Moodle)."""
+        _cache_cursos.delete(self._clave_cache(shortname))
+
+    def invalidar_grupo(self, course_id: int, group_name: str):
+        """Descarta el ID cacheado de un grupo."""
+        _cache_grupos.delete(self._clave_cache(course_id, group_name))
 
     def _call_webservice(self, wsfunction: str, params: dict) -> dict:
         """
@@ -91,7 +134,7 @@ class MoodleService:
             debug_data = {k: '***' if any(x in k.lower() for x in ['password', 'token']) else v for k, v in data.items()}
             logger.info(f"Datos enviados: {debug_data}")
 
-            response = requests.post(url, data=data, timeout=30)
+            response = self.session.post(url, data=data, timeout=30)
             response.raise_for_status()
             result = response.json()
 
@@ -108,9 +151,26 @@ class MoodleService:
             return result
 
         except requests.exceptions.RequestException as e:
+            response = getattr(e, 'response', None)
+            retry_after = detectar_limitacion('moodle', response)
+            if retry_after is not None:
+                self._limitado_retry_after = retry_after
+                logger.warning(f"Moodle limitó {wsfunction} (HTTP {response.status_code}), reintentar en {retry_after:.0f}s")
+                return {
+                    'error': f"M-429: Moodle limitó la solicitud (HTTP {response.status_code})",
+                    'throttled': True,
+                    'retry_after': retry_after,
+                }
             logger.error(f"Error de conexión con Moodle: {e}")
             return {'error': str(e)}
 
+    def _marcar_limitado(self, resultado: dict) -> dict:
+        """Marca un resultado fallido como limitado si Moodle devolvió 429/503 en esta instancia."""
+        if self._limitado_retry_after is not None and not resultado.get('success'):
+            resultado['throttled'] = True
+            resultado['retry_after'] = self._limitado_retry_after
+        return resultado
+
     def create_user(self, alumno) -> Optional[Dict]:
         """
         Busca usuario en Moodle y lo crea solo si no existe.
@@ -122,7 +182,6 @@ class MoodleService:
         Returns:
             Dict con información del usuario (created=True si fue creado, False si ya existía)
         """
-        from ..utils.config import get_moodle_email_type, get_moodle_auth_method
         from ..models import Configuracion
 
         config = Configuracion.load()
@@ -174,43 +233,11 @@ class MoodleService:
         # 2. Si NO existe, crear usuario nuevo
         logger.info(f"Usuario no existe en Moodle, creando: {username}")
 
-        # Determinar qué email usar según configuración
-        email_type = get_moodle_email_type()
-        email_to_use = alumno.email_institucional if email_type == 'institucional' else alumno.email_personal
-        email_to_use = email_to_use or alumno.email_institucional or alumno.email_personal
-
-        # Determinar método de autenticación según configuración
-        auth_method = get_moodle_auth_method()
-
-        # Validar campos requeridos
-        if not username or not email_to_use:
-            raise ValueError("M-004: Username y email son requeridos")
-        if not alumno.nombre or not alumno.apellido:
-            raise ValueError("M-004: Nombre y apellido son requeridos")
-
-        # Parámetros básicos según documentación Moodle
-        user_data = {
-            'users[0][username]': username,
-            'users[0][firstname]': str(alumno.nombre).strip(),
-            'users[0][lastname]': str(alumno.apellido).strip(),
-            'users[0][email]': email_to_use,
-            'users[0][auth]': auth_method,
-            'users[0][lang]': 'es',  # Idioma español
-        }
-
-        # Agregar idnumber solo si existe el DNI
-        if alumno.dni:
-            user_data['users[0][idnumber]'] = str(alumno.dni).strip()
-
-        # Password: requerido por API aunque con oidc no se use para login
-        if auth_method == 'manual':
-            user_data['users[0][password]'] = alumno.teams_password or 'ChangeMe123!'
-        else:
-            # Con oidc, Moodle puede exigir password según políticas
-            user_data['users[0][password]'] = 'TempPass-2025!'
+        campos = self._datos_usuario_nuevo(alumno, username)
+        user_data = {f'users[0][{campo}]': valor for campo, valor in campos.items()}
 
         # Log datos enviados (sin password)
-        logger.info(f"Creando usuario en Moodle con datos: username={username}, firstname={alumno.nombre}, lastname={alumno.apellido}, email={email_to_use}, auth={auth_method}")
+        logger.info(f"Creando usuario en Moodle con datos: username={username}, firstname={alumno.nombre}, lastname={alumno.apellido}, email={campos['email']}, auth={campos['auth']}")
 
         # Log TODOS los parámetros enviados (enmascarando password)
         debug_data = {k: '***' if 'password' in k.lower() else v for k, v in user_data.items()}
@@ -274,6 +301,52 @@ class MoodleService:
         )
         raise ValueError(f"M-004: {error_msg}")
 
+    def _datos_usuario_nuevo(self, alumno, username: str) -> Dict:
+        """
+        Campos de core_user_create_users para un alumno (sin el prefijo users[N]).
+
+        Raises:
+            ValueError: Si faltan campos requeridos
+        """
+        from ..utils.config import get_moodle_email_type, get_moodle_auth_method
+
+        # Determinar qué email usar según configuración
+        email_type = get_moodle_email_type()
+        email_to_use = alumno.email_institucional if email_type == 'institucional' else alumno.email_personal
+        email_to_use = email_to_use or alumno.email_institucional or alumno.email_personal
+
+        # Determinar método de autenticación según configuración
+        auth_method = get_moodle_auth_method()
+
+        # Validar campos requeridos
+        if not username or not email_to_use:
+            raise ValueError("M-004: Username y email son requeridos")
+        if not alumno.nombre or not alumno.apellido:
+            raise ValueError("M-004: Nombre y apellido son requeridos")
+
+        # Parámetros básicos según documentación Moodle
+        campos = {
+            'username': username,
+            'firstname': str(alumno.nombre).strip(),
+            'lastname': str(alumno.apellido).strip(),
+            'email': email_to_use,
+            'auth': auth_method,
+            'lang': 'es',  # Idioma español
+        }
+
+        # Agregar idnumber solo si existe el DNI
+        if alumno.dni:
+            campos['idnumber'] = str(alumno.dni).strip()
+
+        # Password: requerido por API aunque con oidc no se use para login
+        if auth_method == 'manual':
+            campos['password'] = alumno.teams_password or 'ChangeMe123!'
+        else:
+            # Con oidc, Moodle puede exigir password según políticas
+            campos['password'] = 'TempPass-2025!'
+
+        return campos
+
     def get_user_by_username(self, username: str) -> Optional[Dict]:
         """
         Busca un usuario en Moodle por username usando core_user_get_users_by_field.
@@ -348,8 +421,8 @@ class MoodleService:
         from ..utils.config import get_moodle_student_roleid
 
         # Primero obtener el course_id del shortname
-        course = self.get_course_by_shortname(course_shortname)
-        if not course:
+        course_id = self.get_course_id(course_shortname)
+        if not course_id:
             logger.error(f"Curso no encontrado en Moodle: {course_shortname}")
             log_to_db(
                 'ERROR',
@@ -360,7 +433,6 @@ class MoodleService:
             )
             return False
 
-        course_id = course['id']
         was_already_enrolled = False
 
         # Verificar si ya está enrollado
@@ -398,6 +470,8 @@ class MoodleService:
                 return False
 
             if 'error' in result:
+                # El ID cacheado puede haber quedado viejo (curso recreado): reconsultar la próxima vez
+                self.invalidar_curso(course_shortname)
                 logger.error(f"Error enrollando usuario {user_id} en curso {course_shortname}: {result['error']}")
                 log_to_db(
                     'ERROR',
@@ -426,8 +500,10 @@ class MoodleService:
             try:
                 group_id = self.get_or_create_group(course_id, group_name)
                 if group_id:
-                    self.add_user_to_group(user_id, group_id, alumno)
-                    logger.info(f"Usuario {user_id} agregado al grupo '{group_name}'")
+                    if self.add_user_to_group(user_id, group_id, alumno):
+                        logger.info(f"Usuario {user_id} agregado al grupo '{group_name}'")
+                    else:
+                        self.invalidar_grupo(course_id, group_name)
                 else:
                     logger.warning(f"No se pudo crear/obtener grupo '{group_name}' en curso {course_shortname}")
             except Exception as e:
@@ -458,25 +534,42 @@ class MoodleService:
             return None
 
         if isinstance(result, dict) and 'courses' in result and len(result['courses']) > 0:
-            return result['courses'][0]
+            course = result['courses'][0]
+            if course.get('id'):
+                _cache_cursos.set(self._clave_cache(shortname), course['id'])
+            return course
 
         logger.warning(f"Curso no encontrado en Moodle: {shortname}")
         return None
 
-    def enrol_user(self, alumno, courses: List[str]) -> Dict:
+    def get_course_id(self, shortname: str) -> Optional[int]:
         """
-        Crea usuario en Moodle (si no existe) y lo enrolla en los cursos especificados.
+        Obtiene el ID de un curso por shortname usando el cache (TTL: MOODLE_CACHE_TTL).
 
         Args:
-            alumno: Instancia del modelo Alumno
-            courses: Lista de shortnames de cursos
+            shortname: Shortname del curso
 
         Returns:
-            Dict con resultados: {success: bool, user_id: int, enrolled_courses: [...], failed_courses: [...]}
+            ID del curso o None si no existe
         """
-        from ..models import Configuracion
+        course_id = _cache_cursos.get(self._clave_cache(shortname))
+        self._contar_cache('cursos', course_id is not None)
+        if course_id is not None:
+            return course_id
 
-        config = Configuracion.load()
+        course = self.get_course_by_shortname(shortname)
+        return course['id'] if course else None
+
+    def _username_para_alumno(self, alumno, config=None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Username de Moodle del alumno (email institucional, o personal si el fallback está habilitado).
+
+        Returns:
+            (username, error): uno de los dos es None
+        """
+        if config is None:
+            from ..models import Configuracion
+            config = Configuracion.load()
 
         # Preparar username con manejo de fallback
         username = alumno.email_institucional
@@ -492,14 +585,44 @@ class MoodleService:
                     detalles={'alumno_id': alumno.id, 'dni': alumno.dni},
                     alumno=alumno
                 )
-                return {'success': False, 'error': 'M-012: Falta email institucional y fallback deshabilitado'}
+                return None, 'M-012: Falta email institucional y fallback deshabilitado'
             else:
                 # Usar fallback a email personal
                 username = alumno.email_personal
 
         if not username:
             logger.error(f"Alumno {alumno.id} no tiene email")
-            return {'success': False, 'error': 'No email'}
+            return None, 'No email'
+
+        return username, None
+
+    @staticmethod
+    def _modalidad_comision_alumno(alumno) -> Tuple[Optional[str], Optional[str]]:
+        """Modalidad y comisión de la primera carrera del alumno (para asignación a grupos)."""
+        modalidad = None
+        comision = None
+        if alumno.carreras_data and isinstance(alumno.carreras_data, list) and len(alumno.carreras_data) > 0:
+            carrera_data = alumno.carreras_data[0]
+            modalidad = carrera_data.get('modalidad', '').strip()
+            comisiones = carrera_data.get('comisiones', [])
+            if comisiones and len(comisiones) > 0:
+                comision = comisiones[0].get('nombre_comision', '')
+        return modalidad, comision
+
+    def enrol_user(self, alumno, courses: List[str]) -> Dict:
+        """
+        Crea usuario en Moodle (si no existe) y lo enrolla en los cursos especificados.
+
+        Args:
+            alumno: Instancia del modelo Alumno
+            courses: Lista de shortnames de cursos
+
+        Returns:
+            Dict con resultados: {success: bool, user_id: int, enrolled_courses: [...], failed_courses: [...]}
+        """
+        username, error = self._username_para_alumno(alumno)
+        if error:
+            return {'success': False, 'error': error}
 
         # 1. Buscar o crear usuario
         user = self.get_user_by_username(username)
@@ -516,14 +639,7 @@ class MoodleService:
             user_id = created_user['id']
 
         # 2. Obtener modalidad y comisión del alumno para asignación a grupos
-        modalidad = None
-        comision = None
-        if alumno.carreras_data and isinstance(alumno.carreras_data, list) and len(alumno.carreras_data) > 0:
-            carrera_data = alumno.carreras_data[0]
-            modalidad = carrera_data.get('modalidad', '').strip()
-            comisiones = carrera_data.get('comisiones', [])
-            if comisiones and len(comisiones) > 0:
-                comision = comisiones[0].get('nombre_comision', '')
+        modalidad, comision = self._modalidad_comision_alumno(alumno)
 
         # 3. Enrollar en cursos (con asignación a grupo)
         enrolled = []
@@ -542,28 +658,22 @@ class MoodleService:
             'username': username,
             'enrolled_courses': enrolled,
             'failed_courses': failed,
+            'cache': self.estadisticas_cache(),
         }
 
-    def enroll_user_in_courses(self, alumno) -> dict:
+    def cursos_para_alumno(self, alumno) -> Tuple[List[str], Optional[str]]:
         """
-        Enrolla un alumno en los cursos que le corresponden según su carrera, modalidad y comisión.
-        Filtra cursos desde la tabla cursos_cursoingreso según carreras_data del alumno.
-
-        Args:
-            alumno: Instancia del modelo Alumno
+        Cursos que le corresponden al alumno según su carrera, modalidad y comisión.
+        Filtra cursos activos de cursos_cursoingreso usando el índice en memoria de
+        cursos (sin consultar la tabla por cada alumno).
 
         Returns:
-            Dict con resultado del enrollamiento
+            (shortnames, error): error es None si se encontró al menos un curso
         """
-        from django.db import connection
-
         # Verificar que el alumno tenga carreras_data
         if not alumno.carreras_data or not isinstance(alumno.carreras_data, list):
             logger.warning(f"Alumno {alumno.id} no tiene carreras_data")
-            return {
-                'success': False,
-                'error': 'Alumno no tiene información de carrera/modalidad/comisión'
-            }
+            return [], 'Alumno no tiene información de carrera/modalidad/comisión'
 
         # Extraer datos del alumno (tomamos la primera carrera)
         carrera_data = alumno.carreras_data[0]
@@ -582,39 +692,17 @@ class MoodleService:
 
         if not codigo_carrera:
             logger.error(f"No se pudo mapear carrera: ID={id_carrera}, Nombre={nombre_carrera}")
-            return {
-                'success': False,
-                'error': f'Carrera no reconocida: {nombre_carrera} (ID: {id_carrera})'
-            }
+            return [], f'Carrera no reconocida: {nombre_carrera} (ID: {id_carrera})'
 
         logger.info(f"Filtrando cursos para: Carrera={codigo_carrera}, Modalidad={modalidad}, Comisiones={comisiones_alumno}")
 
-        # Consultar todos los cursos activos y filtrar en Python
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT curso_moodle, carreras, modalidades, comisiones
-                FROM cursos_cursoingreso
-                WHERE activo = true
-                ORDER BY curso_moodle
-            """)
-            all_courses = cursor.fetchall()
+        # Cursos activos de la carrera + modalidad desde el índice compartido
+        from cursos.services import get_indice_cursos
+        candidatos = sorted(get_indice_cursos().cursos_con_comisiones(codigo_carrera, modalidad))
 
         # Filtrar cursos que correspondan al alumno
-        import json
         cursos_filtrados = []
-        for curso_moodle, carreras_json, modalidades_json, comisiones_json in all_courses:
-            carreras = json.loads(carreras_json) if isinstance(carreras_json, str) else carreras_json
-            modalidades = json.loads(modalidades_json) if isinstance(modalidades_json, str) else modalidades_json
-            comisiones = json.loads(comisiones_json) if isinstance(comisiones_json, str) else comisiones_json
-
-            # Verificar si la carrera del alumno está en el curso
-            if codigo_carrera not in carreras:
-                continue
-
-            # Verificar si la modalidad del alumno está en el curso
-            if modalidad not in modalidades:
-                continue
-
+        for curso_moodle, comisiones in candidatos:
             # TGA y TGE: Una sola entrada por carrera, NO filtrar por comisión
             if codigo_carrera in ['TGA', 'TGE']:
                 cursos_filtrados.append(curso_moodle)
@@ -629,16 +717,383 @@ class MoodleService:
 
         if not cursos_filtrados:
             logger.warning(f"No se encontraron cursos para {codigo_carrera}/{modalidad}/{comisiones_alumno}")
-            return {
-                'success': False,
-                'error': 'No hay cursos que correspondan a la carrera/modalidad/comisión del alumno'
-            }
+            return [], 'No hay cursos que correspondan a la carrera/modalidad/comisión del alumno'
 
         logger.info(f"Cursos filtrados para enrollment: {cursos_filtrados}")
+        return cursos_filtrados, None
+
+    def enroll_user_in_courses(self, alumno) -> dict:
+        """
+        Enrolla un alumno en los cursos que le corresponden según su carrera, modalidad y comisión.
+
+        Args:
+            alumno: Instancia del modelo Alumno
+
+        Returns:
+            Dict con resultado del enrollamiento
+        """
+        # La marca de limitación vale solo para las llamadas de este alumno
+        self._limitado_retry_after = None
+        cursos_filtrados, error = self.cursos_para_alumno(alumno)
+        if error:
+            return {'success': False, 'error': error}
 
         # Enrollar en los cursos filtrados
         result = self.enrol_user(alumno, cursos_filtrados)
-        return result
+        return self._marcar_limitado(result) if isinstance(result, dict) else result
+
+    # ------------------------------------------------------------------
+    # Enrollamiento en lote
+    # ------------------------------------------------------------------
+
+    def _llamar_multifila(self, wsfunction: str, clave: str, filas: List[Dict],
+                          chunk_size: int = MOODLE_BULK_CHUNK,
+                          respuestas: Optional[List] = None,
+                          limitados: Optional[Dict[int, float]] = None) -> List[Optional[str]]:
+        """
+        Envía muchas filas en pocas llamadas (`clave[0..N][campo]`).
+
+        Moodle procesa cada llamada en una transacción: si una fila es inválida
+        falla el chunk completo. En ese caso se parte el chunk a la mitad hasta
+        aislar las filas con error. Los errores de conexión (sin errorcode) no
+        se subdividen: marcan todo el chunk.
+
+        Si se pasa `respuestas` (lista de len(filas)), se completa con el ítem que
+        Moodle devuelve por fila (para funciones que responden una lista alineada,
+        como core_user_create_users).
+
+        Si se pasa `limitados`, se completa con índice de fila -> Retry-After para
+        las filas cuya llamada Moodle limitó (429/503), así el llamador distingue
+        esos errores reintentables de los permanentes.
+
+        Returns:
+            Lista alineada con `filas`: None si la fila se aplicó, o el mensaje de error
+        """
+        errores: List[Optional[str]] = [None] * len(filas)
+
+        def enviar(indices: List[int]):
+            params = {}
+            for pos, idx in enumerate(indices):
+                for campo, valor in filas[idx].items():
+                    params[f'{clave}[{pos}][{campo}]'] = valor
+
+            result = self._call_webservice(wsfunction, params)
+            if not (isinstance(result, dict) and result.get('error')):
+                if respuestas is not None and isinstance(result, list) and len(result) == len(indices):
+                    for idx, item in zip(indices, result):
+                        respuestas[idx] = item
+                return
+            if len(indices) == 1 or not result.get('errorcode'):
+                for idx in indices:
+                    errores[idx] = result['error']
+                    if limitados is not None and result.get('throttled'):
+                        limitados[idx] = result['retry_after']
+                return
+            mitad = len(indices) // 2
+            enviar(indices[:mitad])
+            enviar(indices[mitad:])
+
+        for inicio in range(0, len(filas), max(1, chunk_size)):
+            enviar(list(range(inicio, min(inicio + chunk_size, len(filas)))))
+        return errores
+
+    def get_users_by_usernames(self, usernames: List[str],
+                               chunk_size: int = MOODLE_BULK_CHUNK) -> Dict[str, int]:
+        """
+        Busca muchos usuarios con core_user_get_users_by_field (values[0..N]).
+
+        Returns:
+            Dict username (en minúsculas, como lo guarda Moodle) -> ID de Moodle,
+            solo con los existentes
+        """
+        encontrados: Dict[str, int] = {}
+        usernames = list(dict.fromkeys(u for u in usernames if u))
+        for inicio in range(0, len(usernames), max(1, chunk_size)):
+            params = {'field': 'username'}
+            for pos, username in enumerate(usernames[inicio:inicio + chunk_size]):
+                params[f'values[{pos}]'] = username
+
+            result = self._call_webservice('core_user_get_users_by_field', params)
+            if isinstance(result, dict) and result.get('throttled'):
+                # 429/503: reintentable, el llamador re-encola el lote con backoff
+                raise ServicioLimitado(result['error'], 'moodle', result['retry_after'])
+            if isinstance(result, dict) and 'error' in result:
+                raise ValueError(f"M-004: Error buscando usuarios en Moodle - {result['error']}")
+
+            for user in result if isinstance(result, list) else []:
+                if user.get('username') and user.get('id'):
+                    encontrados[user['username'].lower()] = user['id']
+        return encontrados
+
+    def ensure_users_bulk(self, alumnos: List, chunk_size: int = MOODLE_BULK_CHUNK,
+                          limitados: Optional[Dict[int, float]] = None
+                          ) -> Tuple[Dict[str, int], Dict[int, str]]:
+        """
+        Garantiza que existan en Moodle los usuarios de muchos alumnos: los busca
+        en lote y crea los faltantes con core_user_create_users (users[0..N]).
+
+        Si se pasa `limitados`, se completa con alumno.id -> Retry-After para
+        los alumnos cuyo alta falló por un 429/503 de Moodle.
+
+        Returns:
+            (username -> ID de Moodle, errores por alumno.id)
+        """
+        from ..models import Configuracion
+        config = Configuracion.load()
+
+        errores: Dict[int, str] = {}
+        usernames: Dict[int, str] = {}
+        for alumno in alumnos:
+            username, error = self._username_para_alumno(alumno, config)
+            if error:
+                errores[alumno.id] = error
+            else:
+                usernames[alumno.id] = username
+
+        # 1. Buscar existentes en pocas llamadas
+        ids = self.get_users_by_usernames(list(usernames.values()), chunk_size)
+
+        # 2. Crear los faltantes en llamadas multi-fila
+        a_crear = []
+        for alumno in alumnos:
+            username = usernames.get(alumno.id)
+            if not username or username.lower() in ids:
+                continue
+            try:
+                a_crear.append((alumno, self._datos_usuario_nuevo(alumno, username)))
+            except ValueError as e:
+                errores[alumno.id] = str(e)
+
+        respuestas: List = [None] * len(a_crear)
+        filas_limitadas: Dict[int, float] = {}
+        fallos = self._llamar_multifila(
+            'core_user_create_users', 'users', [campos for _, campos in a_crear], chunk_size, respuestas,
+            filas_limitadas
+        )
+
+        reintentar = []
+        for idx, ((alumno, campos), error, creado) in enumerate(zip(a_crear, fallos, respuestas)):
+            username = campos['username']
+            if idx in filas_limitadas:
+                errores[alumno.id] = error
+                if limitados is not None:
+                    limitados[alumno.id] = filas_limitadas[idx]
+            elif error is None and creado and creado.get('id'):
+                ids[username.lower()] = creado['id']
+                log_to_db(
+                    'SUCCESS',
+                    'moodle_service',
+                    f"Usuario Moodle creado exitosamente: {username}",
+                    detalles={'user_id': creado['id'], 'username': username},
+                    alumno=alumno
+                )
+            elif error and 'already exists' in error.lower():
+                # Creado por otro proceso entre la búsqueda y el alta
+                reintentar.append((alumno, username))
+            else:
+                errores[alumno.id] = f"M-004: Error al crear usuario en Moodle - {error or 'respuesta inesperada'}"
+                log_to_db(
+                    'ERROR',
+                    'moodle_service',
+                    f"Error creando usuario en Moodle: {error}",
+                    detalles={'username': username},
+                    alumno=alumno
+                )
+
+        if reintentar:
+            ids.update(self.get_users_by_usernames([u for _, u in reintentar], chunk_size))
+            for alumno, username in reintentar:
+                if username.lower() not in ids:
+                    errores[alumno.id] = f"M-004: Error al crear usuario {username} en Moodle"
+
+        logger.info(
+            f"Usuarios Moodle en lote: {len(usernames)} solicitados, "
+            f"{len(a_crear)} a crear, {len(errores)} con error"
+        )
+        return ids, errores
+
+    def enrol_users_bulk(self, filas: List[Tuple[int, str, Optional[str]]],
+                         chunk_size: int = MOODLE_BULK_CHUNK) -> List[Dict]:
+        """
+        Enrolla muchos (user_id, course_shortname, group_name) con llamadas multi-fila
+        a enrol_manual_enrol_users y core_group_add_group_members.
+
+        A diferencia de enrol_user_in_course no se consulta antes si el usuario ya
+        está enrollado: enrol_manual_enrol_users es idempotente.
+
+        Args:
+            filas: Tripletas (user_id, shortname, nombre de grupo o None)
+            chunk_size: Filas por llamada al web service
+
+        Returns:
+            Lista alineada con `filas`: {'enrolled': bool, 'group': bool|None, 'error': str|None};
+            las filas que Moodle limitó (429/503) traen además 'throttled': True y 'retry_after'
+        """
+        from ..utils.config import get_moodle_student_roleid
+
+        resultados = [{'enrolled': False, 'group': None, 'error': None} for _ in filas]
+        if not filas:
+            return resultados
+
+        def marcar_limitada(idx, retry_after):
+            resultados[idx]['throttled'] = True
+            resultados[idx]['retry_after'] = retry_after
+
+        # 1. IDs de cursos (cacheados, una consulta por shortname distinto). Una
+        # búsqueda limitada no significa que el curso no exista
+        course_ids = {}
+        cursos_limitados = {}
+        for shortname in {f[1] for f in filas}:
+            self._limitado_retry_after = None
+            course_ids[shortname] = self.get_course_id(shortname)
+            if self._limitado_retry_after is not None:
+                cursos_limitados[shortname] = self._limitado_retry_after
+
+        pendientes = []
+        for idx, (user_id, shortname, _) in enumerate(filas):
+            if course_ids.get(shortname):
+                pendientes.append(idx)
+            elif shortname in cursos_limitados:
+                resultados[idx]['error'] = f"M-429: Moodle limitó la búsqueda del curso {shortname}"
+                marcar_limitada(idx, cursos_limitados[shortname])
+            else:
+                resultados[idx]['error'] = f"Curso no encontrado en Moodle: {shortname}"
+
+        # 2. Enrollamientos multi-fila
+        roleid = get_moodle_student_roleid()
+        filas_limitadas: Dict[int, float] = {}
+        errores = self._llamar_multifila(
+            'enrol_manual_enrol_users',
+            'enrolments',
+            [{'roleid': roleid, 'userid': filas[idx][0], 'courseid': course_ids[filas[idx][1]]} for idx in pendientes],
+            chunk_size,
+            limitados=filas_limitadas,
+        )
+        enrollados = []
+        for pos, (idx, error) in enumerate(zip(pendientes, errores)):
+            if pos in filas_limitadas:
+                resultados[idx]['error'] = error
+                marcar_limitada(idx, filas_limitadas[pos])
+            elif error:
+                resultados[idx]['error'] = error
+                self.invalidar_curso(filas[idx][1])
+            else:
+                resultados[idx]['enrolled'] = True
+                enrollados.append(idx)
+
+        # 3. Grupos: IDs cacheados por (curso, nombre) y altas multi-fila
+        miembros = []
+        indices_miembros = []
+        for idx in enrollados:
+            user_id, shortname, group_name = filas[idx]
+            if not group_name:
+                continue
+            try:
+                group_id = self.get_or_create_group(course_ids[shortname], group_name)
+            except Exception as e:
+                logger.warning(f"Error obteniendo grupo '{group_name}' en {shortname}: {e}")
+                group_id = None
+            if not group_id:
+                resultados[idx]['group'] = False
+                continue
+            miembros.append({'groupid': group_id, 'userid': user_id})
+            indices_miembros.append(idx)
+
+        errores = self._llamar_multifila('core_group_add_group_members', 'members', miembros, chunk_size)
+        for idx, miembro, error in zip(indices_miembros, miembros, errores):
+            resultados[idx]['group'] = error is None
+            if error:
+                logger.warning(f"Error agregando usuario {miembro['userid']} al grupo {miembro['groupid']}: {error}")
+                self.invalidar_grupo(course_ids[filas[idx][1]], filas[idx][2])
+
+        logger.info(
+            f"Enrollamiento en lote: {len(enrollados)}/{len(filas)} enrollados, "
+            f"{len(miembros)} altas en grupos"
+        )
+        return resultados
+
+    def enroll_alumnos_bulk(self, alumnos: List, chunk_size: int = MOODLE_BULK_CHUNK) -> Dict[int, Dict]:
+        """
+        Versión en lote de enroll_user_in_courses para muchos alumnos.
+
+        Resuelve los cursos de cada alumno, garantiza los usuarios con
+        ensure_users_bulk y envía todos los enrollamientos y altas en grupos en
+        llamadas multi-fila.
+
+        Returns:
+            Dict alumno.id -> resultado con el mismo formato que enrol_user
+            ({success, user_id, username, enrolled_courses, failed_courses} o {success, error})
+        """
+        from ..models import Configuracion
+        config = Configuracion.load()
+
+        resultados: Dict[int, Dict] = {}
+        filas: List[Tuple[int, str, Optional[str]]] = []
+        duenos: List[int] = []
+
+        cursos_por_alumno = {}
+        for alumno in alumnos:
+            cursos, error = self.cursos_para_alumno(alumno)
+            if error:
+                resultados[alumno.id] = {'success': False, 'error': error}
+            else:
+                cursos_por_alumno[alumno.id] = cursos
+
+        con_cursos = [a for a in alumnos if a.id in cursos_por_alumno]
+        usuarios_limitados: Dict[int, float] = {}
+        user_ids, errores_usuarios = self.ensure_users_bulk(con_cursos, chunk_size, usuarios_limitados)
+
+        for alumno in con_cursos:
+            if alumno.id in errores_usuarios:
+                resultados[alumno.id] = {'success': False, 'error': errores_usuarios[alumno.id]}
+                if alumno.id in usuarios_limitados:
+                    resultados[alumno.id].update(throttled=True, retry_after=usuarios_limitados[alumno.id])
+                continue
+
+            username, _ = self._username_para_alumno(alumno, config)
+            user_id = user_ids.get(username.lower())
+            if not user_id:
+                resultados[alumno.id] = {'success': False, 'error': f"M-004: Usuario {username} no encontrado en Moodle"}
+                continue
+            cursos = cursos_por_alumno[alumno.id]
+
+            modalidad, comision = self._modalidad_comision_alumno(alumno)
+            group_name = self.generate_group_name(modalidad, comision) if modalidad and comision else None
+
+            resultados[alumno.id] = {
+                'success': False,
+                'user_id': user_id,
+                'username': username,
+                'enrolled_courses': [],
+                'failed_courses': [],
+            }
+            for shortname in cursos:
+                filas.append((user_id, shortname, group_name))
+                duenos.append(alumno.id)
+
+        for alumno_id, (_, shortname, _), fila in zip(duenos, filas, self.enrol_users_bulk(filas, chunk_size)):
+            resultado = resultados[alumno_id]
+            if fila['enrolled']:
+                resultado['enrolled_courses'].append(shortname)
+                resultado['success'] = True
+            else:
+                resultado['failed_courses'].append(shortname)
+                resultado.setdefault('errores', {})[shortname] = fila['error']
+                if fila.get('throttled'):
+                    resultado.setdefault('_limitado', []).append(fila['retry_after'])
+
+        estadisticas = self.estadisticas_cache()
+        for resultado in resultados.values():
+            limitado = resultado.pop('_limitado', None)
+            if 'user_id' in resultado:
+                resultado['cache'] = estadisticas
+                if not resultado['success']:
+                    resultado['error'] = 'No se pudo enrollar en ningún curso'
+                    # Reintentable solo si todos sus cursos fallaron por limitación
+                    if limitado and len(limitado) == len(resultado['failed_courses']):
+                        resultado['throttled'] = True
+                        resultado['retry_after'] = max(limitado)
+        return resultados
 
     def unenrol_user_from_course(self, user_id: int, course_shortname: str, alumno=None) -> bool:
         """
@@ -653,8 +1108,8 @@ class MoodleService:
             True si se des-enrolló exitosamente o no estaba enrollado, False en caso contrario
         """
         # Primero obtener el course_id del shortname
-        course = self.get_course_by_shortname(course_shortname)
-        if not course:
+        course_id = self.get_course_id(course_shortname)
+        if not course_id:
             logger.error(f"Curso no encontrado en Moodle: {course_shortname}")
             log_to_db(
                 'ERROR',
@@ -665,7 +1120,6 @@ class MoodleService:
             )
             raise ValueError(f"M-005: Curso no encontrado - {course_shortname}")
 
-        course_id = course['id']
 
         # Verificar si está enrollado
         if not self.is_user_enrolled_in_course(user_id, course_id):
@@ -879,8 +1333,19 @@ class MoodleService:
         Returns:
             ID del grupo
         """
-        # Buscar grupo existente
+        clave = self._clave_cache(course_id, group_name)
+        group_id = _cache_grupos.get(clave)
+        self._contar_cache('grupos', group_id is not None)
+        if group_id is not None:
+            return group_id
+
+        # Buscar grupo existente (se cachean todos los grupos del curso de una vez)
         groups = self.get_course_groups(course_id)
+        _cache_grupos.set_many({
+            self._clave_cache(course_id, group['name']): group['id']
+            for group in groups
+            if group.get('name') and group.get('id')
+        })
         for group in groups:
             if group.get('name') == group_name:
                 logger.info(f"Grupo '{group_name}' ya existe (ID: {group['id']})")
@@ -888,7 +1353,10 @@ class MoodleService:
 
         # Si no existe, crear
         logger.info(f"Grupo '{group_name}' no existe, creando...")
-        return self.create_group(course_id, group_name)
+        group_id = self.create_group(course_id, group_name)
+        if group_id:
+            _cache_grupos.set(clave, group_id)
+        return group_id
 
     def generate_group_name(self, modalidad: str, comision: str) -> str:
         """
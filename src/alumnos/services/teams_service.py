@@ -37,37 +37,33 @@ from typing import Optional, Dict, List
 from urllib.parse import quote
 from django.conf import settings
 
+from .graph_token import get_graph_token
+from ..utils.http_client import get_session
+from ..utils.log_buffer import registrar_log
+from ..utils.rate_limit import (
+    STATUS_LIMITACION, RETRY_AFTER_DEFECTO_SEGUNDOS, ServicioLimitado, detectar_limitacion, registrar_limitacion,
+)
+
 logger = logging.getLogger(__name__)
 
 
 def log_to_db(tipo, modulo, mensaje, detalles=None, alumno=None):
-    """
-    Registra un log en la base de datos.
-    Se importa aquí para evitar problemas de importación circular.
-    """
-    try:
-        from ..models import Log
-        Log.objects.create(
-            tipo=tipo,
-            modulo=modulo,
-            mensaje=mensaje,
-            detalles=detalles,
-            alumno=alumno
-        )
-    except Exception as e:
-        logger.error(f"Error guardando log en BD: {e}")
+    """Registra un log en la base de datos (en lote, ver utils.log_buffer)."""
+    registrar_log(tipo, modulo, mensaje, detalles=detalles, alumno=alumno)
 
 
 class TeamsService:
     """Cliente para Microsoft Graph API - Gestión de usuarios Teams/Azure AD"""
 
     BASE_URL = "https://graph.microsoft.com/v1.0"
-    TOKEN_URL = "https://login.microsoftonline.com/{tenant}/oauth2/v2.0/token"
 
     # SKU ID para Microsoft 365 A1 para estudiantes
     # Nota: Este ID puede variar, lo verificaremos en la primera ejecución
     STUDENT_SKU_PART_NUMBER = "STANDARDWOFFPACK_STUDENT"
 
+    # Máximo de sub-requests por llamada a /$batch (límite de Graph)
+    BATCH_MAX_REQUESTS = 20
+
     def __init__(self):
         # Fallback: Configuracion DB → ENV
         from ..models import Configuracion
@@ -78,33 +74,17 @@ class TeamsService:
         self.client_id = config.teams_client_id or settings.TEAMS_CLIENT_ID
         self.client_secret = config.teams_client_secret or settings.TEAMS_CLIENT_SECRET
         self.account_prefix = config.account_prefix or settings.ACCOUNT_PREFIX
-        self._token = None
         self._sku_id = None
+        self.session = get_session('graph')
 
     def _get_token(self) -> str:
         """
         Obtiene token OAuth2 usando Client Credentials Flow.
-        El token se cachea para evitar múltiples llamadas.
+        El token se comparte entre instancias y workers (memoria + Redis) y se
+        renueva antes de expirar, ver graph_token.get_graph_token.
         """
-        if self._token:
-            return self._token
-
-        url = self.TOKEN_URL.format(tenant=self.tenant)
-        data = {
-            'client_id': self.client_id,
-            'client_secret': self.client_secret,
-            'scope': 'https://graph.microsoft.com/.default',
-            'grant_type': 'client_credentials'
-        }
-
         try:
-            response = requests.post(url, data=data, timeout=10)
-            response.raise_for_status()
-            result = response.json()
-            self._token = result['access_token']
-            logger.info("Token OAuth2 obtenido exitosamente")
-            log_to_db('SUCCESS', 'teams_service', 'Token OAuth2 obtenido exitosamente')
-            return self._token
+            return get_graph_token(self.tenant, self.client_id, self.client_secret)
         except requests.exceptions.HTTPError as e:
             error_detail = f"{e}"
             if e.response.status_code == 400:
@@ -135,7 +115,7 @@ class TeamsService:
 
         url = f"{self.BASE_URL}/subscribedSkus"
         try:
-            response = requests.get(url, headers=self._get_headers(), timeout=10)
+            response = self.session.get(url, headers=self._get_headers(), timeout=10)
             response.raise_for_status()
             skus = response.json().get('value', [])
 
@@ -154,6 +134,7 @@ class TeamsService:
 
             return None
         except requests.exceptions.RequestException as e:
+            detectar_limitacion('teams', getattr(e, 'response', None))
             logger.error(f"Error obteniendo SKU ID: {e}")
             return None
 
@@ -169,8 +150,7 @@ class TeamsService:
             Dict con información del usuario (created=True si fue creado, False si ya existía)
         """
         # Generar UPN con prefijo desde configuración
-        prefix = self.account_prefix  # Desde BD o settings
-        upn = f"{prefix}{alumno.dni}@{self.domain}"
+        upn = self._upn_para_alumno(alumno)
 
         # 1. BUSCAR PRIMERO si el usuario ya existe
         logger.info(f"Buscando usuario existente: {upn}")
@@ -208,26 +188,14 @@ class TeamsService:
         password = self._generate_temp_password(alumno.dni)
 
         # Datos del usuario
-        user_data = {
-            "accountEnabled": True,
-            "displayName": f"{alumno.apellido}, {alumno.nombre}",
-            "givenName": alumno.nombre,
-            "surname": alumno.apellido,
-            "mailNickname": f"{prefix}{alumno.dni}",
-            "userPrincipalName": upn,
-            "passwordProfile": {
-                "forceChangePasswordNextSignIn": True,
-                "password": password
-            },
-            "usageLocation": "AR"  # Requerido para asignar licencias
-        }
+        user_data = self._datos_usuario_nuevo(alumno, upn, password)
 
         url = f"{self.BASE_URL}/users"
 
         try:
             # Crear usuario
             logger.info(f"Creando usuario: {upn}")
-            response = requests.post(
+            response = self.session.post(
                 url,
                 json=user_data,
                 headers=self._get_headers(),
@@ -272,6 +240,12 @@ class TeamsService:
             }
 
         except requests.exceptions.HTTPError as e:
+            retry_after = detectar_limitacion('teams', e.response)
+            if retry_after is not None:
+                logger.warning(f"Graph limitó la creación de {upn} (HTTP {e.response.status_code}), reintentar en {retry_after:.0f}s")
+                log_to_db('WARNING', 'teams_service', f'Graph limitó la creación de usuario {upn}',
+                         detalles={'status_code': e.response.status_code, 'retry_after': retry_after}, alumno=alumno)
+                return self._resultado_limitado(upn, e.response.status_code, retry_after)
             if e.response.status_code == 400:
                 # Manejar caso donde 'error' puede ser string o dict
                 error_data = e.response.json().get('error', {})
@@ -300,6 +274,38 @@ class TeamsService:
                      detalles={'error': str(e)}, alumno=alumno)
             return None
 
+    def _upn_para_alumno(self, alumno) -> str:
+        """UPN institucional del alumno con el prefijo desde configuración."""
+        return f"{self.account_prefix}{alumno.dni}@{self.domain}"
+
+    def _datos_usuario_nuevo(self, alumno, upn: str, password: str) -> Dict:
+        """Payload de POST /users para el alumno (compartido con create_users_bulk)."""
+        return {
+            "accountEnabled": True,
+            "displayName": f"{alumno.apellido}, {alumno.nombre}",
+            "givenName": alumno.nombre,
+            "surname": alumno.apellido,
+            "mailNickname": upn.split('@')[0],
+            "userPrincipalName": upn,
+            "passwordProfile": {
+                "forceChangePasswordNextSignIn": True,
+                "password": password
+            },
+            "usageLocation": "AR"  # Requerido para asignar licencias
+        }
+
+    @staticmethod
+    def _datos_licencia(sku_id: str) -> Dict:
+        """Payload de assignLicense para agregar la licencia de estudiante."""
+        return {
+            "addLicenses": [
+                {
+                    "skuId": sku_id
+                }
+            ],
+            "removeLicenses": []
+        }
+
     def _assign_license(self, user_id: str, sku_id: str, alumno=None) -> bool:
         """
         Asigna licencia de estudiante a un usuario.
@@ -313,18 +319,11 @@ class TeamsService:
             True si se asignó exitosamente, False en caso contrario
         """
         url = f"{self.BASE_URL}/users/{user_id}/assignLicense"
-        data = {
-            "addLicenses": [
-                {
-                    "skuId": sku_id
-                }
-            ],
-            "removeLicenses": []
-        }
+        data = self._datos_licencia(sku_id)
 
         try:
             logger.info(f"Asignando licencia {sku_id} a usuario {user_id}")
-            response = requests.post(
+            response = self.session.post(
                 url,
                 json=data,
                 headers=self._get_headers(),
@@ -336,6 +335,7 @@ class TeamsService:
                      detalles={'user_id': user_id, 'sku_id': sku_id}, alumno=alumno)
             return True
         except requests.exceptions.RequestException as e:
+            detectar_limitacion('teams', getattr(e, 'response', None))
             logger.error(f"Error asignando licencia a {user_id}: {e}")
             log_to_db('ERROR', 'teams_service', f'Error asignando licencia a usuario',
                      detalles={'user_id': user_id, 'sku_id': sku_id, 'error': str(e)}, alumno=alumno)
@@ -356,7 +356,7 @@ class TeamsService:
         url = f"{self.BASE_URL}/users/{upn_encoded}"
 
         try:
-            response = requests.get(url, headers=self._get_headers(), timeout=10)
+            response = self.session.get(url, headers=self._get_headers(), timeout=10)
             response.raise_for_status()
             user = response.json()
             logger.info(f"Usuario encontrado: {upn}")
@@ -365,12 +365,335 @@ class TeamsService:
             if e.response.status_code == 404:
                 logger.info(f"Usuario no encontrado: {upn}")
                 return None
+            detectar_limitacion('teams', e.response)
             logger.error(f"Error obteniendo usuario {upn}: {e}")
             return None
         except requests.exceptions.RequestException as e:
             logger.error(f"Error de conexión obteniendo usuario {upn}: {e}")
             return None
 
+    def _post_batch(self, sub_requests: List[Dict]) -> Dict[str, Dict]:
+        """
+        Envía hasta BATCH_MAX_REQUESTS sub-requests en un único POST /$batch.
+
+        Args:
+            sub_requests: Lista de dicts con 'id', 'method', 'url' (relativa a BASE_URL)
+                y opcionalmente 'body' y 'dependsOn'
+
+        Returns:
+            Dict {id: {'status': int, 'body': dict}} con la respuesta de cada sub-request
+
+        Raises:
+            requests.exceptions.RequestException: Si falla la llamada /$batch completa
+        """
+        if len(sub_requests) > self.BATCH_MAX_REQUESTS:
+            raise ValueError(f"Graph $batch admite hasta {self.BATCH_MAX_REQUESTS} sub-requests")
+
+        for sub_request in sub_requests:
+            if 'body' in sub_request:
+                sub_request.setdefault('headers', {'Content-Type': 'application/json'})
+
+        response = self.session.post(
+            f"{self.BASE_URL}/$batch",
+            json={'requests': sub_requests},
+            headers=self._get_headers(),
+            timeout=30
+        )
+        response.raise_for_status()
+
+        return {
+            item['id']: {
+                'status': item.get('status', 0),
+                'headers': item.get('headers') or {},
+                'body': item.get('body') or {}
+            }
+            for item in response.json().get('responses', [])
+        }
+
+    @staticmethod
+    def _retry_after_batch(respuesta: Optional[Dict]) -> Optional[float]:
+        """Retry-After de un sub-request de /$batch limitado (429/503), o None."""
+        if not respuesta or respuesta.get('status') not in STATUS_LIMITACION:
+            return None
+        headers = {k.lower(): v for k, v in respuesta.get('headers', {}).items()}
+        try:
+            return float(headers.get('retry-after'))
+        except (TypeError, ValueError):
+            return float(RETRY_AFTER_DEFECTO_SEGUNDOS)
+
+    @staticmethod
+    def _resultado_limitado(upn: str, status_code: int, retry_after: float) -> Dict:
+        """Resultado de create_user/create_users_bulk cuando Graph limitó la solicitud."""
+        return {
+            'upn': upn,
+            'error': f"T-429: Graph limitó la solicitud (HTTP {status_code})",
+            'status_code': status_code,
+            'throttled': True,
+            'retry_after': retry_after
+        }
+
+    def _lanzar_si_limitado(self, error: requests.exceptions.HTTPError, upn: str, alumno=None):
+        """Convierte un 429/503 de Graph en ServicioLimitado (reintentable) para el llamador."""
+        retry_after = detectar_limitacion('teams', error.response)
+        if retry_after is None:
+            return
+        logger.warning(f"Graph limitó la operación sobre {upn} (HTTP {error.response.status_code})")
+        log_to_db('WARNING', 'teams_service', f'Graph limitó la operación sobre {upn}',
+                 detalles={'status_code': error.response.status_code, 'retry_after': retry_after}, alumno=alumno)
+        raise ServicioLimitado(
+            f"T-429: Graph limitó la solicitud (HTTP {error.response.status_code})", 'teams', retry_after
+        ) from error
+
+    @staticmethod
+    def _error_batch(respuesta: Optional[Dict]) -> str:
+        """Extrae el mensaje de error de la respuesta de un sub-request de /$batch."""
+        if not respuesta:
+            return 'Sin respuesta en $batch'
+        body = respuesta.get('body')
+        error = body.get('error', {}) if isinstance(body, dict) else {}
+        if isinstance(error, dict):
+            mensaje = error.get('message') or error.get('code')
+        else:
+            mensaje = str(error)
+        return mensaje or f"HTTP {respuesta.get('status')}"
+
+    def get_users_bulk(self, upns: List[str],
+                       indeterminados: Optional[Dict[str, Dict]] = None) -> Dict[str, Optional[Dict]]:
+        """
+        Busca varios usuarios por UPN con GET /users/{upn} agrupados en /$batch.
+
+        Args:
+            upns: Lista de User Principal Names
+            indeterminados: Si se pasa, se completa con {upn: resultado limitado}
+                para las búsquedas que no respondieron 200 ni 404 (429, 5xx o
+                $batch caído): no se sabe si el usuario existe y hay que reintentar
+
+        Returns:
+            Dict {upn: usuario o None si no existe}. Ante errores distintos de 404
+            se asume que no existe, igual que get_user() (ver `indeterminados`).
+        """
+        encontrados = {}
+        for inicio in range(0, len(upns), self.BATCH_MAX_REQUESTS):
+            chunk = upns[inicio:inicio + self.BATCH_MAX_REQUESTS]
+            sub_requests = [
+                {
+                    'id': str(n),
+                    'method': 'GET',
+                    'url': f"/users/{quote(upn, safe='')}?$select=id,displayName,userPrincipalName",
+                }
+                for n, upn in enumerate(chunk)
+            ]
+            status_lote = None
+            retry_after_lote = None
+            try:
+                respuestas = self._post_batch(sub_requests)
+            except requests.exceptions.RequestException as e:
+                response = getattr(e, 'response', None)
+                status_lote = response.status_code if response is not None else None
+                retry_after_lote = detectar_limitacion('teams', response)
+                logger.error(f"Error de conexión buscando {len(chunk)} usuarios en lote: {e}")
+                respuestas = {}
+
+            limitado = [ra for ra in map(self._retry_after_batch, respuestas.values()) if ra is not None]
+            if limitado:
+                registrar_limitacion('teams', max(limitado))
+
+            for n, upn in enumerate(chunk):
+                respuesta = respuestas.get(str(n))
+                if respuesta and respuesta['status'] == 200:
+                    encontrados[upn] = respuesta['body']
+                    continue
+
+                encontrados[upn] = None
+                if respuesta and respuesta['status'] == 404:
+                    continue
+                if respuesta:
+                    logger.error(f"Error obteniendo usuario {upn}: {self._error_batch(respuesta)}")
+                if indeterminados is not None:
+                    status_code = respuesta['status'] if respuesta else status_lote
+                    retry_after = self._retry_after_batch(respuesta) if respuesta else retry_after_lote
+                    indeterminados[upn] = self._resultado_limitado(
+                        upn, status_code, retry_after if retry_after is not None else float(RETRY_AFTER_DEFECTO_SEGUNDOS)
+                    )
+
+        return encontrados
+
+    def create_users_bulk(self, alumnos) -> Dict[int, Dict]:
+        """
+        Versión en lote de create_user: busca los usuarios existentes y crea los
+        faltantes con su licencia usando /$batch. Cada alumno nuevo viaja como un
+        par de sub-requests (POST /users + assignLicense con dependsOn), de modo
+        que cada llamada provisiona BATCH_MAX_REQUESTS // 2 alumnos.
+
+        Args:
+            alumnos: Iterable de instancias Alumno
+
+        Returns:
+            Dict {alumno.id: resultado} donde resultado tiene la misma forma que
+            create_user() (created/already_exists, upn, id, password) o, si falló,
+            {'upn', 'error', 'status_code'} sin las claves created/already_exists
+            (con 'throttled' y 'retry_after' si Graph limitó la solicitud).
+        """
+        from ..models import Alumno
+
+        alumnos = list(alumnos)
+        if not alumnos:
+            return {}
+
+        resultados = {}
+        actualizar_upn = []
+        upns = {alumno.id: self._upn_para_alumno(alumno) for alumno in alumnos}
+
+        # 1. Buscar existentes en lote. Si la búsqueda no fue concluyente no se
+        # intenta el alta (podría existir): el alumno se reintenta más tarde
+        indeterminados = {}
+        existentes = self.get_users_bulk(list(upns.values()), indeterminados)
+        nuevos = []
+        for alumno in alumnos:
+            upn = upns[alumno.id]
+            if upn in indeterminados:
+                logger.warning(f"Búsqueda de {upn} no concluyente, se reintenta sin crear")
+                resultados[alumno.id] = indeterminados[upn]
+                continue
+            existing_user = existentes.get(upn)
+            if not existing_user:
+                nuevos.append(alumno)
+                continue
+
+            logger.info(f"Usuario ya existe: {upn} (ID: {existing_user['id']})")
+            log_to_db(
+                'INFO',
+                'teams_service',
+                f'Usuario ya existe en Teams: {upn}',
+                detalles={'user_id': existing_user['id'], 'upn': upn},
+                alumno=alumno
+            )
+            if not alumno.email_institucional:
+                alumno.email_institucional = upn
+                actualizar_upn.append(alumno)
+            resultados[alumno.id] = {
+                'id': existing_user['id'],
+                'upn': upn,
+                'displayName': existing_user.get('displayName'),
+                'password': alumno.teams_password,
+                'created': False,
+                'already_exists': True
+            }
+        if actualizar_upn:
+            Alumno.objects.bulk_update(actualizar_upn, ['email_institucional'])
+
+        # 2. Crear faltantes + licencia, BATCH_MAX_REQUESTS // 2 alumnos por llamada
+        sku_id = self._get_student_sku_id() if nuevos else None
+        if nuevos and not sku_id:
+            logger.warning(f"SKU no encontrado: se crearán {len(nuevos)} usuarios sin licencia")
+            log_to_db('WARNING', 'teams_service',
+                      f'SKU no encontrado: {len(nuevos)} usuarios se crearán sin licencia')
+
+        tamanio = self.BATCH_MAX_REQUESTS // 2
+        for inicio in range(0, len(nuevos), tamanio):
+            chunk = nuevos[inicio:inicio + tamanio]
+            passwords = {}
+            actualizar_credenciales = []
+            sub_requests = []
+            for n, alumno in enumerate(chunk):
+                upn = upns[alumno.id]
+                passwords[alumno.id] = self._generate_temp_password(alumno.dni)
+                sub_requests.append({
+                    'id': f"c{n}",
+                    'method': 'POST',
+                    'url': '/users',
+                    'body': self._datos_usuario_nuevo(alumno, upn, passwords[alumno.id]),
+                })
+                if sku_id:
+                    sub_requests.append({
+                        'id': f"l{n}",
+                        'dependsOn': [f"c{n}"],
+                        'method': 'POST',
+                        'url': f"/users/{quote(upn, safe='')}/assignLicense",
+                        'body': self._datos_licencia(sku_id),
+                    })
+
+            logger.info(f"Creando {len(chunk)} usuarios en lote ($batch)")
+            try:
+                respuestas = self._post_batch(sub_requests)
+            except requests.exceptions.RequestException as e:
+                response = getattr(e, 'response', None)
+                retry_after = detectar_limitacion('teams', response)
+                logger.error(f"Error de conexión creando {len(chunk)} usuarios en lote: {e}")
+                log_to_db('ERROR', 'teams_service', f'Error de conexión creando {len(chunk)} usuarios en lote: {e}',
+                          detalles={'error': str(e), 'upns': [upns[a.id] for a in chunk]})
+                for alumno in chunk:
+                    if retry_after is not None:
+                        resultados[alumno.id] = self._resultado_limitado(upns[alumno.id], response.status_code, retry_after)
+                    else:
+                        resultados[alumno.id] = {'upn': upns[alumno.id], 'error': f"Error de conexión - {e}"}
+                continue
+
+            # Graph limita cada sub-request por separado: una sola baja AIMD por llamada
+            limitado = [ra for ra in map(self._retry_after_batch, respuestas.values()) if ra is not None]
+            if limitado:
+                registrar_limitacion('teams', max(limitado))
+
+            for n, alumno in enumerate(chunk):
+                upn = upns[alumno.id]
+                creado = respuestas.get(f"c{n}")
+
+                if not creado or creado['status'] not in (200, 201):
+                    error_msg = self._error_batch(creado)
+                    status_code = creado['status'] if creado else None
+                    retry_after = self._retry_after_batch(creado)
+                    if retry_after is not None:
+                        logger.warning(f"Graph limitó la creación de {upn} (HTTP {status_code})")
+                        resultados[alumno.id] = self._resultado_limitado(upn, status_code, retry_after)
+                    elif status_code == 400 and 'already exists' in error_msg.lower():
+                        logger.warning(f"Usuario {upn} ya existe")
+                        log_to_db('WARNING', 'teams_service', f'Usuario {upn} ya existe', alumno=alumno)
+                        resultados[alumno.id] = {'upn': upn, 'created': False, 'error': 'Usuario ya existe'}
+                    else:
+                        logger.error(f"Error HTTP {status_code} creando usuario {upn}: {error_msg}")
+                        log_to_db('ERROR', 'teams_service', f'Error HTTP creando usuario {upn}',
+                                  detalles={'error': error_msg, 'status_code': status_code}, alumno=alumno)
+                        resultados[alumno.id] = {'upn': upn, 'error': error_msg, 'status_code': status_code}
+                    continue
+
+                user = creado['body']
+                logger.info(f"Usuario creado exitosamente: {upn} (ID: {user.get('id')})")
+                log_to_db(
+                    'SUCCESS',
+                    'teams_service',
+                    f'Usuario creado exitosamente: {upn}',
+                    detalles={'user_id': user.get('id'), 'upn': upn},
+                    alumno=alumno
+                )
+                alumno.email_institucional = upn
+                alumno.teams_password = passwords[alumno.id]
+                actualizar_credenciales.append(alumno)
+
+                licencia = respuestas.get(f"l{n}")
+                licencia_asignada = bool(licencia and licencia['status'] == 200)
+                if sku_id and not licencia_asignada:
+                    logger.error(f"Error asignando licencia a {upn}: {self._error_batch(licencia)}")
+                    log_to_db('ERROR', 'teams_service', 'Error asignando licencia a usuario',
+                              detalles={'user_id': user.get('id'), 'sku_id': sku_id,
+                                        'error': self._error_batch(licencia)}, alumno=alumno)
+
+                resultados[alumno.id] = {
+                    'id': user.get('id'),
+                    'upn': upn,
+                    'displayName': user.get('displayName'),
+                    'password': passwords[alumno.id],
+                    'created': True,
+                    'license_assigned': licencia_asignada
+                }
+
+            # Persistir las credenciales al cerrar cada chunk: si un chunk posterior
+            # falla (ej: token T-002), las cuentas ya creadas en Graph no pierden
+            # la contraseña generada
+            if actualizar_credenciales:
+                Alumno.objects.bulk_update(actualizar_credenciales, ['email_institucional', 'teams_password'])
+
+        return resultados
+
     def reset_password(self, upn: str, new_password: Optional[str] = None, alumno=None) -> Optional[str]:
         """
         Resetea la contraseña de un usuario.
@@ -400,7 +723,7 @@ class TeamsService:
 
         try:
             logger.info(f"Reseteando contraseña de {upn}")
-            response = requests.patch(
+            response = self.session.patch(
                 url,
                 json=data,
                 headers=self._get_headers(),
@@ -417,6 +740,7 @@ class TeamsService:
 
             return new_password
         except requests.exceptions.HTTPError as e:
+            self._lanzar_si_limitado(e, upn, alumno)
             if e.response.status_code == 404:
                 logger.warning(f"Usuario no encontrado para resetear: {upn}")
                 log_to_db('WARNING', 'teams_service', f'Usuario no encontrado: {upn}', alumno=alumno)
@@ -447,7 +771,7 @@ class TeamsService:
         }
 
         try:
-            response = requests.get(
+            response = self.session.get(
                 url,
                 params=params,
                 headers=self._get_headers(),
@@ -485,12 +809,13 @@ class TeamsService:
 
         try:
             logger.info(f"Eliminando usuario: {upn}")
-            response = requests.delete(url, headers=self._get_headers(), timeout=10)
+            response = self.session.delete(url, headers=self._get_headers(), timeout=10)
             response.raise_for_status()
             logger.info(f"Usuario eliminado exitosamente: {upn}")
             log_to_db('SUCCESS', 'teams_service', f'Usuario eliminado exitosamente: {upn}', alumno=alumno)
             return True
         except requests.exceptions.HTTPError as e:
+            self._lanzar_si_limitado(e, upn, alumno)
             if e.response.status_code == 404:
                 logger.warning(f"Usuario no encontrado para eliminar: {upn}")
                 log_to_db('WARNING', 'teams_service', f'Usuario no encontrado: {upn}', alumno=alumno)
@@ -32,7 +32,8 @@ O EL USO U OTROS TRATOS EN EL SOFTWARE.
 """
 
 import logging
-from django.db.models.signals import pre_delete, pre_save
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from .models import Alumno, Log, Configuracion
 
@@ -97,3 +98,13 @@ def resetear_timestamps_ingesta(sender, instance, **kwargs):
 
         except Configuracion.DoesNotExist:
             pass  # Primera vez que se guarda
+
+
+@receiver(post_save, sender=Configuracion)
+def invalidar_cache_configuracion(sender, instance, **kwargs):
+    """
+    Invalida la Configuracion cacheada en todos los procesos cuando se guarda.
+    Se difiere al commit para que ningún worker recargue datos sin confirmar.
+    """
+    from .utils.config import invalidar_configuracion
+    transaction.on_commit(invalidar_configuracion)
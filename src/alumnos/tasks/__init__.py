@@ -45,6 +45,7 @@ from .moodle import (
 # Tareas de procesamiento de cola
 from .procesamiento import (
     procesar_cola_tareas_pendientes,
+    procesar_carril_tareas,
     procesar_lote_por_tipo_tarea,
     ejecutar_tarea_segun_tipo,
     ejecutar_crear_usuario_teams,
@@ -68,6 +69,11 @@ from .personalizadas import (
     ejecutar_tarea_personalizada,
 )
 
+# Acciones masivas del admin
+from .acciones_admin import (
+    ejecutar_accion_masiva,
+)
+
 # Exportar todas las tareas públicas
 __all__ = [
     # Ingesta
@@ -87,6 +93,7 @@ __all__ = [
 
     # Procesamiento
     'procesar_cola_tareas_pendientes',
+    'procesar_carril_tareas',
     'procesar_lote_por_tipo_tarea',
     'ejecutar_tarea_segun_tipo',
     'ejecutar_crear_usuario_teams',
@@ -104,4 +111,7 @@ __all__ = [
     # Personalizadas
     'tarea_personalizada_ejemplo',
     'ejecutar_tarea_personalizada',
+
+    # Acciones masivas
+    'ejecutar_accion_masiva',
 ]
@@ -0,0 +1,1889 @@
+"""
+Nombre del Módulo: acciones_admin.py
+
+Descripción:
+Acciones masivas del admin de Alumnos (Teams, Moodle, email) ejecutadas en
+background por chunks, con una Tarea agregada que lleva el progreso.
+
+Autor: Carlos Dagorret
+Fecha de Creación: 2025-12-29
+Última Modificación: 2025-12-29
+
+Licencia: MIT
+Copyright (c) 2025 Carlos Dagorret
+"""
+
+import logging
+import time
+from datetime import timedelta
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from ..models import Tarea, Alumno
+from ..utils.log_buffer import registrar_log
+
+logger = logging.getLogger(__name__)
+
+# Alumnos por chunk: entre chunks se actualizan los contadores y se revisa si
+# se pidió cancelar
+ACCION_MASIVA_CHUNK_SIZE = 20
+
+# Heartbeat de la Tarea agregada: el worker renueva lease_hasta en cada chunk.
+# Vencido (worker caído) la acción se marca FAILED; no se reintenta porque los
+# cuerpos de las acciones no son idempotentes (mails, reseteos de contraseña).
+ACCION_MASIVA_LEASE_SEGUNDOS = 15 * 60
+
+# Segundos que una acción masiva puede quedar PENDING (ej: se perdió el .delay)
+ACCION_MASIVA_ESPERA_MAXIMA_SEGUNDOS = 30 * 60
+
+
+def extraer_codigo_error(excepcion_msg, codigo_default='G-001'):
+    """
+    Extrae el código de error si viene en el formato "T-XXX: mensaje".
+    Retorna tupla (codigo_error, mensaje_limpio)
+    """
+    error_msg = str(excepcion_msg)
+
+    # Lista de códigos válidos
+    codigos_validos = [
+        'T-001', 'T-002', 'T-003', 'T-004', 'T-005', 'T-006', 'T-007', 'T-008', 'T-009', 'T-999',
+        'M-001', 'M-002', 'M-003', 'M-004', 'M-005', 'M-006', 'M-007', 'M-008', 'M-009', 'M-010', 'M-011',
+        'E-001', 'E-002', 'E-003', 'E-004', 'E-005', 'E-006', 'E-007',
+        'U-001', 'U-002', 'U-003', 'U-004', 'U-005', 'U-006',
+        'G-001', 'G-002', 'G-003', 'G-004', 'G-005', 'G-006'
+    ]
+
+    # Verificar si el mensaje comienza con un código válido
+    if ':' in error_msg:
+        posible_codigo = error_msg.split(':')[0].strip()
+        if posible_codigo in codigos_validos:
+            mensaje_limpio = error_msg.split(':', 1)[1].strip()
+            return (posible_codigo, mensaje_limpio)
+
+    return (codigo_default, error_msg)
+
+
+# =====================================================
+# CUERPOS DE LAS ACCIONES (un chunk de alumnos)
+# =====================================================
+
+def _activar_teams_con_email(queryset, usuario):
+    """
+    Crea usuario en Teams y envía email con credenciales.
+    Procesa un chunk de alumnos dentro de ejecutar_accion_masiva.
+    """
+    from ..services.teams_service import TeamsService
+    from ..services.email_service import EmailService
+
+    teams_svc = TeamsService()
+    email_svc = EmailService()
+
+    exitos = 0
+    errores = 0
+
+    for alumno in queryset:
+        inicio = timezone.now()
+        inicio_time = time.time()
+        codigo_error = None
+        mensaje_error = None
+
+        # Log inicio
+        registrar_log(
+            tipo='INFO',
+            modulo='admin_action_sync',
+            mensaje=f'Iniciando: Teams con email',
+            alumno=alumno,
+            usuario=usuario
+        )
+
+        # Crear tarea
+        tarea = Tarea.objects.create(
+            tipo=Tarea.TipoTarea.CREAR_USUARIO_TEAMS,
+            estado=Tarea.EstadoTarea.RUNNING,
+            alumno=alumno,
+            usuario=usuario,
+            hora_inicio=inicio,
+            detalles={
+                'modulo': 'admin_action_sync',
+                'accion': 'activar_teams_con_email',
+                'enviar_email': True
+            }
+        )
+
+        try:
+            # Validar email
+            if not alumno.email:
+                codigo_error = 'T-001'
+                raise ValueError("No tiene email configurado")
+
+            # Crear usuario en Teams
+            logger.info(f"Llamando teams_svc.create_user para alumno {alumno.id}")
+            result = teams_svc.create_user(alumno)
+            logger.info(f"Resultado de Teams: type={type(result)}, value={result}")
+
+            if not result:
+                codigo_error = 'T-003'
+                raise Exception("Error al crear usuario en Teams")
+
+            # Validar que el resultado tenga los campos necesarios
+            if not isinstance(result, dict):
+                codigo_error = 'T-003'
+                raise Exception(f"Respuesta inválida de Teams - no es dict: {type(result).__name__}, valor: {str(result)[:100]}")
+
+            if 'upn' not in result:
+                codigo_error = 'T-003'
+                raise Exception(f"Respuesta de Teams sin 'upn': {list(result.keys())}")
+
+            # Actualizar alumno
+            alumno.email_institucional = result.get('upn')
+            alumno.teams_password = result.get('password')
+            alumno.teams_procesado = True
+            # alumno.teams_payload = result
+            alumno.save(update_fields=[
+                'email_institucional', 'teams_password',
+                'teams_procesado'
+            ])
+
+            # Enviar email solo si tenemos password
+            email_enviado = False
+            if result.get('password'):
+                teams_data = {
+                    'upn': result.get('upn'),
+                    'password': result.get('password')
+                }
+                email_enviado = email_svc.send_credentials_email(alumno, teams_data)
+                if email_enviado:
+                    alumno.email_procesado = True
+                    alumno.save(update_fields=['email_procesado'])
+            else:
+                logger.warning(f"No se pudo enviar email a {alumno}: sin password en resultado de Teams")
+
+            # Actualizar tarea
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+            tarea.estado = Tarea.EstadoTarea.COMPLETED
+            tarea.hora_fin = fin
+            tarea.cantidad_entidades = 1
+            tarea.detalles['resultado'] = 'Éxito'
+            tarea.detalles['upn'] = result['upn']
+            tarea.detalles['email_enviado'] = email_enviado
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            # Log fin
+            registrar_log(
+                tipo='SUCCESS',
+                modulo='admin_action_sync',
+                mensaje=f'Completado: Teams con email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'duracion_segundos': round(duracion, 2),
+                    'upn': result['upn']
+                }
+            )
+
+            exitos += 1
+
+        except Exception as e:
+            # Actualizar tarea como fallida
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+
+            # Extraer código de error del mensaje si viene en formato "T-XXX: mensaje"
+            codigo_final, mensaje_limpio = extraer_codigo_error(e, codigo_error)
+
+            tarea.estado = Tarea.EstadoTarea.FAILED
+            tarea.hora_fin = fin
+            tarea.mensaje_error = mensaje_limpio
+            tarea.detalles['codigo_error'] = codigo_final
+            tarea.detalles['error'] = mensaje_limpio
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            # Log error
+            registrar_log(
+                tipo='ERROR',
+                modulo='admin_action_sync',
+                mensaje=f'Error: Teams con email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'codigo_error': codigo_final,
+                    'error': mensaje_limpio,
+                    'duracion_segundos': round(duracion, 2)
+                }
+            )
+
+            errores += 1
+
+    return {'exitos': exitos, 'errores': errores, 'omitidos': 0}
+
+def _activar_teams_sin_email(queryset, usuario):
+    """
+    Crea usuario en Teams SIN enviar email.
+    Procesa un chunk de alumnos dentro de ejecutar_accion_masiva.
+    """
+    from ..services.teams_service import TeamsService
+
+    teams_svc = TeamsService()
+
+    exitos = 0
+    errores = 0
+
+    for alumno in queryset:
+        inicio = timezone.now()
+        inicio_time = time.time()
+        codigo_error = None
+
+        # Log inicio
+        registrar_log(
+            tipo='INFO',
+            modulo='admin_action_sync',
+            mensaje=f'Iniciando: Teams sin email',
+            alumno=alumno,
+            usuario=usuario
+        )
+
+        # Crear tarea
+        tarea = Tarea.objects.create(
+            tipo=Tarea.TipoTarea.CREAR_USUARIO_TEAMS,
+            estado=Tarea.EstadoTarea.RUNNING,
+            alumno=alumno,
+            usuario=usuario,
+            hora_inicio=inicio,
+            detalles={
+                'modulo': 'admin_action_sync',
+                'accion': 'activar_teams_sin_email',
+                'enviar_email': False
+            }
+        )
+
+        try:
+            # Crear usuario en Teams
+            result = teams_svc.create_user(alumno)
+
+            if not result:
+                codigo_error = 'T-003'
+                raise Exception("Error al crear usuario en Teams")
+
+            # Validar que el resultado tenga los campos necesarios
+            if not isinstance(result, dict) or 'upn' not in result:
+                codigo_error = 'T-003'
+                raise Exception(f"Respuesta inválida de Teams: {type(result)}")
+
+            # Actualizar alumno
+            alumno.email_institucional = result.get('upn')
+            alumno.teams_password = result.get('password')
+            alumno.teams_procesado = True
+            # alumno.teams_payload = result
+            alumno.save(update_fields=[
+                'email_institucional', 'teams_password',
+                'teams_procesado'
+            ])
+
+            # Actualizar tarea
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+            tarea.estado = Tarea.EstadoTarea.COMPLETED
+            tarea.hora_fin = fin
+            tarea.cantidad_entidades = 1
+            tarea.detalles['resultado'] = 'Éxito'
+            tarea.detalles['upn'] = result['upn']
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            # Log fin
+            registrar_log(
+                tipo='SUCCESS',
+                modulo='admin_action_sync',
+                mensaje=f'Completado: Teams sin email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'duracion_segundos': round(duracion, 2),
+                    'upn': result['upn']
+                }
+            )
+
+            exitos += 1
+
+        except Exception as e:
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+            tarea.estado = Tarea.EstadoTarea.FAILED
+            tarea.hora_fin = fin
+            tarea.mensaje_error = str(e)
+            tarea.detalles['codigo_error'] = codigo_error or 'G-001'
+            tarea.detalles['error'] = str(e)
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            registrar_log(
+                tipo='ERROR',
+                modulo='admin_action_sync',
+                mensaje=f'Error: Teams sin email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'codigo_error': codigo_error or 'G-001',
+                    'error': str(e),
+                    'duracion_segundos': round(duracion, 2)
+                }
+            )
+
+            errores += 1
+
+    return {'exitos': exitos, 'errores': errores, 'omitidos': 0}
+
+def _resetear_password_teams_con_email(queryset, usuario):
+    """
+    Resetea contraseña de Teams y envía email con credenciales.
+    Procesa un chunk de alumnos dentro de ejecutar_accion_masiva.
+    """
+    from ..services.teams_service import TeamsService
+    from ..services.email_service import EmailService
+
+    teams_svc = TeamsService()
+    email_svc = EmailService()
+    exitos = 0
+    errores = 0
+    omitidos = 0
+
+    for alumno in queryset:
+        # Validar que tenga email institucional
+        if not alumno.email_institucional:
+            omitidos += 1
+            continue
+
+        # Validar que tenga email personal
+        if not alumno.email:
+            omitidos += 1
+            continue
+
+        inicio = timezone.now()
+        inicio_time = time.time()
+        codigo_error = None
+
+        # Log inicio
+        registrar_log(
+            tipo='INFO',
+            modulo='admin_action_sync',
+            mensaje=f'Iniciando: Resetear password Teams con email',
+            alumno=alumno,
+            usuario=usuario
+        )
+
+        # Crear tarea
+        tarea = Tarea.objects.create(
+            tipo=Tarea.TipoTarea.RESETEAR_PASSWORD,
+            estado=Tarea.EstadoTarea.RUNNING,
+            alumno=alumno,
+            usuario=usuario,
+            hora_inicio=inicio,
+            detalles={
+                'modulo': 'admin_action_sync',
+                'accion': 'resetear_password_teams_con_email',
+                'upn': alumno.email_institucional,
+                'enviar_email': True
+            }
+        )
+
+        try:
+            upn = alumno.email_institucional
+
+            # Resetear contraseña
+            new_password = teams_svc.reset_password(upn, alumno=alumno)
+
+            # Actualizar alumno
+            alumno.teams_password = new_password
+            alumno.save(update_fields=['teams_password'])
+
+            # Enviar email con nueva contraseña
+            teams_data = {
+                'upn': upn,
+                'password': new_password
+            }
+            email_enviado = email_svc.send_credentials_email(alumno, teams_data)
+
+            # Actualizar tarea
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+            tarea.estado = Tarea.EstadoTarea.COMPLETED
+            tarea.hora_fin = fin
+            tarea.cantidad_entidades = 1
+            tarea.detalles['resultado'] = 'Éxito'
+            tarea.detalles['upn'] = upn
+            tarea.detalles['email_enviado'] = email_enviado
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            # Log fin
+            registrar_log(
+                tipo='SUCCESS',
+                modulo='admin_action_sync',
+                mensaje=f'Completado: Resetear password Teams con email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'duracion_segundos': round(duracion, 2),
+                    'upn': upn
+                }
+            )
+
+            exitos += 1
+
+        except Exception as e:
+            # Actualizar tarea como fallida
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+
+            # Extraer código de error del mensaje si viene en formato "T-XXX: mensaje"
+            codigo_final, mensaje_limpio = extraer_codigo_error(e, codigo_error)
+
+            tarea.estado = Tarea.EstadoTarea.FAILED
+            tarea.hora_fin = fin
+            tarea.mensaje_error = mensaje_limpio
+            tarea.detalles['codigo_error'] = codigo_final
+            tarea.detalles['error'] = mensaje_limpio
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            # Log error
+            registrar_log(
+                tipo='ERROR',
+                modulo='admin_action_sync',
+                mensaje=f'Error: Resetear password Teams con email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'codigo_error': codigo_final,
+                    'error': mensaje_limpio,
+                    'duracion_segundos': round(duracion, 2)
+                }
+            )
+
+            errores += 1
+
+    return {'exitos': exitos, 'errores': errores, 'omitidos': omitidos}
+
+def _resetear_password_teams_sin_email(queryset, usuario):
+    """
+    Resetea contraseña de Teams SIN enviar email.
+    Procesa un chunk de alumnos dentro de ejecutar_accion_masiva.
+    """
+    from ..services.teams_service import TeamsService
+
+    teams_svc = TeamsService()
+    exitos = 0
+    errores = 0
+    omitidos = 0
+
+    for alumno in queryset:
+        # Validar que tenga email institucional
+        if not alumno.email_institucional:
+            omitidos += 1
+            continue
+
+        inicio = timezone.now()
+        inicio_time = time.time()
+        codigo_error = None
+
+        # Log inicio
+        registrar_log(
+            tipo='INFO',
+            modulo='admin_action_sync',
+            mensaje=f'Iniciando: Resetear password Teams sin email',
+            alumno=alumno,
+            usuario=usuario
+        )
+
+        # Crear tarea
+        tarea = Tarea.objects.create(
+            tipo=Tarea.TipoTarea.RESETEAR_PASSWORD,
+            estado=Tarea.EstadoTarea.RUNNING,
+            alumno=alumno,
+            usuario=usuario,
+            hora_inicio=inicio,
+            detalles={
+                'modulo': 'admin_action_sync',
+                'accion': 'resetear_password_teams_sin_email',
+                'upn': alumno.email_institucional,
+                'enviar_email': False
+            }
+        )
+
+        try:
+            upn = alumno.email_institucional
+
+            # Resetear contraseña
+            new_password = teams_svc.reset_password(upn, alumno=alumno)
+
+            # Actualizar alumno
+            alumno.teams_password = new_password
+            alumno.save(update_fields=['teams_password'])
+
+            # Actualizar tarea
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+            tarea.estado = Tarea.EstadoTarea.COMPLETED
+            tarea.hora_fin = fin
+            tarea.cantidad_entidades = 1
+            tarea.detalles['resultado'] = 'Éxito'
+            tarea.detalles['upn'] = upn
+            tarea.detalles['new_password'] = new_password
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            # Log fin
+            registrar_log(
+                tipo='SUCCESS',
+                modulo='admin_action_sync',
+                mensaje=f'Completado: Resetear password Teams sin email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'duracion_segundos': round(duracion, 2),
+                    'upn': upn
+                }
+            )
+
+            exitos += 1
+
+        except Exception as e:
+            # Actualizar tarea como fallida
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+
+            # Extraer código de error del mensaje si viene en formato "T-XXX: mensaje"
+            codigo_final, mensaje_limpio = extraer_codigo_error(e, codigo_error)
+
+            tarea.estado = Tarea.EstadoTarea.FAILED
+            tarea.hora_fin = fin
+            tarea.mensaje_error = mensaje_limpio
+            tarea.detalles['codigo_error'] = codigo_final
+            tarea.detalles['error'] = mensaje_limpio
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            # Log error
+            registrar_log(
+                tipo='ERROR',
+                modulo='admin_action_sync',
+                mensaje=f'Error: Resetear password Teams sin email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'codigo_error': codigo_final,
+                    'error': mensaje_limpio,
+                    'duracion_segundos': round(duracion, 2)
+                }
+            )
+
+            errores += 1
+
+    return {'exitos': exitos, 'errores': errores, 'omitidos': omitidos}
+
+def _borrar_teams(queryset, usuario):
+    """
+    Elimina usuarios de Teams.
+    Procesa un chunk de alumnos dentro de ejecutar_accion_masiva.
+    PRECAUCIÓN: Solo funciona con cuentas test-*
+    """
+    from ..services.teams_service import TeamsService
+
+    teams_svc = TeamsService()
+    exitos = 0
+    errores = 0
+    omitidos = 0
+
+    for alumno in queryset:
+        # Validar que tenga email institucional
+        if not alumno.email_institucional:
+            omitidos += 1
+            continue
+
+        # Validar que esté procesado en Teams
+        if not alumno.teams_procesado:
+            omitidos += 1
+            continue
+
+        inicio = timezone.now()
+        inicio_time = time.time()
+        codigo_error = None
+
+        # Log inicio
+        registrar_log(
+            tipo='INFO',
+            modulo='admin_action_sync',
+            mensaje=f'Iniciando: Borrar de Teams',
+            alumno=alumno,
+            usuario=usuario
+        )
+
+        # Crear tarea
+        tarea = Tarea.objects.create(
+            tipo=Tarea.TipoTarea.ELIMINAR_CUENTA,
+            estado=Tarea.EstadoTarea.RUNNING,
+            alumno=alumno,
+            usuario=usuario,
+            hora_inicio=inicio,
+            detalles={
+                'modulo': 'admin_action_sync',
+                'accion': 'borrar_teams',
+                'servicio': 'Teams',
+                'upn': alumno.email_institucional
+            }
+        )
+
+        try:
+            upn = alumno.email_institucional
+
+            # Eliminar usuario de Teams
+            teams_svc.delete_user(upn, alumno)
+
+            # Limpiar campos del alumno
+            alumno.email_institucional = None
+            alumno.teams_password = None
+            alumno.teams_procesado = False
+            # alumno.teams_payload = None
+            alumno.save(update_fields=[
+                'email_institucional', 'teams_password',
+                'teams_procesado'
+            ])
+
+            # Actualizar tarea
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+            tarea.estado = Tarea.EstadoTarea.COMPLETED
+            tarea.hora_fin = fin
+            tarea.cantidad_entidades = 1
+            tarea.detalles['resultado'] = 'Éxito'
+            tarea.detalles['upn_eliminado'] = upn
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            # Log fin
+            registrar_log(
+                tipo='SUCCESS',
+                modulo='admin_action_sync',
+                mensaje=f'Completado: Borrar de Teams',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'duracion_segundos': round(duracion, 2),
+                    'upn': upn
+                }
+            )
+
+            exitos += 1
+
+        except Exception as e:
+            # Actualizar tarea como fallida
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+
+            # Extraer código de error del mensaje si viene en formato "T-XXX: mensaje"
+            codigo_final, mensaje_limpio = extraer_codigo_error(e, codigo_error)
+
+            tarea.estado = Tarea.EstadoTarea.FAILED
+            tarea.hora_fin = fin
+            tarea.mensaje_error = mensaje_limpio
+            tarea.detalles['codigo_error'] = codigo_final
+            tarea.detalles['error'] = mensaje_limpio
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            # Log error
+            registrar_log(
+                tipo='ERROR',
+                modulo='admin_action_sync',
+                mensaje=f'Error: Borrar de Teams',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'codigo_error': codigo_final,
+                    'error': mensaje_limpio,
+                    'duracion_segundos': round(duracion, 2)
+                }
+            )
+
+            errores += 1
+
+    return {'exitos': exitos, 'errores': errores, 'omitidos': omitidos}
+
+def _enrollar_moodle_con_email(queryset, usuario):
+    """
+    Enrolla en Moodle y envía email de enrollamiento.
+    Procesa un chunk de alumnos dentro de ejecutar_accion_masiva.
+    """
+    from ..services.moodle_service import MoodleService
+    from ..services.email_service import EmailService
+
+    moodle_svc = MoodleService()
+    email_svc = EmailService()
+
+    exitos = 0
+    errores = 0
+
+    for alumno in queryset:
+        inicio = timezone.now()
+        inicio_time = time.time()
+        codigo_error = None
+
+        registrar_log(
+            tipo='INFO',
+            modulo='admin_action_sync',
+            mensaje=f'Iniciando: Moodle con email',
+            alumno=alumno,
+            usuario=usuario
+        )
+
+        tarea = Tarea.objects.create(
+            tipo=Tarea.TipoTarea.MOODLE_ENROLL,
+            estado=Tarea.EstadoTarea.RUNNING,
+            alumno=alumno,
+            usuario=usuario,
+            hora_inicio=inicio,
+            detalles={
+                'modulo': 'admin_action_sync',
+                'accion': 'enrollar_moodle_con_email',
+                'enviar_email': True
+            }
+        )
+
+        try:
+            if not alumno.email_institucional:
+                codigo_error = 'M-001'
+                raise ValueError("No tiene email institucional")
+
+            # Crear/buscar usuario en Moodle
+            result = moodle_svc.create_user(alumno)
+            if not result:
+                codigo_error = 'M-004'
+                raise Exception('Error al crear usuario en Moodle - Sin respuesta')
+
+            if isinstance(result, dict) and 'error' in result:
+                codigo_error = 'M-004'
+                error_msg = result.get('error') if isinstance(result, dict) else str(result)
+                raise Exception(f'Error al crear usuario en Moodle: {error_msg}')
+
+            # Enrollar en cursos
+            enroll_result = moodle_svc.enroll_user_in_courses(alumno)
+            if not enroll_result:
+                codigo_error = 'M-006'
+                raise Exception('Error al enrollar en cursos - Sin respuesta')
+
+            if isinstance(enroll_result, dict) and 'error' in enroll_result:
+                codigo_error = 'M-006'
+                error_msg = enroll_result.get('error') if isinstance(enroll_result, dict) else str(enroll_result)
+                raise Exception(f'Error al enrollar en cursos: {error_msg}')
+
+            # Actualizar alumno
+            alumno.moodle_procesado = True
+            # alumno.moodle_payload = {'user': result, 'enrollments': enroll_result}
+            alumno.save(update_fields=['moodle_procesado'])
+
+            # Enviar email
+            email_enviado = email_svc.send_enrollment_email(alumno)
+            if email_enviado:
+                alumno.email_procesado = True
+                alumno.save(update_fields=['email_procesado'])
+
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+            tarea.estado = Tarea.EstadoTarea.COMPLETED
+            tarea.hora_fin = fin
+            tarea.cantidad_entidades = 1
+            tarea.detalles['resultado'] = 'Éxito'
+            tarea.detalles['email_enviado'] = email_enviado
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            registrar_log(
+                tipo='SUCCESS',
+                modulo='admin_action_sync',
+                mensaje=f'Completado: Moodle con email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={'duracion_segundos': round(duracion, 2)}
+            )
+
+            exitos += 1
+
+        except Exception as e:
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+            tarea.estado = Tarea.EstadoTarea.FAILED
+            tarea.hora_fin = fin
+            tarea.mensaje_error = str(e)
+            tarea.detalles['codigo_error'] = codigo_error or 'G-001'
+            tarea.detalles['error'] = str(e)
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            registrar_log(
+                tipo='ERROR',
+                modulo='admin_action_sync',
+                mensaje=f'Error: Moodle con email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'codigo_error': codigo_error or 'G-001',
+                    'error': str(e),
+                    'duracion_segundos': round(duracion, 2)
+                }
+            )
+
+            errores += 1
+
+    return {'exitos': exitos, 'errores': errores, 'omitidos': 0}
+
+def _enrollar_moodle_sin_email(queryset, usuario):
+    """
+    Enrolla en Moodle SIN enviar email.
+    Procesa un chunk de alumnos dentro de ejecutar_accion_masiva.
+    """
+    from ..services.moodle_service import MoodleService
+
+    moodle_svc = MoodleService()
+
+    exitos = 0
+    errores = 0
+
+    for alumno in queryset:
+        inicio = timezone.now()
+        inicio_time = time.time()
+        codigo_error = None
+
+        registrar_log(
+            tipo='INFO',
+            modulo='admin_action_sync',
+            mensaje=f'Iniciando: Moodle sin email',
+            alumno=alumno,
+            usuario=usuario
+        )
+
+        tarea = Tarea.objects.create(
+            tipo=Tarea.TipoTarea.MOODLE_ENROLL,
+            estado=Tarea.EstadoTarea.RUNNING,
+            alumno=alumno,
+            usuario=usuario,
+            hora_inicio=inicio,
+            detalles={
+                'modulo': 'admin_action_sync',
+                'accion': 'enrollar_moodle_sin_email',
+                'enviar_email': False
+            }
+        )
+
+        try:
+            if not alumno.email_institucional:
+                codigo_error = 'M-001'
+                raise ValueError("No tiene email institucional")
+
+            # Crear/buscar usuario en Moodle
+            result = moodle_svc.create_user(alumno)
+            if not result:
+                codigo_error = 'M-004'
+                raise Exception('Error al crear usuario en Moodle - Sin respuesta')
+
+            if isinstance(result, dict) and 'error' in result:
+                codigo_error = 'M-004'
+                error_msg = result.get('error') if isinstance(result, dict) else str(result)
+                raise Exception(f'Error al crear usuario en Moodle: {error_msg}')
+
+            # Enrollar en cursos
+            enroll_result = moodle_svc.enroll_user_in_courses(alumno)
+            if not enroll_result:
+                codigo_error = 'M-006'
+                raise Exception('Error al enrollar en cursos - Sin respuesta')
+
+            if isinstance(enroll_result, dict) and 'error' in enroll_result:
+                codigo_error = 'M-006'
+                error_msg = enroll_result.get('error') if isinstance(enroll_result, dict) else str(enroll_result)
+                raise Exception(f'Error al enrollar en cursos: {error_msg}')
+
+            # Actualizar alumno
+            alumno.moodle_procesado = True
+            # alumno.moodle_payload = {'user': result, 'enrollments': enroll_result}
+            alumno.save(update_fields=['moodle_procesado'])
+
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+            tarea.estado = Tarea.EstadoTarea.COMPLETED
+            tarea.hora_fin = fin
+            tarea.cantidad_entidades = 1
+            tarea.detalles['resultado'] = 'Éxito'
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            registrar_log(
+                tipo='SUCCESS',
+                modulo='admin_action_sync',
+                mensaje=f'Completado: Moodle sin email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={'duracion_segundos': round(duracion, 2)}
+            )
+
+            exitos += 1
+
+        except Exception as e:
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+            tarea.estado = Tarea.EstadoTarea.FAILED
+            tarea.hora_fin = fin
+            tarea.mensaje_error = str(e)
+            tarea.detalles['codigo_error'] = codigo_error or 'G-001'
+            tarea.detalles['error'] = str(e)
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            registrar_log(
+                tipo='ERROR',
+                modulo='admin_action_sync',
+                mensaje=f'Error: Moodle sin email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'codigo_error': codigo_error or 'G-001',
+                    'error': str(e),
+                    'duracion_segundos': round(duracion, 2)
+                }
+            )
+
+            errores += 1
+
+    return {'exitos': exitos, 'errores': errores, 'omitidos': 0}
+
+def _desenrollar_moodle_con_email(queryset, usuario):
+    """
+    Des-enrolla de cursos de Moodle y envía email de notificación.
+    Procesa un chunk de alumnos dentro de ejecutar_accion_masiva.
+    """
+    from ..services.moodle_service import MoodleService
+    from ..services.email_service import EmailService
+    from ..models import Configuracion
+
+    from cursos.services import resolver_curso
+    from cursos.constants import CARRERAS_DICT
+
+    config = Configuracion.load()
+    moodle_svc = MoodleService()
+    email_svc = EmailService()
+    exitos = 0
+    errores = 0
+    omitidos = 0
+
+    for alumno in queryset:
+        # Validar email institucional con manejo de fallback
+        username = alumno.email_institucional
+        if not username:
+            if config.deshabilitar_fallback_email_personal:
+                # Fallback deshabilitado, omitir alumno
+                registrar_log(
+                    tipo='WARNING',
+                    modulo='admin_action_sync',
+                    mensaje=f'⚠️ FALTA EMAIL INSTITUCIONAL - Alumno {alumno.id} omitido (fallback deshabilitado)',
+                    alumno=alumno,
+                    usuario=usuario,
+                    detalles={'dni': alumno.dni, 'nombre': f'{alumno.nombre} {alumno.apellido}'}
+                )
+                omitidos += 1
+                continue
+            else:
+                # Usar fallback a email personal
+                username = alumno.email_personal
+
+        if not username:
+            omitidos += 1
+            continue
+
+        # Validar que tenga email personal para notificación
+        if not alumno.email:
+            omitidos += 1
+            continue
+
+        # Obtener cursos dinámicamente basado en carreras_data
+        courses_to_unenrol = []
+        if alumno.carreras_data and isinstance(alumno.carreras_data, list):
+            for carrera_data in alumno.carreras_data:
+                id_carrera = carrera_data.get('id_carrera')
+                modalidad = carrera_data.get('modalidad', '').strip()
+                comisiones = carrera_data.get('comisiones', [])
+                comision = comisiones[0].get('nombre_comision', '') if comisiones else ''
+
+                # Mapear id_carrera a código
+                codigo_carrera = CARRERAS_DICT.get(str(id_carrera)) or CARRERAS_DICT.get(id_carrera)
+                if not codigo_carrera:
+                    continue
+
+                try:
+                    cursos = resolver_curso(codigo_carrera, modalidad, comision)
+                    courses_to_unenrol.extend(cursos)
+                except Exception:
+                    continue
+
+        # Eliminar duplicados
+        courses_to_unenrol = list(set(courses_to_unenrol))
+
+        if not courses_to_unenrol:
+            omitidos += 1
+            continue
+
+        inicio = timezone.now()
+        inicio_time = time.time()
+        codigo_error = None
+
+        # Log inicio
+        registrar_log(
+            tipo='INFO',
+            modulo='admin_action_sync',
+            mensaje=f'Iniciando: Desenrollar de Moodle con email',
+            alumno=alumno,
+            usuario=usuario
+        )
+
+        # Crear tarea
+        tarea = Tarea.objects.create(
+            tipo=Tarea.TipoTarea.MOODLE_ENROLL,
+            estado=Tarea.EstadoTarea.RUNNING,
+            alumno=alumno,
+            usuario=usuario,
+            hora_inicio=inicio,
+            detalles={
+                'modulo': 'admin_action_sync',
+                'accion': 'desenrollar_moodle_con_email',
+                'username': username,
+                'cursos': courses_to_unenrol,
+                'enviar_email': True
+            }
+        )
+
+        try:
+            # Buscar usuario en Moodle
+            user = moodle_svc.get_user_by_username(username)
+            if not user:
+                codigo_error = 'M-001'
+                raise ValueError(f"Usuario no encontrado en Moodle: {username}")
+
+            user_id = user['id']
+
+            # Des-enrollar de cada curso
+            desenrollados = []
+            for course_shortname in courses_to_unenrol:
+                try:
+                    if moodle_svc.unenrol_user_from_course(user_id, course_shortname, alumno):
+                        desenrollados.append(course_shortname)
+                except Exception as e:
+                    logger.warning(f"Error des-enrollando de {course_shortname}: {e}")
+
+            if not desenrollados:
+                codigo_error = 'M-006'
+                raise Exception("No se pudo des-enrollar de ningún curso")
+
+            # Enviar email de notificación
+            # TODO: Implementar plantilla de email para des-enrollamiento
+            email_enviado = False  # Por ahora no enviamos email
+
+            # Actualizar alumno
+            alumno.moodle_procesado = False
+            alumno.save(update_fields=['moodle_procesado'])
+
+            # Actualizar tarea
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+            tarea.estado = Tarea.EstadoTarea.COMPLETED
+            tarea.hora_fin = fin
+            tarea.cantidad_entidades = len(desenrollados)
+            tarea.detalles['resultado'] = 'Éxito'
+            tarea.detalles['cursos_desenrollados'] = desenrollados
+            tarea.detalles['email_enviado'] = email_enviado
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            # Log fin
+            registrar_log(
+                tipo='SUCCESS',
+                modulo='admin_action_sync',
+                mensaje=f'Completado: Desenrollar de Moodle con email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'duracion_segundos': round(duracion, 2),
+                    'cursos': desenrollados
+                }
+            )
+
+            exitos += 1
+
+        except Exception as e:
+            # Actualizar tarea como fallida
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+
+            # Extraer código de error del mensaje si viene en formato "M-XXX: mensaje"
+            codigo_final, mensaje_limpio = extraer_codigo_error(e, codigo_error)
+
+            tarea.estado = Tarea.EstadoTarea.FAILED
+            tarea.hora_fin = fin
+            tarea.mensaje_error = mensaje_limpio
+            tarea.detalles['codigo_error'] = codigo_final
+            tarea.detalles['error'] = mensaje_limpio
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            # Log error
+            registrar_log(
+                tipo='ERROR',
+                modulo='admin_action_sync',
+                mensaje=f'Error: Desenrollar de Moodle con email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'codigo_error': codigo_final,
+                    'error': mensaje_limpio,
+                    'duracion_segundos': round(duracion, 2)
+                }
+            )
+
+            errores += 1
+
+    return {'exitos': exitos, 'errores': errores, 'omitidos': omitidos}
+
+def _desenrollar_moodle_sin_email(queryset, usuario):
+    """
+    Des-enrolla de cursos de Moodle SIN enviar email.
+    Procesa un chunk de alumnos dentro de ejecutar_accion_masiva.
+    """
+    from ..services.moodle_service import MoodleService
+    from ..models import Configuracion
+    from cursos.services import resolver_curso
+    from cursos.constants import CARRERAS_DICT
+
+    config = Configuracion.load()
+    moodle_svc = MoodleService()
+    exitos = 0
+    errores = 0
+    omitidos = 0
+
+    for alumno in queryset:
+        # Validar email institucional con manejo de fallback
+        username = alumno.email_institucional
+        if not username:
+            if config.deshabilitar_fallback_email_personal:
+                # Fallback deshabilitado, omitir alumno
+                registrar_log(
+                    tipo='WARNING',
+                    modulo='admin_action_sync',
+                    mensaje=f'⚠️ FALTA EMAIL INSTITUCIONAL - Alumno {alumno.id} omitido (fallback deshabilitado)',
+                    alumno=alumno,
+                    usuario=usuario,
+                    detalles={'dni': alumno.dni, 'nombre': f'{alumno.nombre} {alumno.apellido}'}
+                )
+                omitidos += 1
+                continue
+            else:
+                # Usar fallback a email personal
+                username = alumno.email_personal
+
+        if not username:
+            omitidos += 1
+            continue
+
+        # Obtener cursos dinámicamente basado en carreras_data
+        courses_to_unenrol = []
+        if alumno.carreras_data and isinstance(alumno.carreras_data, list):
+            for carrera_data in alumno.carreras_data:
+                id_carrera = carrera_data.get('id_carrera')
+                modalidad = carrera_data.get('modalidad', '').strip()
+                comisiones = carrera_data.get('comisiones', [])
+                comision = comisiones[0].get('nombre_comision', '') if comisiones else ''
+
+                # Mapear id_carrera a código
+                codigo_carrera = CARRERAS_DICT.get(str(id_carrera)) or CARRERAS_DICT.get(id_carrera)
+                if not codigo_carrera:
+                    continue
+
+                try:
+                    cursos = resolver_curso(codigo_carrera, modalidad, comision)
+                    courses_to_unenrol.extend(cursos)
+                except Exception:
+                    continue
+
+        # Eliminar duplicados
+        courses_to_unenrol = list(set(courses_to_unenrol))
+
+        if not courses_to_unenrol:
+            omitidos += 1
+            continue
+
+        inicio = timezone.now()
+        inicio_time = time.time()
+        codigo_error = None
+
+        # Log inicio
+        registrar_log(
+            tipo='INFO',
+            modulo='admin_action_sync',
+            mensaje=f'Iniciando: Desenrollar de Moodle sin email',
+            alumno=alumno,
+            usuario=usuario
+        )
+
+        # Crear tarea
+        tarea = Tarea.objects.create(
+            tipo=Tarea.TipoTarea.MOODLE_ENROLL,
+            estado=Tarea.EstadoTarea.RUNNING,
+            alumno=alumno,
+            usuario=usuario,
+            hora_inicio=inicio,
+            detalles={
+                'modulo': 'admin_action_sync',
+                'accion': 'desenrollar_moodle_sin_email',
+                'username': username,
+                'cursos': courses_to_unenrol,
+                'enviar_email': False
+            }
+        )
+
+        try:
+            # Buscar usuario en Moodle
+            user = moodle_svc.get_user_by_username(username)
+            if not user:
+                codigo_error = 'M-001'
+                raise ValueError(f"Usuario no encontrado en Moodle: {username}")
+
+            user_id = user['id']
+
+            # Des-enrollar de cada curso
+            desenrollados = []
+            for course_shortname in courses_to_unenrol:
+                try:
+                    if moodle_svc.unenrol_user_from_course(user_id, course_shortname, alumno):
+                        desenrollados.append(course_shortname)
+                except Exception as e:
+                    logger.warning(f"Error des-enrollando de {course_shortname}: {e}")
+
+            if not desenrollados:
+                codigo_error = 'M-006'
+                raise Exception("No se pudo des-enrollar de ningún curso")
+
+            # Actualizar alumno
+            alumno.moodle_procesado = False
+            alumno.save(update_fields=['moodle_procesado'])
+
+            # Actualizar tarea
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+            tarea.estado = Tarea.EstadoTarea.COMPLETED
+            tarea.hora_fin = fin
+            tarea.cantidad_entidades = len(desenrollados)
+            tarea.detalles['resultado'] = 'Éxito'
+            tarea.detalles['cursos_desenrollados'] = desenrollados
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            # Log fin
+            registrar_log(
+                tipo='SUCCESS',
+                modulo='admin_action_sync',
+                mensaje=f'Completado: Desenrollar de Moodle sin email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'duracion_segundos': round(duracion, 2),
+                    'cursos': desenrollados
+                }
+            )
+
+            exitos += 1
+
+        except Exception as e:
+            # Actualizar tarea como fallida
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+
+            # Extraer código de error del mensaje si viene en formato "M-XXX: mensaje"
+            codigo_final, mensaje_limpio = extraer_codigo_error(e, codigo_error)
+
+            tarea.estado = Tarea.EstadoTarea.FAILED
+            tarea.hora_fin = fin
+            tarea.mensaje_error = mensaje_limpio
+            tarea.detalles['codigo_error'] = codigo_final
+            tarea.detalles['error'] = mensaje_limpio
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            # Log error
+            registrar_log(
+                tipo='ERROR',
+                modulo='admin_action_sync',
+                mensaje=f'Error: Desenrollar de Moodle sin email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'codigo_error': codigo_final,
+                    'error': mensaje_limpio,
+                    'duracion_segundos': round(duracion, 2)
+                }
+            )
+
+            errores += 1
+
+    return {'exitos': exitos, 'errores': errores, 'omitidos': omitidos}
+
+def _activar_teams_y_moodle_con_email(queryset, usuario):
+    """
+    Crea usuario en Teams, enrolla en Moodle y envía emails.
+    Operación ATÓMICA.
+    """
+    from ..services.teams_service import TeamsService
+    from ..services.moodle_service import MoodleService
+    from ..services.email_service import EmailService
+
+    teams_svc = TeamsService()
+    moodle_svc = MoodleService()
+    email_svc = EmailService()
+
+    exitos = 0
+    errores = 0
+
+    for alumno in queryset:
+        inicio = timezone.now()
+        inicio_time = time.time()
+        codigo_error = None
+        paso = ""
+
+        registrar_log(
+            tipo='INFO',
+            modulo='admin_action_sync',
+            mensaje=f'Iniciando: Teams + Moodle con email',
+            alumno=alumno,
+            usuario=usuario
+        )
+
+        tarea = Tarea.objects.create(
+            tipo=Tarea.TipoTarea.ACTIVAR_SERVICIOS,
+            estado=Tarea.EstadoTarea.RUNNING,
+            alumno=alumno,
+            usuario=usuario,
+            hora_inicio=inicio,
+            detalles={
+                'modulo': 'admin_action_sync',
+                'accion': 'activar_teams_y_moodle_con_email',
+                'enviar_email': True
+            }
+        )
+
+        try:
+            if not alumno.email:
+                codigo_error = 'T-001'
+                raise ValueError("No tiene email configurado")
+
+            # PASO 1: Crear usuario en Teams
+            paso = "Teams"
+            teams_result = teams_svc.create_user(alumno)
+
+            if not teams_result:
+                codigo_error = 'T-003'
+                raise Exception("Error al crear usuario en Teams")
+
+            # Validar que el resultado tenga los campos necesarios
+            if not isinstance(teams_result, dict) or 'upn' not in teams_result:
+                codigo_error = 'T-003'
+                raise Exception(f"Respuesta inválida de Teams: {type(teams_result)}")
+
+            alumno.email_institucional = teams_result.get('upn')
+            alumno.teams_password = teams_result.get('password')
+            alumno.teams_procesado = True
+            # alumno.teams_payload = teams_result
+            alumno.save(update_fields=[
+                'email_institucional', 'teams_password',
+                'teams_procesado'
+            ])
+
+            # PASO 2: Enviar email con credenciales Teams (solo si tenemos password)
+            if teams_result.get('password'):
+                teams_data = {
+                    'upn': teams_result.get('upn'),
+                    'password': teams_result.get('password')
+                }
+                email_svc.send_credentials_email(alumno, teams_data)
+
+            # PASO 3: Enrollar en Moodle
+            paso = "Moodle"
+            moodle_result = moodle_svc.create_user(alumno)
+            if not moodle_result or 'error' in moodle_result:
+                codigo_error = 'M-004'
+                raise Exception(moodle_result.get('error', 'Error al crear usuario en Moodle'))
+
+            enroll_result = moodle_svc.enroll_user_in_courses(alumno)
+            if not enroll_result or 'error' in enroll_result:
+                codigo_error = 'M-006'
+                raise Exception(enroll_result.get('error', 'Error al enrollar en cursos'))
+
+            alumno.moodle_procesado = True
+            # alumno.moodle_payload = {'user': moodle_result, 'enrollments': enroll_result}
+            alumno.save(update_fields=['moodle_procesado'])
+
+            # PASO 4: Enviar email de enrollamiento
+            email_svc.send_enrollment_email(alumno)
+            alumno.email_procesado = True
+            alumno.save(update_fields=['email_procesado'])
+
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+            tarea.estado = Tarea.EstadoTarea.COMPLETED
+            tarea.hora_fin = fin
+            tarea.cantidad_entidades = 1
+            tarea.detalles['resultado'] = 'Éxito completo'
+            tarea.detalles['upn'] = teams_result['upn']
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            registrar_log(
+                tipo='SUCCESS',
+                modulo='admin_action_sync',
+                mensaje=f'Completado: Teams + Moodle con email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'duracion_segundos': round(duracion, 2),
+                    'upn': teams_result['upn']
+                }
+            )
+
+            exitos += 1
+
+        except Exception as e:
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+            tarea.estado = Tarea.EstadoTarea.FAILED
+            tarea.hora_fin = fin
+            tarea.mensaje_error = f"Error en {paso}: {str(e)}"
+            tarea.detalles['codigo_error'] = codigo_error or 'G-001'
+            tarea.detalles['paso_fallido'] = paso
+            tarea.detalles['error'] = str(e)
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            registrar_log(
+                tipo='ERROR',
+                modulo='admin_action_sync',
+                mensaje=f'Error: Teams + Moodle (paso: {paso})',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'codigo_error': codigo_error or 'G-001',
+                    'paso_fallido': paso,
+                    'error': str(e),
+                    'duracion_segundos': round(duracion, 2)
+                }
+            )
+
+            errores += 1
+
+    return {'exitos': exitos, 'errores': errores, 'omitidos': 0}
+
+def _activar_teams_y_moodle_sin_email(queryset, usuario):
+    """
+    Crea usuario en Teams y enrolla en Moodle SIN enviar emails.
+    Operación ATÓMICA.
+    """
+    from ..services.teams_service import TeamsService
+    from ..services.moodle_service import MoodleService
+
+    teams_svc = TeamsService()
+    moodle_svc = MoodleService()
+
+    exitos = 0
+    errores = 0
+
+    for alumno in queryset:
+        inicio = timezone.now()
+        inicio_time = time.time()
+        codigo_error = None
+        paso = ""
+
+        registrar_log(
+            tipo='INFO',
+            modulo='admin_action_sync',
+            mensaje=f'Iniciando: Teams + Moodle sin email',
+            alumno=alumno,
+            usuario=usuario
+        )
+
+        tarea = Tarea.objects.create(
+            tipo=Tarea.TipoTarea.ACTIVAR_SERVICIOS,
+            estado=Tarea.EstadoTarea.RUNNING,
+            alumno=alumno,
+            usuario=usuario,
+            hora_inicio=inicio,
+            detalles={
+                'modulo': 'admin_action_sync',
+                'accion': 'activar_teams_y_moodle_sin_email',
+                'enviar_email': False
+            }
+        )
+
+        try:
+            # PASO 1: Crear usuario en Teams
+            paso = "Teams"
+            teams_result = teams_svc.create_user(alumno)
+
+            if not teams_result:
+                codigo_error = 'T-003'
+                raise Exception("Error al crear usuario en Teams")
+
+            # Validar que el resultado tenga los campos necesarios
+            if not isinstance(teams_result, dict) or 'upn' not in teams_result:
+                codigo_error = 'T-003'
+                raise Exception(f"Respuesta inválida de Teams: {type(teams_result)}")
+
+            alumno.email_institucional = teams_result.get('upn')
+            alumno.teams_password = teams_result.get('password')
+            alumno.teams_procesado = True
+            # alumno.teams_payload = teams_result
+            alumno.save(update_fields=[
+                'email_institucional', 'teams_password',
+                'teams_procesado'
+            ])
+
+            # PASO 2: Enrollar en Moodle
+            paso = "Moodle"
+            moodle_result = moodle_svc.create_user(alumno)
+            if not moodle_result or 'error' in moodle_result:
+                codigo_error = 'M-004'
+                raise Exception(moodle_result.get('error', 'Error al crear usuario en Moodle'))
+
+            enroll_result = moodle_svc.enroll_user_in_courses(alumno)
+            if not enroll_result or 'error' in enroll_result:
+                codigo_error = 'M-006'
+                raise Exception(enroll_result.get('error', 'Error al enrollar en cursos'))
+
+            alumno.moodle_procesado = True
+            # alumno.moodle_payload = {'user': moodle_result, 'enrollments': enroll_result}
+            alumno.save(update_fields=['moodle_procesado'])
+
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+            tarea.estado = Tarea.EstadoTarea.COMPLETED
+            tarea.hora_fin = fin
+            tarea.cantidad_entidades = 1
+            tarea.detalles['resultado'] = 'Éxito completo'
+            tarea.detalles['upn'] = teams_result['upn']
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            registrar_log(
+                tipo='SUCCESS',
+                modulo='admin_action_sync',
+                mensaje=f'Completado: Teams + Moodle sin email',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'duracion_segundos': round(duracion, 2),
+                    'upn': teams_result['upn']
+                }
+            )
+
+            exitos += 1
+
+        except Exception as e:
+            fin = timezone.now()
+            duracion = time.time() - inicio_time
+            tarea.estado = Tarea.EstadoTarea.FAILED
+            tarea.hora_fin = fin
+            tarea.mensaje_error = f"Error en {paso}: {str(e)}"
+            tarea.detalles['codigo_error'] = codigo_error or 'G-001'
+            tarea.detalles['paso_fallido'] = paso
+            tarea.detalles['error'] = str(e)
+            tarea.detalles['duracion_segundos'] = round(duracion, 2)
+            tarea.save()
+
+            registrar_log(
+                tipo='ERROR',
+                modulo='admin_action_sync',
+                mensaje=f'Error: Teams + Moodle (paso: {paso})',
+                alumno=alumno,
+                usuario=usuario,
+                detalles={
+                    'codigo_error': codigo_error or 'G-001',
+                    'paso_fallido': paso,
+                    'error': str(e),
+                    'duracion_segundos': round(duracion, 2)
+                }
+            )
+
+            errores += 1
+
+    return {'exitos': exitos, 'errores': errores, 'omitidos': 0}
+
+
+# Acción -> (descripción, función que procesa un chunk)
+ACCIONES_MASIVAS = {
+    'activar_teams_con_email': ("⚡ Teams con email", _activar_teams_con_email),
+    'activar_teams_sin_email': ("⚡ Teams sin email", _activar_teams_sin_email),
+    'resetear_password_teams_con_email': ("🔄 Resetear password Teams con email", _resetear_password_teams_con_email),
+    'resetear_password_teams_sin_email': ("🔄 Resetear password Teams sin email", _resetear_password_teams_sin_email),
+    'borrar_teams': ("🗑️ Borrar de Teams", _borrar_teams),
+    'enrollar_moodle_con_email': ("⚡ Moodle con email", _enrollar_moodle_con_email),
+    'enrollar_moodle_sin_email': ("⚡ Moodle sin email", _enrollar_moodle_sin_email),
+    'desenrollar_moodle_con_email': ("🔻 Desenrollar de Moodle con email", _desenrollar_moodle_con_email),
+    'desenrollar_moodle_sin_email': ("🔻 Desenrollar de Moodle sin email", _desenrollar_moodle_sin_email),
+    'activar_teams_y_moodle_con_email': ("⚡⚡ Teams + Moodle con email", _activar_teams_y_moodle_con_email),
+    'activar_teams_y_moodle_sin_email': ("⚡⚡ Teams + Moodle sin email", _activar_teams_y_moodle_sin_email),
+}
+
+
+# =====================================================
+# TAREA AGREGADA (progreso y cancelación)
+# =====================================================
+
+def crear_accion_masiva(accion, alumno_ids, usuario=None):
+    """
+    Crea la Tarea ACCION_MASIVA que agrega el progreso de una acción del admin.
+
+    Los contadores viven en `detalles` (total, procesados, exitos, errores,
+    omitidos) y `cantidad_entidades` refleja los éxitos. Cada alumno sigue
+    teniendo además su propia Tarea con el detalle del resultado.
+
+    Args:
+        accion: Clave de ACCIONES_MASIVAS
+        alumno_ids: Lista de IDs de Alumno seleccionados
+        usuario: Username que lanzó la acción
+
+    Returns:
+        Tarea creada (PENDING)
+    """
+    descripcion, _ = ACCIONES_MASIVAS[accion]
+    return Tarea.objects.create(
+        tipo=Tarea.TipoTarea.ACCION_MASIVA,
+        estado=Tarea.EstadoTarea.PENDING,
+        usuario=usuario,
+        detalles={
+            'modulo': 'admin_action_sync',
+            'accion': accion,
+            'descripcion': descripcion,
+            'alumno_ids': list(alumno_ids),
+            'total': len(alumno_ids),
+            'procesados': 0,
+            'exitos': 0,
+            'errores': 0,
+            'omitidos': 0,
+            'cancelar': False,
+        }
+    )
+
+
+def cancelar_accion_masiva(tarea_id, usuario=None):
+    """
+    Pide cancelar una acción masiva. El worker la corta al terminar el chunk en curso.
+
+    Returns:
+        True si se marcó para cancelar, False si no existe o ya terminó
+    """
+    with transaction.atomic():
+        tarea = (
+            Tarea.objects.select_for_update()
+            .filter(id=tarea_id, tipo=Tarea.TipoTarea.ACCION_MASIVA)
+            .first()
+        )
+        if tarea is None or tarea.estado in (Tarea.EstadoTarea.COMPLETED, Tarea.EstadoTarea.FAILED):
+            return False
+
+        tarea.detalles['cancelar'] = True
+        tarea.detalles['cancelada_por'] = usuario
+        tarea.save(update_fields=['detalles'])
+
+    return True
+
+
+def progreso_accion_masiva(tarea):
+    """Resume el estado de una Tarea ACCION_MASIVA para la página de progreso."""
+    detalles = tarea.detalles or {}
+    total = detalles.get('total', 0)
+    procesados = detalles.get('procesados', 0)
+    return {
+        'id': tarea.id,
+        'accion': detalles.get('accion'),
+        'descripcion': detalles.get('descripcion'),
+        'estado': tarea.estado,
+        'estado_display': tarea.get_estado_display(),
+        'total': total,
+        'procesados': procesados,
+        'exitos': detalles.get('exitos', 0),
+        'errores': detalles.get('errores', 0),
+        'omitidos': detalles.get('omitidos', 0),
+        'porcentaje': round(procesados * 100 / total, 1) if total else 100.0,
+        'cancelar': detalles.get('cancelar', False),
+        'cancelada': detalles.get('cancelada', False),
+        'terminada': tarea.estado in (Tarea.EstadoTarea.COMPLETED, Tarea.EstadoTarea.FAILED),
+        'mensaje_error': tarea.mensaje_error,
+    }
+
+
+def _acumular_progreso(tarea_id, resultado, procesados):
+    """
+    Suma el resultado de un chunk a la Tarea agregada.
+
+    Se hace con select_for_update para no pisar un pedido de cancelación que
+    llegue desde el admin en el medio.
+
+    Returns:
+        True si se pidió cancelar
+    """
+    with transaction.atomic():
+        tarea = Tarea.objects.select_for_update().get(id=tarea_id)
+        detalles = tarea.detalles
+        detalles['procesados'] += procesados
+        for clave in ('exitos', 'errores', 'omitidos'):
+            detalles[clave] += resultado.get(clave, 0)
+        tarea.cantidad_entidades = detalles['exitos']
+        tarea.lease_hasta = timezone.now() + timedelta(seconds=ACCION_MASIVA_LEASE_SEGUNDOS)
+        tarea.save(update_fields=['detalles', 'cantidad_entidades', 'lease_hasta'])
+        return detalles.get('cancelar', False)
+
+
+def _finalizar_accion_masiva(tarea_id, cancelada, mensaje_error=None):
+    """Cierra la Tarea agregada preservando los contadores acumulados."""
+    with transaction.atomic():
+        tarea = Tarea.objects.select_for_update().get(id=tarea_id)
+        tarea.estado = Tarea.EstadoTarea.FAILED if mensaje_error else Tarea.EstadoTarea.COMPLETED
+        tarea.hora_fin = timezone.now()
+        tarea.lease_hasta = None
+        tarea.mensaje_error = mensaje_error
+        tarea.detalles['cancelada'] = cancelada
+        tarea.save(update_fields=['estado', 'hora_fin', 'lease_hasta', 'mensaje_error', 'detalles'])
+        return tarea
+
+
+def vencer_acciones_masivas():
+    """
+    Marca FAILED las acciones masivas abandonadas: RUNNING con el heartbeat
+    (lease_hasta) vencido, o PENDING hace más de
+    ACCION_MASIVA_ESPERA_MAXIMA_SEGUNDOS sin que un worker las tome.
+    Los contadores acumulados se conservan.
+
+    Returns:
+        Cantidad de acciones marcadas como fallidas
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        vencidas = list(
+            Tarea.objects.select_for_update(skip_locked=True)
+            .filter(tipo=Tarea.TipoTarea.ACCION_MASIVA)
+            .filter(
+                Q(estado=Tarea.EstadoTarea.RUNNING, lease_hasta__lt=ahora)
+                | Q(
+                    estado=Tarea.EstadoTarea.PENDING,
+                    hora_programada__lt=ahora - timedelta(seconds=ACCION_MASIVA_ESPERA_MAXIMA_SEGUNDOS)
+                )
+            )
+        )
+        for tarea in vencidas:
+            if tarea.estado == Tarea.EstadoTarea.RUNNING:
+                tarea.mensaje_error = 'El worker dejó de reportar progreso (caído o reiniciado)'
+            else:
+                tarea.mensaje_error = 'Ningún worker tomó la acción masiva'
+            tarea.estado = Tarea.EstadoTarea.FAILED
+            tarea.hora_fin = ahora
+            tarea.lease_hasta = None
+        if vencidas:
+            Tarea.objects.bulk_update(vencidas, ['estado', 'hora_fin', 'lease_hasta', 'mensaje_error'])
+
+    for tarea in vencidas:
+        registrar_log(
+            tipo='ERROR',
+            modulo='admin_action_sync',
+            mensaje=f"Acción masiva abandonada: {tarea.detalles.get('descripcion')} - {tarea.mensaje_error}",
+            usuario=tarea.usuario,
+            detalles={'tarea_id': tarea.id, 'accion': tarea.detalles.get('accion')}
+        )
+    if vencidas:
+        logger.warning(f"[Acción masiva] {len(vencidas)} acciones abandonadas marcadas como fallidas")
+    return len(vencidas)
+
+
+@shared_task(bind=True)
+def ejecutar_accion_masiva(self, tarea_id):
+    """
+    Ejecuta una acción masiva del admin en background, de a chunks de alumnos.
+
+    Entre chunks acumula los contadores en la Tarea agregada y revisa si se
+    pidió cancelar; el chunk en curso siempre se termina.
+
+    Args:
+        tarea_id: ID de la Tarea ACCION_MASIVA creada con crear_accion_masiva
+    """
+    try:
+        tarea = Tarea.objects.get(id=tarea_id, tipo=Tarea.TipoTarea.ACCION_MASIVA)
+    except Tarea.DoesNotExist:
+        logger.error(f"[Acción masiva] Tarea {tarea_id} no encontrada")
+        return {'success': False, 'error': 'Tarea no encontrada'}
+
+    accion = tarea.detalles.get('accion')
+    if accion not in ACCIONES_MASIVAS:
+        _finalizar_accion_masiva(tarea_id, False, f"Acción desconocida: {accion}")
+        return {'success': False, 'error': f'Acción desconocida: {accion}'}
+
+    descripcion, funcion = ACCIONES_MASIVAS[accion]
+    alumno_ids = tarea.detalles.get('alumno_ids', [])
+    chunk_size = getattr(settings, 'ACCION_MASIVA_CHUNK', ACCION_MASIVA_CHUNK_SIZE)
+
+    ahora = timezone.now()
+    Tarea.objects.filter(id=tarea_id).update(
+        estado=Tarea.EstadoTarea.RUNNING,
+        hora_inicio=ahora,
+        lease_hasta=ahora + timedelta(seconds=ACCION_MASIVA_LEASE_SEGUNDOS),
+        celery_task_id=self.request.id
+    )
+
+    registrar_log(
+        tipo='INFO',
+        modulo='admin_action_sync',
+        mensaje=f'Iniciando acción masiva: {descripcion} ({len(alumno_ids)} alumnos)',
+        usuario=tarea.usuario,
+        detalles={'tarea_id': tarea_id, 'accion': accion}
+    )
+
+    cancelada = tarea.detalles.get('cancelar', False)
+    try:
+        for inicio in range(0, len(alumno_ids), chunk_size):
+            if cancelada:
+                break
+            chunk = alumno_ids[inicio:inicio + chunk_size]
+            queryset = Alumno.objects.filter(id__in=chunk).order_by('apellido', 'nombre')
+            resultado = funcion(queryset, tarea.usuario)
+            cancelada = _acumular_progreso(tarea_id, resultado, len(chunk))
+    except Exception as e:
+        logger.exception(f"[Acción masiva] Error en tarea {tarea_id}: {e}")
+        tarea = _finalizar_accion_masiva(tarea_id, cancelada, str(e))
+        registrar_log(
+            tipo='ERROR',
+            modulo='admin_action_sync',
+            mensaje=f'Error en acción masiva: {descripcion}',
+            usuario=tarea.usuario,
+            detalles={'tarea_id': tarea_id, 'accion': accion, 'error': str(e)}
+        )
+        return {'success': False, 'error': str(e), **progreso_accion_masiva(tarea)}
+
+    tarea = _finalizar_accion_masiva(tarea_id, cancelada)
+    progreso = progreso_accion_masiva(tarea)
+
+    registrar_log(
+        tipo='WARNING' if cancelada else 'SUCCESS',
+        modulo='admin_action_sync',
+        mensaje=(
+            f"{'Cancelada' if cancelada else 'Completada'} acción masiva: {descripcion} - "
+            f"{progreso['exitos']} éxitos, {progreso['errores']} errores, {progreso['omitidos']} omitidos"
+        ),
+        usuario=tarea.usuario,
+        detalles={'tarea_id': tarea_id, 'accion': accion}
+    )
+
+    return {'success': True, **progreso}
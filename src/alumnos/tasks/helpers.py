@@ -13,15 +13,63 @@ Copyright (c) 2025 Carlos Dagorret
 """
 
 import logging
+import math
 import time
+from itertools import islice
 from celery import shared_task
+from django.db import transaction
 from django.utils import timezone
-from ..models import Configuracion, Log, Tarea, Alumno
+from ..models import Configuracion, Tarea, Alumno
+from ..utils.log_buffer import registrar_log
 from ..services.teams_service import TeamsService
 from ..services.email_service import EmailService
+from ..utils.rate_limit import ServicioLimitado, registrar_exito_tarea, reservar_cuota
 
 logger = logging.getLogger(__name__)
 
+# Filas por INSERT al encolar tareas en lote
+TAREAS_BULK_CHUNK_SIZE = 1000
+
+
+def encolar_tareas_alumnos(tipo, alumno_ids, detalles=None, chunk_size=TAREAS_BULK_CHUNK_SIZE):
+    """
+    Crea una Tarea PENDING de tipo `tipo` por cada alumno, con bulk_create por chunks.
+
+    `alumno_ids` se consume de a `chunk_size` elementos, así que puede ser un
+    iterador (ej: values_list('id', flat=True).iterator()) y la memoria queda
+    acotada al chunk aunque sean decenas de miles de alumnos.
+
+    Args:
+        tipo: Tarea.TipoTarea a crear
+        alumno_ids: Iterable de IDs de Alumno
+        detalles: Dict que se copia en cada tarea
+        chunk_size: Filas por INSERT
+
+    Returns:
+        int: Cantidad de tareas creadas
+    """
+    ids = iter(alumno_ids)
+    total = 0
+    with transaction.atomic():
+        while True:
+            chunk = list(islice(ids, chunk_size))
+            if not chunk:
+                break
+            Tarea.objects.bulk_create(
+                [
+                    Tarea(
+                        tipo=tipo,
+                        estado=Tarea.EstadoTarea.PENDING,
+                        alumno_id=alumno_id,
+                        detalles=dict(detalles or {}),
+                    )
+                    for alumno_id in chunk
+                ],
+                batch_size=chunk_size,
+            )
+            total += len(chunk)
+    return total
+
 
 @shared_task
 def activar_servicios_alumno(alumno_id):
@@ -56,7 +104,7 @@ def activar_servicios_alumno(alumno_id):
 
         if email_sent:
             logger.info(f"✅ Email de bienvenida enviado a preinscripto {alumno.email_personal}")
-            Log.objects.create(
+            registrar_log(
                 tipo=Log.TipoLog.SUCCESS,
                 modulo='activar_servicios',
                 mensaje=f"Email de bienvenida enviado a preinscripto",
@@ -67,7 +115,7 @@ def activar_servicios_alumno(alumno_id):
             alumno.save(update_fields=['email_procesado'])
         else:
             logger.error(f"❌ Error enviando email de bienvenida a preinscripto {alumno.email_personal}")
-            Log.objects.create(
+            registrar_log(
                 tipo=Log.TipoLog.ERROR,
                 modulo='activar_servicios',
                 mensaje=f"Error enviando email de bienvenida a preinscripto",
@@ -94,7 +142,7 @@ def activar_servicios_alumno(alumno_id):
         if teams_result and teams_result.get('created'):
             teams_success = True
             logger.info(f"✅ Usuario Teams creado para alumno {alumno_id}: {teams_result.get('upn')}")
-            Log.objects.create(
+            registrar_log(
                 tipo=Log.TipoLog.SUCCESS,
                 modulo='activar_servicios',
                 mensaje=f"Usuario Teams creado exitosamente",
@@ -103,7 +151,7 @@ def activar_servicios_alumno(alumno_id):
             )
         else:
             logger.warning(f"⚠️ Teams no retornó resultado válido para alumno {alumno_id}")
-            Log.objects.create(
+            registrar_log(
                 tipo=Log.TipoLog.WARNING,
                 modulo='activar_servicios',
                 mensaje=f"Teams no retornó resultado válido",
@@ -112,7 +160,7 @@ def activar_servicios_alumno(alumno_id):
             )
     except Exception as e:
         logger.error(f"❌ Error creando usuario Teams para alumno {alumno_id}: {e}")
-        Log.objects.create(
+        registrar_log(
             tipo=Log.TipoLog.ERROR,
             modulo='activar_servicios',
             mensaje=f"Error al crear usuario en Teams",
@@ -130,7 +178,7 @@ def activar_servicios_alumno(alumno_id):
 
         if email_sent:
             logger.info(f"✅ Email con credenciales enviado a {alumno.email}")
-            Log.objects.create(
+            registrar_log(
                 tipo=Log.TipoLog.SUCCESS,
                 modulo='activar_servicios',
                 mensaje=f"Email con credenciales enviado exitosamente",
@@ -139,7 +187,7 @@ def activar_servicios_alumno(alumno_id):
             )
         else:
             logger.error(f"❌ Error enviando email con credenciales a {alumno.email}")
-            Log.objects.create(
+            registrar_log(
                 tipo=Log.TipoLog.ERROR,
                 modulo='activar_servicios',
                 mensaje=f"Error al enviar email con credenciales",
@@ -153,7 +201,7 @@ def activar_servicios_alumno(alumno_id):
 
         if email_sent:
             logger.info(f"✅ Email de bienvenida enviado a {alumno.email}")
-            Log.objects.create(
+            registrar_log(
                 tipo=Log.TipoLog.INFO,
                 modulo='activar_servicios',
                 mensaje=f"Email de bienvenida enviado (Teams no disponible)",
@@ -162,7 +210,7 @@ def activar_servicios_alumno(alumno_id):
             )
         else:
             logger.error(f"❌ Error enviando email de bienvenida a {alumno.email}")
-            Log.objects.create(
+            registrar_log(
                 tipo=Log.TipoLog.ERROR,
                 modulo='activar_servicios',
                 mensaje=f"Error al enviar email de bienvenida",
@@ -187,7 +235,7 @@ def activar_servicios_alumno(alumno_id):
                     failed = moodle_result.get('failed_courses', [])
 
                     logger.info(f"✅ Moodle: {len(enrolled)} cursos enrollados, {len(failed)} fallidos")
-                    Log.objects.create(
+                    registrar_log(
                         tipo=Log.TipoLog.SUCCESS,
                         modulo='activar_servicios',
                         mensaje=f"Enrollamiento en Moodle exitoso",
@@ -200,7 +248,7 @@ def activar_servicios_alumno(alumno_id):
                     )
                 else:
                     logger.error(f"❌ Error en enrollamiento Moodle: {moodle_result.get('error')}")
-                    Log.objects.create(
+                    registrar_log(
                         tipo=Log.TipoLog.ERROR,
                         modulo='activar_servicios',
                         mensaje=f"Error en enrollamiento Moodle",
@@ -210,7 +258,7 @@ def activar_servicios_alumno(alumno_id):
 
             except Exception as e:
                 logger.error(f"❌ Excepción en Moodle para alumno {alumno_id}: {e}")
-                Log.objects.create(
+                registrar_log(
                     tipo=Log.TipoLog.ERROR,
                     modulo='activar_servicios',
                     mensaje=f"Excepción al enrollar en Moodle",
@@ -491,7 +539,7 @@ def procesar_alumno_nuevo_completo(self, alumno_id, estado):
         }
         tarea.save()
 
-        Log.objects.create(
+        registrar_log(
             tipo='ERROR',
             modulo='tasks',
             mensaje=f'Error en workflow completo para alumno',
@@ -510,15 +558,14 @@ def procesar_lote_alumnos_nuevos(self, alumno_ids, estado):
         alumno_ids: Lista de IDs de alumnos a procesar
         estado: Estado de los alumnos (preinscripto, aspirante, ingresante)
 
-    Esta tarea procesa alumnos uno por uno respetando el rate limit
-    configurado en Configuracion.rate_limit_teams.
+    Esta tarea procesa alumnos uno por uno con la misma cuota que la cola
+    para ACTIVAR_SERVICIOS (rate_limit_teams/moodle ajustados por el control
+    AIMD, compartidos entre workers). Cuando se agota la cuota, el servicio
+    está en pausa por Retry-After o una API responde 429/503, los alumnos
+    restantes se re-encolan como un nuevo lote, sin dormir el worker.
     """
-    import time
-    from .models import Configuracion
-
     config = Configuracion.load()
     rate_limit = config.rate_limit_teams  # tareas por minuto
-    delay_seconds = 60.0 / rate_limit if rate_limit > 0 else 0
 
     logger.info(f"[Batch] Procesando lote de {len(alumno_ids)} alumnos ({estado}) con rate limit {rate_limit}/min")
 
@@ -539,21 +586,37 @@ def procesar_lote_alumnos_nuevos(self, alumno_ids, estado):
     try:
         # Procesar alumnos uno por uno con rate limiting
         resultados = []
+        diferidos = []
         for idx, alumno_id in enumerate(alumno_ids):
+            espera = reservar_cuota(Tarea.TipoTarea.ACTIVAR_SERVICIOS, config)
+            if espera > 0:
+                diferidos = list(alumno_ids[idx:])
+                countdown = max(1, math.ceil(espera))
+                procesar_lote_alumnos_nuevos.apply_async(args=[diferidos, estado], countdown=countdown)
+                logger.info(f"[Batch] Cuota agotada: {len(diferidos)} alumnos re-encolados en {countdown}s")
+                break
+
             logger.info(f"[Batch] Procesando {idx+1}/{len(alumno_ids)}: alumno_id={alumno_id}")
 
-            # Ejecutar workflow síncronamente
-            resultado = procesar_alumno_nuevo_completo(alumno_id, estado)
+            # Ejecutar workflow síncronamente. Los 429/503 ya quedaron registrados
+            # en el control AIMD por el servicio que los recibió
+            try:
+                resultado = procesar_alumno_nuevo_completo(alumno_id, estado)
+            except ServicioLimitado as e:
+                diferidos = list(alumno_ids[idx:])
+                countdown = max(1, math.ceil(e.retry_after))
+                procesar_lote_alumnos_nuevos.apply_async(args=[diferidos, estado], countdown=countdown)
+                logger.warning(
+                    f"[Batch] {e.servicio} limitado: {len(diferidos)} alumnos re-encolados en {countdown}s"
+                )
+                break
             resultados.append(resultado)
 
-            # Rate limiting: Esperar antes del siguiente (excepto en el último)
-            if idx < len(alumno_ids) - 1 and delay_seconds > 0:
-                logger.debug(f"[Batch] Esperando {delay_seconds:.2f}s (rate limit)")
-                time.sleep(delay_seconds)
-
         # Contar éxitos y fallos
         exitosos = sum(1 for r in resultados if r.get('success'))
-        fallidos = len(alumno_ids) - exitosos
+        fallidos = len(resultados) - exitosos
+        if exitosos:
+            registrar_exito_tarea(Tarea.TipoTarea.ACTIVAR_SERVICIOS, config, exitosos)
 
         # Actualizar tarea del lote
         tarea.estado = Tarea.EstadoTarea.COMPLETED
@@ -564,7 +627,8 @@ def procesar_lote_alumnos_nuevos(self, alumno_ids, estado):
             'cantidad_alumnos': len(alumno_ids),
             'estado': estado,
             'exitosos': exitosos,
-            'fallidos': fallidos
+            'fallidos': fallidos,
+            'diferidos': len(diferidos)
         }
         tarea.save()
 
@@ -574,7 +638,8 @@ def procesar_lote_alumnos_nuevos(self, alumno_ids, estado):
             'success': True,
             'total': len(alumno_ids),
             'exitosos': exitosos,
-            'fallidos': fallidos
+            'fallidos': fallidos,
+            'diferidos': len(diferidos)
         }
 
     except Exception as e:
@@ -585,7 +650,7 @@ def procesar_lote_alumnos_nuevos(self, alumno_ids, estado):
         tarea.hora_fin = timezone.now()
         tarea.save()
 
-        Log.objects.create(
+        registrar_log(
             tipo='ERROR',
             modulo='tasks',
             mensaje=f'Error procesando lote de {len(alumno_ids)} alumnos',
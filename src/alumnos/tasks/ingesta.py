@@ -35,8 +35,10 @@ import logging
 from datetime import timedelta
 from celery import shared_task
 from django.utils import timezone
-from ..models import Configuracion, Log, Tarea
+from ..models import Configuracion, Tarea
+from ..utils.log_buffer import registrar_log
 from ..services import ingerir_desde_sial
+from .helpers import encolar_tareas_alumnos
 
 logger = logging.getLogger(__name__)
 
@@ -102,12 +104,14 @@ def ingestar_preinscriptos(self):
         enviar_email = config.preinscriptos_enviar_email
 
         # ✨ Ejecutar con desde/hasta
+        estadisticas = {}
         created, updated, errors, nuevos_ids = ingerir_desde_sial(
             tipo='preinscriptos',
             desde=desde,
             hasta=hasta,
             retornar_nuevos=True,
-            enviar_email=enviar_email
+            enviar_email=enviar_email,
+            estadisticas=estadisticas,
         )
 
         # 🔧 DETERMINAR TIPO DE LOG: "Ingesta" si hubo datos, "Chequeo de Ingesta" si no
@@ -151,6 +155,7 @@ def ingestar_preinscriptos(self):
             'errores_correo': errores_categorizados['correo'],
             'errores_guardado': errores_categorizados['guardado'],
             'errores_otros': errores_categorizados['otros'],
+            'cache_datospersonales': estadisticas.get('cache_datospersonales'),
         }
         tarea.save()
 
@@ -159,7 +164,7 @@ def ingestar_preinscriptos(self):
         config.save(update_fields=['ultima_ingesta_preinscriptos'])
         logger.info(f"[{log_prefix} Auto-Preinscriptos] Timestamp actualizado: {ahora}")
 
-        Log.objects.create(
+        registrar_log(
             tipo='SUCCESS' if len(errors) == 0 else 'WARNING',
             modulo='tasks',
             mensaje=f'{log_prefix} automática de preinscriptos: {created} creados, {updated} actualizados, {len(errors)} errores',
@@ -200,7 +205,7 @@ def ingestar_preinscriptos(self):
         tarea.hora_fin = timezone.now()
         tarea.save()
 
-        Log.objects.create(
+        registrar_log(
             tipo='ERROR',
             modulo='tasks',
             mensaje=f'Error en ingesta automática de preinscriptos',
@@ -265,12 +270,14 @@ def ingestar_aspirantes(self):
         logger.info(f"[{{log_prefix}} Auto-Aspirantes] Enviar email: {enviar_email}")
 
         # ✨ Ejecutar con desde/hasta
+        estadisticas = {}
         created, updated, errors, nuevos_ids = ingerir_desde_sial(
             tipo='aspirantes',
             desde=desde,
             hasta=hasta,
             retornar_nuevos=True,
-            enviar_email=enviar_email
+            enviar_email=enviar_email,
+            estadisticas=estadisticas,
         )
 
         # 🔧 DETERMINAR TIPO DE LOG: Ingesta si hubo datos, Chequeo de Ingesta si no
@@ -314,6 +321,7 @@ def ingestar_aspirantes(self):
             'errores_correo': errores_categorizados['correo'],
             'errores_guardado': errores_categorizados['guardado'],
             'errores_otros': errores_categorizados['otros'],
+            'cache_datospersonales': estadisticas.get('cache_datospersonales'),
         }
         tarea.save()
 
@@ -322,7 +330,7 @@ def ingestar_aspirantes(self):
         config.save(update_fields=['ultima_ingesta_aspirantes'])
         logger.info(f"[{log_prefix} Auto-Aspirantes] Timestamp actualizado: {ahora}")
 
-        Log.objects.create(
+        registrar_log(
             tipo='SUCCESS' if len(errors) == 0 else 'WARNING',
             modulo='tasks',
             mensaje=f'Ingesta automática de aspirantes: {created} creados, {updated} actualizados, {len(errors)} errores',
@@ -351,32 +359,28 @@ def ingestar_aspirantes(self):
         if nuevos_ids and len(nuevos_ids) > 0:
             logger.info(f"[{log_prefix} Auto-Aspirantes] {len(nuevos_ids)} aspirantes nuevos detectados")
 
-            # Crear tareas individuales para cada alumno nuevo
+            # Crear tareas individuales para cada alumno nuevo (bulk_create por chunks)
             if config.aspirantes_activar_teams:
                 logger.info(f"[{log_prefix} Auto-Aspirantes] Creando {len(nuevos_ids)} tareas individuales Teams")
-                for alumno_id in nuevos_ids:
-                    Tarea.objects.create(
-                        tipo=Tarea.TipoTarea.CREAR_USUARIO_TEAMS,
-                        estado=Tarea.EstadoTarea.PENDING,
-                        alumno_id=alumno_id,
-                        detalles={
-                            'origen': 'ingesta_automatica_aspirantes',
-                            'enviar_email': True  # Enviar email con credenciales
-                        }
-                    )
+                encolar_tareas_alumnos(
+                    Tarea.TipoTarea.CREAR_USUARIO_TEAMS,
+                    nuevos_ids,
+                    detalles={
+                        'origen': 'ingesta_automatica_aspirantes',
+                        'enviar_email': True  # Enviar email con credenciales
+                    }
+                )
 
             if config.aspirantes_activar_moodle:
                 logger.info(f"[{log_prefix} Auto-Aspirantes] Creando {len(nuevos_ids)} tareas individuales Moodle")
-                for alumno_id in nuevos_ids:
-                    Tarea.objects.create(
-                        tipo=Tarea.TipoTarea.MOODLE_ENROLL,
-                        estado=Tarea.EstadoTarea.PENDING,
-                        alumno_id=alumno_id,
-                        detalles={
-                            'origen': 'ingesta_automatica_aspirantes',
-                            'enviar_email': True  # Enviar email de enrollamiento Moodle
-                        }
-                    )
+                encolar_tareas_alumnos(
+                    Tarea.TipoTarea.MOODLE_ENROLL,
+                    nuevos_ids,
+                    detalles={
+                        'origen': 'ingesta_automatica_aspirantes',
+                        'enviar_email': True  # Enviar email de enrollamiento Moodle
+                    }
+                )
 
             if not config.aspirantes_activar_teams and not config.aspirantes_activar_moodle:
                 logger.info(f"[{log_prefix} Auto-Aspirantes] Sin activación automática configurada")
@@ -391,7 +395,7 @@ def ingestar_aspirantes(self):
         tarea.hora_fin = timezone.now()
         tarea.save()
 
-        Log.objects.create(
+        registrar_log(
             tipo='ERROR',
             modulo='tasks',
             mensaje=f'Error en ingesta automática de aspirantes',
@@ -456,12 +460,14 @@ def ingestar_ingresantes(self):
         logger.info(f"[{{log_prefix}} Auto-Ingresantes] Enviar email: {enviar_email}")
 
         # ✨ Ejecutar con desde/hasta
+        estadisticas = {}
         created, updated, errors, nuevos_ids = ingerir_desde_sial(
             tipo='ingresantes',
             desde=desde,
             hasta=hasta,
             retornar_nuevos=True,
-            enviar_email=enviar_email
+            enviar_email=enviar_email,
+            estadisticas=estadisticas,
         )
 
         # 🔧 DETERMINAR TIPO DE LOG: Ingesta si hubo datos, Chequeo de Ingesta si no
@@ -505,6 +511,7 @@ def ingestar_ingresantes(self):
             'errores_correo': errores_categorizados['correo'],
             'errores_guardado': errores_categorizados['guardado'],
             'errores_otros': errores_categorizados['otros'],
+            'cache_datospersonales': estadisticas.get('cache_datospersonales'),
         }
         tarea.save()
 
@@ -513,7 +520,7 @@ def ingestar_ingresantes(self):
         config.save(update_fields=['ultima_ingesta_ingresantes'])
         logger.info(f"[{log_prefix} Auto-Ingresantes] Timestamp actualizado: {ahora}")
 
-        Log.objects.create(
+        registrar_log(
             tipo='SUCCESS' if len(errors) == 0 else 'WARNING',
             modulo='tasks',
             mensaje=f'Ingesta automática de ingresantes: {created} creados, {updated} actualizados, {len(errors)} errores',
@@ -542,32 +549,28 @@ def ingestar_ingresantes(self):
         if nuevos_ids and len(nuevos_ids) > 0:
             logger.info(f"[{log_prefix} Auto-Ingresantes] {len(nuevos_ids)} ingresantes nuevos detectados")
 
-            # Crear tareas individuales para cada alumno nuevo
+            # Crear tareas individuales para cada alumno nuevo (bulk_create por chunks)
             if config.ingresantes_activar_teams:
                 logger.info(f"[{log_prefix} Auto-Ingresantes] Creando {len(nuevos_ids)} tareas individuales Teams")
-                for alumno_id in nuevos_ids:
-                    Tarea.objects.create(
-                        tipo=Tarea.TipoTarea.CREAR_USUARIO_TEAMS,
-                        estado=Tarea.EstadoTarea.PENDING,
-                        alumno_id=alumno_id,
-                        detalles={
-                            'origen': 'ingesta_automatica_ingresantes',
-                            'enviar_email': True  # Enviar email con credenciales
-                        }
-                    )
+                encolar_tareas_alumnos(
+                    Tarea.TipoTarea.CREAR_USUARIO_TEAMS,
+                    nuevos_ids,
+                    detalles={
+                        'origen': 'ingesta_automatica_ingresantes',
+                        'enviar_email': True  # Enviar email con credenciales
+                    }
+                )
 
             if config.ingresantes_activar_moodle:
                 logger.info(f"[{log_prefix} Auto-Ingresantes] Creando {len(nuevos_ids)} tareas individuales Moodle")
-                for alumno_id in nuevos_ids:
-                    Tarea.objects.create(
-                        tipo=Tarea.TipoTarea.MOODLE_ENROLL,
-                        estado=Tarea.EstadoTarea.PENDING,
-                        alumno_id=alumno_id,
-                        detalles={
-                            'origen': 'ingesta_automatica_ingresantes',
-                            'enviar_email': True  # Enviar email de enrollamiento Moodle
-                        }
-                    )
+                encolar_tareas_alumnos(
+                    Tarea.TipoTarea.MOODLE_ENROLL,
+                    nuevos_ids,
+                    detalles={
+                        'origen': 'ingesta_automatica_ingresantes',
+                        'enviar_email': True  # Enviar email de enrollamiento Moodle
+                    }
+                )
 
             if not config.ingresantes_activar_teams and not config.ingresantes_activar_moodle:
                 logger.info(f"[{log_prefix} Auto-Ingresantes] Sin activación automática configurada")
@@ -582,7 +585,7 @@ def ingestar_ingresantes(self):
         tarea.hora_fin = timezone.now()
         tarea.save()
 
-        Log.objects.create(
+        registrar_log(
             tipo='ERROR',
             modulo='tasks',
             mensaje=f'Error en ingesta automática de ingresantes',
@@ -644,6 +647,7 @@ def ingesta_manual_task(self, tipo, n=None, seed=None, desde=None, hasta=None, e
         logger.info(f"[Ingesta Manual] Parámetros: n={n}, seed={seed}, desde={desde}, hasta={hasta}, enviar_email={enviar_email}")
 
         # Ejecutar ingesta
+        estadisticas = {}
         created, updated, errors, nuevos_ids = ingerir_desde_sial(
             tipo=tipo,
             n=n,
@@ -652,7 +656,8 @@ def ingesta_manual_task(self, tipo, n=None, seed=None, desde=None, hasta=None, e
             hasta=hasta,
             seed=seed,
             retornar_nuevos=True,
-            enviar_email=False  # NO enviar email síncronamente, se procesa en cola después
+            enviar_email=False,  # NO enviar email síncronamente, se procesa en cola después
+            estadisticas=estadisticas,
         )
 
         # 🔧 CATEGORIZACIÓN DE ERRORES
@@ -698,6 +703,7 @@ def ingesta_manual_task(self, tipo, n=None, seed=None, desde=None, hasta=None, e
             'errores_correo': errores_categorizados['correo'],
             'errores_guardado': errores_categorizados['guardado'],
             'errores_otros': errores_categorizados['otros'],
+            'cache_datospersonales': estadisticas.get('cache_datospersonales'),
         }
         tarea.save()
 
@@ -715,7 +721,7 @@ def ingesta_manual_task(self, tipo, n=None, seed=None, desde=None, hasta=None, e
         if errores_categorizados['guardado']:
             logger.error(f"[Ingesta Manual] Errores de guardado: {len(errores_categorizados['guardado'])}")
 
-        Log.objects.create(
+        registrar_log(
             tipo='SUCCESS' if len(errors) == 0 else 'WARNING',
             modulo='tasks',
             mensaje=f'Ingesta manual de {tipo}: {created} creados, {updated} actualizados, {len(errors)} errores',
@@ -749,7 +755,7 @@ def ingesta_manual_task(self, tipo, n=None, seed=None, desde=None, hasta=None, e
         tarea.hora_fin = timezone.now()
         tarea.save()
 
-        Log.objects.create(
+        registrar_log(
             tipo='ERROR',
             modulo='tasks',
             mensaje=f'Error fatal en ingesta manual de {tipo}',
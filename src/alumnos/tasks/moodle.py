@@ -14,7 +14,8 @@ Copyright (c) 2025 Carlos Dagorret
 
 import logging
 from celery import shared_task
-from ..models import Log, Alumno
+from ..models import Alumno
+from ..utils.log_buffer import registrar_log
 
 logger = logging.getLogger(__name__)
 
@@ -93,7 +94,7 @@ def enrollar_moodle_task(self, alumno_id, enviar_email=False):
             alumno.moodle_procesado = True
             alumno.save()
 
-            Log.objects.create(
+            registrar_log(
                 tipo='INFO',
                 modulo='tasks',
                 mensaje=f'Usuario creado y enrollado en Moodle: {alumno.email_institucional}',
@@ -113,7 +114,7 @@ def enrollar_moodle_task(self, alumno_id, enviar_email=False):
         resultado_moodle['success'] = False
         resultado_moodle['error'] = str(e)
 
-        Log.objects.create(
+        registrar_log(
             tipo='ERROR',
             modulo='tasks',
             mensaje=f'Error enrollando en Moodle: {alumno.email_institucional}',
@@ -132,7 +133,7 @@ def enrollar_moodle_task(self, alumno_id, enviar_email=False):
 
             if email_result:
                 resultado_email['success'] = True
-                Log.objects.create(
+                registrar_log(
                     tipo='INFO',
                     modulo='tasks',
                     mensaje=f'Email de enrollamiento Moodle enviado a: {alumno.email}',
@@ -18,6 +18,7 @@ from celery import shared_task
 from django.utils import timezone
 from ..models import Tarea, Alumno
 from ..services import ingerir_desde_sial
+from .helpers import TAREAS_BULK_CHUNK_SIZE, encolar_tareas_alumnos
 
 logger = logging.getLogger(__name__)
 
@@ -214,12 +215,14 @@ def _ejecutar_ingesta_personalizada(tarea_config, celery_task_id):
         )
 
         try:
+            estadisticas = {}
             created, updated, errors, nuevos_ids = ingerir_desde_sial(
                 tipo=tipo_ingesta,
                 desde=desde,
                 hasta=hasta,
                 retornar_nuevos=True,
-                enviar_email=tarea_config.enviar_email
+                enviar_email=tarea_config.enviar_email,
+                estadisticas=estadisticas,
             )
 
             tarea.estado = Tarea.EstadoTarea.COMPLETED
@@ -228,7 +231,8 @@ def _ejecutar_ingesta_personalizada(tarea_config, celery_task_id):
             tarea.detalles.update({
                 'created': created,
                 'updated': updated,
-                'errors': len(errors)
+                'errors': len(errors),
+                'cache_datospersonales': estadisticas.get('cache_datospersonales'),
             })
             tarea.save()
 
@@ -251,18 +255,19 @@ def _ejecutar_ingesta_personalizada(tarea_config, celery_task_id):
 def _ejecutar_accion_sobre_alumnos(tarea_config, celery_task_id):
     """
     Ejecuta una acción sobre alumnos según filtros de TareaPersonalizada.
-    """
-    from .models import Alumno, Tarea
 
+    Las tareas se crean con bulk_create por chunks recorriendo solo los IDs
+    (values_list + iterator), sin cargar los Alumno en memoria.
+    """
     # Filtrar alumnos según tipo
     queryset = Alumno.objects.all()
     if tarea_config.tipo_usuario != 'todos':
         queryset = queryset.filter(estado_actual=tarea_config.tipo_usuario)
 
-    alumnos = list(queryset)
-    logger.info(f"[TareaPersonalizada] Encontrados {len(alumnos)} alumnos para procesar")
+    total = queryset.count()
+    logger.info(f"[TareaPersonalizada] Encontrados {total} alumnos para procesar")
 
-    if not alumnos:
+    if not total:
         return {'success': True, 'mensaje': 'No hay alumnos para procesar', 'procesados': 0}
 
     # Mapear acción a tipo de tarea
@@ -277,24 +282,19 @@ def _ejecutar_accion_sobre_alumnos(tarea_config, celery_task_id):
     tipo_tarea = accion_to_tipo.get(tarea_config.accion)
 
     # Crear tareas en cola para cada alumno
-    tareas_creadas = []
-    for alumno in alumnos:
-        tarea = Tarea.objects.create(
-            tipo=tipo_tarea,
-            estado=Tarea.EstadoTarea.PENDING,
-            alumno=alumno,
-            detalles={
-                'tarea_personalizada_id': tarea_config.id,
-                'origen': 'tarea_personalizada'
-            }
-        )
-        tareas_creadas.append(tarea.id)
+    creadas = encolar_tareas_alumnos(
+        tipo_tarea,
+        queryset.values_list('id', flat=True).iterator(chunk_size=TAREAS_BULK_CHUNK_SIZE),
+        detalles={
+            'tarea_personalizada_id': tarea_config.id,
+            'origen': 'tarea_personalizada'
+        }
+    )
 
-    logger.info(f"[TareaPersonalizada] ✅ {len(tareas_creadas)} tareas creadas en cola")
+    logger.info(f"[TareaPersonalizada] ✅ {creadas} tareas creadas en cola")
 
     return {
         'success': True,
-        'mensaje': f'{len(tareas_creadas)} tareas encoladas',
-        'tareas_creadas': tareas_creadas,
-        'procesados': len(tareas_creadas)
+        'mensaje': f'{creadas} tareas encoladas',
+        'procesados': creadas
     }
@@ -13,95 +13,468 @@ Copyright (c) 2025 Carlos Dagorret
 """
 
 import logging
+import math
+import threading
 import time
 from collections import defaultdict
+from datetime import timedelta
 from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 from ..models import Configuracion, Tarea
+from ..utils.rate_limit import SERVICIOS_POR_TIPO, ServicioLimitado, registrar_exito_tarea, reservar_cuota
 
 logger = logging.getLogger(__name__)
 
+# Carriles de la cola: cada uno tiene sus propios consumidores (settings.COLA_CONCURRENCIA)
+# para que un lote lento de un servicio no demore a los demás
+CARRILES = {
+    'teams': (
+        Tarea.TipoTarea.CREAR_USUARIO_TEAMS,
+        Tarea.TipoTarea.RESETEAR_PASSWORD,
+        Tarea.TipoTarea.ACTIVAR_SERVICIOS,
+        Tarea.TipoTarea.ELIMINAR_CUENTA,
+    ),
+    'moodle': (
+        Tarea.TipoTarea.MOODLE_ENROLL,
+    ),
+    'email': (
+        Tarea.TipoTarea.ENVIAR_EMAIL,
+    ),
+    'uti': (
+        Tarea.TipoTarea.INGESTA_PREINSCRIPTOS,
+        Tarea.TipoTarea.INGESTA_ASPIRANTES,
+        Tarea.TipoTarea.INGESTA_INGRESANTES,
+    ),
+}
+
+# Segundos que una tarea reclamada queda reservada para su consumidor; vencido
+# el lease, recuperar_leases_vencidos la devuelve a PENDING
+TAREA_LEASE_SEGUNDOS = 30 * 60
+
+# Segundos que un consumidor retiene su lugar en el carril (si el worker muere,
+# se libera solo). Igual al lease de sus tareas y se renueva junto con él, para
+# que no entre un segundo consumidor mientras el lote sigue en curso.
+LEASE_CONSUMIDOR_SEGUNDOS = TAREA_LEASE_SEGUNDOS
+MAX_RECUPERACIONES_LEASE = 3
+
+# Re-encolado de tareas limitadas por la API (429/503): backoff exponencial
+# desde BASE hasta MAXIMO segundos, respetando Retry-After
+BACKOFF_LIMITACION_BASE = 30
+BACKOFF_LIMITACION_MAXIMO = 15 * 60
+MAX_REINTENTOS_LIMITACION = 5
+
+# Campos que cambian al cerrar (o re-encolar) una tarea; se persisten con bulk_update
+CAMPOS_ESTADO_TAREA = [
+    'estado', 'detalles', 'mensaje_error', 'cantidad_entidades',
+    'hora_inicio', 'hora_fin', 'lease_hasta', 'no_antes_de',
+]
+
+
+# Lease del lote que procesa el consumidor en curso (lo usan los CheckpointTareas)
+_lote_local = threading.local()
+
+
+class LeaseLote:
+    """
+    Lease de las tareas que reclamó un consumidor. Se identifica por el valor
+    de lease_hasta que tienen sus filas: al renovarlo cambia, así una tarea que
+    venció y reclamó otro consumidor deja de pertenecer a este lote.
+    Si se pasa el lock Redis del consumidor, se renueva junto con el lease.
+    """
+
+    def __init__(self, tareas, lease_hasta, lock=None):
+        self.ids = {t.id for t in tareas}
+        self.lease_hasta = lease_hasta
+        self.lock = lock
+
+    def vigentes(self, ids):
+        """IDs que siguen RUNNING con este lease (llamar dentro de una transacción)."""
+        return set(
+            Tarea.objects.select_for_update()
+            .filter(id__in=ids, estado=Tarea.EstadoTarea.RUNNING, lease_hasta=self.lease_hasta)
+            .values_list('id', flat=True)
+        )
+
+    def cerrar(self, ids):
+        """Saca del lease las tareas ya resueltas."""
+        self.ids.difference_update(ids)
+
+    def renovar(self):
+        """Extiende TAREA_LEASE_SEGUNDOS el lease de las tareas del lote todavía abiertas."""
+        if self.lock is not None:
+            try:
+                self.lock.extend(LEASE_CONSUMIDOR_SEGUNDOS, replace_ttl=True)
+            except Exception as e:
+                logger.warning(f"[Cola] No se pudo renovar el lock del consumidor: {e}")
+        if not self.ids:
+            return 0
+        nuevo = timezone.now() + timedelta(seconds=TAREA_LEASE_SEGUNDOS)
+        renovadas = Tarea.objects.filter(
+            id__in=self.ids, estado=Tarea.EstadoTarea.RUNNING, lease_hasta=self.lease_hasta
+        ).update(lease_hasta=nuevo)
+        self.lease_hasta = nuevo
+        return renovadas
+
+
+def lease_actual():
+    """LeaseLote del lote que procesa este hilo, o None (ej: fuera de la cola)."""
+    return getattr(_lote_local, 'lease', None)
+
+
+class CheckpointTareas:
+    """
+    Acumula en memoria las tareas ya resueltas de un lote y las persiste con un
+    bulk_update cada settings.COLA_CHECKPOINT_TAREAS tareas o
+    COLA_CHECKPOINT_SEGUNDOS segundos (lo que ocurra primero), y al cerrar el lote.
+
+    Entre checkpoints el admin sigue viendo las tareas en RUNNING; la
+    granularidad con que se actualiza el estado visible es la del checkpoint.
+    Si el lote tiene lease (consumidor de la cola), solo se escriben las tareas
+    que siguen siendo de este consumidor y en cada checkpoint se renueva el
+    lease de las que quedan abiertas.
+    """
+
+    def __init__(self, cada=None, segundos=None, lease=None):
+        self.cada = cada or getattr(settings, 'COLA_CHECKPOINT_TAREAS', 25)
+        self.segundos = segundos if segundos is not None else getattr(settings, 'COLA_CHECKPOINT_SEGUNDOS', 10)
+        self.lease = lease or lease_actual()
+        self._pendientes = {}
+        self._desde = time.monotonic()
+
+    def agregar(self, tarea):
+        self._pendientes[tarea.id] = tarea
+        if len(self._pendientes) >= self.cada or time.monotonic() - self._desde >= self.segundos:
+            self.guardar()
+
+    def guardar(self):
+        """Persiste las tareas acumuladas en un solo UPDATE."""
+        self._desde = time.monotonic()
+        if not self._pendientes:
+            return 0
+        tareas = list(self._pendientes.values())
+        self._pendientes = {}
+        for tarea in tareas:
+            if tarea.estado != Tarea.EstadoTarea.RUNNING:
+                tarea.lease_hasta = None
+
+        if self.lease is None:
+            Tarea.objects.bulk_update(tareas, CAMPOS_ESTADO_TAREA)
+            return len(tareas)
+
+        with transaction.atomic():
+            vigentes = self.lease.vigentes([t.id for t in tareas])
+            perdidas = [t.id for t in tareas if t.id not in vigentes]
+            if perdidas:
+                # Lease vencido y tarea re-tomada por otro consumidor: su estado manda
+                logger.warning(f"[Cola] {len(perdidas)} tareas ya no pertenecen a este lote, no se guardan: {perdidas}")
+            tareas = [t for t in tareas if t.id in vigentes]
+            Tarea.objects.bulk_update(tareas, CAMPOS_ESTADO_TAREA)
+
+        self.lease.cerrar([t.id for t in tareas] + perdidas)
+        self.lease.renovar()
+        return len(tareas)
+
+
+def _carril_de_tipo(tipo_tarea):
+    for carril, tipos in CARRILES.items():
+        if tipo_tarea in tipos:
+            return carril
+    return None
+
+
+def _concurrencia_carril(carril):
+    from django.conf import settings
+    return max(1, getattr(settings, 'COLA_CONCURRENCIA', {}).get(carril, 1))
+
 
 @shared_task(bind=True)
 def procesar_cola_tareas_pendientes(self):
     """
-    Procesa tareas pendientes en la cola respetando batch_size y rate_limits.
+    Distribuye las tareas pendientes entre consumidores independientes por carril.
 
     Esta tarea se ejecuta cada 5 minutos vía Celery Beat y:
-    1. Busca tareas con estado=PENDING
-    2. Agrupa por tipo de tarea
-    3. Procesa hasta batch_size tareas por ejecución
-    4. Aplica rate limiting según el tipo de tarea
+    1. Devuelve a PENDING las tareas cuyo lease venció (recuperar_leases_vencidos)
+       y marca FAILED las acciones masivas abandonadas (vencer_acciones_masivas)
+    2. Cuenta tareas con estado=PENDING por carril (teams, moodle, email, uti)
+    3. Lanza, por cada carril con pendientes, hasta settings.COLA_CONCURRENCIA[carril]
+       consumidores procesar_carril_tareas, que reclaman tareas con SKIP LOCKED
+    4. Cada consumidor procesa lotes de batch_size y se re-encola mientras
+       queden pendientes, así el throughput depende de los workers disponibles
+       y no del intervalo de Beat
 
     **Arquitectura**:
     - Las acciones del admin crean registros Tarea con estado=PENDING
-    - Este procesador las toma en lotes y ejecuta respetando límites
+    - Los consumidores de cada carril las toman en lotes y ejecutan respetando límites
     - Ver docs/ARQUITECTURA_COLAS.md para más detalles
 
-    **Rate Limits** (configurables en modelo Configuracion):
-    - rate_limit_teams: Tareas/minuto para Microsoft Teams/Graph API
+    **Rate Limits** (configurables en modelo Configuracion, compartidos vía Redis):
+    - rate_limit_teams: Tareas/minuto para Microsoft Teams/Graph API (carriles teams y email)
     - rate_limit_moodle: Tareas/minuto para Moodle Web Services
     - rate_limit_uti: Tareas/minuto para API UTI/SIAL
     """
-    import time
-    from collections import defaultdict
+    from django.db.models import Count
+    from .acciones_admin import vencer_acciones_masivas
+
+    recuperar_leases_vencidos()
+    vencer_acciones_masivas()
+
+    # Mismo criterio que reclamar_tareas: las que esperan su backoff no cuentan
+    ahora = timezone.now()
+    conteos = dict(
+        Tarea.objects.filter(estado=Tarea.EstadoTarea.PENDING)
+        .filter(Q(no_antes_de__isnull=True) | Q(no_antes_de__lte=ahora))
+        .exclude(tipo=Tarea.TipoTarea.ACCION_MASIVA)  # las ejecuta ejecutar_accion_masiva
+        .order_by()
+        .values_list('tipo')
+        .annotate(total=Count('id'))
+    )
+
+    if not conteos:
+        logger.info("[Cola] No hay tareas pendientes")
+        return {'procesadas': 0, 'mensaje': 'No hay tareas pendientes'}
 
-    config = Configuracion.load()
-    batch_size = config.batch_size
+    pendientes_por_carril = defaultdict(int)
+    for tipo_tarea, total in conteos.items():
+        carril = _carril_de_tipo(tipo_tarea)
+        if carril is None:
+            logger.warning(f"[Cola] {total} tareas de tipo '{tipo_tarea}' sin carril asignado")
+            continue
+        pendientes_por_carril[carril] += total
+
+    consumidores = 0
+    for carril, pendientes in pendientes_por_carril.items():
+        concurrencia = _concurrencia_carril(carril)
+        for consumidor in range(min(concurrencia, pendientes)):
+            procesar_carril_tareas.delay(carril, consumidor)
+            consumidores += 1
+        logger.info(f"[Cola:{carril}] {pendientes} tareas pendientes, {min(concurrencia, pendientes)} consumidores")
 
-    logger.info(f"[Cola] Iniciando procesamiento de tareas pendientes (batch_size={batch_size})")
+    return {
+        'pendientes': dict(pendientes_por_carril),
+        'consumidores': consumidores
+    }
 
-    # Buscar tareas pendientes (ordenadas por antigüedad)
-    tareas_pending = Tarea.objects.filter(
-        estado=Tarea.EstadoTarea.PENDING
-    ).order_by('hora_programada')[:batch_size * 2]  # Traer más para asegurar batch completo
 
-    if not tareas_pending.exists():
-        logger.info("[Cola] No hay tareas pendientes")
-        return {'procesadas': 0, 'mensaje': 'No hay tareas pendientes'}
+@shared_task(bind=True)
+def procesar_carril_tareas(self, carril, consumidor=0):
+    """
+    Consumidor de un carril de la cola: reclama hasta batch_size tareas PENDING
+    de los tipos del carril (reclamar_tareas, con SKIP LOCKED y lease) y las procesa.
 
-    # Agrupar por tipo de tarea
-    tareas_por_tipo = defaultdict(list)
-    contador_total = 0
+    Un lock en Redis por (carril, consumidor) limita los consumidores activos
+    a la concurrencia del carril. Al terminar se re-encola de inmediato si
+    quedan pendientes, o con countdown si el lote se cortó por rate limit.
+    """
+    from ..utils.redis_client import get_redis
 
-    for tarea in tareas_pending:
-        if contador_total >= batch_size:
-            break
-        tareas_por_tipo[tarea.tipo].append(tarea)
-        contador_total += 1
+    tipos = CARRILES.get(carril)
+    if not tipos:
+        return {'error': f'Carril desconocido: {carril}'}
 
-    logger.info(f"[Cola] Encontradas {contador_total} tareas pendientes agrupadas en {len(tareas_por_tipo)} tipos")
+    concurrencia = _concurrencia_carril(carril)
+    if consumidor >= concurrencia:
+        return {'carril': carril, 'consumidor': consumidor, 'mensaje': 'Consumidor fuera de la concurrencia actual'}
 
-    # Procesar cada tipo con su rate limit correspondiente
-    resultados = {}
-    for tipo_tarea, tareas in tareas_por_tipo.items():
-        logger.info(f"[Cola] Procesando {len(tareas)} tareas de tipo '{tipo_tarea}'")
+    r = get_redis()
+    lock = None
+    if r is not None:
+        try:
+            lock = r.lock(f"lucy:cola:{carril}:{consumidor}", timeout=LEASE_CONSUMIDOR_SEGUNDOS)
+            if not lock.acquire(blocking=False):
+                logger.debug(f"[Cola:{carril}] Consumidor {consumidor} ya está activo")
+                return {'carril': carril, 'consumidor': consumidor, 'mensaje': 'Consumidor activo'}
+            # Esta ejecución consume la re-programación pendiente (si la había)
+            r.delete(f"lucy:cola:{carril}:{consumidor}:programada")
+        except Exception as e:
+            logger.warning(f"[Cola:{carril}] Error tomando lock en Redis: {e}")
+            lock = None
 
-        resultado = procesar_lote_por_tipo_tarea(
-            tareas=tareas,
-            tipo_tarea=tipo_tarea,
-            config=config
+    try:
+        config = Configuracion.load()
+        batch_size = config.batch_size
+
+        tareas = reclamar_tareas(tipos, batch_size)
+        if not tareas:
+            return {'carril': carril, 'consumidor': consumidor, 'procesadas': 0}
+        lease = LeaseLote(tareas, tareas[0].lease_hasta, lock)
+        _lote_local.lease = lease
+
+        tareas_por_tipo = defaultdict(list)
+        for tarea in tareas:
+            tareas_por_tipo[tarea.tipo].append(tarea)
+
+        logger.info(
+            f"[Cola:{carril}/{consumidor}] Procesando {len(tareas)} tareas "
+            f"agrupadas en {len(tareas_por_tipo)} tipos (batch_size={batch_size})"
         )
 
-        resultados[tipo_tarea] = resultado
+        # Procesar cada tipo con su rate limit correspondiente
+        resultados = {}
+        for tipo_tarea, tareas_tipo in tareas_por_tipo.items():
+            lease.renovar()
+            resultados[tipo_tarea] = procesar_lote_por_tipo_tarea(
+                tareas=tareas_tipo,
+                tipo_tarea=tipo_tarea,
+                config=config
+            )
 
-    # Resumen final
-    total_exitosas = sum(r.get('exitosas', 0) for r in resultados.values())
-    total_fallidas = sum(r.get('fallidas', 0) for r in resultados.values())
+        # Las que no entraron en la cuota se liberan para otro consumidor
+        no_procesadas = [t.id for t in tareas if t.estado == Tarea.EstadoTarea.RUNNING]
+        if no_procesadas:
+            liberar_tareas(no_procesadas, lease)
+    finally:
+        _lote_local.lease = None
+        if lock is not None:
+            try:
+                lock.release()
+            except Exception:
+                pass
+
+    # Sin cuota: volver cuando se libere, en lugar de dormir el worker.
+    # Lote completo: puede haber más pendientes, seguir sin esperar a Beat.
+    esperas = [res['reintentar_en'] for res in resultados.values() if res.get('reintentar_en')]
+    if esperas:
+        _reprogramar_carril(carril, consumidor, min(esperas))
+    elif len(tareas) >= batch_size:
+        _reprogramar_carril(carril, consumidor, 0)
+
+    total_exitosas = sum(res.get('exitosas', 0) for res in resultados.values())
+    total_fallidas = sum(res.get('fallidas', 0) for res in resultados.values())
 
     logger.info(
-        f"[Cola] Procesamiento finalizado: {total_exitosas} exitosas, "
-        f"{total_fallidas} fallidas de {contador_total} tareas"
+        f"[Cola:{carril}/{consumidor}] Lote finalizado: {total_exitosas} exitosas, "
+        f"{total_fallidas} fallidas de {len(tareas)} tareas"
     )
 
     return {
-        'procesadas': contador_total,
+        'carril': carril,
+        'consumidor': consumidor,
+        'procesadas': len(tareas),
         'exitosas': total_exitosas,
         'fallidas': total_fallidas,
         'por_tipo': resultados
     }
 
 
+def _reprogramar_carril(carril, consumidor, espera):
+    """
+    Agenda una nueva ejecución del consumidor (carril, consumidor) en `espera` segundos.
+    Un SET NX en Redis evita encadenar varias re-ejecuciones del mismo consumidor.
+    """
+    from ..utils.redis_client import get_redis
+
+    countdown = math.ceil(espera)
+    r = get_redis()
+    if r is not None:
+        try:
+            clave = f"lucy:cola:{carril}:{consumidor}:programada"
+            if not r.set(clave, 1, nx=True, px=max(countdown, 1) * 1000):
+                return
+        except Exception as e:
+            logger.warning(f"[Cola:{carril}] Error verificando re-programación en Redis: {e}")
+
+    procesar_carril_tareas.apply_async(args=[carril, consumidor], countdown=countdown)
+    logger.info(f"[Cola:{carril}/{consumidor}] Re-programado en {countdown}s")
+
+
+def despertar_carril(carril):
+    """Agenda ya al consumidor 0 del carril (ej: se encolaron tareas fuera del dispatcher)."""
+    _reprogramar_carril(carril, 0, 0)
+
+
+def reclamar_tareas(tipos, limite):
+    """
+    Reserva atómicamente hasta `limite` tareas PENDING de los tipos dados.
+
+    Las re-encoladas por limitación de la API esperan hasta no_antes_de.
+    SELECT ... FOR UPDATE SKIP LOCKED + UPDATE a RUNNING en la misma transacción:
+    consumidores concurrentes nunca reciben la misma tarea. Cada tarea queda con
+    lease_hasta; si el worker muere, recuperar_leases_vencidos la devuelve a PENDING.
+
+    Returns:
+        Lista de Tarea ya en estado RUNNING (ordenadas por antigüedad)
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Tarea.objects.select_for_update(skip_locked=True)
+            .filter(estado=Tarea.EstadoTarea.PENDING, tipo__in=tipos)
+            .filter(Q(no_antes_de__isnull=True) | Q(no_antes_de__lte=ahora))
+            .order_by('hora_programada')
+            .values_list('id', flat=True)[:limite]
+        )
+        if not ids:
+            return []
+        Tarea.objects.filter(id__in=ids).update(
+            estado=Tarea.EstadoTarea.RUNNING,
+            hora_inicio=ahora,
+            lease_hasta=ahora + timedelta(seconds=TAREA_LEASE_SEGUNDOS)
+        )
+    return list(Tarea.objects.filter(id__in=ids).order_by('hora_programada'))
+
+
+def liberar_tareas(ids, lease=None):
+    """
+    Devuelve a PENDING tareas reclamadas que no llegaron a ejecutarse.
+    Con `lease`, solo las que siguen siendo de ese lote.
+    """
+    tareas = Tarea.objects.filter(id__in=ids, estado=Tarea.EstadoTarea.RUNNING)
+    if lease is not None:
+        tareas = tareas.filter(lease_hasta=lease.lease_hasta)
+    return tareas.update(
+        estado=Tarea.EstadoTarea.PENDING,
+        hora_inicio=None,
+        lease_hasta=None
+    )
+
+
+def recuperar_leases_vencidos():
+    """
+    Devuelve a PENDING las tareas RUNNING cuyo lease venció (worker caído o
+    colgado), registrando el reintento en detalles. Tras MAX_RECUPERACIONES_LEASE
+    recuperaciones la tarea se marca FAILED para no reintentarla indefinidamente.
+    Las tareas RUNNING sin lease (no reclamadas por la cola) no se tocan, ni
+    las ACCION_MASIVA (ver acciones_admin.vencer_acciones_masivas).
+
+    Returns:
+        Cantidad de tareas recuperadas o marcadas como fallidas
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        vencidas = list(
+            Tarea.objects.select_for_update(skip_locked=True)
+            .filter(estado=Tarea.EstadoTarea.RUNNING, lease_hasta__lt=ahora)
+            .exclude(tipo=Tarea.TipoTarea.ACCION_MASIVA)
+        )
+        for tarea in vencidas:
+            detalles = tarea.detalles if isinstance(tarea.detalles, dict) else {}
+            reintentos = detalles.setdefault('reintentos', [])
+            reintentos.append({
+                'fecha': ahora.isoformat(),
+                'motivo': 'Lease vencido en estado running, reintentando automáticamente'
+            })
+            tarea.detalles = detalles
+            tarea.lease_hasta = None
+            if len(reintentos) > MAX_RECUPERACIONES_LEASE:
+                tarea.estado = Tarea.EstadoTarea.FAILED
+                tarea.mensaje_error = f'Lease vencido {len(reintentos)} veces, se descarta la tarea'
+                tarea.hora_fin = ahora
+            else:
+                tarea.estado = Tarea.EstadoTarea.PENDING
+                tarea.hora_inicio = None
+        if vencidas:
+            Tarea.objects.bulk_update(
+                vencidas, ['estado', 'hora_inicio', 'hora_fin', 'lease_hasta', 'detalles', 'mensaje_error']
+            )
+
+    if vencidas:
+        logger.warning(f"[Cola] {len(vencidas)} tareas con lease vencido recuperadas")
+    return len(vencidas)
+
+
 def procesar_lote_por_tipo_tarea(tareas, tipo_tarea, config):
     """
     Procesa un lote de tareas del mismo tipo aplicando rate limiting.
@@ -112,102 +485,457 @@ def procesar_lote_por_tipo_tarea(tareas, tipo_tarea, config):
         config: Objeto Configuracion con rate_limits
 
     Returns:
-        Dict con estadísticas: {'exitosas': int, 'fallidas': int, 'errores': []}
+        Dict con estadísticas: {'exitosas': int, 'fallidas': int, 'errores': [],
+        'diferidas': int, 'reintentar_en': segundos o None}
     """
-    import time
-
-    # Determinar rate limit según tipo de tarea
-    rate_limit_map = {
-        # Tareas de Teams/Graph API
-        Tarea.TipoTarea.CREAR_USUARIO_TEAMS: config.rate_limit_teams,
-        Tarea.TipoTarea.RESETEAR_PASSWORD: config.rate_limit_teams,
-        Tarea.TipoTarea.ENVIAR_EMAIL: config.rate_limit_teams,
-
-        # Tareas de Moodle
-        Tarea.TipoTarea.MOODLE_ENROLL: config.rate_limit_moodle,
-
-        # Tareas de UTI/SIAL
-        Tarea.TipoTarea.INGESTA_PREINSCRIPTOS: config.rate_limit_uti,
-        Tarea.TipoTarea.INGESTA_ASPIRANTES: config.rate_limit_uti,
-        Tarea.TipoTarea.INGESTA_INGRESANTES: config.rate_limit_uti,
-
-        # Tareas mixtas (usan el menor rate limit para seguridad)
-        Tarea.TipoTarea.ACTIVAR_SERVICIOS: min(config.rate_limit_teams, config.rate_limit_moodle),
-        Tarea.TipoTarea.ELIMINAR_CUENTA: min(config.rate_limit_teams, config.rate_limit_moodle),
-    }
-
-    rate_limit = rate_limit_map.get(tipo_tarea, 10)  # Default 10 tareas/min
-    delay_seconds = 60.0 / rate_limit if rate_limit > 0 else 0
+    # Moodle y Teams: todo el lote viaja en pocas llamadas multi-fila / $batch,
+    # pero cada alumno sigue contando como una unidad de cuota (Graph limita
+    # cada sub-request por separado), así que se reserva el lote completo
+    if tipo_tarea in (Tarea.TipoTarea.MOODLE_ENROLL, Tarea.TipoTarea.CREAR_USUARIO_TEAMS):
+        espera = reservar_cuota(tipo_tarea, config, costo=len(tareas))
+        if espera > 0:
+            logger.info(f"[Cola:{tipo_tarea}] Cuota agotada, lote diferido {espera:.1f}s")
+            return _resultado_diferido(tareas, espera)
+        if tipo_tarea == Tarea.TipoTarea.MOODLE_ENROLL:
+            return procesar_lote_moodle_enroll(tareas)
+        return procesar_lote_crear_usuario_teams(tareas)
+
+    # Emails de bienvenida: una conexión y mensajes en /$batch para todo el grupo
+    # (una unidad de cuota por mensaje); el resto de los tipos de email sigue de a uno
+    if tipo_tarea == Tarea.TipoTarea.ENVIAR_EMAIL:
+        bienvenida = [t for t in tareas if (t.detalles or {}).get('tipo_email') == 'bienvenida']
+        if bienvenida:
+            espera = reservar_cuota(tipo_tarea, config, costo=len(bienvenida))
+            if espera > 0:
+                logger.info(f"[Cola:{tipo_tarea}] Cuota agotada, lote diferido {espera:.1f}s")
+                return _resultado_diferido(tareas, espera)
+            resultado = procesar_lote_enviar_email(bienvenida)
+            ids_bienvenida = {t.id for t in bienvenida}
+            resto = [t for t in tareas if t.id not in ids_bienvenida]
+            if not resto:
+                return resultado
+            resultado_resto = procesar_lote_por_tipo_tarea(resto, tipo_tarea, config)
+            for clave in ('exitosas', 'fallidas', 'total', 'reencoladas'):
+                resultado_resto[clave] = resultado_resto.get(clave, 0) + resultado.get(clave, 0)
+            resultado_resto['errores'] = resultado['errores'] + resultado_resto['errores']
+            return resultado_resto
 
     logger.info(
-        f"[Cola:{tipo_tarea}] Procesando {len(tareas)} tareas con rate limit "
-        f"{rate_limit}/min (delay={delay_seconds:.2f}s)"
+        f"[Cola:{tipo_tarea}] Procesando {len(tareas)} tareas con cuota de "
+        f"{', '.join(SERVICIOS_POR_TIPO.get(tipo_tarea, (tipo_tarea,)))}"
     )
 
     exitosas = 0
     fallidas = 0
     errores = []
 
-    for idx, tarea in enumerate(tareas):
-        try:
-            # Marcar como RUNNING
-            tarea.estado = Tarea.EstadoTarea.RUNNING
-            tarea.hora_inicio = timezone.now()
-            tarea.save(update_fields=['estado', 'hora_inicio'])
-
-            # Ejecutar la tarea según su tipo
-            resultado = ejecutar_tarea_segun_tipo(tarea)
-
-            # Marcar como COMPLETED o FAILED
-            if resultado.get('success'):
-                tarea.estado = Tarea.EstadoTarea.COMPLETED
-                tarea.detalles = resultado.get('detalles', {})
-                tarea.cantidad_entidades = resultado.get('cantidad_entidades', 1)
-                exitosas += 1
-            else:
+    diferidas = 0
+    reencoladas = 0
+    reintentar_en = None
+    checkpoint = CheckpointTareas()
+
+    try:
+        for idx, tarea in enumerate(tareas):
+            # Rate limiting distribuido: sin cuota, el resto queda PENDING para un reintento
+            espera = reservar_cuota(tipo_tarea, config)
+            if espera > 0:
+                diferidas = len(tareas) - idx
+                reintentar_en = espera
+                logger.info(
+                    f"[Cola:{tipo_tarea}] Cuota agotada: {diferidas} tareas quedan pendientes "
+                    f"(reintento en {espera:.1f}s)"
+                )
+                break
+
+            try:
+                # Ya viene RUNNING desde reclamar_tareas; registrar el inicio real
+                tarea.hora_inicio = timezone.now()
+
+                # Ejecutar la tarea según su tipo
+                resultado = ejecutar_tarea_segun_tipo(tarea)
+
+                # 429/503 de la API: re-encolar con backoff en lugar de fallar
+                retry_after = None if resultado.get('success') else _limitacion(resultado)
+                if retry_after is not None and _reencolar_por_limitacion(tarea, retry_after, resultado.get('error')):
+                    reencoladas += 1
+                    checkpoint.agregar(tarea)
+                    continue
+
+                # Marcar como COMPLETED o FAILED
+                if resultado.get('success'):
+                    tarea.estado = Tarea.EstadoTarea.COMPLETED
+                    tarea.detalles = resultado.get('detalles', {})
+                    tarea.cantidad_entidades = resultado.get('cantidad_entidades', 1)
+                    exitosas += 1
+                    registrar_exito_tarea(tipo_tarea, config)
+                else:
+                    tarea.estado = Tarea.EstadoTarea.FAILED
+                    tarea.mensaje_error = resultado.get('error', 'Error desconocido')
+                    tarea.detalles = resultado.get('detalles', {})
+                    fallidas += 1
+                    errores.append({
+                        'tarea_id': tarea.id,
+                        'error': tarea.mensaje_error
+                    })
+
+                tarea.hora_fin = timezone.now()
+                checkpoint.agregar(tarea)
+
+                logger.info(
+                    f"[Cola:{tipo_tarea}] Tarea {tarea.id} procesada "
+                    f"({'OK' if resultado.get('success') else 'FAIL'}) "
+                    f"[{idx+1}/{len(tareas)}]"
+                )
+
+            except Exception as e:
+                # Error inesperado al procesar la tarea
+                logger.error(f"[Cola:{tipo_tarea}] Error procesando tarea {tarea.id}: {e}", exc_info=True)
+
                 tarea.estado = Tarea.EstadoTarea.FAILED
-                tarea.mensaje_error = resultado.get('error', 'Error desconocido')
-                tarea.detalles = resultado.get('detalles', {})
+                tarea.mensaje_error = f"Error inesperado: {str(e)}"
+                tarea.hora_fin = timezone.now()
+                checkpoint.agregar(tarea)
+
                 fallidas += 1
                 errores.append({
                     'tarea_id': tarea.id,
-                    'error': tarea.mensaje_error
+                    'error': str(e)
                 })
+    finally:
+        # Último checkpoint: lo resuelto se persiste aunque el lote se corte
+        checkpoint.guardar()
+
+    return {
+        'exitosas': exitosas,
+        'fallidas': fallidas,
+        'total': len(tareas),
+        'errores': errores,
+        'diferidas': diferidas,
+        'reencoladas': reencoladas,
+        'reintentar_en': reintentar_en
+    }
 
-            tarea.hora_fin = timezone.now()
-            tarea.save()
 
-            logger.info(
-                f"[Cola:{tipo_tarea}] Tarea {tarea.id} procesada "
-                f"({'OK' if resultado.get('success') else 'FAIL'}) "
-                f"[{idx+1}/{len(tareas)}]"
-            )
+def _limitacion(resultado):
+    """Segundos de Retry-After si el resultado falló por 429/503 de una API, o None."""
+    for origen in (resultado, resultado.get('detalles')):
+        if isinstance(origen, dict) and origen.get('throttled'):
+            return float(origen.get('retry_after') or 0)
+    return None
 
-        except Exception as e:
-            # Error inesperado al procesar la tarea
-            logger.error(f"[Cola:{tipo_tarea}] Error procesando tarea {tarea.id}: {e}", exc_info=True)
 
+def _reencolar_por_limitacion(tarea, retry_after, error=None):
+    """
+    Devuelve a PENDING una tarea que la API limitó (429/503), con backoff
+    exponencial que respeta el Retry-After; reclamar_tareas no la toma antes
+    de no_antes_de. Conserva los detalles originales (parámetros de la tarea).
+    Solo modifica la instancia: la persiste el CheckpointTareas del llamador.
+
+    Returns:
+        True si se re-encoló; False si agotó MAX_REINTENTOS_LIMITACION
+        (el llamador la marca como fallida)
+    """
+    detalles = tarea.detalles if isinstance(tarea.detalles, dict) else {}
+    limitaciones = detalles.get('limitaciones', 0) + 1
+    if limitaciones > MAX_REINTENTOS_LIMITACION:
+        return False
+
+    backoff = min(BACKOFF_LIMITACION_MAXIMO, max(retry_after, BACKOFF_LIMITACION_BASE * 2 ** (limitaciones - 1)))
+    detalles['limitaciones'] = limitaciones
+    tarea.detalles = detalles
+    tarea.estado = Tarea.EstadoTarea.PENDING
+    tarea.hora_inicio = None
+    tarea.lease_hasta = None
+    tarea.no_antes_de = timezone.now() + timedelta(seconds=backoff)
+    tarea.mensaje_error = f"Limitada por la API ({error or '429/503'}), reintento {limitaciones} en {backoff:.0f}s"
+    logger.warning(f"[Cola:{tarea.tipo}] Tarea {tarea.id} re-encolada por limitación ({backoff:.0f}s)")
+    return True
+
+
+def _resultado_diferido(tareas, espera):
+    """Resultado de un lote que no se procesó por falta de cuota (las tareas siguen PENDING)."""
+    return {
+        'exitosas': 0,
+        'fallidas': 0,
+        'total': len(tareas),
+        'errores': [],
+        'diferidas': len(tareas),
+        'reintentar_en': espera
+    }
+
+
+def procesar_lote_moodle_enroll(tareas):
+    """
+    Procesa un lote de tareas MOODLE_ENROLL con MoodleService.enroll_alumnos_bulk:
+    los enrollamientos y altas en grupos de todo el lote viajan en llamadas
+    multi-fila, y el resultado de cada fila se vuelca en su Tarea y su Alumno.
+
+    Returns:
+        Dict con estadísticas: {'exitosas': int, 'fallidas': int, 'errores': []}
+    """
+    from ..models import Alumno
+    from ..services.moodle_service import MoodleService
+
+    exitosas = 0
+    fallidas = 0
+    reencoladas = 0
+    errores = []
+
+    # Las tareas llegan en RUNNING desde reclamar_tareas
+    alumnos = Alumno.objects.in_bulk([t.alumno_id for t in tareas if t.alumno_id])
+
+    try:
+        resultados = MoodleService().enroll_alumnos_bulk(list(alumnos.values()))
+    except ServicioLimitado as e:
+        # 429/503 en un paso común a todo el lote: se re-encola el lote entero
+        logger.warning(f"[Cola:{Tarea.TipoTarea.MOODLE_ENROLL}] Lote limitado por {e.servicio}: {e}")
+        resultados = {
+            alumno_id: {'success': False, 'error': str(e), 'throttled': True, 'retry_after': e.retry_after}
+            for alumno_id in alumnos
+        }
+    except Exception as e:
+        logger.error(f"[Cola:{Tarea.TipoTarea.MOODLE_ENROLL}] Error en enrollamiento en lote: {e}", exc_info=True)
+        resultados = {alumno_id: {'success': False, 'error': f"Error inesperado: {e}"} for alumno_id in alumnos}
+
+    enrollados = []
+    checkpoint = CheckpointTareas()
+    for tarea in tareas:
+        alumno = alumnos.get(tarea.alumno_id)
+        if alumno is None:
+            resultado = {'success': False, 'error': 'Tarea sin alumno asociado'}
+        else:
+            resultado = resultados.get(alumno.id, {'success': False, 'error': 'Sin resultado'})
+
+        # 429/503 de la API: re-encolar con backoff en lugar de fallar
+        retry_after = _limitacion(resultado)
+        if retry_after is not None and _reencolar_por_limitacion(tarea, retry_after, resultado.get('error')):
+            reencoladas += 1
+            checkpoint.agregar(tarea)
+            continue
+
+        enviar_email = tarea.detalles.get('enviar_email', False) if tarea.detalles else False
+        if resultado.get('success'):
+            enrollados.append(alumno.id)
+            tarea.estado = Tarea.EstadoTarea.COMPLETED
+            tarea.cantidad_entidades = len(resultado.get('enrolled_courses', []))
+            exitosas += 1
+            if enviar_email:
+                try:
+                    from ..services.email_service import EmailService
+                    resultado['email_enviado'] = EmailService().send_enrollment_email(
+                        alumno, resultado.get('enrolled_courses', [])
+                    )
+                except Exception as e:
+                    logger.warning(f"[Cola:{tarea.tipo}] Error enviando email de enrollamiento a {alumno.id}: {e}")
+                    resultado['email_enviado'] = False
+        else:
             tarea.estado = Tarea.EstadoTarea.FAILED
-            tarea.mensaje_error = f"Error inesperado: {str(e)}"
-            tarea.hora_fin = timezone.now()
-            tarea.save()
+            tarea.mensaje_error = resultado.get('error') or 'Error desconocido'
+            fallidas += 1
+            errores.append({'tarea_id': tarea.id, 'error': tarea.mensaje_error})
+
+        tarea.detalles = resultado
+        tarea.hora_fin = timezone.now()
+        checkpoint.agregar(tarea)
+
+    checkpoint.guardar()
+
+    # Marcar como procesados en Moodle los enrollados exitosamente
+    if enrollados:
+        Alumno.objects.filter(id__in=enrollados).update(moodle_procesado=True)
+
+    if exitosas:
+        registrar_exito_tarea(Tarea.TipoTarea.MOODLE_ENROLL, Configuracion.load(), exitosas)
+
+    logger.info(
+        f"[Cola:{Tarea.TipoTarea.MOODLE_ENROLL}] Lote procesado: {exitosas} exitosas, {fallidas} fallidas"
+        f", {reencoladas} re-encoladas por limitación"
+    )
+
+    return {
+        'exitosas': exitosas,
+        'fallidas': fallidas,
+        'total': len(tareas),
+        'errores': errores,
+        'reencoladas': reencoladas
+    }
+
+
+def procesar_lote_crear_usuario_teams(tareas):
+    """
+    Procesa un lote de tareas CREAR_USUARIO_TEAMS con TeamsService.create_users_bulk:
+    búsquedas, altas y licencias de todo el lote viajan en llamadas /$batch de Graph,
+    y el resultado de cada alumno se vuelca en su Tarea.
+
+    Returns:
+        Dict con estadísticas: {'exitosas': int, 'fallidas': int, 'errores': []}
+    """
+    from ..models import Alumno
+    from ..services.teams_service import TeamsService
+
+    exitosas = 0
+    fallidas = 0
+    reencoladas = 0
+    errores = []
 
+    # Las tareas llegan en RUNNING desde reclamar_tareas
+    alumnos = Alumno.objects.in_bulk([t.alumno_id for t in tareas if t.alumno_id])
+
+    try:
+        resultados = TeamsService().create_users_bulk(list(alumnos.values()))
+    except Exception as e:
+        logger.error(f"[Cola:{Tarea.TipoTarea.CREAR_USUARIO_TEAMS}] Error en creación en lote: {e}", exc_info=True)
+        resultados = {alumno_id: {'error': f"Error inesperado: {e}"} for alumno_id in alumnos}
+
+    procesados = []
+    emails_enviados = []
+    checkpoint = CheckpointTareas()
+    for tarea in tareas:
+        alumno = alumnos.get(tarea.alumno_id)
+        if alumno is None:
+            resultado = {'error': 'Tarea sin alumno asociado'}
+        else:
+            resultado = resultados.get(alumno.id) or {'error': 'Error desconocido creando usuario Teams'}
+
+        # 429/503 de la API: re-encolar con backoff en lugar de fallar
+        retry_after = _limitacion(resultado)
+        if retry_after is not None and _reencolar_por_limitacion(tarea, retry_after, resultado.get('error')):
+            reencoladas += 1
+            checkpoint.agregar(tarea)
+            continue
+
+        # Mismo criterio que ejecutar_crear_usuario_teams: creado o ya existente → éxito
+        if 'created' in resultado or 'already_exists' in resultado:
+            procesados.append(alumno.id)
+            enviar_email = tarea.detalles.get('enviar_email', False) if tarea.detalles else False
+            email_enviado = False
+            if enviar_email and resultado.get('password'):
+                try:
+                    from ..services.email_service import EmailService
+                    email_enviado = EmailService().send_credentials_email(
+                        alumno, {'upn': resultado.get('upn'), 'password': resultado.get('password')}
+                    )
+                except Exception as e:
+                    logger.warning(f"[Cola:{tarea.tipo}] Error enviando credenciales a {alumno.id}: {e}")
+                if email_enviado:
+                    emails_enviados.append(alumno.id)
+
+            tarea.estado = Tarea.EstadoTarea.COMPLETED
+            tarea.cantidad_entidades = 1
+            tarea.detalles = {
+                'upn': resultado.get('upn'),
+                'user_id': resultado.get('id'),
+                'created': resultado.get('created', False),
+                'already_exists': resultado.get('already_exists', False),
+                'license_assigned': resultado.get('license_assigned'),
+                'email_enviado': email_enviado
+            }
+            exitosas += 1
+        else:
+            tarea.estado = Tarea.EstadoTarea.FAILED
+            tarea.mensaje_error = resultado.get('error') or 'Error desconocido creando usuario Teams'
+            tarea.detalles = resultado
             fallidas += 1
-            errores.append({
-                'tarea_id': tarea.id,
-                'error': str(e)
-            })
+            errores.append({'tarea_id': tarea.id, 'error': tarea.mensaje_error})
+
+        tarea.hora_fin = timezone.now()
+        checkpoint.agregar(tarea)
+
+    checkpoint.guardar()
 
-        # Rate limiting: Esperar antes del siguiente (excepto en el último)
-        if idx < len(tareas) - 1 and delay_seconds > 0:
-            logger.debug(f"[Cola:{tipo_tarea}] Esperando {delay_seconds:.2f}s (rate limit)")
-            time.sleep(delay_seconds)
+    if procesados:
+        Alumno.objects.filter(id__in=procesados).update(teams_procesado=True)
+    if emails_enviados:
+        Alumno.objects.filter(id__in=emails_enviados).update(email_procesado=True)
+
+    if exitosas:
+        registrar_exito_tarea(Tarea.TipoTarea.CREAR_USUARIO_TEAMS, Configuracion.load(), exitosas)
+
+    logger.info(
+        f"[Cola:{Tarea.TipoTarea.CREAR_USUARIO_TEAMS}] Lote procesado: {exitosas} exitosas, {fallidas} fallidas"
+        f", {reencoladas} re-encoladas por limitación"
+    )
 
     return {
         'exitosas': exitosas,
         'fallidas': fallidas,
         'total': len(tareas),
-        'errores': errores
+        'errores': errores,
+        'reencoladas': reencoladas
+    }
+
+
+def procesar_lote_enviar_email(tareas):
+    """
+    Procesa un lote de tareas ENVIAR_EMAIL de bienvenida con
+    EmailService.enviar_emails_bulk: una conexión del backend (un token de
+    Graph) y mensajes agrupados en /$batch; el servicio marca
+    Alumno.email_procesado y el resultado de cada alumno se vuelca en su Tarea.
+
+    Returns:
+        Dict con estadísticas: {'exitosas': int, 'fallidas': int, 'errores': []}
+    """
+    from ..models import Alumno
+    from ..services.email_service import EmailService
+
+    exitosas = 0
+    fallidas = 0
+    reencoladas = 0
+    errores = []
+
+    # Las tareas llegan en RUNNING desde reclamar_tareas
+    alumnos = Alumno.objects.in_bulk([t.alumno_id for t in tareas if t.alumno_id])
+
+    try:
+        resultados = EmailService().enviar_emails_bulk(list(alumnos.values()), 'bienvenida')
+    except Exception as e:
+        logger.error(f"[Cola:{Tarea.TipoTarea.ENVIAR_EMAIL}] Error en envío en lote: {e}", exc_info=True)
+        resultados = {alumno_id: {'success': False, 'error': f"Error inesperado: {e}"} for alumno_id in alumnos}
+
+    checkpoint = CheckpointTareas()
+    for tarea in tareas:
+        if tarea.alumno_id not in alumnos:
+            resultado = {'success': False, 'error': 'Tarea sin alumno asociado'}
+        else:
+            resultado = resultados.get(tarea.alumno_id) or {'success': False, 'error': 'Sin resultado'}
+
+        # 429/503 de la API: re-encolar con backoff en lugar de fallar
+        retry_after = _limitacion(resultado)
+        if retry_after is not None and _reencolar_por_limitacion(tarea, retry_after, resultado.get('error')):
+            reencoladas += 1
+            checkpoint.agregar(tarea)
+            continue
+
+        if resultado.get('success'):
+            tarea.estado = Tarea.EstadoTarea.COMPLETED
+            tarea.cantidad_entidades = 1
+            tarea.detalles = {**(tarea.detalles or {}), 'email_enviado': True}
+            exitosas += 1
+        else:
+            tarea.estado = Tarea.EstadoTarea.FAILED
+            tarea.mensaje_error = resultado.get('error') or 'Error desconocido'
+            fallidas += 1
+            errores.append({'tarea_id': tarea.id, 'error': tarea.mensaje_error})
+
+        tarea.hora_fin = timezone.now()
+        checkpoint.agregar(tarea)
+
+    checkpoint.guardar()
+
+    if exitosas:
+        registrar_exito_tarea(Tarea.TipoTarea.ENVIAR_EMAIL, Configuracion.load(), exitosas)
+
+    logger.info(
+        f"[Cola:{Tarea.TipoTarea.ENVIAR_EMAIL}] Lote procesado: {exitosas} exitosas, {fallidas} fallidas"
+        f", {reencoladas} re-encoladas por limitación"
+    )
+
+    return {
+        'exitosas': exitosas,
+        'fallidas': fallidas,
+        'total': len(tareas),
+        'errores': errores,
+        'reencoladas': reencoladas
     }
 
 
@@ -247,6 +975,15 @@ def ejecutar_tarea_segun_tipo(tarea):
                 'error': f"Tipo de tarea no implementado: {tarea.tipo}"
             }
 
+    except ServicioLimitado as e:
+        logger.warning(f"Tarea {tarea.id} ({tarea.tipo}) limitada por {e.servicio}: {e}")
+        return {
+            'success': False,
+            'error': str(e),
+            'throttled': True,
+            'retry_after': e.retry_after
+        }
+
     except Exception as e:
         logger.error(f"Error ejecutando tarea {tarea.id} ({tarea.tipo}): {e}", exc_info=True)
         return {
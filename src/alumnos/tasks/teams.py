@@ -15,7 +15,8 @@ Copyright (c) 2025 Carlos Dagorret
 import logging
 from celery import shared_task
 from django.utils import timezone
-from ..models import Log, Tarea, Alumno
+from ..models import Tarea, Alumno
+from ..utils.log_buffer import registrar_log
 from ..services.teams_service import TeamsService
 from ..services.email_service import EmailService
 
@@ -90,7 +91,7 @@ def crear_usuario_teams_async(self, alumno_id):
         tarea.hora_fin = timezone.now()
         tarea.save()
 
-        Log.objects.create(
+        registrar_log(
             tipo='ERROR',
             modulo='tasks',
             mensaje=f'Error creando usuario Teams',
@@ -208,7 +209,7 @@ def resetear_password_y_enviar_email(self, alumno_id):
         tarea.hora_fin = timezone.now()
         tarea.save()
 
-        Log.objects.create(
+        registrar_log(
             tipo='ERROR',
             modulo='tasks',
             mensaje=f'Error reseteando contraseña',
@@ -247,7 +248,7 @@ def eliminar_cuenta_externa(self, alumno_id, upn):
             tarea.hora_fin = timezone.now()
             tarea.save()
 
-            Log.objects.create(
+            registrar_log(
                 tipo='WARNING',
                 modulo='tasks',
                 mensaje=mensaje,
@@ -261,7 +262,7 @@ def eliminar_cuenta_externa(self, alumno_id, upn):
 
         if teams_result:
             logger.info(f"Usuario Teams eliminado: {upn}")
-            Log.objects.create(
+            registrar_log(
                 tipo='SUCCESS',
                 modulo='tasks',
                 mensaje=f'Usuario Teams eliminado: {upn}',
@@ -291,7 +292,7 @@ def eliminar_cuenta_externa(self, alumno_id, upn):
         tarea.hora_fin = timezone.now()
         tarea.save()
 
-        Log.objects.create(
+        registrar_log(
             tipo='ERROR',
             modulo='tasks',
             mensaje=f'Error eliminando cuenta externa: {upn}',
@@ -362,7 +363,7 @@ def enviar_email_credenciales(self, alumno_id, teams_data):
         tarea.hora_fin = timezone.now()
         tarea.save()
 
-        Log.objects.create(
+        registrar_log(
             tipo='ERROR',
             modulo='tasks',
             mensaje=f'Error enviando email a {alumno.email}',
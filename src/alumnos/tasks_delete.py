@@ -34,23 +34,15 @@ O EL USO U OTROS TRATOS EN EL SOFTWARE.
 import logging
 from celery import shared_task
 from django.utils import timezone
-from .models import Log, Tarea, Alumno
+from .models import Tarea, Alumno
+from .utils.log_buffer import registrar_log
 
 logger = logging.getLogger(__name__)
 
 
 def log_to_db(tipo, modulo, mensaje, detalles=None, alumno=None):
-    """Registra un log en la base de datos."""
-    try:
-        Log.objects.create(
-            tipo=tipo,
-            modulo=modulo,
-            mensaje=mensaje,
-            detalles=detalles,
-            alumno=alumno
-        )
-    except Exception as e:
-        logger.error(f"Error guardando log en BD: {e}")
+    """Registra un log en la base de datos (en lote, ver utils.log_buffer)."""
+    registrar_log(tipo, modulo, mensaje, detalles=detalles, alumno=alumno)
 
 
 @shared_task(bind=True, max_retries=3)
@@ -0,0 +1,145 @@
+"""
+Nombre del Módulo: cache_ttl.py
+
+Descripción:
+Cache clave→valor con TTL compartido entre workers vía Redis
+(con fallback en memoria del proceso).
+
+Autor: Carlos Dagorret
+Fecha de Creación: 2025-12-29
+Última Modificación: 2025-12-29
+
+Licencia: MIT
+Copyright (c) 2025 Carlos Dagorret
+
+Permisos:
+Se concede permiso, de forma gratuita, a cualquier persona que obtenga una copia
+de este software y la documentación asociada (el "Software"), para tratar
+en el Software sin restricciones, incluyendo, sin limitación, los derechos
+de usar, copiar, modificar, fusionar, publicar, distribuir, sublicenciar
+y/o vender copias del Software, y para permitir a las personas a las que
+se les proporciona el Software hacerlo, sujeto a las siguientes condiciones:
+
+El aviso de copyright anterior y este aviso de permiso se incluirán en todas
+las copias o partes sustanciales del Software.
+
+EL SOFTWARE SE PROPORCIONA "TAL CUAL", SIN GARANTÍA DE NINGÚN TIPO, EXPRESA O
+IMPLÍCITA, INCLUYENDO PERO NO LIMITADO A LAS GARANTÍAS DE COMERCIABILIDAD,
+IDONEIDAD PARA UN PROPÓSITO PARTICULAR Y NO INFRACCIÓN. EN NINGÚN CASO LOS
+AUTORES O TITULARES DE LOS DERECHOS DE AUTOR SERÁN RESPONSABLES DE CUALQUIER
+RECLAMO, DAÑO U OTRA RESPONSABILIDAD, YA SEA EN UNA ACCIÓN DE CONTRATO,
+AGRAVIO O DE OTRO MODO, QUE SURJA DE, FUERA DE O EN CONEXIÓN CON EL SOFTWARE
+O EL USO U OTROS TRATOS EN EL SOFTWARE.
+"""
+
+
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class CacheTTL:
+    """
+    Cache de valores JSON con expiración por entrada.
+
+    Las claves se guardan en Redis como `<prefijo>:<clave>` con SETEX, así
+    todos los workers comparten lo resuelto. Si Redis no está disponible se
+    usa un dict del proceso con la misma expiración. Lleva contadores de
+    hits/misses del proceso.
+    """
+
+    def __init__(self, prefijo: str, ttl: int):
+        self.prefijo = prefijo
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._local: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _clave(self, clave: str) -> str:
+        return f"{self.prefijo}:{clave}"
+
+    def get(self, clave: str) -> Optional[Any]:
+        valor = None
+        r = get_redis()
+        if r is not None:
+            try:
+                crudo = r.get(self._clave(clave))
+                valor = json.loads(crudo) if crudo is not None else None
+            except Exception as e:
+                logger.warning(f"[CacheTTL {self.prefijo}] Error leyendo Redis: {e}")
+                r = None
+        if r is None:
+            with self._lock:
+                entrada = self._local.get(clave)
+                if entrada is not None:
+                    expira_en, guardado = entrada
+                    if expira_en > time.time():
+                        valor = guardado
+                    else:
+                        del self._local[clave]
+
+        if valor is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return valor
+
+    def set(self, clave: str, valor: Any) -> None:
+        self.set_many({clave: valor})
+
+    def set_many(self, valores: Dict[str, Any]) -> None:
+        if not valores or self.ttl <= 0:
+            return
+        r = get_redis()
+        if r is not None:
+            try:
+                pipe = r.pipeline(transaction=False)
+                for clave, valor in valores.items():
+                    pipe.setex(self._clave(clave), self.ttl, json.dumps(valor))
+                pipe.execute()
+                return
+            except Exception as e:
+                logger.warning(f"[CacheTTL {self.prefijo}] Error escribiendo Redis: {e}")
+        expira_en = time.time() + self.ttl
+        with self._lock:
+            for clave, valor in valores.items():
+                self._local[clave] = (expira_en, valor)
+
+    def delete(self, clave: str) -> None:
+        with self._lock:
+            self._local.pop(clave, None)
+        r = get_redis()
+        if r is not None:
+            try:
+                r.delete(self._clave(clave))
+            except Exception as e:
+                logger.warning(f"[CacheTTL {self.prefijo}] Error borrando en Redis: {e}")
+
+    def clear(self) -> None:
+        """Borra todas las entradas del prefijo (local y Redis)."""
+        with self._lock:
+            self._local.clear()
+        r = get_redis()
+        if r is not None:
+            try:
+                claves = list(r.scan_iter(match=f"{self.prefijo}:*", count=500))
+                if claves:
+                    r.delete(*claves)
+            except Exception as e:
+                logger.warning(f"[CacheTTL {self.prefijo}] Error limpiando Redis: {e}")
+
+    def estadisticas(self) -> dict:
+        consultas = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / consultas, 3) if consultas else None,
+        }
@@ -0,0 +1,127 @@
+"""
+Nombre del Módulo: cache_versionado.py
+
+Descripción:
+Valores cacheados en memoria del proceso e invalidados en todos los workers
+mediante un contador de versión en Redis.
+
+Autor: Carlos Dagorret
+Fecha de Creación: 2025-12-29
+Última Modificación: 2025-12-29
+
+Licencia: MIT
+Copyright (c) 2025 Carlos Dagorret
+
+Permisos:
+Se concede permiso, de forma gratuita, a cualquier persona que obtenga una copia
+de este software y la documentación asociada (el "Software"), para tratar
+en el Software sin restricciones, incluyendo, sin limitación, los derechos
+de usar, copiar, modificar, fusionar, publicar, distribuir, sublicenciar
+y/o vender copias del Software, y para permitir a las personas a las que
+se les proporciona el Software hacerlo, sujeto a las siguientes condiciones:
+
+El aviso de copyright anterior y este aviso de permiso se incluirán en todas
+las copias o partes sustanciales del Software.
+
+EL SOFTWARE SE PROPORCIONA "TAL CUAL", SIN GARANTÍA DE NINGÚN TIPO, EXPRESA O
+IMPLÍCITA, INCLUYENDO PERO NO LIMITADO A LAS GARANTÍAS DE COMERCIABILIDAD,
+IDONEIDAD PARA UN PROPÓSITO PARTICULAR Y NO INFRACCIÓN. EN NINGÚN CASO LOS
+AUTORES O TITULARES DE LOS DERECHOS DE AUTOR SERÁN RESPONSABLES DE CUALQUIER
+RECLAMO, DAÑO U OTRA RESPONSABILIDAD, YA SEA EN UNA ACCIÓN DE CONTRATO,
+AGRAVIO O DE OTRO MODO, QUE SURJA DE, FUERA DE O EN CONEXIÓN CON EL SOFTWARE
+O EL USO U OTROS TRATOS EN EL SOFTWARE.
+"""
+
+
+
+import logging
+import threading
+import time
+from typing import Callable, Generic, Optional, TypeVar
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class CacheVersionado(Generic[T]):
+    """
+    Cache de un único valor por proceso con invalidación distribuida.
+
+    `cargar()` se ejecuta solo cuando no hay valor o cuando cambió la versión
+    publicada en Redis bajo `clave_version` (consultada a lo sumo cada
+    `chequeo_segundos`). Sin Redis, el valor se recarga cada `ttl_sin_redis`.
+    `invalidar()` descarta el valor local e incrementa la versión para que el
+    resto de los workers lo recarguen.
+    """
+
+    def __init__(
+        self,
+        clave_version: str,
+        cargar: Callable[[], T],
+        chequeo_segundos: float = 5,
+        ttl_sin_redis: float = 30,
+    ):
+        self.clave_version = clave_version
+        self.cargar = cargar
+        self.chequeo_segundos = chequeo_segundos
+        self.ttl_sin_redis = ttl_sin_redis
+        self._lock = threading.Lock()
+        self._valor: Optional[T] = None
+        self._version: Optional[int] = None
+        self._cargado = 0.0
+        self._chequeado = 0.0
+
+    def _leer_version(self) -> Optional[int]:
+        r = get_redis()
+        if r is None:
+            return None
+        try:
+            valor = r.get(self.clave_version)
+            return int(valor) if valor is not None else 0
+        except Exception as e:
+            logger.warning(f"No se pudo leer {self.clave_version} en Redis: {e}")
+            return None
+
+    def get(self) -> T:
+        ahora = time.monotonic()
+        valor = self._valor
+        if valor is not None and ahora - self._chequeado < self.chequeo_segundos:
+            return valor
+
+        with self._lock:
+            valor = self._valor
+            if valor is not None and ahora - self._chequeado < self.chequeo_segundos:
+                return valor
+
+            version = self._leer_version()
+            if valor is not None:
+                if version is not None:
+                    vigente = version == self._version
+                else:
+                    vigente = ahora - self._cargado < self.ttl_sin_redis
+                if vigente:
+                    self._chequeado = ahora
+                    return valor
+
+            # La versión se lee antes de cargar: si cambia en el medio, se recarga en el próximo chequeo
+            valor = self.cargar()
+            self._valor = valor
+            self._version = version
+            self._cargado = self._chequeado = ahora
+            return valor
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._valor = None
+            self._version = None
+
+        r = get_redis()
+        if r is None:
+            return
+        try:
+            r.incr(self.clave_version)
+        except Exception as e:
+            logger.warning(f"No se pudo publicar {self.clave_version} en Redis: {e}")
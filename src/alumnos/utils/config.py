@@ -35,6 +35,44 @@ O EL USO U OTROS TRATOS EN EL SOFTWARE.
 from django.conf import settings
 from typing import Optional
 
+from .cache_versionado import CacheVersionado
+
+
+# ========================================
+# Cache del singleton Configuracion
+# ========================================
+
+def _cargar_configuracion():
+    from alumnos.models import Configuracion
+    obj, _ = Configuracion.objects.get_or_create(pk=1)
+    return obj
+
+
+# La versión en Redis se incrementa en cada guardado de Configuracion (ver signals)
+_configuracion = CacheVersionado('lucy:config:version', _cargar_configuracion)
+
+
+def get_configuracion():
+    """
+    Obtiene el singleton Configuracion cacheado en el proceso.
+
+    Solo se recarga de BD cuando otro proceso (o este) guardó la configuración,
+    así una ingesta de miles de alumnos hace una sola query de configuración
+    en lugar de una por getter y alumno.
+
+    La instancia es compartida: no modificarla. Para editar y guardar usar
+    Configuracion.load(), que devuelve una copia.
+
+    Returns:
+        Configuracion
+    """
+    return _configuracion.get()
+
+
+def invalidar_configuracion() -> None:
+    """Descarta la Configuracion cacheada en todos los procesos."""
+    _configuracion.invalidar()
+
 
 def get_moodle_base_url() -> str:
     """
@@ -49,8 +87,7 @@ def get_moodle_base_url() -> str:
         str: URL base de Moodle
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config and config.moodle_base_url:
             return config.moodle_base_url
     except Exception:
@@ -73,8 +110,7 @@ def get_moodle_wstoken() -> str:
         str: Token de Moodle WS
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config and config.moodle_wstoken:
             return config.moodle_wstoken
     except Exception:
@@ -97,8 +133,7 @@ def get_sial_base_url() -> str:
         str: URL base de SIAL/UTI
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config and config.sial_base_url:
             return config.sial_base_url
     except Exception:
@@ -121,8 +156,7 @@ def get_sial_basic_user() -> str:
         str: Usuario para autenticación básica
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config and config.sial_basic_user:
             return config.sial_basic_user
     except Exception:
@@ -144,8 +178,7 @@ def get_sial_basic_pass() -> str:
         str: Contraseña para autenticación básica
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config and config.sial_basic_pass:
             return config.sial_basic_pass
     except Exception:
@@ -162,8 +195,7 @@ def get_rate_limit_moodle() -> int:
         int: Máximo de requests por minuto
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config:
             return config.rate_limit_moodle
     except Exception:
@@ -180,8 +212,7 @@ def get_rate_limit_teams() -> int:
         int: Máximo de requests por minuto
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config:
             return config.rate_limit_teams
     except Exception:
@@ -190,6 +221,57 @@ def get_rate_limit_teams() -> int:
     return 10  # Default
 
 
+def get_rate_limit_uti() -> int:
+    """
+    Obtiene el rate limit de la API UTI/SIAL (requests por minuto).
+
+    Returns:
+        int: Máximo de requests por minuto
+    """
+    try:
+        config = get_configuracion()
+        if config:
+            return config.rate_limit_uti
+    except Exception:
+        pass
+
+    return 60  # Default
+
+
+def get_cache_personal_ttl() -> int:
+    """
+    Obtiene el TTL (segundos) del cache de datospersonales de UTI/SIAL.
+
+    Returns:
+        int: Segundos de validez de cada entrada (0 = cache deshabilitado)
+    """
+    try:
+        config = get_configuracion()
+        if config:
+            return config.cache_personal_ttl_segundos
+    except Exception:
+        pass
+
+    return 86400  # Default: 24 horas
+
+
+def get_cache_personal_max_entradas() -> int:
+    """
+    Obtiene la cantidad máxima de documentos en el cache de datospersonales.
+
+    Returns:
+        int: Máximo de entradas antes de desalojar las más antiguas
+    """
+    try:
+        config = get_configuracion()
+        if config:
+            return config.cache_personal_max_entradas
+    except Exception:
+        pass
+
+    return 100000  # Default
+
+
 def get_batch_size() -> int:
     """
     Obtiene el tamaño de lote para procesamiento.
@@ -198,8 +280,7 @@ def get_batch_size() -> int:
         int: Cantidad de elementos a procesar por lote
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config:
             return config.batch_size
     except Exception:
@@ -225,8 +306,7 @@ def get_teams_tenant() -> str:
         str: Tenant ID de Azure AD
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config and config.teams_tenant_id:
             return config.teams_tenant_id
     except Exception:
@@ -248,8 +328,7 @@ def get_teams_client_id() -> str:
         str: Client ID de Teams App
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config and config.teams_client_id:
             return config.teams_client_id
     except Exception:
@@ -271,8 +350,7 @@ def get_teams_client_secret() -> str:
         str: Client Secret de Teams App
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config and config.teams_client_secret:
             return config.teams_client_secret
     except Exception:
@@ -294,8 +372,7 @@ def get_account_prefix() -> str:
         str: Prefijo de cuentas (ej: 'test-a' o 'a')
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config and config.account_prefix:
             return config.account_prefix
     except Exception:
@@ -321,8 +398,7 @@ def get_email_from() -> str:
         str: Email remitente
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config and config.email_from:
             return config.email_from
     except Exception:
@@ -344,8 +420,7 @@ def get_email_host() -> str:
         str: Servidor SMTP
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config and config.email_host:
             return config.email_host
     except Exception:
@@ -367,8 +442,7 @@ def get_email_port() -> int:
         int: Puerto SMTP
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config and config.email_port is not None:
             return config.email_port
     except Exception:
@@ -390,8 +464,7 @@ def get_email_use_tls() -> bool:
         bool: True si se debe usar TLS
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config and config.email_use_tls is not None:
             return config.email_use_tls
     except Exception:
@@ -412,8 +485,7 @@ def get_moodle_email_type() -> str:
         str: 'institucional' o 'personal'
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config and config.moodle_email_type:
             return config.moodle_email_type
     except Exception:
@@ -434,8 +506,7 @@ def get_moodle_student_roleid() -> int:
         int: Role ID de estudiante
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config and config.moodle_student_roleid:
             return config.moodle_student_roleid
     except Exception:
@@ -456,8 +527,7 @@ def get_moodle_auth_method() -> str:
         str: 'manual' o 'oauth2'
     """
     try:
-        from alumnos.models import Configuracion
-        config = Configuracion.objects.first()
+        config = get_configuracion()
         if config and config.moodle_auth_method:
             return config.moodle_auth_method
     except Exception:
@@ -0,0 +1,117 @@
+"""
+Nombre del Módulo: http_client.py
+
+Descripción:
+Sesiones HTTP compartidas (keep-alive y reintentos) para las integraciones externas.
+
+Autor: Carlos Dagorret
+Fecha de Creación: 2025-12-29
+Última Modificación: 2025-12-29
+
+Licencia: MIT
+Copyright (c) 2025 Carlos Dagorret
+
+Permisos:
+Se concede permiso, de forma gratuita, a cualquier persona que obtenga una copia
+de este software y la documentación asociada (el "Software"), para tratar
+en el Software sin restricciones, incluyendo, sin limitación, los derechos
+de usar, copiar, modificar, fusionar, publicar, distribuir, sublicenciar
+y/o vender copias del Software, y para permitir a las personas a las que
+se les proporciona el Software hacerlo, sujeto a las siguientes condiciones:
+
+El aviso de copyright anterior y este aviso de permiso se incluirán en todas
+las copias o partes sustanciales del Software.
+
+EL SOFTWARE SE PROPORCIONA "TAL CUAL", SIN GARANTÍA DE NINGÚN TIPO, EXPRESA O
+IMPLÍCITA, INCLUYENDO PERO NO LIMITADO A LAS GARANTÍAS DE COMERCIABILIDAD,
+IDONEIDAD PARA UN PROPÓSITO PARTICULAR Y NO INFRACCIÓN. EN NINGÚN CASO LOS
+AUTORES O TITULARES DE LOS DERECHOS DE AUTOR SERÁN RESPONSABLES DE CUALQUIER
+RECLAMO, DAÑO U OTRA RESPONSABILIDAD, YA SEA EN UNA ACCIÓN DE CONTRATO,
+AGRAVIO O DE OTRO MODO, QUE SURJA DE, FUERA DE O EN CONEXIÓN CON EL SOFTWARE
+O EL USO U OTROS TRATOS EN EL SOFTWARE.
+"""
+
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Errores transitorios de gateway que se reintentan con backoff. 429 y 503
+# quedan fuera a propósito: son señales de limitación que van directo al
+# control AIMD y al re-encolado con backoff de la cola, no a un sleep acá.
+REINTENTO_STATUS = (502, 504)
+
+_lock = threading.Lock()
+_sesiones: Dict[str, Tuple[requests.Session, int]] = {}
+_pid: Optional[int] = None
+
+
+class SesionHTTP(requests.Session):
+    """requests.Session con timeout por defecto para toda request que no lo indique."""
+
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def _crear_sesion(servicio: str, pool_maxsize: int) -> requests.Session:
+    sesion = SesionHTTP(timeout=getattr(settings, 'HTTP_TIMEOUT', 30))
+    reintentos = Retry(
+        total=getattr(settings, 'HTTP_MAX_RETRIES', 2),
+        backoff_factor=0.5,
+        status_forcelist=REINTENTO_STATUS,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,  # POST solo se reintenta si no llegó a conectar
+        respect_retry_after_header=False,  # nunca dormir el worker por un Retry-After
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=getattr(settings, 'HTTP_POOL_CONNECTIONS', 4),
+        pool_maxsize=pool_maxsize,
+        max_retries=reintentos,
+    )
+    sesion.mount("http://", adapter)
+    sesion.mount("https://", adapter)
+    logger.debug(f"Sesión HTTP '{servicio}' creada (pool_maxsize={pool_maxsize})")
+    return sesion
+
+
+def get_session(servicio: str, pool_maxsize: Optional[int] = None) -> requests.Session:
+    """
+    Retorna la sesión HTTP compartida del proceso para un servicio externo
+    ('moodle', 'graph', 'sial'), para reutilizar conexiones keep-alive entre
+    instancias de los clientes y entre llamadas de una misma operación en lote.
+
+    La sesión no guarda credenciales: cada cliente envía las suyas (auth/headers)
+    en cada request. Tras un fork (workers prefork de Celery) se crean sesiones
+    nuevas, para no compartir sockets con el proceso padre.
+
+    Args:
+        servicio: Nombre lógico del servicio
+        pool_maxsize: Conexiones simultáneas requeridas por el llamador
+            (se usa el mayor entre este valor y HTTP_POOL_MAXSIZE)
+
+    Returns:
+        requests.Session con pool, reintentos y timeout por defecto
+    """
+    global _pid
+    tamanio = max(pool_maxsize or 0, getattr(settings, 'HTTP_POOL_MAXSIZE', 10))
+    with _lock:
+        if _pid != os.getpid():
+            _sesiones.clear()
+            _pid = os.getpid()
+        sesion, tamanio_actual = _sesiones.get(servicio, (None, 0))
+        if sesion is None or tamanio_actual < tamanio:
+            sesion = _crear_sesion(servicio, tamanio)
+            _sesiones[servicio] = (sesion, tamanio)
+        return sesion
@@ -0,0 +1,150 @@
+"""
+Nombre del Módulo: log_buffer.py
+
+Descripción:
+Escritura en lote de los Log de sistema, fuera del camino crítico.
+
+Autor: Carlos Dagorret
+Fecha de Creación: 2025-12-29
+Última Modificación: 2025-12-29
+
+Licencia: MIT
+Copyright (c) 2025 Carlos Dagorret
+
+Permisos:
+Se concede permiso, de forma gratuita, a cualquier persona que obtenga una copia
+de este software y la documentación asociada (el "Software"), para tratar
+en el Software sin restricciones, incluyendo, sin limitación, los derechos
+de usar, copiar, modificar, fusionar, publicar, distribuir, sublicenciar
+y/o vender copias del Software, y para permitir a las personas a las que
+se les proporciona el Software hacerlo, sujeto a las siguientes condiciones:
+
+El aviso de copyright anterior y este aviso de permiso se incluirán en todas
+las copias o partes sustanciales del Software.
+
+EL SOFTWARE SE PROPORCIONA "TAL CUAL", SIN GARANTÍA DE NINGÚN TIPO, EXPRESA O
+IMPLÍCITA, INCLUYENDO PERO NO LIMITADO A LAS GARANTÍAS DE COMERCIABILIDAD,
+IDONEIDAD PARA UN PROPÓSITO PARTICULAR Y NO INFRACCIÓN. EN NINGÚN CASO LOS
+AUTORES O TITULARES DE LOS DERECHOS DE AUTOR SERÁN RESPONSABLES DE CUALQUIER
+RECLAMO, DAÑO U OTRA RESPONSABILIDAD, YA SEA EN UNA ACCIÓN DE CONTRATO,
+AGRAVIO O DE OTRO MODO, QUE SURJA DE, FUERA DE O EN CONEXIÓN CON EL SOFTWARE
+O EL USO U OTROS TRATOS EN EL SOFTWARE.
+"""
+
+
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def _buffer() -> list:
+    if not hasattr(_local, 'logs'):
+        _local.logs = []
+        _local.desde = None
+    return _local.logs
+
+
+def registrar_log(tipo, modulo, mensaje, detalles=None, alumno=None, **campos):
+    """
+    Agrega un Log al buffer del hilo actual; se escribe con bulk_create.
+
+    El buffer se vuelca al llegar a LOG_BUFFER_TAMANO entradas, cuando la más
+    vieja supera LOG_BUFFER_SEGUNDOS, y siempre al terminar cada tarea Celery
+    o request (ver conectar_senales). Nunca lanza excepciones.
+
+    Nota: `fecha` (auto_now_add) toma la hora del volcado, no la del evento.
+    """
+    try:
+        from ..models import Log
+        logs = _buffer()
+        logs.append(Log(
+            tipo=tipo,
+            modulo=modulo,
+            mensaje=mensaje,
+            detalles=detalles,
+            alumno=alumno,
+            **campos
+        ))
+        if _local.desde is None:
+            _local.desde = time.monotonic()
+
+        if (len(logs) >= getattr(settings, 'LOG_BUFFER_TAMANO', 100)
+                or time.monotonic() - _local.desde >= getattr(settings, 'LOG_BUFFER_SEGUNDOS', 5)):
+            flush_logs()
+    except Exception as e:
+        logger.error(f"Error registrando log en buffer: {e}")
+
+
+def flush_logs() -> int:
+    """
+    Escribe los Log pendientes del hilo actual con bulk_create.
+
+    Si el INSERT en lote falla (ej: alumno borrado mientras tanto), reintenta
+    fila por fila y descarta las que no se puedan guardar.
+
+    Returns:
+        int: Cantidad de logs escritos
+    """
+    logs = _buffer()
+    if not logs:
+        return 0
+    _local.logs = []
+    _local.desde = None
+
+    from django.db import transaction
+    from ..models import Log
+
+    for log in logs:
+        # Alumno borrado después de registrar el log (delete() deja pk=None)
+        if log.alumno_id is not None and log.alumno is not None and log.alumno.pk is None:
+            log.alumno = None
+
+    try:
+        # Savepoint: un error acá no rompe la transacción de quien llama
+        with transaction.atomic():
+            Log.objects.bulk_create(logs)
+        return len(logs)
+    except Exception as e:
+        logger.error(f"Error guardando {len(logs)} logs en BD, reintentando uno por uno: {e}")
+
+    guardados = 0
+    for log in logs:
+        for intento in range(2):
+            try:
+                with transaction.atomic():
+                    log.save()
+                guardados += 1
+                break
+            except Exception as e:
+                if intento == 0 and log.alumno_id is not None:
+                    # Sin el alumno (pudo haberse borrado) antes de descartarlo
+                    log.alumno = None
+                    continue
+                logger.error(f"Log descartado ({log.modulo}: {log.mensaje}): {e}")
+                break
+    return guardados
+
+
+def _flush_senal(*args, **kwargs):
+    try:
+        flush_logs()
+    except Exception as e:
+        logger.error(f"Error volcando logs al finalizar: {e}")
+
+
+def conectar_senales():
+    """Vuelca el buffer al terminar cada tarea Celery, cada request y al salir del proceso."""
+    from celery.signals import task_postrun, worker_process_shutdown
+    from django.core.signals import request_finished
+
+    task_postrun.connect(_flush_senal, weak=False, dispatch_uid='lucy_log_buffer_task')
+    worker_process_shutdown.connect(_flush_senal, weak=False, dispatch_uid='lucy_log_buffer_worker')
+    request_finished.connect(_flush_senal, weak=False, dispatch_uid='lucy_log_buffer_request')
+    atexit.register(_flush_senal)
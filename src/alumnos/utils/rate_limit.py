@@ -0,0 +1,364 @@
+"""
+Nombre del Módulo: rate_limit.py
+
+Descripción:
+Limitador de tasa distribuido (GCRA) y control adaptativo (AIMD) para las APIs externas.
+
+Autor: Carlos Dagorret
+Fecha de Creación: 2025-12-29
+Última Modificación: 2025-12-29
+
+Licencia: MIT
+Copyright (c) 2025 Carlos Dagorret
+
+Permisos:
+Se concede permiso, de forma gratuita, a cualquier persona que obtenga una copia
+de este software y la documentación asociada (el "Software"), para tratar
+en el Software sin restricciones, incluyendo, sin limitación, los derechos
+de usar, copiar, modificar, fusionar, publicar, distribuir, sublicenciar
+y/o vender copias del Software, y para permitir a las personas a las que
+se les proporciona el Software hacerlo, sujeto a las siguientes condiciones:
+
+El aviso de copyright anterior y este aviso de permiso se incluirán en todas
+las copias o partes sustanciales del Software.
+
+EL SOFTWARE SE PROPORCIONA "TAL CUAL", SIN GARANTÍA DE NINGÚN TIPO, EXPRESA O
+IMPLÍCITA, INCLUYENDO PERO NO LIMITADO A LAS GARANTÍAS DE COMERCIABILIDAD,
+IDONEIDAD PARA UN PROPÓSITO PARTICULAR Y NO INFRACCIÓN. EN NINGÚN CASO LOS
+AUTORES O TITULARES DE LOS DERECHOS DE AUTOR SERÁN RESPONSABLES DE CUALQUIER
+RECLAMO, DAÑO U OTRA RESPONSABILIDAD, YA SEA EN UNA ACCIÓN DE CONTRATO,
+AGRAVIO O DE OTRO MODO, QUE SURJA DE, FUERA DE O EN CONEXIÓN CON EL SOFTWARE
+O EL USO U OTROS TRATOS EN EL SOFTWARE.
+"""
+
+
+
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# GCRA atómico en Redis. Guarda el "theoretical arrival time" (TAT) en ms.
+# KEYS[1]=clave  ARGV[1]=intervalo_ms  ARGV[2]=rafaga  ARGV[3]=costo
+# Retorna 0 si se concede, o los ms que faltan para poder concederse.
+_GCRA_LUA = """
+local t = redis.call('TIME')
+local ahora = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local intervalo = tonumber(ARGV[1])
+local tat = tonumber(redis.call('GET', KEYS[1]) or ahora)
+if tat < ahora then tat = ahora end
+local nuevo_tat = tat + intervalo * tonumber(ARGV[3])
+local permitido_desde = nuevo_tat - intervalo * tonumber(ARGV[2])
+if ahora < permitido_desde then
+    return permitido_desde - ahora
+end
+redis.call('SET', KEYS[1], nuevo_tat, 'PX', math.max(nuevo_tat - ahora, 1))
+return 0
+"""
+
+
+class LimitadorTasa:
+    """
+    Limitador GCRA (token bucket sin timers) compartido entre workers.
+
+    Cada servicio externo ('teams', 'moodle', 'uti') tiene su estado en
+    Redis (`lucy:ratelimit:<servicio>`), así varios workers que drenan la
+    cola en paralelo respetan juntos la cuota. No duerme: reservar() dice
+    cuánto falta y el llamador decide (re-encolar, pasar a otro tipo, etc.).
+    Si Redis no está disponible, el límite se aplica solo dentro del proceso.
+    """
+
+    def __init__(self, servicio: str, por_minuto: int, rafaga: int = 1):
+        self.clave = f"lucy:ratelimit:{servicio}"
+        self.por_minuto = por_minuto
+        self.rafaga = max(1, rafaga)
+        self._local_tat = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def intervalo(self) -> float:
+        """Segundos entre dos unidades de cuota."""
+        return 60.0 / self.por_minuto if self.por_minuto > 0 else 0.0
+
+    def reservar(self, costo: int = 1) -> float:
+        """
+        Intenta consumir `costo` unidades de cuota.
+
+        El costo se cobra completo: si supera la ráfaga, la ráfaga se amplía al
+        costo (se concede solo con el balde lleno), así un lote de N llamadas
+        consume N unidades y la tasa promedio no pasa de por_minuto.
+
+        Returns:
+            0 si se concedió; si no, segundos hasta que pueda concederse
+        """
+        if self.intervalo <= 0:
+            return 0.0
+        costo = max(1, costo)
+        rafaga = max(self.rafaga, costo)
+
+        r = get_redis()
+        if r is not None:
+            try:
+                espera_ms = r.eval(_GCRA_LUA, 1, self.clave, int(self.intervalo * 1000), rafaga, costo)
+                return int(espera_ms) / 1000.0
+            except Exception as e:
+                logger.warning(f"[RateLimit {self.clave}] Error en Redis, se limita solo en este proceso: {e}")
+
+        with self._lock:
+            ahora = time.time()
+            tat = max(self._local_tat, ahora)
+            nuevo_tat = tat + self.intervalo * costo
+            permitido_desde = nuevo_tat - self.intervalo * rafaga
+            if ahora < permitido_desde:
+                return permitido_desde - ahora
+            self._local_tat = nuevo_tat
+            return 0.0
+
+
+_limitadores: Dict[str, LimitadorTasa] = {}
+_limitadores_lock = threading.Lock()
+
+
+def get_limitador(servicio: str, por_minuto: int, rafaga: int = 1) -> LimitadorTasa:
+    """
+    Limitador del proceso para `servicio`, actualizado con la cuota vigente
+    (por_minuto puede cambiar desde Configuracion sin reiniciar workers).
+    """
+    with _limitadores_lock:
+        limitador = _limitadores.get(servicio)
+        if limitador is None:
+            limitador = LimitadorTasa(servicio, por_minuto, rafaga)
+            _limitadores[servicio] = limitador
+        limitador.por_minuto = por_minuto
+        limitador.rafaga = max(1, rafaga)
+        return limitador
+
+
+# =============================================================================
+# Control adaptativo (AIMD) a partir de 429/503 de las APIs
+# =============================================================================
+#
+# El rate_limit_<servicio> de Configuracion es la tasa base. Cada servicio
+# tiene un factor multiplicativo compartido en Redis (`lucy:aimd:<servicio>`):
+# cada éxito lo sube de a poco (aditivo, +1 tarea/min por minuto de éxitos)
+# hasta settings.RATE_LIMIT_TECHO_FACTOR, y cada 429/503 lo reduce a la mitad
+# y pausa el servicio durante el Retry-After.
+
+STATUS_LIMITACION = (429, 503)
+AIMD_FACTOR_BAJA = 0.5
+AIMD_FACTOR_MINIMO = 0.1
+# Varios 429 de la misma ráfaga cuentan como una sola baja
+AIMD_VENTANA_BAJA_SEGUNDOS = 10
+# Pausa cuando la respuesta no trae Retry-After
+RETRY_AFTER_DEFECTO_SEGUNDOS = 30
+# Sin actividad, el estado adaptativo expira y se vuelve a la tasa base
+AIMD_TTL_SEGUNDOS = 24 * 3600
+
+_LIMITACION_LUA = """
+local t = redis.call('TIME')
+local ahora = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local factor = tonumber(redis.call('HGET', KEYS[1], 'factor') or '1')
+local ultima = tonumber(redis.call('HGET', KEYS[1], 'ultima_baja') or '0')
+if ahora - ultima >= tonumber(ARGV[2]) then
+    factor = math.max(tonumber(ARGV[3]), factor * tonumber(ARGV[4]))
+    redis.call('HSET', KEYS[1], 'ultima_baja', ahora)
+end
+local pausa = math.max(tonumber(redis.call('HGET', KEYS[1], 'pausa_hasta') or '0'), ahora + tonumber(ARGV[1]))
+redis.call('HSET', KEYS[1], 'factor', factor, 'pausa_hasta', pausa)
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return tostring(factor)
+"""
+
+_EXITO_LUA = """
+local factor = tonumber(redis.call('HGET', KEYS[1], 'factor') or '1')
+local tasa = math.max(factor * tonumber(ARGV[2]), 1)
+factor = math.min(tonumber(ARGV[3]), factor + tonumber(ARGV[1]) / tasa)
+redis.call('HSET', KEYS[1], 'factor', factor)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return tostring(factor)
+"""
+
+_aimd_local: Dict[str, Dict[str, float]] = {}
+_aimd_lock = threading.Lock()
+
+
+class ServicioLimitado(ValueError):
+    """
+    La API externa respondió 429/503: la operación puede reintentarse más tarde.
+    Hereda de ValueError para no romper a los llamadores que ya capturan los
+    errores T-00x/M-00x de los servicios.
+    """
+
+    def __init__(self, mensaje: str, servicio: str, retry_after: float):
+        super().__init__(mensaje)
+        self.servicio = servicio
+        self.retry_after = retry_after
+
+
+def _clave_aimd(servicio: str) -> str:
+    return f"lucy:aimd:{servicio}"
+
+
+def _techo() -> float:
+    from django.conf import settings
+    return max(1.0, float(getattr(settings, 'RATE_LIMIT_TECHO_FACTOR', 2.0)))
+
+
+def retry_after_de(response) -> Optional[float]:
+    """Segundos del header Retry-After (en segundos o fecha HTTP), o None."""
+    valor = response.headers.get('Retry-After') if response is not None else None
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        fecha = parsedate_to_datetime(valor)
+        return max(0.0, fecha.timestamp() - time.time())
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def detectar_limitacion(servicio: str, response) -> Optional[float]:
+    """
+    Si `response` es un 429/503, lo registra en el control AIMD del servicio.
+
+    Returns:
+        Segundos a esperar antes de reintentar, o None si no hubo limitación
+    """
+    if response is None or response.status_code not in STATUS_LIMITACION:
+        return None
+    retry_after = retry_after_de(response)
+    if retry_after is None:
+        retry_after = RETRY_AFTER_DEFECTO_SEGUNDOS
+    registrar_limitacion(servicio, retry_after)
+    return retry_after
+
+
+def registrar_limitacion(servicio: str, retry_after: float = RETRY_AFTER_DEFECTO_SEGUNDOS) -> float:
+    """Baja multiplicativa del factor del servicio y pausa por retry_after. Retorna el nuevo factor."""
+    r = get_redis()
+    if r is not None:
+        try:
+            factor = float(r.eval(
+                _LIMITACION_LUA, 1, _clave_aimd(servicio), retry_after, AIMD_VENTANA_BAJA_SEGUNDOS,
+                AIMD_FACTOR_MINIMO, AIMD_FACTOR_BAJA, AIMD_TTL_SEGUNDOS
+            ))
+            logger.warning(f"[AIMD {servicio}] Limitado por la API: factor={factor:.2f}, pausa {retry_after:.0f}s")
+            return factor
+        except Exception as e:
+            logger.warning(f"[AIMD {servicio}] Error en Redis, se ajusta solo en este proceso: {e}")
+
+    with _aimd_lock:
+        ahora = time.time()
+        estado = _aimd_local.setdefault(servicio, {'factor': 1.0, 'pausa_hasta': 0.0, 'ultima_baja': 0.0})
+        if ahora - estado['ultima_baja'] >= AIMD_VENTANA_BAJA_SEGUNDOS:
+            estado['factor'] = max(AIMD_FACTOR_MINIMO, estado['factor'] * AIMD_FACTOR_BAJA)
+            estado['ultima_baja'] = ahora
+        estado['pausa_hasta'] = max(estado['pausa_hasta'], ahora + retry_after)
+        logger.warning(f"[AIMD {servicio}] Limitado por la API: factor={estado['factor']:.2f}, pausa {retry_after:.0f}s")
+        return estado['factor']
+
+
+def registrar_exito(servicio: str, tasa_base: int, cantidad: int = 1) -> float:
+    """Suba aditiva del factor del servicio tras `cantidad` operaciones exitosas. Retorna el nuevo factor."""
+    if tasa_base <= 0 or cantidad <= 0:
+        return 1.0
+    r = get_redis()
+    if r is not None:
+        try:
+            return float(r.eval(_EXITO_LUA, 1, _clave_aimd(servicio), cantidad, tasa_base, _techo(), AIMD_TTL_SEGUNDOS))
+        except Exception as e:
+            logger.warning(f"[AIMD {servicio}] Error en Redis, se ajusta solo en este proceso: {e}")
+
+    with _aimd_lock:
+        estado = _aimd_local.setdefault(servicio, {'factor': 1.0, 'pausa_hasta': 0.0, 'ultima_baja': 0.0})
+        tasa = max(estado['factor'] * tasa_base, 1)
+        estado['factor'] = min(_techo(), estado['factor'] + cantidad / tasa)
+        return estado['factor']
+
+
+def estado_adaptativo(servicio: str) -> Tuple[float, float]:
+    """
+    Returns:
+        (factor sobre la tasa base, segundos de pausa restantes por Retry-After)
+    """
+    r = get_redis()
+    if r is not None:
+        try:
+            factor, pausa_hasta = r.hmget(_clave_aimd(servicio), 'factor', 'pausa_hasta')
+            return (
+                float(factor) if factor is not None else 1.0,
+                max(0.0, float(pausa_hasta or 0) - time.time())
+            )
+        except Exception as e:
+            logger.warning(f"[AIMD {servicio}] Error leyendo Redis: {e}")
+
+    with _aimd_lock:
+        estado = _aimd_local.get(servicio)
+        if not estado:
+            return 1.0, 0.0
+        return estado['factor'], max(0.0, estado['pausa_hasta'] - time.time())
+
+
+# =============================================================================
+# Cuota por tipo de tarea (limitador GCRA ajustado por el factor AIMD)
+# =============================================================================
+
+# Servicios externos cuya cuota (Configuracion.rate_limit_<servicio>) consume
+# cada tipo de tarea (valores de Tarea.TipoTarea). Las mixtas consumen de ambos.
+SERVICIOS_POR_TIPO = {
+    # Tareas de Teams/Graph API
+    'crear_usuario_teams': ('teams',),
+    'resetear_password': ('teams',),
+    'enviar_email': ('teams',),
+
+    # Tareas de Moodle
+    'moodle_enroll': ('moodle',),
+
+    # Tareas de UTI/SIAL
+    'ingesta_preinscriptos': ('uti',),
+    'ingesta_aspirantes': ('uti',),
+    'ingesta_ingresantes': ('uti',),
+
+    # Tareas mixtas
+    'activar_servicios': ('teams', 'moodle'),
+    'eliminar_cuenta': ('teams', 'moodle'),
+}
+
+
+def reservar_cuota(tipo_tarea, config, costo: int = 1) -> float:
+    """
+    Consume `costo` unidades de cuota de cada servicio externo que usa el tipo
+    de tarea (una por alumno en los lotes multi-fila / $batch).
+
+    La cuota es rate_limit_<servicio> ajustado por el control AIMD (sube con
+    éxitos, baja con 429/503); si el servicio está en pausa por Retry-After no
+    se consume nada. La ráfaga es el propio costo: un lote completo sale
+    cuando se acumuló su cuota, y la tasa promedio sigue siendo por_minuto.
+
+    Returns:
+        0 si hay cuota; si no, segundos hasta que la haya
+    """
+    espera = 0.0
+    for servicio in SERVICIOS_POR_TIPO.get(tipo_tarea, (tipo_tarea,)):
+        factor, pausa = estado_adaptativo(servicio)
+        if pausa > 0:
+            espera = max(espera, pausa)
+            continue
+        base = getattr(config, f'rate_limit_{servicio}', 10)  # Default 10 tareas/min
+        por_minuto = max(1, int(base * factor))
+        espera = max(espera, get_limitador(servicio, por_minuto, rafaga=costo).reservar(costo))
+    return espera
+
+
+def registrar_exito_tarea(tipo_tarea, config, cantidad: int = 1):
+    """Informa al control AIMD de cada servicio del tipo que hubo `cantidad` operaciones exitosas."""
+    for servicio in SERVICIOS_POR_TIPO.get(tipo_tarea, (tipo_tarea,)):
+        registrar_exito(servicio, getattr(config, f'rate_limit_{servicio}', 10), cantidad)
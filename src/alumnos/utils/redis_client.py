@@ -0,0 +1,84 @@
+"""
+Nombre del Módulo: redis_client.py
+
+Descripción:
+Cliente Redis compartido (caches y coordinación entre workers).
+
+Autor: Carlos Dagorret
+Fecha de Creación: 2025-12-29
+Última Modificación: 2025-12-29
+
+Licencia: MIT
+Copyright (c) 2025 Carlos Dagorret
+
+Permisos:
+Se concede permiso, de forma gratuita, a cualquier persona que obtenga una copia
+de este software y la documentación asociada (el "Software"), para tratar
+en el Software sin restricciones, incluyendo, sin limitación, los derechos
+de usar, copiar, modificar, fusionar, publicar, distribuir, sublicenciar
+y/o vender copias del Software, y para permitir a las personas a las que
+se les proporciona el Software hacerlo, sujeto a las siguientes condiciones:
+
+El aviso de copyright anterior y este aviso de permiso se incluirán en todas
+las copias o partes sustanciales del Software.
+
+EL SOFTWARE SE PROPORCIONA "TAL CUAL", SIN GARANTÍA DE NINGÚN TIPO, EXPRESA O
+IMPLÍCITA, INCLUYENDO PERO NO LIMITADO A LAS GARANTÍAS DE COMERCIABILIDAD,
+IDONEIDAD PARA UN PROPÓSITO PARTICULAR Y NO INFRACCIÓN. EN NINGÚN CASO LOS
+AUTORES O TITULARES DE LOS DERECHOS DE AUTOR SERÁN RESPONSABLES DE CUALQUIER
+RECLAMO, DAÑO U OTRA RESPONSABILIDAD, YA SEA EN UNA ACCIÓN DE CONTRATO,
+AGRAVIO O DE OTRO MODO, QUE SURJA DE, FUERA DE O EN CONEXIÓN CON EL SOFTWARE
+O EL USO U OTROS TRATOS EN EL SOFTWARE.
+"""
+
+
+
+import logging
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_cliente = None
+_ultimo_intento = float('-inf')
+
+# Segundos entre reintentos de conexión cuando Redis no está disponible
+REINTENTO_SEGUNDOS = 60
+
+
+def get_redis():
+    """
+    Obtiene el cliente Redis compartido del proceso.
+
+    Usa REDIS_URL (por defecto la misma instancia que el broker de Celery).
+    Si la librería no está instalada o Redis no responde, retorna None y
+    los llamadores deben degradar a su fallback en memoria (se reintenta
+    la conexión cada REINTENTO_SEGUNDOS).
+
+    Returns:
+        redis.Redis | None
+    """
+    global _cliente, _ultimo_intento
+    if _cliente is not None or time.monotonic() - _ultimo_intento < REINTENTO_SEGUNDOS:
+        return _cliente
+
+    with _lock:
+        if _cliente is not None or time.monotonic() - _ultimo_intento < REINTENTO_SEGUNDOS:
+            return _cliente
+        _ultimo_intento = time.monotonic()
+        url: Optional[str] = getattr(settings, 'REDIS_URL', None) or getattr(settings, 'CELERY_BROKER_URL', None)
+        if not url or not url.startswith(('redis://', 'rediss://', 'unix://')):
+            return None
+        try:
+            import redis
+            cliente = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+            cliente.ping()
+            _cliente = cliente
+        except Exception as e:
+            logger.warning(f"Redis no disponible ({e}), se usarán caches locales del proceso")
+            _cliente = None
+        return _cliente
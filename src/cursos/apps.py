@@ -38,3 +38,7 @@ class CursosConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "cursos"
     verbose_name = "Cursos de Ingreso"
+
+    def ready(self):
+        """Importa signals cuando la app está lista."""
+        import cursos.signals  # noqa
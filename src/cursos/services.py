@@ -32,7 +32,10 @@ RECLAMO, DAÑO U OTRA RESPONSABILIDAD, YA SEA EN UNA ACCIÓN DE CONTRATO,
 AGRAVIO O DE OTRO MODO, QUE SURJA DE, FUERA DE O EN CONEXIÓN CON EL SOFTWARE
 O EL USO U OTROS TRATOS EN EL SOFTWARE.
 """
-from typing import Iterable, List, Tuple
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+from alumnos.utils.cache_versionado import CacheVersionado
 
 from .constants import CARRERAS_DICT, MODALIDADES_DICT
 from .models import (
@@ -58,6 +61,88 @@ class MapeoError:
         self.motivo = motivo
 
 
+def _elementos_json(valor) -> List[str]:
+    """
+    Elementos string de una lista JSON, sin repetir.
+    Replica la semántica de `campo__contains=[valor]` sobre JSONField.
+    """
+    if not isinstance(valor, list):
+        return []
+    return list(dict.fromkeys(v for v in valor if isinstance(v, str)))
+
+
+class IndiceCursos:
+    """
+    Índice inmutable de CursoIngreso activos:
+    {(carrera, modalidad) -> {comision -> (shortnames...)}}.
+
+    Se arma con una sola query y permite resolver cursos sin tocar la BD.
+    """
+
+    __slots__ = ("_todos", "_por_comision", "_detalle")
+
+    def __init__(self, cursos: Iterable[Tuple[str, list, list, list]]):
+        todos: Dict[Tuple[str, str], List[str]] = {}
+        por_comision: Dict[Tuple[str, str], Dict[str, List[str]]] = {}
+        detalle: Dict[Tuple[str, str], List[Tuple[str, Tuple[str, ...]]]] = {}
+
+        for curso_moodle, carreras, modalidades, comisiones in cursos:
+            lista_comisiones = _elementos_json(comisiones)
+            for carrera in _elementos_json(carreras):
+                for mod in _elementos_json(modalidades):
+                    clave = (carrera, mod)
+                    todos.setdefault(clave, []).append(curso_moodle)
+                    detalle.setdefault(clave, []).append((curso_moodle, tuple(lista_comisiones)))
+                    comisiones_clave = por_comision.setdefault(clave, {})
+                    for com in lista_comisiones:
+                        comisiones_clave.setdefault(com, []).append(curso_moodle)
+
+        self._todos: Mapping[Tuple[str, str], Tuple[str, ...]] = MappingProxyType(
+            {clave: tuple(cursos_clave) for clave, cursos_clave in todos.items()}
+        )
+        self._por_comision: Mapping[Tuple[str, str], Mapping[str, Tuple[str, ...]]] = MappingProxyType({
+            clave: MappingProxyType({com: tuple(c) for com, c in comisiones_clave.items()})
+            for clave, comisiones_clave in por_comision.items()
+        })
+        self._detalle: Mapping[Tuple[str, str], Tuple[Tuple[str, Tuple[str, ...]], ...]] = MappingProxyType(
+            {clave: tuple(cursos_clave) for clave, cursos_clave in detalle.items()}
+        )
+
+    @classmethod
+    def desde_bd(cls) -> "IndiceCursos":
+        return cls(
+            CursoIngreso.objects.filter(activo=True)
+            .order_by("pk")
+            .values_list("curso_moodle", "carreras", "modalidades", "comisiones")
+        )
+
+    def cursos(self, carrera: str, modalidad: str) -> Tuple[str, ...]:
+        """Todos los cursos activos de la carrera + modalidad."""
+        return self._todos.get((carrera, modalidad), ())
+
+    def cursos_comision(self, carrera: str, modalidad: str, comision: str) -> Tuple[str, ...]:
+        """Cursos activos de la carrera + modalidad que incluyen la comisión."""
+        return self._por_comision.get((carrera, modalidad), {}).get(comision, ())
+
+    def cursos_con_comisiones(self, carrera: str, modalidad: str) -> Tuple[Tuple[str, Tuple[str, ...]], ...]:
+        """Pares (shortname, comisiones del curso) de la carrera + modalidad."""
+        return self._detalle.get((carrera, modalidad), ())
+
+
+# La versión en Redis se incrementa al guardar/borrar/importar cursos (ver cursos/signals.py)
+_indice_cursos = CacheVersionado("lucy:cursos:version", IndiceCursos.desde_bd)
+
+
+def get_indice_cursos() -> IndiceCursos:
+    """Índice de cursos activos cacheado en el proceso."""
+    return _indice_cursos.get()
+
+
+def invalidar_indice_cursos() -> None:
+    """Descarta el índice de cursos en todos los procesos."""
+    _indice_cursos.invalidar()
+
+
 def resolver_curso(codigo_carrera: str, modalidad: str, comision: str) -> List[str]:
     """
     Devuelve TODOS los shortnames de Moodle para la combinación carrera + modalidad + comisión.
@@ -67,6 +152,8 @@ def resolver_curso(codigo_carrera: str, modalidad: str, comision: str) -> List[s
 
     Prioridad: CursoIngreso con coincidencia exacta de comisión si viene informada.
     Lanza ValueError si no hay match.
+
+    Resuelve contra el índice en memoria (get_indice_cursos), sin queries.
     """
     carrera = (codigo_carrera or "").strip().upper()
     com_list = _normalizar_comisiones(comision)
@@ -80,26 +167,25 @@ def resolver_curso(codigo_carrera: str, modalidad: str, comision: str) -> List[s
     if not mod:
         raise ValueError("Modalidad vacía")
 
-    normales = CursoIngreso.objects.filter(
-        activo=True, carreras__contains=[carrera], modalidades__contains=[mod]
-    )
+    indice = get_indice_cursos()
+    normales = indice.cursos(carrera, mod)
 
     # TGA y TGE: Una sola entrada por carrera, NO filtrar por comisión
     if carrera in ["TGA", "TGE"]:
-        if normales.exists():
-            return [c.curso_moodle for c in normales]
+        if normales:
+            return list(normales)
         raise ValueError(f"No se encontró curso para {carrera}")
 
     # Para otras carreras: Si hay comisión especificada, filtrar por ella
     if com_list:
         for com in com_list:
-            con_comision = normales.filter(comisiones__contains=[com])
-            if con_comision.exists():
-                return [c.curso_moodle for c in con_comision]
+            con_comision = indice.cursos_comision(carrera, mod, com)
+            if con_comision:
+                return list(con_comision)
 
     # Devolver todos los cursos que coinciden (sin filtro de comisión)
-    if normales.exists():
-        return [c.curso_moodle for c in normales]
+    if normales:
+        return list(normales)
 
     raise ValueError("No se encontró mapeo")
 
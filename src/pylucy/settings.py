@@ -249,6 +249,9 @@ except Exception as e:
     )
     MOODLE_WSTOKEN = os.getenv("MOODLE_WSTOKEN", "")
 
+# Segundos que se cachean los IDs de cursos/grupos de Moodle (compartidos vía Redis)
+MOODLE_CACHE_TTL = int(os.getenv("MOODLE_CACHE_TTL", "3600"))
+
 # Microsoft Teams / Graph API - Las credenciales se cargan desde credenciales/teams_credentials.json
 try:
     from pylucy.credentials_loader import get_teams_credentials
@@ -275,6 +278,24 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
+# Redis para caches compartidos entre workers (por defecto, el mismo del broker)
+REDIS_URL = os.getenv("REDIS_URL", CELERY_BROKER_URL)
+
+# Sesiones HTTP salientes (Moodle, Graph, SIAL): pool keep-alive por worker
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "4"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+
+# Techo del rate limit adaptativo: ante éxitos sostenidos, la cuota de cada
+# servicio puede subir hasta rate_limit_<servicio> × este factor (429/503 la bajan)
+RATE_LIMIT_TECHO_FACTOR = float(os.getenv("RATE_LIMIT_TECHO_FACTOR", "2.0"))
+
+# Logs de sistema (modelo Log) en lote: se escriben con bulk_create al juntar
+# LOG_BUFFER_TAMANO entradas, pasados LOG_BUFFER_SEGUNDOS o al terminar la tarea/request
+LOG_BUFFER_TAMANO = int(os.getenv("LOG_BUFFER_TAMANO", "100"))
+LOG_BUFFER_SEGUNDOS = float(os.getenv("LOG_BUFFER_SEGUNDOS", "5"))
+
 # =============================================================================
 # SISTEMA DE COLAS - Feature Flag
 # =============================================================================
@@ -287,3 +308,23 @@ CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 #
 # Para activar en producción/testing: agregar USE_QUEUE_SYSTEM=true en .env
 USE_QUEUE_SYSTEM = os.getenv("USE_QUEUE_SYSTEM", "False").lower() == "true"
+
+# Consumidores en paralelo por carril de la cola (teams, moodle, email, uti).
+# Los consumidores reclaman tareas PENDING de su carril con SKIP LOCKED (sin
+# duplicar trabajo); el rate limit de cada servicio se comparte entre todos.
+COLA_CONCURRENCIA = {
+    'teams': int(os.getenv("COLA_CONCURRENCIA_TEAMS", "1")),
+    'moodle': int(os.getenv("COLA_CONCURRENCIA_MOODLE", "1")),
+    'email': int(os.getenv("COLA_CONCURRENCIA_EMAIL", "1")),
+    'uti': int(os.getenv("COLA_CONCURRENCIA_UTI", "1")),
+}
+
+# Checkpoints del procesador de la cola: los estados finales de las tareas se
+# guardan con bulk_update cada N tareas o S segundos (lo que ocurra primero).
+# Es la granularidad con la que el admin ve avanzar un lote.
+COLA_CHECKPOINT_TAREAS = int(os.getenv("COLA_CHECKPOINT_TAREAS", "25"))
+COLA_CHECKPOINT_SEGUNDOS = float(os.getenv("COLA_CHECKPOINT_SEGUNDOS", "10"))
+
+# Acciones masivas del admin (*_sync): se ejecutan en background de a N alumnos;
+# entre chunks se actualiza el progreso y se revisa si se pidió cancelar.
+ACCION_MASIVA_CHUNK = int(os.getenv("ACCION_MASIVA_CHUNK", "20"))